@@ -1,441 +1,442 @@
-import streamlit as st
+import hashlib
 import os
-import re
 import tempfile
+import time
 import zipfile
-from io import BytesIO
+from time import perf_counter
 
+import streamlit as st
 
-def modificar_estrategia_escalado_gerard(content, filename):
-    """
-    Modifica contenido de estrategia MQL5 para añadir gestión de riesgo por niveles - VERSIÓN CORREGIDA
-    """
-    # Evita modificar un archivo que ya ha sido procesado
-    if "Risk Management (Precise Level Scaling)" in content:
-        return (
-            None,
-            f"El archivo '{filename}' ya parece tener la gestión de riesgo precisa.",
-        )
+from cache import CacheResultados
+from diferencias import con_cabecera
+from entradas import listar_fuentes
+from motor import ANCLAS_REQUERIDAS, METODOLOGIAS, nombre_modificado
+from trabajos import (
+    ICONOS,
+    REGISTRO_TRABAJOS,
+    TTL_TRABAJOS,
+    ColaLlena,
+    ColaTrabajos,
+)
 
-    # Correcciones de warnings comunes
-    content = content.replace(
-        'return("File not found in the MQL5\\Files directory to send on FTP server");',
-        'return("File not found in the MQL5\\\\Files directory to send on FTP server");',
-    )
-    content = content.replace("0.5f", "0.5")
-    content = content.replace("10.0f", "10.0")
-
-    # Bloques de código MQL5 CORREGIDOS
-    risk_management_inputs = """
-    //+------------------------------------------------------------------+
-    //| Risk Management (Precise Level Scaling) by Python Script
-    //+------------------------------------------------------------------+
-    input string g_riskScalingTitle = "----------- Risk Management (Level Scaling) -----------";
-    input string g_riskLevels_string = "1.0,1.2,1.6,2.4,3.6,4.5"; // Risk % por nivel, separado por comas
-
-    // --- Internal State Variables ---
-    double g_riskLevels[];          // Array para guardar los niveles de riesgo parseados
-    int    g_currentTradeLevel;     // Nivel actual del Trade (1-based, ej: 1, 2, 3...)
-    string g_gv_tradeLevel_key;     // Clave para la Variable Global
+# Segundos entre consultas del estado de los trabajos en curso
+INTERVALO_SONDEO = 1
 
-    """
+# ZIP de resultados de cada sesión: en disco, la sesión solo guarda la ruta
+DESCARGAS_DIR = os.path.join(tempfile.gettempdir(), "mql5_descargas")
 
-    on_init_addition = """
-    // --- Inicialización de Gestión de Riesgo por Niveles ---
-    g_gv_tradeLevel_key = "SQ.TradeLevel." + StrategyID;
 
-    string risk_levels_parts[];
-    StringSplit(g_riskLevels_string, ',', risk_levels_parts);
-    ArrayResize(g_riskLevels, ArraySize(risk_levels_parts));
-    for(int i = 0; i < ArraySize(risk_levels_parts); i++)
-    {
-        g_riskLevels[i] = StringToDouble(risk_levels_parts[i]);
-    }
+@st.cache_resource
+def obtener_cache_resultados():
+    """Caché de resultados compartida entre reruns y sesiones"""
+    return CacheResultados()
 
-    if(ArraySize(g_riskLevels) == 0)
-    {
-        Alert("Error en Gestión de Riesgo: La cadena de niveles de riesgo está vacía o mal formada.");
-        return(INIT_FAILED);
-    }
 
-    if(GlobalVariableCheck(g_gv_tradeLevel_key)) {
-        g_currentTradeLevel = (int)GlobalVariableGet(g_gv_tradeLevel_key);
-    } else {
-        g_currentTradeLevel = 1; 
-        GlobalVariableSet(g_gv_tradeLevel_key, g_currentTradeLevel);
-    }
-    
-    VerboseLog("Gestión de Riesgo por Niveles Inicializada. Nivel Actual: ", IntegerToString(g_currentTradeLevel));
-    // --- Fin de la Inicialización ---
-    """
+@st.cache_resource
+def obtener_cola_trabajos():
+    """Cola de trabajos en segundo plano, común a todas las sesiones"""
+    return ColaTrabajos(obtener_cache_resultados(), registro=REGISTRO_TRABAJOS)
 
-    on_trade_transaction_function = """
-    //+------------------------------------------------------------------+
-    //| Gestor de Eventos de Transacción para Gestión de Riesgo por Niveles |
-    //+------------------------------------------------------------------+
-    void OnTradeTransaction(const MqlTradeTransaction &trans,
-                            const MqlTradeRequest &request,
-                            const MqlTradeResult &result)
-    {
-    if(trans.type == TRADE_TRANSACTION_DEAL_ADD)
-    {
-        if(HistoryDealSelect(trans.deal))
-        {
-            if(HistoryDealGetInteger(trans.deal, DEAL_MAGIC) == MagicNumber)
-            {
-                if(HistoryDealGetInteger(trans.deal, DEAL_ENTRY) == DEAL_ENTRY_OUT)
-                {
-                double dealProfit = HistoryDealGetDouble(trans.deal, DEAL_PROFIT);
-                
-                if(dealProfit < 0) 
-                {
-                    g_currentTradeLevel++; 
-                    if(g_currentTradeLevel > ArraySize(g_riskLevels))
-                    {
-                        g_currentTradeLevel = ArraySize(g_riskLevels);
-                    }
-                    VerboseLog("GESTION POR NIVELES: Trade PERDEDOR. Avanzando al Nivel ", IntegerToString(g_currentTradeLevel));
-                }
-                else
-                {
-                    g_currentTradeLevel = 1;
-                    VerboseLog("GESTION POR NIVELES: Trade GANADOR. Reseteando al Nivel 1.");
-                }
-                GlobalVariableSet(g_gv_tradeLevel_key, g_currentTradeLevel);
-                }
-            }
-        }
-    }
-    }
-    """
 
-    # LÓGICA CORREGIDA para el cálculo del tamaño del lote
-    lot_size_calculation_logic = """      // --- Cálculo de Gestión de Riesgo por Niveles ---
-      if(g_currentTradeLevel < 1 || g_currentTradeLevel > ArraySize(g_riskLevels))
-      {
-         g_currentTradeLevel = 1; 
-         GlobalVariableSet(g_gv_tradeLevel_key, g_currentTradeLevel);
-      }
-      
-      double riskPercentForTrade = g_riskLevels[g_currentTradeLevel - 1];
-      
-      double moneyToRisk = (initialBalance * riskPercentForTrade) / 100.0;
-      VerboseLog("GESTION POR NIVELES: Nivel actual: ", IntegerToString(g_currentTradeLevel), ". Arriesgando: ", DoubleToString(riskPercentForTrade, 2), "%. Dinero máximo a arriesgar: ", DoubleToString(moneyToRisk, 2));
-      
-      size = sqMMFixedAmount("Current",ORDER_TYPE_BUY,openPrice,sl,moneyToRisk,mmDecimals,mmLotsIfNoMM,mmMaxLots,mmMultiplier);"""
-
-    # FUNCIÓN CORREGIDA sqMMFixedAmount sin el parámetro problemático mmStep
-    precise_mm_function = """
-    double sqMMFixedAmount(string symbol, ENUM_ORDER_TYPE orderType, double price, double sl, double RiskedMoney, int decimals, double LotsIfNoMM, double MaximumLots, double multiplier) {
-    Verbose("Computing Money Management for order - Precise amount");
-    
-    if(UseMoneyManagement == false) {
-        Verbose("Use Money Management = false, MM not used");
-        return (mmLotsIfNoMM);
-    }
-        
-    string correctedSymbol = correctSymbol(symbol);
-    sl = NormalizeDouble(sl, (int) SymbolInfoInteger(correctedSymbol, SYMBOL_DIGITS));
-    
-    double openPrice = price > 0 ? price : SymbolInfoDouble(correctedSymbol, isLongOrder(orderType) ? SYMBOL_ASK : SYMBOL_BID);
-    double LotSize=0;
-
-    if(RiskedMoney <= 0 ) {
-        Verbose("Computing Money Management - Incorrect RiskedMoney value, it must be above 0");
-        return(0);
-    }
-    
-    double PointValue = SymbolInfoDouble(correctedSymbol, SYMBOL_TRADE_TICK_VALUE) / SymbolInfoDouble(correctedSymbol, SYMBOL_TRADE_TICK_SIZE); 
-    double Smallest_Lot = SymbolInfoDouble(correctedSymbol, SYMBOL_VOLUME_MIN);
-    double Largest_Lot = SymbolInfoDouble(correctedSymbol, SYMBOL_VOLUME_MAX);    
-    double LotStep = SymbolInfoDouble(correctedSymbol, SYMBOL_VOLUME_STEP);
-    
-    if (PointValue <= 0 || MathAbs(openPrice - sl) <= 0) {
-        Verbose("Cannot calculate lot size: Point value or SL distance is zero. Using default lot size.");
-        return LotsIfNoMM;
-    }
-    
-    double oneLotSLDrawdown = PointValue * MathAbs(openPrice - sl);
-            
-    if(oneLotSLDrawdown > 0) {
-        LotSize = RiskedMoney / oneLotSLDrawdown;
-    }
-    else {
-        LotSize = 0;
-    }
+def _huella_contenido(identidad, cargar):
+    """
+    Hash del contenido de un archivo subido, memorizado por su identidad para
+    no releerlo en cada rerun
+    """
+    huellas = st.session_state.setdefault("huellas", {})
+    huella = huellas.get(identidad)
+    if huella is None:
+        huella = huellas[identidad] = hashlib.sha256(cargar()).hexdigest()
+    return huella
+
+
+def _olvidar_archivos_retirados(fuentes, claves):
+    """Descarta del estado de sesión los archivos que ya no están en el cargador"""
+    identidades = {identidad for _, identidad, _ in fuentes}
+    huellas = st.session_state.setdefault("huellas", {})
+    for identidad in list(huellas):
+        if identidad not in identidades:
+            del huellas[identidad]
+
+    vigentes = set(claves)
+    for nombre in ("resultados", "informes_anclas", "colisiones"):
+        guardados = st.session_state.setdefault(nombre, {})
+        for clave in list(guardados):
+            if clave not in vigentes:
+                del guardados[clave]
+
+
+def _enviar_trabajo(fuentes, claves, pendientes, metodologia):
+    """
+    Envía los archivos pendientes a la cola de trabajos y apunta el trabajo en
+    la sesión y en la URL, para recuperarlo si se recarga la página
+    """
+    try:
+        with st.spinner(f"Preparando {len(pendientes)} archivo(s)..."):
+            id_trabajo = obtener_cola_trabajos().enviar(
+                metodologia,
+                [(claves[i], fuentes[i][0], fuentes[i][2]) for i in pendientes],
+            )
+    except ColaLlena as e:
+        st.warning(f"⏳ {e}")
+        return False
+    trabajos = st.session_state.setdefault("trabajos", [])
+    if id_trabajo not in trabajos:
+        trabajos.append(id_trabajo)
+    st.query_params["trabajo"] = id_trabajo
+    return True
 
-    LotSize = LotSize * multiplier;
-    
-    // Redondear al step correcto
-    if(LotStep > 0) {
-        LotSize = MathFloor(LotSize / LotStep) * LotStep;
-    }
 
-    Verbose("Computing Money Management - Smallest_Lot: ", DoubleToString(Smallest_Lot), ", Largest_Lot: ", DoubleToString(Largest_Lot), ", Computed LotSize: ", DoubleToString(LotSize, 8));
-    Verbose("Money to risk: ", DoubleToString(RiskedMoney), ", Max 1 lot trade drawdown: ", DoubleToString(oneLotSLDrawdown), ", Point value: ", DoubleToString(PointValue));
+def _incorporar_trabajos():
+    """
+    Pasa al estado de sesión los resultados de los trabajos terminados y
+    devuelve los que siguen en curso
+    """
+    cola = obtener_cola_trabajos()
+    trabajos = st.session_state.setdefault("trabajos", [])
+    incorporados = st.session_state.setdefault("trabajos_incorporados", set())
+    # Tras recargar la página, el trabajo de la URL se sigue desde la nueva sesión
+    id_url = st.query_params.get("trabajo")
+    if id_url and id_url not in trabajos and id_url not in incorporados:
+        trabajos.append(id_url)
+
+    activos = []
+    for id_trabajo in list(trabajos):
+        trabajo = cola.obtener(id_trabajo)
+        if trabajo is None:
+            trabajos.remove(id_trabajo)
+            continue
+        if trabajo.activo:
+            activos.append(trabajo)
+            continue
+        st.session_state.setdefault("resultados", {}).update(trabajo.resultados)
+        st.session_state.setdefault("informes_anclas", {}).update(trabajo.informes)
+        st.session_state.setdefault("colisiones", {}).update(trabajo.colisiones)
+        if trabajo.perfil is not None:
+            st.session_state["perfil"] = trabajo.perfil
+            st.session_state["resumen_cache"] = trabajo.resumen_cache
+        if trabajo.error is not None:
+            st.error(f"❌ El trabajo {id_trabajo[:8]} se interrumpió: {trabajo.error}")
+        trabajos.remove(id_trabajo)
+        incorporados.add(id_trabajo)
+    return activos
+
+
+@st.fragment(run_every=INTERVALO_SONDEO)
+def _seguir_trabajos():
+    """Progreso de los trabajos en curso; cuando terminan, se recarga la página"""
+    cola = obtener_cola_trabajos()
+    en_curso = False
+    for id_trabajo in st.session_state.get("trabajos", []):
+        trabajo = cola.obtener(id_trabajo)
+        if trabajo is None or not trabajo.activo:
+            continue
+        en_curso = True
+        if trabajo.estado == "en_cola":
+            st.info(
+                f"⏳ Trabajo {id_trabajo[:8]} en cola "
+                f"({cola.posicion(trabajo)} trabajo(s) por delante)"
+            )
+            continue
+        st.progress(
+            trabajo.completados / max(trabajo.total, 1),
+            text=f"Trabajo {id_trabajo[:8]}: {trabajo.completados} de "
+            f"{trabajo.total} archivo(s)",
+        )
+        resumen = " · ".join(
+            f"{ICONOS[estado]} {cantidad}"
+            for estado, cantidad in trabajo.contadores().items()
+            if cantidad
+        )
+        if resumen:
+            st.caption(resumen)
+        for linea in list(trabajo.recientes):
+            st.write(linea)
+    if not en_curso:
+        st.rerun()
+    st.caption(
+        "El procesamiento sigue en segundo plano: puedes cambiar opciones o "
+        "recargar la página sin perderlo."
+    )
 
-    if(LotSize <= 0) {
-        Verbose("Calculated LotSize is <= 0. Using LotsIfNoMM value: ", DoubleToString(LotsIfNoMM), ")");
-        LotSize = LotsIfNoMM;
-    }                              
 
-    if (LotSize < Smallest_Lot) {
-        Verbose("Calculated LotSize is too small (", DoubleToString(LotSize,8), "). Minimal allowed is ", DoubleToString(Smallest_Lot), ". Trade will be skipped.");
-        return 0;
-    }
-    else if (LotSize > Largest_Lot) {
-        Verbose("LotSize is too big. LotSize set to maximal allowed market value: ", DoubleToString(Largest_Lot));
-        LotSize = Largest_Lot;
-    }
+def _mostrar_trabajo_recuperado():
+    """Resumen y ZIP del trabajo de la URL cuando no hay archivos cargados"""
+    id_trabajo = st.query_params.get("trabajo")
+    trabajo = obtener_cola_trabajos().obtener(id_trabajo) if id_trabajo else None
+    if trabajo is None or trabajo.activo:
+        return
+
+    st.subheader(f"📦 Último trabajo: {trabajo.metodologia}")
+    contadores = trabajo.contadores()
+    st.caption(
+        " · ".join(
+            f"{ICONOS[estado]} {cantidad}"
+            for estado, cantidad in contadores.items()
+            if cantidad
+        )
+    )
+    if trabajo.archivo_zip is not None and contadores["ok"]:
+        _boton_descarga(trabajo.archivo_zip, trabajo.metodologia)
+    st.caption(
+        "Vuelve a cargar los mismos archivos para ver el detalle y los diffs: "
+        "los resultados se conservan y no se volverán a procesar."
+    )
 
-    if(LotSize > MaximumLots) {
-        Verbose("LotSize is too big. LotSize set to maximal allowed value (MaximumLots): ", DoubleToString(MaximumLots));
-        LotSize = MaximumLots;
-    }
 
-    return (LotSize);
-    }"""
+def _nombre_modificado(ruta, metodologia):
+    """Nombre del archivo modificado, conservando las carpetas de los paquetes"""
+    return nombre_modificado(ruta, METODOLOGIAS[metodologia])
 
-    # Aplicar modificaciones
-    # 1. Reemplazar la función sqMMFixedAmount existente
-    content = re.sub(
-        r"double sqMMFixedAmount\(string symbol,.*?\)\s*{.*?^}",
-        lambda m: precise_mm_function,
-        content,
-        flags=re.DOTALL | re.MULTILINE,
-    )
 
-    # 2. Agregar las variables de input para gestión de riesgo
-    target_for_inputs = (
-        'input string smm = "----------- Money Management - Fixed Amount -----------";'
-    )
-    content = content.replace(
-        target_for_inputs, risk_management_inputs + "\n" + target_for_inputs
+def _diff_archivo(ruta, metodologia, hunks):
+    return con_cabecera(
+        hunks, f"a/{ruta}", f"b/{_nombre_modificado(ruta, metodologia)}"
     )
 
-    # 3. Agregar inicialización en OnInit
-    target_for_oninit = "      return(INIT_SUCCEEDED);"
-    content = content.replace(
-        target_for_oninit, on_init_addition + "\n\n   " + target_for_oninit
-    )
 
-    # 4. Reemplazar el cálculo del tamaño del lote - MÚLTIPLES PATRONES POSIBLES
-    original_patterns = [
-        'size = sqMMFixedAmount("Current",ORDER_TYPE_BUY,openPrice,sl,mmRiskedMoney,mmDecimals,mmLotsIfNoMM,mmMaxLots,mmMultiplier,mmStep);',
-        'size = sqMMFixedAmount("Current",ORDER_TYPE_BUY,openPrice,sl,mmRiskedMoney,mmDecimals,mmLotsIfNoMM,mmMaxLots,mmMultiplier);',
-        'size = sqMMFixedAmount("Current", ORDER_TYPE_BUY, openPrice, sl, mmRiskedMoney, mmDecimals, mmLotsIfNoMM, mmMaxLots, mmMultiplier, mmStep);',
-        'size = sqMMFixedAmount("Current", ORDER_TYPE_BUY, openPrice, sl, mmRiskedMoney, mmDecimals, mmLotsIfNoMM, mmMaxLots, mmMultiplier);'
-    ]
-    
-    replaced = False
-    for pattern in original_patterns:
-        if pattern in content:
-            match = re.search(r"(\s*)" + re.escape(pattern), content)
-            if match:
-                indentation = match.group(1)
-                indented_logic = "\n".join(
-                    [indentation + line for line in lot_size_calculation_logic.split("\n")]
-                )
-                content = content.replace(indentation + pattern, indented_logic)
-                replaced = True
-                break
-    
-    if not replaced:
-        # Patrón más flexible para capturar variaciones
-        pattern = r'(\s*)size\s*=\s*sqMMFixedAmount\s*\([^;]+\);'
-        match = re.search(pattern, content)
-        if match:
-            indentation = match.group(1)
-            indented_logic = "\n".join(
-                [indentation + line for line in lot_size_calculation_logic.split("\n")]
-            )
-            content = re.sub(pattern, indented_logic, content)
-
-    # 5. Agregar la función OnTradeTransaction
-    first_include_marker = "//+----------------------------- Include from"
-    if first_include_marker in content:
-        content = content.replace(
-            first_include_marker,
-            on_trade_transaction_function + "\n\n" + first_include_marker,
-            1,
+def _boton_descarga(ruta_zip, metodologia):
+    """
+    Botón de descarga del ZIP en disco. El archivo se lee al mostrar el botón
+    y no se guarda en la sesión
+    """
+    try:
+        zip_file = open(ruta_zip, "rb")
+    except FileNotFoundError:
+        return
+    with zip_file:
+        st.download_button(
+            label="📥 Descargar Archivos Modificados",
+            data=zip_file,
+            file_name=f"estrategias_modificadas_{metodologia.lower().replace(' ', '_')}.zip",
+            mime="application/zip",
+            type="primary",
         )
-    else:
-        content += "\n\n" + on_trade_transaction_function
 
-    return content, "Estrategia modificada con éxito - Escalado Preciso CORREGIDO"
 
+def _limpiar_descargas(ahora=None):
+    """Borra los ZIP de sesiones que ya no los usan"""
+    limite = (ahora or time.time()) - TTL_TRABAJOS
+    for entrada in os.scandir(DESCARGAS_DIR):
+        try:
+            if entrada.stat().st_mtime < limite:
+                os.remove(entrada.path)
+        except OSError:
+            pass
 
-def modificar_estrategia_benjamin(content, filename):
+
+def _construir_zip(claves, metodologia, incluir_diffs=False):
     """
-    Modifica contenido de estrategia MQL5 para añadir gestión de riesgo para cuentas de fondeo
+    Construye el ZIP a partir de los resultados guardados, en el orden de carga,
+    en un archivo temporal cuya ruta se memoriza en la sesión mientras no
+    cambie el conjunto de archivos. Con `incluir_diffs`, añade un .diff junto a
+    cada estrategia modificada
     """
-    # Evita modificar un archivo que ya ha sido procesado
-    if "Risk Management for Funded Accounts" in content:
-        return None, f"El archivo '{filename}' ya parece estar modificado."
-
-    # Correcciones de warnings
-    content = content.replace(
-        'return("File not found in the MQL5\\Files directory to send on FTP server");',
-        'return("File not found in the MQL5\\\\Files directory to send on FTP server");',
-    )
-    content = content.replace("0.5f", "0.5")
-    content = content.replace("10.0f", "10.0")
-
-    # Bloques de código MQL5
-    risk_management_inputs = """
-    //+------------------------------------------------------------------+
-    //| Risk Management for Funded Accounts by Python Script (V2 - Corrected)
-    //+------------------------------------------------------------------+
-    input string g_riskManagementTitle = "----------- Risk Management (Funded Accounts) -----------";
-    input double g_initialRiskPercent = 1.0;       // Riesgo Inicial %
-    input double g_riskStep = 0.25;                // Paso de Riesgo % por Ganancia/Pérdida
-    input double g_maxLossThreshold = -4.0;        // Umbral de Pérdida Máxima %
-    input double g_maxLossRisk = 1.0;              // Riesgo % tras alcanzar Umbral de Pérdida
-    input double g_profitProtectThreshold = 4.0;   // Umbral de Protección de Ganancias %
-    input double g_profitProtectRisk = 0.75;       // Riesgo % tras alcanzar Protección de Ganancias
-    input double g_minRiskPercent = 0.25;          // Riesgo mínimo permitido %
-
-    // --- Variables de estado internas (no modificar)
-    double g_currentRiskPercent;
-    double g_totalAccountProfitPercent;
-    string g_gv_riskPercent_key;
-    string g_gv_profitPercent_key;
+    from zip_salida import CompresorParalelo, abrir_zip
+
+    memo = (tuple(claves), incluir_diffs)
+    guardado = st.session_state.get("zip_resultados")
+    if guardado is not None:
+        if guardado[0] == memo and os.path.exists(guardado[1]):
+            # Marca de uso para _limpiar_descargas
+            os.utime(guardado[1])
+            return guardado[1]
+        try:
+            os.remove(guardado[1])
+        except OSError:
+            pass
+
+    resultados = st.session_state["resultados"]
+    perfil = st.session_state.get("perfil")
+
+    os.makedirs(DESCARGAS_DIR, exist_ok=True)
+    _limpiar_descargas()
+    descriptor, ruta_zip = tempfile.mkstemp(suffix=".zip", dir=DESCARGAS_DIR)
+    with open(descriptor, "wb") as destino:
+        with abrir_zip(destino) as zip_file, CompresorParalelo(zip_file) as compresor:
+            for ruta, huella, _ in claves:
+                estado, _, modified_content, diff = resultados[
+                    (ruta, huella, metodologia)
+                ]
+                if estado == "ok":
+                    new_filename = _nombre_modificado(ruta, metodologia)
+                    inicio = perf_counter()
+                    compresor.escribir(new_filename, modified_content)
+                    if incluir_diffs:
+                        compresor.escribir(
+                            f"{os.path.splitext(new_filename)[0]}.diff",
+                            _diff_archivo(ruta, metodologia, diff),
+                        )
+                    if perfil is not None and ruta in perfil.archivos:
+                        perfil.registrar(ruta, {"zip": perf_counter() - inicio})
+
+    st.session_state["zip_resultados"] = (memo, ruta_zip)
+    return ruta_zip
+
+
+def _mostrar_anclas_faltantes(claves):
+    """Tabla con las anclas de cada archivo rechazado en la comprobación previa"""
+    informes = st.session_state["informes_anclas"]
+    filas = []
+    for clave in claves:
+        informe = informes.get(clave)
+        if informe is None:
+            continue
+        fila = {"Archivo": clave[0]}
+        for ancla, descripcion in ANCLAS_REQUERIDAS.items():
+            if ancla in informe.anclas:
+                fila[descripcion] = "✅" if informe.anclas[ancla] else "❌"
+            else:
+                fila[descripcion] = "—"
+        fila["Otra gestión de riesgo"] = ", ".join(informe.marcadores) or "—"
+        filas.append(fila)
+
+    if filas:
+        st.subheader(f"🚫 Archivos rechazados: {len(filas)}")
+        st.caption("Anclas que faltan en cada archivo (❌) para aplicar la metodología")
+        st.dataframe(filas, hide_index=True, use_container_width=True)
+
+
+def _mostrar_colisiones(claves):
+    """Archivos cuyo StrategyID o MagicNumber ya usa otra estrategia de la cartera"""
+    colisiones = st.session_state.get("colisiones", {})
+    lineas = [
+        f"{ICONOS['colision']} {clave[0]}: {colisiones[clave]}"
+        for clave in claves
+        if clave in colisiones
+    ]
+    if lineas:
+        st.warning(
+            "Estas estrategias comparten StrategyID o MagicNumber con otras de "
+            "la cartera y se pisarían el estado de riesgo:\n\n" + "\n\n".join(lineas)
+        )
 
-    """
 
-    on_init_addition = """
-    // --- Inicialización de Variables de Gestión de Riesgo ---
-    g_gv_riskPercent_key = "SQ.Risk." + StrategyID;
-    g_gv_profitPercent_key = "SQ.Profit." + StrategyID;
+def _mostrar_resultados(claves, metodologia):
+    """Resumen, estados por archivo y descarga a partir de los resultados guardados"""
+    resultados = st.session_state["resultados"]
+    estados = [resultados[clave] for clave in claves]
+    procesados = sum(1 for estado, *_ in estados if estado == "ok")
+    errores = len(estados) - procesados
 
-    if(GlobalVariableCheck(g_gv_riskPercent_key)) {
-        g_currentRiskPercent = GlobalVariableGet(g_gv_riskPercent_key);
-    } else {
-        g_currentRiskPercent = g_initialRiskPercent;
-        GlobalVariableSet(g_gv_riskPercent_key, g_currentRiskPercent);
-    }
+    with st.expander("Ver resultado por archivo"):
+        for (ruta, _, _), (estado, message, *_) in zip(claves, estados):
+            if estado in ("error", "invalido"):
+                st.write(f"{ICONOS[estado]} {message}")
+            else:
+                st.write(f"{ICONOS[estado]} {ruta}: {message}")
 
-    if(GlobalVariableCheck(g_gv_profitPercent_key)) {
-        g_totalAccountProfitPercent = GlobalVariableGet(g_gv_profitPercent_key);
-    } else {
-        g_totalAccountProfitPercent = 0.0;
-        GlobalVariableSet(g_gv_profitPercent_key, g_totalAccountProfitPercent);
-    }
-    
-    VerboseLog("Gestión de Riesgo Inicializada. Riesgo Actual: ", DoubleToString(g_currentRiskPercent, 2), "%, P/L Total: ", DoubleToString(g_totalAccountProfitPercent, 2), "%");
-    // --- Fin de la Inicialización de Gestión de Riesgo ---
-    """
+    _mostrar_anclas_faltantes(claves)
+    _mostrar_colisiones(claves)
+    _mostrar_diffs(claves, metodologia)
 
-    on_trade_transaction_function = """
-    //+------------------------------------------------------------------+
-    //| Gestor de Eventos de Transacción para Gestión de Riesgo          |
-    //+------------------------------------------------------------------+
-    void OnTradeTransaction(const MqlTradeTransaction &trans,
-                            const MqlTradeRequest &request,
-                            const MqlTradeResult &result)
-    {
-    if(trans.type == TRADE_TRANSACTION_DEAL_ADD)
-    {
-        if(HistoryDealSelect(trans.deal))
-        {
-            if(HistoryDealGetInteger(trans.deal, DEAL_MAGIC) == MagicNumber)
-            {
-                if(HistoryDealGetInteger(trans.deal, DEAL_ENTRY) == DEAL_ENTRY_OUT)
-                {
-                double dealProfit = HistoryDealGetDouble(trans.deal, DEAL_PROFIT);
-                
-                if(initialBalance <= 0)
-                {
-                    VerboseLog("Error en Gestión de Riesgo: InitialCapital debe ser > 0 para el cálculo de porcentaje.");
-                    return; 
-                }
+    # Mostrar resumen
+    st.markdown("---")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Archivos Procesados", procesados)
+    with col2:
+        st.metric("Errores/Omitidos", errores)
+    with col3:
+        st.metric("Total", len(claves))
+
+    if "resumen_cache" in st.session_state:
+        st.caption(st.session_state["resumen_cache"])
+
+    # Botón de descarga
+    if procesados > 0:
+        incluir_diffs = st.checkbox(
+            "Incluir un .diff de cada estrategia en el ZIP",
+            key="incluir_diffs",
+            help="Diff unificado con los cambios, aplicable con `git apply` o `patch`",
+        )
+        _boton_descarga(_construir_zip(claves, metodologia, incluir_diffs), metodologia)
 
-                double profitPercent = (dealProfit / initialBalance) * 100.0;
-                g_totalAccountProfitPercent += profitPercent;
-                
-                if(dealProfit >= 0)
-                {
-                    g_currentRiskPercent -= g_riskStep;
-                    if(g_currentRiskPercent < g_minRiskPercent) 
-                    {
-                        g_currentRiskPercent = g_minRiskPercent;
-                    }
-                }
-                else
-                {
-                    g_currentRiskPercent += g_riskStep;
-                }
+        st.info(
+            "💡 **Consejo:** Los archivos modificados están listos para compilar en MetaEditor."
+        )
 
-                GlobalVariableSet(g_gv_riskPercent_key, g_currentRiskPercent);
-                GlobalVariableSet(g_gv_profitPercent_key, g_totalAccountProfitPercent);
-                
-                VerboseLog("GESTION DE RIESGO: Trade Cerrado. P/L: ", DoubleToString(dealProfit, 2), " (", DoubleToString(profitPercent, 2), "%). Nuevo P/L Total: ", DoubleToString(g_totalAccountProfitPercent, 2), "%. Próximo Riesgo: ", DoubleToString(g_currentRiskPercent, 2), "%");
-                }
-            }
-        }
-    }
-    }
-    """
+    _mostrar_perfil()
 
-    lot_size_calculation_logic = """    // --- Cálculo de Gestión de Riesgo Dinámico ---
-    double riskPercentForTrade = g_currentRiskPercent;
-    if(g_totalAccountProfitPercent <= g_maxLossThreshold) {
-        riskPercentForTrade = g_maxLossRisk;
-        VerboseLog("GESTION DE RIESGO: Protección de Drawdown activada. Riesgo fijado a: ", DoubleToString(riskPercentForTrade, 2), "%");
-    } else if (g_totalAccountProfitPercent >= g_profitProtectThreshold) {
-        riskPercentForTrade = g_profitProtectRisk;
-        VerboseLog("GESTION DE RIESGO: Protección de Ganancias activada. Riesgo fijado a: ", DoubleToString(riskPercentForTrade, 2), "%");
-    }
-    
-    double moneyToRisk = (initialBalance * riskPercentForTrade) / 100.0;
-    VerboseLog("GESTION DE RIESGO: Calculando tamaño de lote. Usando riesgo de: ", DoubleToString(riskPercentForTrade, 2), "%. Dinero a arriesgar: ", DoubleToString(moneyToRisk, 2));
-    
-    size = sqMMFixedAmount("Current",ORDER_TYPE_BUY,openPrice,sl,moneyToRisk,mmDecimals,mmLotsIfNoMM,mmMaxLots,mmMultiplier);"""
-
-    # Aplicar modificaciones
-    target_for_inputs = (
-        'input string smm = "----------- Money Management - Fixed Amount -----------";'
-    )
-    content = content.replace(
-        target_for_inputs, risk_management_inputs + "\n" + target_for_inputs
-    )
 
-    target_for_oninit = "   return(INIT_SUCCEEDED);"
-    content = content.replace(
-        target_for_oninit, on_init_addition + "\n\n   " + target_for_oninit
-    )
+def _mostrar_diffs(claves, metodologia):
+    """Vista previa del diff de cada estrategia modificada"""
+    resultados = st.session_state["resultados"]
+    modificados = {
+        clave[0]: resultados[clave][3]
+        for clave in claves
+        if resultados[clave][0] == "ok"
+    }
+    if not modificados:
+        return
 
-    original_patterns = [
-        'size = sqMMFixedAmount("Current",ORDER_TYPE_BUY,openPrice,sl,mmRiskedMoney,mmDecimals,mmLotsIfNoMM,mmMaxLots,mmMultiplier,mmStep);',
-        'size = sqMMFixedAmount("Current",ORDER_TYPE_BUY,openPrice,sl,mmRiskedMoney,mmDecimals,mmLotsIfNoMM,mmMaxLots,mmMultiplier);',
-        'size = sqMMFixedAmount("Current", ORDER_TYPE_BUY, openPrice, sl, mmRiskedMoney, mmDecimals, mmLotsIfNoMM, mmMaxLots, mmMultiplier, mmStep);',
-        'size = sqMMFixedAmount("Current", ORDER_TYPE_BUY, openPrice, sl, mmRiskedMoney, mmDecimals, mmLotsIfNoMM, mmMaxLots, mmMultiplier);'
-    ]
-    
-    replaced = False
-    for pattern in original_patterns:
-        if pattern in content:
-            match = re.search(r"(\s*)" + re.escape(pattern), content)
-            if match:
-                indentation = match.group(1)
-                indented_logic = "\n".join(
-                    [indentation + line for line in lot_size_calculation_logic.split("\n")]
-                )
-                content = content.replace(indentation + pattern, indented_logic)
-                replaced = True
-                break
-
-    first_include_marker = "//+----------------------------- Include from"
-    if first_include_marker in content:
-        content = content.replace(
-            first_include_marker,
-            on_trade_transaction_function + "\n\n" + first_include_marker,
-            1,
+    with st.expander("🔍 Vista previa de los cambios"):
+        ruta = st.selectbox("Archivo:", list(modificados), key="diff_archivo")
+        hunks = modificados[ruta]
+        lineas = hunks.splitlines()
+        st.caption(
+            f"{sum(linea.startswith('+') for linea in lineas)} línea(s) añadida(s), "
+            f"{sum(linea.startswith('-') for linea in lineas)} eliminada(s)"
         )
-    else:
-        content += "\n\n" + on_trade_transaction_function
+        st.code(_diff_archivo(ruta, metodologia, hunks), language="diff")
 
-    return content, "Estrategia modificada con éxito - Cuentas de Fondeo"
+
+def _mostrar_perfil():
+    """Tiempos por etapa del último lote procesado y su exportación"""
+    perfil = st.session_state.get("perfil")
+    if perfil is None or not perfil.archivos:
+        return
+
+    with st.expander("⏱️ Profiling"):
+        if perfil.duracion is not None:
+            st.caption(
+                f"Último lote: {len(perfil.archivos)} archivo(s) en "
+                f"{perfil.duracion:.2f} s"
+            )
+        st.dataframe(
+            [
+                {
+                    "Etapa": nombre,
+                    "Archivos": metricas["archivos"],
+                    "Total (ms)": metricas["total_s"] * 1000,
+                    "Media (ms)": metricas["media_s"] * 1000,
+                    "p95 (ms)": metricas["p95_s"] * 1000,
+                    "Máx (ms)": metricas["max_s"] * 1000,
+                }
+                for nombre, metricas in perfil.etapas().items()
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.dataframe(
+            [
+                {"Archivo": nombre}
+                | {
+                    etapa_nombre: segundos * 1000
+                    for etapa_nombre, segundos in tiempos.items()
+                }
+                for nombre, tiempos in perfil.archivos.items()
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.caption("Tiempos por archivo en milisegundos")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="Exportar JSON",
+                data=perfil.a_json(),
+                file_name="perfil_lote.json",
+                mime="application/json",
+            )
+        with col2:
+            st.download_button(
+                label="Exportar métricas Prometheus",
+                data=perfil.a_prometheus(),
+                file_name="perfil_lote.prom",
+                mime="text/plain",
+            )
 
 
 def main():
@@ -488,13 +489,16 @@ def main():
             "Este video explica en detalle cómo funciona la gestión de riesgo para cuentas de fondeo"
         )
 
+    # Los trabajos terminados desde el último rerun pasan a la sesión
+    activos = _incorporar_trabajos()
+
     # Carga de archivos
     st.subheader("📁 Cargar archivos .mq5")
     uploaded_files = st.file_uploader(
-        "Selecciona uno o más archivos .mq5 para modificar:",
-        type=["mq5"],
+        "Selecciona uno o más archivos .mq5 (o paquetes .zip) para modificar:",
+        type=["mq5", "zip"],
         accept_multiple_files=True,
-        help="Puedes seleccionar múltiples archivos .mq5 para procesarlos en lote",
+        help="Puedes seleccionar múltiples archivos .mq5 o paquetes .zip de StrategyQuant para procesarlos en lote",
     )
 
     if uploaded_files:
@@ -505,89 +509,46 @@ def main():
             for file in uploaded_files:
                 st.write(f"• {file.name} ({file.size} bytes)")
 
-        # Botón de procesamiento
-        if st.button("🚀 Procesar Archivos", type="primary"):
-            # Crear archivo ZIP con los resultados
-            zip_buffer = BytesIO()
-
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                procesados = 0
-                errores = 0
-
-                # Crear barra de progreso
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-
-                for i, uploaded_file in enumerate(uploaded_files):
-                    # Actualizar progreso
-                    progress = (i + 1) / len(uploaded_files)
-                    progress_bar.progress(progress)
-                    status_text.text(f"Procesando: {uploaded_file.name}")
-
-                    try:
-                        # Leer contenido del archivo
-                        content = uploaded_file.read().decode("utf-8")
-
-                        # Aplicar la modificación según la metodología seleccionada
-                        if metodologia == "Escalado Metodología Gerard":
-                            modified_content, message = (
-                                modificar_estrategia_escalado_gerard(
-                                    content, uploaded_file.name
-                                )
-                            )
-                            suffix = "_escalado_gerard"
-                        else:
-                            modified_content, message = modificar_estrategia_benjamin(
-                                content, uploaded_file.name
-                            )
-                            suffix = "_escalado_benjamin"
-
-                        if modified_content:
-                            # Generar nombre de archivo modificado
-                            base_name = os.path.splitext(uploaded_file.name)[0]
-                            new_filename = f"{base_name}{suffix}.mq5"
-
-                            # Añadir al ZIP
-                            zip_file.writestr(new_filename, modified_content)
-                            procesados += 1
-
-                            st.success(f"✅ {uploaded_file.name}: {message}")
-                        else:
-                            errores += 1
-                            st.warning(f"⚠️ {uploaded_file.name}: {message}")
-
-                    except Exception as e:
-                        errores += 1
-                        st.error(f"❌ Error procesando {uploaded_file.name}: {str(e)}")
-
-                # Completar progreso
-                progress_bar.progress(1.0)
-                status_text.text("¡Procesamiento completado!")
-
-            # Mostrar resumen
-            st.markdown("---")
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Archivos Procesados", procesados)
-            with col2:
-                st.metric("Errores/Omitidos", errores)
-            with col3:
-                st.metric("Total", len(uploaded_files))
-
-            # Botón de descarga
-            if procesados > 0:
-                zip_buffer.seek(0)
-                st.download_button(
-                    label="📥 Descargar Archivos Modificados",
-                    data=zip_buffer.getvalue(),
-                    file_name=f"estrategias_modificadas_{metodologia.lower().replace(' ', '_')}.zip",
-                    mime="application/zip",
-                    type="primary",
-                )
-
-                st.info(
-                    "💡 **Consejo:** Los archivos modificados están listos para compilar en MetaEditor."
-                )
+        # Los paquetes .zip se expanden en sus miembros .mq5 sin extraerlos
+        try:
+            fuentes = listar_fuentes(uploaded_files)
+        except zipfile.BadZipFile as e:
+            st.error(f"❌ Paquete ZIP no válido: {str(e)}")
+            fuentes = []
+
+        # Los resultados sobreviven a los reruns (p. ej. al pulsar Descargar):
+        # se guardan por archivo (identidad y contenido) y metodología
+        claves = [
+            (ruta, _huella_contenido(identidad, cargar), metodologia)
+            for ruta, identidad, cargar in fuentes
+        ]
+        _olvidar_archivos_retirados(fuentes, claves)
+        resultados = st.session_state.setdefault("resultados", {})
+        # Los archivos de un trabajo en curso no se vuelven a enviar
+        en_curso = {clave for trabajo in activos for clave, _, _ in trabajo.entradas}
+        pendientes = [
+            i
+            for i, clave in enumerate(claves)
+            if clave not in resultados and clave not in en_curso
+        ]
+        if pendientes and len(pendientes) < len(claves):
+            st.info(
+                f"🆕 {len(pendientes)} archivo(s) nuevo(s) pendiente(s) de procesar. "
+                "El resto ya está procesado y no se volverá a transformar."
+            )
+
+        # Botón de procesamiento: el lote se procesa en segundo plano
+        if st.button("🚀 Procesar Archivos", type="primary") and pendientes:
+            if _enviar_trabajo(fuentes, claves, pendientes, metodologia):
+                st.rerun()
+
+        if claves and all(clave in resultados for clave in claves):
+            _mostrar_resultados(claves, metodologia)
+    else:
+        _mostrar_trabajo_recuperado()
+
+    if activos:
+        _seguir_trabajos()
 
     # Información adicional
     st.markdown("---")
@@ -597,7 +558,7 @@ def main():
         ### ¿Cómo usar esta herramienta?
         
         1. **Selecciona la metodología** que mejor se adapte a tu estilo de trading
-        2. **Carga tus archivos .mq5** (puedes seleccionar múltiples archivos)
+        2. **Carga tus archivos .mq5** (puedes seleccionar múltiples archivos o paquetes .zip de StrategyQuant)
         3. **Haz clic en "Procesar Archivos"** para aplicar las modificaciones
         4. **Descarga el archivo ZIP** con los archivos modificados
         5. **Compila los archivos** en MetaEditor y úsalos en MetaTrader 5
@@ -607,6 +568,8 @@ def main():
         - ✅ Gestión de variables globales para persistencia
         - ✅ Logging detallado para debugging
         - ✅ Validación de parámetros de entrada
+        - ✅ Vista previa de los cambios de cada archivo en formato diff
+        - ✅ Los bloques inyectados quedan entre marcas de región versionadas: un archivo ya modificado se puede volver a cargar para actualizarlo a la versión actual o cambiarlo de metodología, sin el original
         - ✅ Compatibilidad con múltiples símbolos
         - ✅ **NUEVO**: Corrección de problemas con mmStep
         - ✅ **NUEVO**: Mejor detección de patrones de código
@@ -619,6 +582,7 @@ def main():
         
         ### Requisitos:
         - Los archivos deben tener la estructura estándar de StrategyQuant
+        - Los archivos sin las anclas necesarias (inputs de Money Management, `return(INIT_SUCCEEDED);`, cálculo del lote y, para Gerard, la función `sqMMFixedAmount`) se rechazan sin modificarlos
         - Se recomienda hacer backup de los archivos originales
         """
         )
@@ -0,0 +1,13 @@
+"""
+Benchmarks de los transformadores MQL5 sobre un corpus sintético de
+Expert Advisors con la estructura que genera StrategyQuant X.
+
+    python -m benchmarks.run --output resultados.json
+    python -m benchmarks.run --compare resultados_anteriores.json
+    python -m benchmarks.funciones --tamanos 10k,100k,1m
+    python -m benchmarks.importacion
+    python -m benchmarks.compresion --archivos 200 --tamano 1m
+    python -m benchmarks.flujo --tamanos 10m
+    python -m benchmarks.carga --iniciar -j 4 --clientes 8
+    python -m benchmarks.registro --cartera 10000
+"""
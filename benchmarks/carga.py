@@ -0,0 +1,234 @@
+"""
+Prueba de carga de la API HTTP (servidor.py): varios clientes en paralelo
+envían lotes de estrategias sintéticas y leen el .zip de respuesta por trozos.
+
+    python -m benchmarks.carga --iniciar -j 4 --clientes 8 --peticiones 5
+    python -m benchmarks.carga --url http://127.0.0.1:8000 --archivos 50 --tamano 100k
+
+Con --iniciar se arranca el servidor en un puerto libre y, al terminar, se
+informa de su pico de memoria residente. Cada respuesta se comprueba: el .zip
+debe abrirse y su manifiesto debe tener un estado por archivo enviado.
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import zipfile
+from urllib.parse import urlsplit
+
+from benchmarks.corpus import TAMANOS, generar_estrategia
+from motor.perfilado import percentil
+
+BLOQUE = 64 * 1024
+
+
+def cuerpo_multipart(archivos, campos):
+    """(cuerpo, content-type) de un formulario multipart con los archivos .mq5"""
+    boundary = uuid.uuid4().hex
+    partes = []
+    for nombre, valor in campos:
+        partes.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n'
+            f"{valor}\r\n".encode("utf-8")
+        )
+    for nombre, content in archivos:
+        partes.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; "
+            f'name="archivos"; filename="{nombre}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n".encode("utf-8")
+        )
+        partes.append(content + b"\r\n")
+    partes.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(partes), f"multipart/form-data; boundary={boundary}"
+
+
+def peticion(url, cuerpo, tipo, archivos):
+    """
+    Envía un lote y lee la respuesta por bloques. Devuelve un diccionario con
+    el código, los tiempos y, si hubo respuesta completa, la comprobación
+    """
+    partes = urlsplit(url)
+    conexion = http.client.HTTPConnection(partes.hostname, partes.port, timeout=300)
+    t0 = time.perf_counter()
+    try:
+        conexion.request("POST", "/procesar", cuerpo, {"Content-Type": tipo})
+        respuesta = conexion.getresponse()
+        primer_byte = None
+        datos = bytearray()
+        while bloque := respuesta.read(BLOQUE):
+            if primer_byte is None:
+                primer_byte = time.perf_counter() - t0
+            datos += bloque
+        resultado = {
+            "codigo": respuesta.status,
+            "duracion": time.perf_counter() - t0,
+            "primer_byte": primer_byte,
+            "bytes": len(datos),
+        }
+        if respuesta.status == 200:
+            with zipfile.ZipFile(io.BytesIO(datos)) as bundle:
+                manifiesto = json.loads(bundle.read("manifiesto.json"))
+            resultado["valido"] = len(manifiesto["archivos"]) == archivos
+            resultado["contadores"] = manifiesto["contadores"]
+        return resultado
+    except (OSError, http.client.HTTPException, zipfile.BadZipFile) as e:
+        return {"codigo": None, "error": str(e), "duracion": time.perf_counter() - t0}
+    finally:
+        conexion.close()
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar_servidor(url, limite=30):
+    partes = urlsplit(url)
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        try:
+            conexion = http.client.HTTPConnection(
+                partes.hostname, partes.port, timeout=2
+            )
+            conexion.request("GET", "/salud")
+            if conexion.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+        finally:
+            conexion.close()
+    raise RuntimeError(f"El servidor no responde en {url}")
+
+
+def _pico_memoria(pid):
+    """VmHWM del proceso en bytes (Linux), o None"""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de servidor.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument(
+        "--iniciar",
+        action="store_true",
+        help="Arranca servidor.py en un puerto libre (ignora --url)",
+    )
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--clientes", type=int, default=4)
+    parser.add_argument("--peticiones", type=int, default=5, help="Por cliente")
+    parser.add_argument("--archivos", type=int, default=20, help="Por petición")
+    parser.add_argument(
+        "--tamano",
+        default="100k",
+        help=f"Tamaño de cada estrategia ({', '.join(TAMANOS)})",
+    )
+    parser.add_argument("--metodologia", action="append", default=None)
+    args = parser.parse_args(argv)
+    if args.tamano not in TAMANOS:
+        parser.error(f"Tamaño desconocido '{args.tamano}'")
+
+    archivos = [
+        (
+            f"estrategia_{i:04d}.mq5",
+            generar_estrategia(TAMANOS[args.tamano], seed=i).encode("utf-8"),
+        )
+        for i in range(args.archivos)
+    ]
+    campos = [("metodologia", m) for m in args.metodologia or ["gerard"]]
+    cuerpo, tipo = cuerpo_multipart(archivos, campos)
+
+    servidor = None
+    url = args.url
+    if args.iniciar:
+        puerto = _puerto_libre()
+        url = f"http://127.0.0.1:{puerto}"
+        comando = [sys.executable, "servidor.py", "--puerto", str(puerto)]
+        if args.workers:
+            comando += ["-j", str(args.workers)]
+        servidor = subprocess.Popen(
+            comando, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+    try:
+        _esperar_servidor(url)
+        resultados = []
+        cerrojo = threading.Lock()
+
+        def cliente():
+            for _ in range(args.peticiones):
+                resultado = peticion(url, cuerpo, tipo, len(archivos))
+                with cerrojo:
+                    resultados.append(resultado)
+
+        print(
+            f"{args.clientes} clientes x {args.peticiones} peticiones x "
+            f"{args.archivos} archivos de {args.tamano} "
+            f"({len(cuerpo) / 1024 / 1024:.1f} MB por petición) contra {url}",
+            flush=True,
+        )
+        inicio = time.perf_counter()
+        hilos = [threading.Thread(target=cliente) for _ in range(args.clientes)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+        pico = _pico_memoria(servidor.pid) if servidor is not None else None
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+    completas = [r for r in resultados if r["codigo"] == 200]
+    invalidas = [r for r in completas if not r.get("valido")]
+    ocupado = sum(1 for r in resultados if r["codigo"] == 503)
+    fallidas = [r for r in resultados if r["codigo"] not in (200, 503)]
+    latencias = sorted(r["duracion"] for r in completas)
+    primeros = sorted(r["primer_byte"] for r in completas if r["primer_byte"])
+
+    print(
+        f"Peticiones: {len(resultados)} | 200: {len(completas)} | "
+        f"503: {ocupado} | Fallidas: {len(fallidas)} | "
+        f"Respuestas incorrectas: {len(invalidas)}"
+    )
+    if completas:
+        archivos_ok = len(completas) * args.archivos
+        print(
+            f"Tiempo: {duracion:.2f} s | {archivos_ok / duracion:.1f} archivos/s | "
+            f"{sum(r['bytes'] for r in completas) / 1024 / 1024 / duracion:.1f} MB/s "
+            "de respuesta"
+        )
+        print(
+            f"Latencia: p50 {percentil(latencias, 50) * 1000:.0f} ms | "
+            f"p95 {percentil(latencias, 95) * 1000:.0f} ms | "
+            f"máx {latencias[-1] * 1000:.0f} ms"
+        )
+    if primeros:
+        print(
+            f"Primer byte: p50 {percentil(primeros, 50) * 1000:.0f} ms | "
+            f"p95 {percentil(primeros, 95) * 1000:.0f} ms"
+        )
+    if pico is not None:
+        print(f"Pico de memoria del servidor: {pico / 1024 / 1024:.1f} MB")
+    for r in fallidas[:5]:
+        print(f"  fallida: {r.get('error') or r['codigo']}")
+    return 1 if fallidas or invalidas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Benchmark de la escritura del ZIP de salida: compresión en el hilo principal
+(escribir_entrada) frente a CompresorParalelo, por nivel de compresión.
+
+    python -m benchmarks.compresion --archivos 200 --tamano 1m
+    python -m benchmarks.compresion --niveles 0,1,6,9 --hilos 1,4,8
+
+Cada medición escribe el mismo lote de estrategias sintéticas en memoria y
+comprueba que el ZIP resultante es idéntico byte a byte al del camino en serie.
+"""
+
+import argparse
+import io
+import sys
+import time
+
+from benchmarks.corpus import TAMANOS, generar_estrategia
+from zip_salida import CompresorParalelo, abrir_zip, escribir_entrada
+
+
+def en_serie(entradas, nivel, hilos=None):
+    destino = io.BytesIO()
+    with abrir_zip(destino, nivel) as zip_file:
+        for arcname, content in entradas:
+            escribir_entrada(zip_file, arcname, content)
+    return destino.getvalue()
+
+
+def en_paralelo(entradas, nivel, hilos):
+    destino = io.BytesIO()
+    with abrir_zip(destino, nivel) as zip_file:
+        with CompresorParalelo(zip_file, hilos) as compresor:
+            for arcname, content in entradas:
+                compresor.escribir(arcname, content)
+    return destino.getvalue()
+
+
+def cronometrar(funcion, entradas, nivel, hilos, repeticiones):
+    """(mejor tiempo de `repeticiones` ejecuciones, ZIP generado)"""
+    mejor = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        datos = funcion(entradas, nivel, hilos)
+        duracion = time.perf_counter() - t0
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, datos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark de la compresión del ZIP de salida"
+    )
+    parser.add_argument("--archivos", type=int, default=200)
+    parser.add_argument(
+        "--tamano",
+        default="100k",
+        help=f"Tamaño de cada estrategia ({', '.join(TAMANOS)})",
+    )
+    parser.add_argument(
+        "--niveles",
+        default="0,1,6,9",
+        help="Niveles de compresión separados por comas (0 = sin comprimir)",
+    )
+    parser.add_argument("--hilos", default="2,4,8", help="Hilos separados por comas")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.tamano not in TAMANOS:
+        parser.error(f"Tamaño desconocido '{args.tamano}'")
+    entradas = [
+        (f"estrategia_{i:05d}.mq5", generar_estrategia(TAMANOS[args.tamano], seed=i))
+        for i in range(args.archivos)
+    ]
+    total_mb = sum(len(content) for _, content in entradas) / 1024 / 1024
+    print(f"{args.archivos} archivos de {args.tamano} ({total_mb:.1f} MB)")
+
+    distintos = 0
+    for nivel in (int(n) for n in args.niveles.split(",")):
+        t_serie, referencia = cronometrar(
+            en_serie, entradas, nivel, None, args.repeticiones
+        )
+        print(
+            f"nivel {nivel}: serie        {t_serie * 1000:9.1f} ms | "
+            f"{total_mb / t_serie:8.1f} MB/s | ZIP {len(referencia) / 1024:9.0f} KB",
+            flush=True,
+        )
+        for hilos in (int(h) for h in args.hilos.split(",")):
+            t_paralelo, datos = cronometrar(
+                en_paralelo, entradas, nivel, hilos, args.repeticiones
+            )
+            identico = datos == referencia
+            distintos += not identico
+            print(
+                f"nivel {nivel}: {hilos:2d} hilos     {t_paralelo * 1000:9.1f} ms | "
+                f"{total_mb / t_paralelo:8.1f} MB/s | x{t_serie / t_paralelo:5.2f} | "
+                f"{'idéntico' if identico else 'DISTINTO'}",
+                flush=True,
+            )
+    return 1 if distintos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""
+Generador de Expert Advisors sintéticos con la estructura de StrategyQuant X.
+
+Cada archivo reproduce las anclas que buscan los transformadores (línea de
+inputs `smm`, `return(INIT_SUCCEEDED);`, llamada a sqMMFixedAmount, marcadores
+`Include from`, literales con warnings) y se rellena con funciones de
+señales, comentarios y cadenas hasta alcanzar el tamaño pedido.
+"""
+
+import json
+import os
+import random
+
+from motor.anclas import BENJAMIN_MARKER, GERARD_MARKER, LOT_SIZE_PATTERNS
+
+# Variantes de la llamada al cálculo del lote: las cuatro de LOT_SIZE_PATTERNS
+# y una con formato libre que solo captura el patrón flexible de Gerard
+LOT_SIZE_CALLS = LOT_SIZE_PATTERNS + [
+    'size = sqMMFixedAmount( "Current", ORDER_TYPE_BUY, openPrice, sl,\n'
+    "            mmRiskedMoney, mmDecimals, mmLotsIfNoMM, mmMaxLots, mmMultiplier );",
+]
+
+# Anclas que se pueden omitir para generar archivos no parcheables
+ANCLAS = ("inputs", "oninit", "lot", "include", "mmfunc")
+
+TAMANOS = {
+    "10k": 10 * 1024,
+    "100k": 100 * 1024,
+    "1m": 1024 * 1024,
+    "10m": 10 * 1024 * 1024,
+}
+
+_HEADER = """//+------------------------------------------------------------------+
+//|  Strategy: {nombre}
+//|  Generated by StrategyQuant X build 136 for MetaTrader 5
+//+------------------------------------------------------------------+
+#property copyright "StrategyQuant.com"
+#property link      "http://www.StrategyQuant.com"
+#property version   "1.00"
+
+#include <Trade\\Trade.mqh>
+#include <Trade\\SymbolInfo.mqh>
+
+CTrade trade;
+
+//+------------------------------------------------------------------+
+// -- Variables
+//+------------------------------------------------------------------+
+
+input string CustomComment = "{nombre}";
+input int MagicNumber = {magic};
+input bool UseMoneyManagement = true;
+input int MaxTradesPerDay = 0;
+input double MinimumSL = 0;
+"""
+
+_MM_INPUTS = """{smm}
+input double mmRiskedMoney = 100;
+input int mmDecimals = 2;
+input double mmLotsIfNoMM = 1;
+input double mmMaxLots = 10;
+input double mmMultiplier = 1;
+"""
+
+_GLOBALS = """
+string StrategyID = "{strategy_id}";
+double initialBalance = 0;
+double sqVolatility = 0.5f;
+double sqThreshold = 10.0f;
+bool VerboseMode = false;
+"""
+
+_ONINIT = """
+//+------------------------------------------------------------------+
+//| Expert initialization function                                   |
+//+------------------------------------------------------------------+
+int OnInit() {{
+   VerboseLog("--------------------------------------------------------");
+   VerboseLog("Starting the EA");
+
+   initialBalance = AccountInfoDouble(ACCOUNT_BALANCE);
+   trade.SetExpertMagicNumber(MagicNumber);
+
+   if(!sqInitIndicators()) {{
+      return(INIT_FAILED);
+   }}
+
+   VerboseLog("--------------------------------------------------------");
+{retorno}
+}}
+"""
+
+_LOT_SIZE_FUNCTION = """
+//+------------------------------------------------------------------+
+
+double sqGetLotSize(string symbol, ENUM_ORDER_TYPE orderType, double openPrice, double sl) {{
+   double size = 0;
+   if(sl == 0) {{
+      return(mmLotsIfNoMM);
+   }}
+{llamada}
+   return(size);
+}}
+"""
+
+_FTP_FUNCTION = """
+string sqSendFileToFTP(string fileName) {
+   if(!FileIsExist(fileName)) {
+      return("File not found in the MQL5\\Files directory to send on FTP server");
+   }
+   return("");
+}
+"""
+
+_MM_FUNCTION = """
+//+----------------------------- Include from /Extensions/MoneyManagement/FixedAmount.mq5 -------------------------------------+
+
+double sqMMFixedAmount(string symbol,{comentario} ENUM_ORDER_TYPE orderType, double price, double sl, double RiskedMoney, int decimals, double LotsIfNoMM, double MaximumLots, double multiplier{step_param}) {{
+   Verbose("Computing Money Management for order - Fixed amount");
+
+   if(UseMoneyManagement == false) {{
+      Verbose("Use Money Management = false, MM not used");
+      return (mmLotsIfNoMM);
+   }}
+
+   string correctedSymbol = correctSymbol(symbol);
+   sl = NormalizeDouble(sl, (int) SymbolInfoInteger(correctedSymbol, SYMBOL_DIGITS));
+
+   double openPrice = price > 0 ? price : SymbolInfoDouble(correctedSymbol, isLongOrder(orderType) ? SYMBOL_ASK : SYMBOL_BID);
+   double LotSize=0;
+
+   if(RiskedMoney <= 0 ) {{
+      Verbose("Computing Money Management - Incorrect RiskedMoney value, it must be above 0");
+      return(0);
+   }}
+
+   double PointValue = SymbolInfoDouble(correctedSymbol, SYMBOL_TRADE_TICK_VALUE) / SymbolInfoDouble(correctedSymbol, SYMBOL_TRADE_TICK_SIZE);
+   double Smallest_Lot = SymbolInfoDouble(correctedSymbol, SYMBOL_VOLUME_MIN);
+   double Largest_Lot = SymbolInfoDouble(correctedSymbol, SYMBOL_VOLUME_MAX);
+
+   double oneLotSLDrawdown = PointValue * MathAbs(openPrice - sl);
+
+   if(oneLotSLDrawdown > 0) {{
+      LotSize = RiskedMoney / oneLotSLDrawdown;
+   }}
+   else {{
+      LotSize = 0;
+   }}
+
+   //--- MAXLOT and MINLOT management
+{step_body}
+   LotSize = NormalizeDouble(LotSize * multiplier, decimals);
+
+   if (LotSize < Smallest_Lot) {{
+      Verbose("Calculated LotSize is too small. Minimal allowed lot size from the broker is: ", DoubleToString(Smallest_Lot));
+      return 0;
+   }}
+   else if (LotSize > Largest_Lot) {{
+      LotSize = Largest_Lot;
+   }}
+
+   if(LotSize > MaximumLots) {{
+      LotSize = MaximumLots;
+   }}
+
+   return (LotSize);
+}}
+"""
+
+_STEP_BODY = """   if(step > 0) {
+      LotSize = MathRound(LotSize / step) * step;
+   }
+"""
+
+_INCLUDE_FUNCTION = """
+//+----------------------------- Include from /Extensions/Indicators/{nombre}.mq5 -------------------------------------+
+
+double sq{nombre}(string symbol, int timeframe, int period, int shift) {{
+   // Calcula el valor del indicador {nombre} con {periodo} barras
+   double suma = 0;
+   for(int i = shift; i < shift + period; i++) {{
+      if(iClose(symbol, (ENUM_TIMEFRAMES) timeframe, i) > 0) {{
+         suma += iClose(symbol, (ENUM_TIMEFRAMES) timeframe, i) * {factor};
+      }}
+      else {{
+         Verbose("Invalid close for {nombre} at bar ", IntegerToString(i), " {{not a brace}}");
+      }}
+   }}
+   /* Bloque de comentario con llaves {{ }} que no cuentan */
+   return(period > 0 ? suma / period : 0);
+}}
+"""
+
+_SIGNAL_FUNCTION = """
+//+------------------------------------------------------------------+
+// Rule: {nombre}
+//+------------------------------------------------------------------+
+bool sqRule{nombre}(string symbol) {{
+   if(sqGetIndicatorValue(symbol, {periodo}, 1) > sqGetIndicatorValue(symbol, {periodo2}, 2)) {{
+      if(sqIsBarOpen() && MaxTradesPerDay > 0) {{
+         VerboseLog("Rule {nombre} triggered on ", symbol, " with period {periodo}");
+         return(true);
+      }}
+   }}
+   return(false);
+}}
+"""
+
+# Comentarios en la cabecera de sqMMFixedAmount, tras `string symbol,`
+_COMENTARIOS_FIRMA = {
+    "comentario_bloque": " /* step */",
+    "comentario_linea": " // orden\n  ",
+}
+
+
+def generar_estrategia(
+    size=TAMANOS["10k"],
+    llamada=0,
+    mm_step=True,
+    oninit_indent="      ",
+    ya_procesado=None,
+    sin_anclas=(),
+    cierre_indentado=False,
+    firma_mm=None,
+    seed=0,
+):
+    """
+    Devuelve el código fuente de un EA sintético de unos `size` bytes.
+
+    llamada: índice en LOT_SIZE_CALLS de la llamada al cálculo del lote.
+    mm_step: la función sqMMFixedAmount recibe y usa el parámetro `step`.
+    oninit_indent: indentación de `return(INIT_SUCCEEDED);` en OnInit.
+    ya_procesado: "gerard" o "benjamin" para incluir su marcador.
+    sin_anclas: anclas de ANCLAS que se omiten.
+    cierre_indentado: ninguna llave de cierre de función queda en la columna 0,
+    como en el código pasado por un formateador.
+    firma_mm: "comentario_bloque" o "comentario_linea" para intercalar un
+    comentario en la cabecera de sqMMFixedAmount.
+    """
+    rnd = random.Random(seed)
+    nombre = f"Strategy {rnd.randint(1, 9)}.{rnd.randint(1, 99)}.{rnd.randint(1, 999)}"
+    partes = [
+        _HEADER.format(nombre=nombre, magic=rnd.randint(1000, 999999)),
+    ]
+    if ya_procesado == "gerard":
+        partes.append(f"//| {GERARD_MARKER} by Python Script\n")
+    elif ya_procesado == "benjamin":
+        partes.append(f"//| {BENJAMIN_MARKER} by Python Script\n")
+
+    smm = (
+        'input string smm = "----------- Money Management - Fixed Amount -----------";'
+        if "inputs" not in sin_anclas
+        else 'input string smm = "----------- Money Management -----------";'
+    )
+    partes.append(_MM_INPUTS.format(smm=smm))
+    if mm_step:
+        partes.append("input double mmStep = 0.01;\n")
+    partes.append(_GLOBALS.format(strategy_id=f"{rnd.randint(10**8, 10**9 - 1)}"))
+
+    retorno = (
+        f"{oninit_indent}return(INIT_SUCCEEDED);"
+        if "oninit" not in sin_anclas
+        else f"{oninit_indent}return(0);"
+    )
+    partes.append(_ONINIT.format(retorno=retorno))
+
+    if "lot" not in sin_anclas:
+        call = LOT_SIZE_CALLS[llamada]
+        if not mm_step:
+            call = call.replace(",mmStep", "").replace(", mmStep", "")
+        partes.append(_LOT_SIZE_FUNCTION.format(llamada=f"   {call}"))
+    else:
+        partes.append(_LOT_SIZE_FUNCTION.format(llamada="   size = mmLotsIfNoMM;"))
+
+    partes.append(_FTP_FUNCTION)
+
+    # Relleno hasta el tamaño pedido: señales y funciones incluidas
+    actual = sum(len(parte) for parte in partes)
+    cola = []
+    if "mmfunc" not in sin_anclas:
+        cola.append(
+            _MM_FUNCTION.format(
+                step_param=", double step" if mm_step else "",
+                step_body=_STEP_BODY if mm_step else "",
+                comentario=_COMENTARIOS_FIRMA.get(firma_mm, ""),
+            )
+        )
+    cola_size = sum(len(parte) for parte in cola)
+    i = 0
+    while actual + cola_size < size:
+        i += 1
+        if "include" not in sin_anclas and rnd.random() < 0.3:
+            bloque = _INCLUDE_FUNCTION.format(
+                nombre=f"Indicator{i}",
+                periodo=rnd.randint(5, 200),
+                factor=rnd.choice(["1.0", "0.5f", "10.0f", "2.5"]),
+            )
+        else:
+            bloque = _SIGNAL_FUNCTION.format(
+                nombre=i, periodo=rnd.randint(5, 200), periodo2=rnd.randint(5, 200)
+            )
+        if "include" in sin_anclas:
+            bloque = bloque.replace("Include from", "Included from")
+        partes.append(bloque)
+        actual += len(bloque)
+
+    # La función de MM suele ir a mitad de las funciones incluidas
+    posicion = len(partes) - (len(partes) - 6) // 2
+    partes[posicion:posicion] = cola
+    content = "".join(partes)
+    if cierre_indentado:
+        content = content.replace("\n}", "\n }")
+    return content
+
+
+def variantes():
+    """
+    Matriz de variantes del corpus: (nombre, parámetros de generar_estrategia)
+    """
+    for llamada in range(len(LOT_SIZE_CALLS)):
+        for mm_step in (True, False):
+            for indent in ("   ", "      "):
+                yield (
+                    f"llamada{llamada}_{'step' if mm_step else 'nostep'}_indent{len(indent)}",
+                    {"llamada": llamada, "mm_step": mm_step, "oninit_indent": indent},
+                )
+    for metodologia in ("gerard", "benjamin"):
+        yield f"procesado_{metodologia}", {"ya_procesado": metodologia}
+    for ancla in ANCLAS:
+        yield f"sin_{ancla}", {"sin_anclas": (ancla,)}
+    for firma in _COMENTARIOS_FIRMA:
+        yield f"firma_{firma}", {"firma_mm": firma}
+
+
+def generar_corpus(directorio, tamanos=tuple(TAMANOS), seed=0):
+    """
+    Escribe el corpus completo (todas las variantes para cada tamaño) y un
+    manifest.json con los parámetros de cada archivo
+    """
+    os.makedirs(directorio, exist_ok=True)
+    manifest = []
+    for etiqueta in tamanos:
+        for j, (variante, parametros) in enumerate(variantes()):
+            nombre = f"{etiqueta}_{variante}.mq5"
+            content = generar_estrategia(TAMANOS[etiqueta], seed=seed + j, **parametros)
+            with open(os.path.join(directorio, nombre), "w", encoding="utf-8") as f:
+                f.write(content)
+            manifest.append(
+                {
+                    "archivo": nombre,
+                    "tamano": etiqueta,
+                    "variante": variante,
+                    "bytes": len(content.encode("utf-8")),
+                }
+            )
+    with open(os.path.join(directorio, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera el corpus sintético")
+    parser.add_argument("directorio")
+    parser.add_argument("--tamanos", default=",".join(TAMANOS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    manifest = generar_corpus(args.directorio, args.tamanos.split(","), args.seed)
+    print(f"{len(manifest)} archivos generados en {args.directorio}")
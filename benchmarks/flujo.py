@@ -0,0 +1,96 @@
+"""
+Benchmark del modo en flujo (motor.flujo) frente al modo en memoria: tiempo y
+memoria máxima (tracemalloc) de modificar una estrategia grande en disco.
+
+    python -m benchmarks.flujo --tamanos 10m
+    python -m benchmarks.flujo --tamanos 1m,10m --metodologia benjamin
+
+Los dos modos escriben su resultado en un archivo temporal y se comprueba que
+son idénticos byte a byte.
+"""
+
+import argparse
+import filecmp
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.corpus import TAMANOS, generar_estrategia
+from motor import BENJAMIN, GERARD, modificar_estrategia
+from motor.codificacion import decodificar
+from motor.flujo import generar_flujo, preparar_flujo
+
+METODOLOGIAS = {"gerard": GERARD, "benjamin": BENJAMIN}
+
+
+def en_memoria(origen, destino, metodologia):
+    with open(origen, "rb") as f:
+        data = f.read()
+    content, codificacion = decodificar(data)
+    modified_content, _ = modificar_estrategia(content, origen, metodologia)
+    with open(destino, "wb") as f:
+        f.write(codificacion.codificar(modified_content))
+
+
+def en_flujo(origen, destino, metodologia):
+    def abrir():
+        return open(origen, "rb")
+
+    codificacion, [(ediciones, _)] = preparar_flujo(abrir, origen, [metodologia])
+    with open(destino, "wb") as f:
+        for trozo in generar_flujo(abrir, codificacion, ediciones):
+            f.write(trozo)
+
+
+def medir(funcion, *args):
+    """(segundos, pico de memoria en bytes)"""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    funcion(*args)
+    duracion = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duracion, pico
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark del modo en flujo frente al modo en memoria"
+    )
+    parser.add_argument(
+        "--tamanos",
+        default="1m,10m",
+        help=f"Tamaños separados por comas ({', '.join(TAMANOS)})",
+    )
+    parser.add_argument("--metodologia", choices=sorted(METODOLOGIAS), default="gerard")
+    args = parser.parse_args(argv)
+    metodologia = METODOLOGIAS[args.metodologia]
+
+    distintos = 0
+    with tempfile.TemporaryDirectory() as directorio:
+        for etiqueta in args.tamanos.split(","):
+            if etiqueta not in TAMANOS:
+                parser.error(f"Tamaño desconocido '{etiqueta}'")
+            origen = os.path.join(directorio, f"estrategia_{etiqueta}.mq5")
+            with open(origen, "w", encoding="utf-8", newline="") as f:
+                f.write(generar_estrategia(TAMANOS[etiqueta]))
+
+            salidas = {}
+            for nombre, funcion in (("memoria", en_memoria), ("flujo", en_flujo)):
+                salidas[nombre] = os.path.join(directorio, f"{nombre}_{etiqueta}.mq5")
+                duracion, pico = medir(funcion, origen, salidas[nombre], metodologia)
+                print(
+                    f"{etiqueta:>5} {nombre:8}: {duracion * 1000:9.1f} ms | "
+                    f"pico {pico / 1024 / 1024:8.2f} MB",
+                    flush=True,
+                )
+            if not filecmp.cmp(salidas["memoria"], salidas["flujo"], shallow=False):
+                distintos += 1
+                print(f"{etiqueta:>5}: ¡los resultados son distintos!", flush=True)
+    return 1 if distintos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Benchmark del localizador de funciones: la expresión regular DOTALL que usaba
+el paso 1 de Gerard frente al índice de lexico.indice_funciones.
+
+    python -m benchmarks.funciones --tamanos 10k,100k,1m
+
+La variante `cierre_indentado` (ninguna llave de cierre en la columna 0) es el
+caso en el que la expresión regular retrocede sobre todo el archivo por cada
+función candidata, y además no encuentra la función.
+"""
+
+import argparse
+import re
+import sys
+import time
+
+from benchmarks.corpus import TAMANOS, generar_estrategia
+from motor import escanear_anclas
+from motor.lexico import funcion_en, indice_funciones
+
+# Patrón de SQMM_FUNCTION_PATTERN antes de introducir el analizador léxico
+PATRON_ANTERIOR = re.compile(
+    r"double sqMMFixedAmount\(string symbol,.*?\)\s*{.*?^}", re.DOTALL | re.MULTILINE
+)
+
+
+def localizar_regex(content, anclas):
+    return [
+        match.span() for pos in anclas if (match := PATRON_ANTERIOR.match(content, pos))
+    ]
+
+
+def localizar_lexico(content, anclas):
+    funciones = indice_funciones(content, hasta=anclas[-1] if anclas else None)
+    tramos = []
+    for pos in anclas:
+        funcion = funcion_en(funciones, pos)
+        if funcion is not None and pos < funcion.apertura:
+            tramos.append((pos, funcion.fin))
+    return tramos
+
+
+def cronometrar(funcion, content, anclas, repeticiones, limite):
+    """Mejor tiempo de `repeticiones` ejecuciones; se abandona tras `limite` s"""
+    mejor = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion(content, anclas)
+        duracion = time.perf_counter() - t0
+        mejor = duracion if mejor is None else min(mejor, duracion)
+        if duracion > limite:
+            break
+    return mejor, resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark del localizador de funciones sqMMFixedAmount"
+    )
+    parser.add_argument(
+        "--tamanos",
+        default="10k,100k,1m",
+        help=f"Tamaños separados por comas ({', '.join(TAMANOS)})",
+    )
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument(
+        "--limite",
+        type=float,
+        default=30.0,
+        help="Segundos tras los que no se repite una medición",
+    )
+    args = parser.parse_args(argv)
+
+    for etiqueta in args.tamanos.split(","):
+        if etiqueta not in TAMANOS:
+            parser.error(f"Tamaño desconocido '{etiqueta}'")
+        for variante in ("normal", "cierre_indentado"):
+            content = generar_estrategia(
+                TAMANOS[etiqueta], cierre_indentado=variante == "cierre_indentado"
+            )
+            anclas = escanear_anclas(content).mmfunc
+            t_regex, tramos_regex = cronometrar(
+                localizar_regex, content, anclas, args.repeticiones, args.limite
+            )
+            t_lexico, tramos_lexico = cronometrar(
+                localizar_lexico, content, anclas, args.repeticiones, args.limite
+            )
+            print(
+                f"{etiqueta:>5} {variante:16}: regex {t_regex * 1000:10.2f} ms | "
+                f"léxico {t_lexico * 1000:8.2f} ms | "
+                f"x{t_regex / t_lexico:8.1f} | funciones encontradas: "
+                f"{len(tramos_regex)} / {len(tramos_lexico)}",
+                flush=True,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Benchmark del tiempo de importación de los puntos de entrada.
+
+Cada módulo se importa en un intérprete nuevo con `python -X importtime`, que
+informa del tiempo acumulado de cada importación. Los módulos del núcleo
+(motor, procesamiento, cli) no deben cargar Streamlit: si lo hacen, el
+benchmark termina con error.
+
+    python -m benchmarks.importacion
+    python -m benchmarks.importacion --repeticiones 10 --limite 150
+"""
+
+import argparse
+import subprocess
+import sys
+
+NUCLEO = ("motor", "procesamiento", "cli")
+INTERFAZ = ("app",)
+
+
+def medir(modulo):
+    """
+    (milisegundos acumulados de importar `modulo`, si se cargó Streamlit),
+    medidos en un intérprete nuevo
+    """
+    resultado = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys, {modulo}; print('streamlit' in sys.modules)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    acumulado = None
+    for linea in resultado.stderr.splitlines():
+        # import time: propio | acumulado | módulo (sangrado según la anidación)
+        partes = linea.split("|")
+        if len(partes) == 3 and partes[2].strip() == modulo:
+            acumulado = int(partes[1])
+    return acumulado / 1000, resultado.stdout.strip() == "True"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Tiempo de importación del núcleo y de la interfaz"
+    )
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument(
+        "--limite",
+        type=float,
+        default=None,
+        help="Milisegundos máximos para importar un módulo del núcleo",
+    )
+    parser.add_argument(
+        "--sin-interfaz",
+        action="store_true",
+        help="No medir app.py (no requiere Streamlit instalado)",
+    )
+    args = parser.parse_args(argv)
+
+    modulos = NUCLEO if args.sin_interfaz else NUCLEO + INTERFAZ
+    fallos = []
+    for modulo in modulos:
+        # El primer intérprete compila los .pyc; no cuenta
+        medir(modulo)
+        tiempos = []
+        for _ in range(args.repeticiones):
+            ms, con_streamlit = medir(modulo)
+            tiempos.append(ms)
+        mejor = min(tiempos)
+        print(
+            f"{modulo:>14}: {mejor:8.1f} ms (mejor de {args.repeticiones}) | "
+            f"streamlit: {'sí' if con_streamlit else 'no'}",
+            flush=True,
+        )
+        if modulo in NUCLEO:
+            if con_streamlit:
+                fallos.append(f"{modulo} carga Streamlit")
+            if args.limite is not None and mejor > args.limite:
+                fallos.append(f"{modulo} tarda {mejor:.1f} ms (> {args.limite} ms)")
+
+    for fallo in fallos:
+        print(f"ERROR: {fallo}", file=sys.stderr)
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
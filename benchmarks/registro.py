@@ -0,0 +1,96 @@
+"""
+Benchmark del registro de la cartera (registro.py): una cartera sintética de
+--cartera estrategias y el tiempo de registrar cada estrategia nueva, con la
+comprobación de colisiones incluida. Con los índices, el tiempo no debe
+crecer con el tamaño de la cartera.
+
+    python -m benchmarks.registro --cartera 10000
+    python -m benchmarks.registro --cartera 100000 --nuevas 2000 --limite 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import generar_estrategia
+from motor import BENJAMIN, GERARD, Identidad, extraer_identidad
+from motor.perfilado import percentil
+from registro import RegistroCartera
+
+
+def identidad_aleatoria(rng):
+    # Como las de corpus.py: StrategyID de 9 cifras, MagicNumber de 6
+    return Identidad(
+        str(rng.randrange(10**8, 10**9)),
+        rng.randrange(1000, 1_000_000),
+        rng.choice(("EURUSD", "GBPUSD", "XAUUSD", "US30", None)),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Registro de la cartera")
+    parser.add_argument("--cartera", type=int, default=10_000)
+    parser.add_argument("--nuevas", type=int, default=1000)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument(
+        "--limite",
+        type=float,
+        default=None,
+        help="Milisegundos máximos (p95) para registrar una estrategia",
+    )
+    args = parser.parse_args(argv)
+    rng = random.Random(args.semilla)
+
+    # La extracción de la identidad, sobre un archivo de cada tamaño
+    for tamano in (10 * 1024, 1024 * 1024):
+        content = generar_estrategia(tamano, seed=0)
+        inicio = time.perf_counter()
+        extraer_identidad(content)
+        print(
+            f"Identidad de {tamano // 1024} KB: "
+            f"{(time.perf_counter() - inicio) * 1_000_000:.0f} µs"
+        )
+
+    with tempfile.TemporaryDirectory() as directorio:
+        registro = RegistroCartera(os.path.join(directorio, "cartera.sqlite"))
+        try:
+            inicio = time.perf_counter()
+            for n in range(args.cartera):
+                metodologias = [rng.choice((GERARD, BENJAMIN))]
+                registro.registrar(
+                    f"cartera_{n:06d}.mq5", identidad_aleatoria(rng), metodologias
+                )
+            alta = time.perf_counter() - inicio
+
+            tiempos = []
+            colisiones = 0
+            for n in range(args.nuevas):
+                inicio = time.perf_counter()
+                encontradas = registro.registrar(
+                    f"nueva_{n:06d}.mq5", identidad_aleatoria(rng), [GERARD]
+                )
+                tiempos.append(time.perf_counter() - inicio)
+                colisiones += bool(encontradas)
+            total = len(registro)
+        finally:
+            registro.cerrar()
+
+    tiempos.sort()
+    p95 = percentil(tiempos, 95) * 1000
+    print(f"Cartera: {args.cartera} estrategias en {alta:.2f} s | registros: {total}")
+    print(
+        f"Registrar una nueva: p50 {percentil(tiempos, 50) * 1000:.2f} ms | "
+        f"p95 {p95:.2f} ms | máx {tiempos[-1] * 1000:.2f} ms | "
+        f"con colisiones: {colisiones} de {args.nuevas}"
+    )
+    if args.limite is not None and p95 > args.limite:
+        print(f"❌ p95 por encima de {args.limite} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Runner de benchmarks: latencia por archivo (percentiles), archivos por segundo
+y pico de memoria de cada metodología sobre el corpus sintético.
+
+    python -m benchmarks.run --tamanos 10k,100k,1m --repeticiones 5 \\
+        --output resultados.json --compare resultados_anteriores.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.corpus import TAMANOS, generar_estrategia, variantes
+from motor import BENJAMIN, GERARD, AnclasNoEncontradas, modificar_estrategia
+from motor.perfilado import percentil
+
+METODOLOGIAS = {"gerard": GERARD, "benjamin": BENJAMIN}
+
+
+def _aplicar(content, nombre, metodologia):
+    # Los archivos sin anclas se rechazan en la comprobación previa: también
+    # es un resultado válido a medir
+    try:
+        modificar_estrategia(content, nombre, metodologia)
+    except AnclasNoEncontradas:
+        pass
+
+
+def medir(archivos, metodologia, repeticiones):
+    """
+    Ejecuta la metodología sobre cada archivo `repeticiones` veces.
+    La memoria se mide en una pasada aparte con tracemalloc para no
+    distorsionar las latencias.
+    """
+    latencias = []
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for nombre, content in archivos:
+            t0 = time.perf_counter()
+            _aplicar(content, nombre, metodologia)
+            latencias.append(time.perf_counter() - t0)
+    duracion = time.perf_counter() - inicio
+
+    pico = 0
+    for nombre, content in archivos:
+        tracemalloc.start()
+        _aplicar(content, nombre, metodologia)
+        pico = max(pico, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    latencias.sort()
+    return {
+        "archivos": len(latencias),
+        "bytes": sum(len(content) for _, content in archivos),
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p90_ms": percentil(latencias, 90) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "max_ms": latencias[-1] * 1000 if latencias else 0.0,
+        "archivos_por_segundo": len(latencias) / duracion if duracion else 0.0,
+        "mb_por_segundo": (
+            sum(len(content) for _, content in archivos)
+            * repeticiones
+            / duracion
+            / 1024
+            / 1024
+            if duracion
+            else 0.0
+        ),
+        "pico_memoria_mb": pico / 1024 / 1024,
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(tamanos, repeticiones, metodologias, seed=0):
+    resultados = {}
+    for etiqueta in tamanos:
+        archivos = [
+            (
+                f"{etiqueta}_{variante}.mq5",
+                generar_estrategia(TAMANOS[etiqueta], seed=seed + j, **parametros),
+            )
+            for j, (variante, parametros) in enumerate(variantes())
+        ]
+        # Los archivos grandes se repiten menos para acotar la duración
+        reps = max(1, repeticiones // max(1, TAMANOS[etiqueta] // TAMANOS["1m"]))
+        for clave in metodologias:
+            metricas = medir(archivos, METODOLOGIAS[clave], reps)
+            resultados.setdefault(clave, {})[etiqueta] = metricas
+            print(
+                f"{clave:9} {etiqueta:>5}: p50 {metricas['p50_ms']:8.2f} ms | "
+                f"p99 {metricas['p99_ms']:8.2f} ms | "
+                f"{metricas['archivos_por_segundo']:8.1f} archivos/s | "
+                f"pico {metricas['pico_memoria_mb']:7.2f} MB",
+                flush=True,
+            )
+    return {
+        "commit": _commit_actual(),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticiones": repeticiones,
+        "resultados": resultados,
+    }
+
+
+def comparar(actual, anterior):
+    """Imprime la variación de cada métrica respecto a una ejecución anterior"""
+    print(f"\nComparación con {anterior.get('commit') or 'ejecución anterior'}:")
+    for clave, por_tamano in actual["resultados"].items():
+        for etiqueta, metricas in por_tamano.items():
+            previas = anterior.get("resultados", {}).get(clave, {}).get(etiqueta)
+            if not previas:
+                continue
+            cambios = []
+            for metrica in (
+                "p50_ms",
+                "p99_ms",
+                "archivos_por_segundo",
+                "pico_memoria_mb",
+            ):
+                if previas.get(metrica):
+                    cambio = (metricas[metrica] / previas[metrica] - 1) * 100
+                    cambios.append(f"{metrica} {cambio:+.1f}%")
+            print(f"{clave:9} {etiqueta:>5}: " + " | ".join(cambios))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark de los transformadores MQL5"
+    )
+    parser.add_argument(
+        "--tamanos",
+        default="10k,100k,1m,10m",
+        help=f"Tamaños separados por comas ({', '.join(TAMANOS)})",
+    )
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument(
+        "--metodologias", default=",".join(METODOLOGIAS), help="gerard,benjamin"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior")
+    args = parser.parse_args(argv)
+
+    tamanos = args.tamanos.split(",")
+    for etiqueta in tamanos:
+        if etiqueta not in TAMANOS:
+            parser.error(f"Tamaño desconocido '{etiqueta}'")
+
+    informe = ejecutar(
+        tamanos, args.repeticiones, args.metodologias.split(","), args.seed
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            comparar(informe, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
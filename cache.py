@@ -0,0 +1,201 @@
+"""
+Caché de resultados direccionada por contenido.
+
+La clave combina el hash de los bytes originales, la metodología y la versión
+de sus plantillas, así que un mismo archivo subido de nuevo (aunque cambie de
+nombre) no vuelve a transformarse. Hay dos niveles, ambos con expulsión por
+tamaño: un LRU en memoria y un directorio en disco. Los métodos se pueden
+llamar desde varios hilos a la vez (los trabajos de trabajos.py).
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+CACHE_MEMORIA_MAX_SIZE = (
+    int(os.environ.get("MQL5_CACHE_MEMORIA_MB", "256")) * 1024 * 1024
+)
+CACHE_DISCO_MAX_SIZE = int(os.environ.get("MQL5_CACHE_DISCO_MB", "1024")) * 1024 * 1024
+CACHE_DIR = os.environ.get(
+    "MQL5_CACHE_DIR", os.path.join(tempfile.gettempdir(), "mql5_estrategias_cache")
+)
+
+
+class CacheResultados:
+    """
+    Guarda (modified_content, message, diff) de las transformaciones con
+    éxito, con el contenido ya codificado en bytes y los hunks del diff en texto
+    """
+
+    def __init__(
+        self,
+        memoria_max_size=CACHE_MEMORIA_MAX_SIZE,
+        directorio=CACHE_DIR,
+        disco_max_size=CACHE_DISCO_MAX_SIZE,
+    ):
+        self.memoria_max_size = memoria_max_size
+        self.directorio = directorio
+        self.disco_max_size = disco_max_size
+
+        # Protege el LRU, los tamaños y los contadores de ambos niveles
+        self._cerrojo = threading.Lock()
+        self._memoria = OrderedDict()
+        self._memoria_size = 0
+        self._disco_size = 0
+
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+
+        if self.directorio:
+            os.makedirs(self.directorio, exist_ok=True)
+            self._disco_size = sum(
+                entrada.stat().st_size for entrada in self._entradas_disco()
+            )
+
+    @staticmethod
+    def clave(data, metodologia):
+        huella = hashlib.sha256(data)
+        huella.update(b"\0" + metodologia.nombre.encode("utf-8"))
+        huella.update(b"\0" + metodologia.version.encode("ascii"))
+        return huella.hexdigest()
+
+    def estadisticas(self):
+        with self._cerrojo:
+            return {
+                "aciertos_memoria": self.aciertos_memoria,
+                "aciertos_disco": self.aciertos_disco,
+                "fallos": self.fallos,
+                "memoria_bytes": self._memoria_size,
+                "disco_bytes": self._disco_size,
+            }
+
+    def buscar(self, clave):
+        """
+        (resultado, nivel) donde nivel es "memoria", "disco" o None si no
+        está en la caché
+        """
+        with self._cerrojo:
+            resultado = self._memoria.get(clave)
+            if resultado is not None:
+                self._memoria.move_to_end(clave)
+                self.aciertos_memoria += 1
+                return resultado, "memoria"
+
+            resultado = self._leer_disco(clave)
+            if resultado is not None:
+                self.aciertos_disco += 1
+                self._guardar_memoria(clave, resultado)
+                return resultado, "disco"
+
+            self.fallos += 1
+            return None, None
+
+    def get(self, clave):
+        return self.buscar(clave)[0]
+
+    def put(self, clave, resultado):
+        modified_content = resultado[0]
+        if not modified_content:
+            # Solo se guardan transformaciones con éxito: los mensajes de
+            # archivos omitidos incluyen el nombre del archivo
+            return
+        with self._cerrojo:
+            self._guardar_memoria(clave, resultado)
+            self._escribir_disco(clave, resultado)
+
+    # --- Nivel en memoria ---
+
+    @staticmethod
+    def _size(resultado):
+        return len(resultado[0]) + len(resultado[2] or "")
+
+    def _guardar_memoria(self, clave, resultado):
+        size = self._size(resultado)
+        if size > self.memoria_max_size:
+            return
+        anterior = self._memoria.pop(clave, None)
+        if anterior is not None:
+            self._memoria_size -= self._size(anterior)
+        self._memoria[clave] = resultado
+        self._memoria_size += size
+        while self._memoria_size > self.memoria_max_size:
+            _, expulsado = self._memoria.popitem(last=False)
+            self._memoria_size -= self._size(expulsado)
+
+    # --- Nivel en disco ---
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave[:2], clave)
+
+    def _entradas_disco(self):
+        for subdirectorio in os.scandir(self.directorio):
+            if subdirectorio.is_dir():
+                yield from (
+                    entrada
+                    for entrada in os.scandir(subdirectorio)
+                    if entrada.is_file()
+                )
+
+    def _leer_disco(self, clave):
+        if not self.directorio:
+            return None
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, "rb") as f:
+                message = f.readline()[:-1]
+                diff_size = int(f.readline())
+                diff = f.read(diff_size)
+                content = f.read()
+            # La fecha de modificación hace de marca de uso para la expulsión
+            os.utime(ruta)
+        except (OSError, ValueError):
+            return None
+        return content, message.decode("utf-8"), diff.decode("utf-8")
+
+    def _escribir_disco(self, clave, resultado):
+        if not self.directorio:
+            return
+        # Mensaje y tamaño del diff en sendas líneas, el diff y el contenido
+        modified_content, message, diff = resultado
+        diff = (diff or "").encode("utf-8")
+        data = b"%s\n%d\n%s%s" % (
+            message.encode("utf-8"),
+            len(diff),
+            diff,
+            modified_content,
+        )
+        if len(data) > self.disco_max_size:
+            return
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(data)
+        try:
+            self._disco_size -= os.path.getsize(ruta)
+        except OSError:
+            pass
+        os.replace(temporal, ruta)
+        self._disco_size += len(data)
+        if self._disco_size > self.disco_max_size:
+            self._expulsar_disco()
+
+    def _expulsar_disco(self):
+        """Borra las entradas usadas hace más tiempo hasta quedar al 90 % del límite"""
+        entradas = sorted(
+            (entrada.stat().st_mtime, entrada.stat().st_size, entrada.path)
+            for entrada in self._entradas_disco()
+        )
+        objetivo = self.disco_max_size * 0.9
+        self._disco_size = sum(size for _, size, _ in entradas)
+        for _, size, ruta in entradas:
+            if self._disco_size <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+            self._disco_size -= size
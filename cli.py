@@ -0,0 +1,636 @@
+"""
+Modo por lotes sin interfaz: aplica una metodología de gestión de riesgo a
+árboles de archivos .mq5 repartiendo el trabajo entre varios procesos.
+
+Uso:
+    python cli.py exports/ -m gerard -o salida/
+    python cli.py "exports/**/*.mq5" -m benjamin -o estrategias.zip -j 8
+    python cli.py export_sqx.zip -m gerard -o salida/
+    python cli.py exports/ -m gerard -m benjamin -o variantes.zip
+    python cli.py exports/ --variantes escalas.json -o variantes.zip
+    python cli.py exports/ -m gerard -o salida/ --diff
+    python cli.py exports/ -m gerard -o salida.zip --nivel-zip 0
+    python cli.py exports_enormes/ -m gerard -o salida/ --flujo
+    python cli.py exports/ -m gerard -o salida.zip --validacion avisar
+    python cli.py exports/ -m gerard -o salida.zip --registro
+    python cli.py exports/ -m gerard -o salida.zip --perfil perfil.json \\
+        --metricas /var/lib/node_exporter/mql5.prom
+
+El archivo de --variantes es una lista JSON de objetos con "metodologia",
+"sufijo" y, opcionalmente, "parametros" (valores por defecto de los inputs):
+
+    [{"metodologia": "gerard", "sufijo": "_g_conservador",
+      "parametros": {"g_riskLevels_string": "0.5,1.0,1.5"}}]
+
+Cada salida se valida en el propio proceso del pool (motor.validacion) antes
+de escribirla: por defecto, las que no compilarían no se escriben ni entran en
+el .zip; con --validacion avisar se escriben y solo se informa.
+
+El lote termina con código 1 si algún archivo se rechaza por falta de anclas,
+no supera la validación o da error; los ya modificados (omitidos) no cuentan.
+"""
+
+import argparse
+import glob
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+from multiprocessing import Pool
+
+from diferencias import diff_unificado
+from entradas import es_zip, miembros_mq5
+from motor import (
+    METODOLOGIAS_CLI,
+    Identidad,
+    Validador,
+    aplicar_ediciones,
+    cargar_variantes,
+    describir_problemas,
+    extraer_identidad,
+    nombre_modificado,
+    preparar_variantes,
+    validar_estructura,
+)
+from motor.codificacion import decodificar
+from motor.flujo import generar_flujo, identidad_flujo, preparar_flujo
+from motor.perfilado import Cronometro, PerfilLote, etapa
+from registro import (
+    REGISTRO_RUTA,
+    RegistroCartera,
+    clave_cartera,
+    describir_colisiones,
+)
+from zip_salida import CompresorParalelo, abrir_zip, copiar_entrada
+
+
+def recopilar_archivos(entradas):
+    """
+    Expande directorios, patrones glob y paquetes .zip en una lista ordenada
+    de (ruta, miembro, ruta relativa) sin duplicados. `miembro` es None para
+    los archivos sueltos y el nombre dentro del paquete para los ZIP. Las
+    rutas relativas repetidas (el mismo miembro en dos paquetes) llevan
+    delante el número de su archivo de origen
+    """
+    archivos = {}
+
+    def agregar(ruta, relpath):
+        if es_zip(ruta):
+            # Solo se lee el directorio central; los miembros se descomprimen
+            # en los procesos del pool
+            with zipfile.ZipFile(ruta) as bundle:
+                for info in miembros_mq5(bundle):
+                    archivos.setdefault((ruta, info.filename), info.filename)
+        elif ruta.lower().endswith(".mq5"):
+            archivos.setdefault((ruta, None), relpath)
+
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for raiz, _, nombres in os.walk(entrada):
+                for nombre in nombres:
+                    if nombre.lower().endswith((".mq5", ".zip")):
+                        ruta = os.path.join(raiz, nombre)
+                        agregar(ruta, os.path.relpath(ruta, entrada))
+        elif glob.has_magic(entrada):
+            base = _raiz_del_patron(entrada)
+            for ruta in glob.iglob(entrada, recursive=True):
+                if os.path.isfile(ruta):
+                    agregar(ruta, os.path.relpath(ruta, base))
+        elif os.path.isfile(entrada):
+            agregar(entrada, os.path.basename(entrada))
+        else:
+            raise FileNotFoundError(f"No existe el archivo o directorio '{entrada}'")
+
+    ordenados = sorted(
+        ((ruta, miembro, relpath) for (ruta, miembro), relpath in archivos.items()),
+        key=lambda item: (item[2], item[0]),
+    )
+    # Número de cada archivo de origen, en orden: no depende del orden de
+    # los argumentos ni del recorrido del directorio
+    origenes = {
+        ruta: n for n, ruta in enumerate(sorted({ruta for ruta, _, _ in ordenados}))
+    }
+    recopilados = []
+    usados = set()
+    for ruta, miembro, relpath in ordenados:
+        if relpath in usados:
+            relpath = f"{origenes[ruta]}/{relpath}"
+        usados.add(relpath)
+        recopilados.append((ruta, miembro, relpath))
+    return sorted(recopilados, key=lambda item: item[2])
+
+
+def _raiz_del_patron(patron):
+    """Parte fija de un patrón glob, usada para conservar las rutas relativas"""
+    partes = []
+    for parte in patron.split(os.sep):
+        if glob.has_magic(parte):
+            break
+        partes.append(parte)
+    return os.sep.join(partes) or "."
+
+
+def nombre_de_salida(relpath, metodologia):
+    """Ruta relativa del archivo modificado, con el sufijo de la metodología"""
+    return nombre_modificado(relpath, metodologia)
+
+
+# Paquetes ZIP abiertos por cada proceso del pool, para no releer el
+# directorio central en cada miembro
+_bundles_abiertos = {}
+
+# Variantes a generar, si se escribe el .diff de cada una, en modo flujo el
+# directorio de las salidas que el proceso principal copia al ZIP y qué hacer
+# con las salidas inválidas; se envían una sola vez a cada proceso del pool
+_metodologias = []
+_con_diff = False
+_en_flujo = False
+_temporales = None
+_validacion = "bloquear"
+
+# Modos de --validacion
+VALIDACIONES = ("bloquear", "avisar", "no")
+
+# Estados que hacen terminar el lote con código 1
+FALLOS = ("rechazado", "invalido", "error")
+
+# Icono de cada estado en la salida por consola
+ICONOS = {
+    "ok": "✅",
+    "omitido": "⚠️",
+    "rechazado": "🚫",
+    "invalido": "🧱",
+    "error": "❌",
+    "colision": "💥",
+}
+
+
+def _iniciar_proceso(
+    metodologias, con_diff=False, en_flujo=False, temporales=None, validacion="bloquear"
+):
+    global _metodologias, _con_diff, _en_flujo, _temporales, _validacion
+    _metodologias = metodologias
+    _con_diff = con_diff
+    _en_flujo = en_flujo
+    _temporales = temporales
+    _validacion = validacion
+
+
+@contextmanager
+def _abrir_fuente(ruta, miembro):
+    """
+    Bytes del archivo de entrada. Los archivos sueltos se proyectan con mmap:
+    el texto se decodifica directamente desde la caché de páginas del sistema,
+    sin una copia intermedia en bytes
+    """
+    if miembro is not None:
+        bundle = _bundles_abiertos.get(ruta)
+        if bundle is None:
+            bundle = _bundles_abiertos[ruta] = zipfile.ZipFile(ruta)
+        with etapa("lectura"):
+            data = bundle.read(miembro)
+        yield data
+        return
+
+    with open(ruta, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap no admite archivos vacíos
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as proyeccion:
+            yield proyeccion
+
+
+def _procesar_archivo(tarea):
+    """
+    Trabajo de cada proceso del pool: lee y escanea el archivo una sola vez y
+    genera todas las variantes. Devuelve (relpath, estado, mensaje, salidas,
+    tiempos, identidad) donde estado es "ok" (alguna variante generada),
+    "omitido", "rechazado" (a alguna variante le faltan anclas requeridas),
+    "invalido" (alguna variante no superó la validación) o "error",
+    tiempos son los segundos de cada etapa e identidad el StrategyID,
+    MagicNumber y símbolo del original (motor.identidad)
+    """
+    cronometro = Cronometro()
+    generar = _generar_salidas_flujo if _en_flujo else _generar_salidas
+    with cronometro.activo():
+        relpath, estado, message, salidas, identidad = generar(*tarea)
+    return relpath, estado, message, salidas, cronometro.tiempos, identidad
+
+
+def _problemas_de_salida(problemas, new_filename, mensajes):
+    """
+    Añade a los mensajes los problemas de una salida inválida. Devuelve True
+    si la salida no se debe escribir
+    """
+    message = describir_problemas(problemas, os.path.basename(new_filename))
+    bloquear = _validacion == "bloquear"
+    mensajes.append(f"{message} (no se escribe)" if bloquear else message)
+    return bloquear
+
+
+def _estado(salidas, invalidas, rechazos):
+    if invalidas:
+        return "invalido"
+    if rechazos:
+        return "rechazado"
+    return "ok" if salidas else "omitido"
+
+
+def _generar_salidas(ruta, miembro, relpath, output_dir):
+    try:
+        with _abrir_fuente(ruta, miembro) as data, etapa("decodificacion"):
+            content, codificacion = decodificar(data)
+        with etapa("identidad"):
+            identidad = extraer_identidad(content)
+        rechazos = []
+        preparados = preparar_variantes(
+            content, os.path.basename(miembro or ruta), _metodologias, rechazos
+        )
+        salidas = []
+        mensajes = []
+        invalidas = 0
+        for metodologia, (ediciones, message) in zip(_metodologias, preparados):
+            if message not in mensajes:
+                mensajes.append(message)
+            if ediciones is None:
+                continue
+
+            with etapa("aplicar_ediciones"):
+                modified_content = aplicar_ediciones(content, ediciones)
+            new_filename = nombre_de_salida(relpath, metodologia)
+            if _validacion != "no":
+                with etapa("validacion"):
+                    problemas = validar_estructura(modified_content, metodologia)
+                if problemas:
+                    invalidas += 1
+                    if _problemas_de_salida(problemas, new_filename, mensajes):
+                        continue
+            # Cada salida se escribe en la codificación del archivo original
+            with etapa("codificacion"):
+                modified_content = codificacion.codificar(modified_content)
+            archivos = [(new_filename, modified_content)]
+            if _con_diff:
+                with etapa("diff"):
+                    diff = diff_unificado(
+                        content,
+                        ediciones,
+                        f"a/{relpath.replace(os.sep, '/')}",
+                        f"b/{new_filename.replace(os.sep, '/')}",
+                    )
+                archivos.append(
+                    (f"{os.path.splitext(new_filename)[0]}.diff", diff.encode("utf-8"))
+                )
+
+            for nombre, data in archivos:
+                if output_dir is None:
+                    # Modo ZIP: el proceso principal escribe la entrada
+                    salidas.append((nombre.replace(os.sep, "/"), data))
+                    continue
+
+                destino = os.path.join(output_dir, nombre)
+                with etapa("escritura"):
+                    os.makedirs(os.path.dirname(destino), exist_ok=True)
+                    with open(destino, "wb") as f:
+                        f.write(data)
+                salidas.append(None)
+        estado = _estado(salidas, invalidas, rechazos)
+        return relpath, estado, "; ".join(mensajes), salidas, identidad
+    except Exception as e:
+        return relpath, "error", str(e), [], Identidad()
+
+
+def _abridor(ruta, miembro):
+    """Función que abre el archivo de entrada en binario, una vez por pasada"""
+    if miembro is None:
+        return lambda: open(ruta, "rb")
+    bundle = _bundles_abiertos.get(ruta)
+    if bundle is None:
+        bundle = _bundles_abiertos[ruta] = zipfile.ZipFile(ruta)
+    return lambda: bundle.open(miembro)
+
+
+def _generar_salidas_flujo(ruta, miembro, relpath, output_dir):
+    """
+    Como _generar_salidas, pero leyendo y escribiendo cada archivo por trozos.
+    En modo ZIP, cada salida se escribe en un temporal y se devuelve su ruta
+    """
+    try:
+        abrir = _abridor(ruta, miembro)
+        rechazos = []
+        codificacion, preparados = preparar_flujo(
+            abrir, os.path.basename(miembro or ruta), _metodologias, rechazos=rechazos
+        )
+        with etapa("identidad"):
+            identidad = identidad_flujo(abrir, codificacion)
+        salidas = []
+        mensajes = []
+        invalidas = 0
+        for metodologia, (ediciones, message) in zip(_metodologias, preparados):
+            if message not in mensajes:
+                mensajes.append(message)
+            if ediciones is None:
+                continue
+
+            new_filename = nombre_de_salida(relpath, metodologia)
+            validador = None if _validacion == "no" else Validador(metodologia)
+            if output_dir is None:
+                descriptor, destino = tempfile.mkstemp(suffix=".mq5", dir=_temporales)
+                os.close(descriptor)
+                salidas.append((new_filename.replace(os.sep, "/"), destino))
+            else:
+                destino = os.path.join(output_dir, new_filename)
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                salidas.append(None)
+            with etapa("escritura"), open(destino, "wb") as f:
+                for trozo in generar_flujo(
+                    abrir, codificacion, ediciones, validador=validador
+                ):
+                    f.write(trozo)
+            problemas = [] if validador is None else validador.terminar()
+            if problemas:
+                invalidas += 1
+                # La salida ya está en disco: se retira
+                if _problemas_de_salida(problemas, new_filename, mensajes):
+                    os.remove(destino)
+                    salidas.pop()
+        estado = _estado(salidas, invalidas, rechazos)
+        return relpath, estado, "; ".join(mensajes), salidas, identidad
+    except Exception as e:
+        return relpath, "error", str(e), [], Identidad()
+
+
+def procesar_lote(
+    archivos,
+    metodologias,
+    output,
+    workers=None,
+    chunksize=None,
+    perfil=None,
+    con_diff=False,
+    nivel_zip=None,
+    hilos_zip=None,
+    en_flujo=False,
+    validacion="bloquear",
+    registro=None,
+):
+    """
+    Procesa los archivos en un pool de procesos, generando una salida por cada
+    metodología (o variante) indicada, e informa del estado de cada archivo.
+    Con `con_diff`, cada salida va acompañada de su diff unificado (.diff).
+    Con un PerfilLote, registra los tiempos por etapa de cada archivo.
+    Las entradas del ZIP se comprimen en `hilos_zip` hilos con `nivel_zip`
+    (0 las guarda sin comprimir). Con `en_flujo`, ningún archivo se carga
+    entero en memoria (ver motor.flujo). `validacion` ("bloquear", "avisar" o
+    "no") indica qué hacer con las salidas que no superan motor.validacion.
+    Con un RegistroCartera, cada archivo con salidas se registra y se avisa
+    de las colisiones de StrategyID o MagicNumber con el resto de la cartera.
+    Devuelve un diccionario con los contadores por estado y de colisiones
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        # Lotes pequeños por tarea para repartir bien la carga sin saturar la IPC
+        chunksize = max(1, min(64, len(archivos) // (workers * 8)))
+
+    es_zip = output.lower().endswith(".zip")
+    output_dir = None if es_zip else output
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    tareas = [
+        (ruta, miembro, relpath, output_dir) for ruta, miembro, relpath in archivos
+    ]
+    contadores = dict.fromkeys(ICONOS, 0)
+
+    zip_file = abrir_zip(output, nivel_zip) if es_zip else None
+    compresor = CompresorParalelo(zip_file, hilos_zip) if es_zip else None
+    temporales = tempfile.mkdtemp(prefix="mql5_flujo_") if en_flujo and es_zip else None
+    try:
+        with Pool(
+            processes=workers,
+            initializer=_iniciar_proceso,
+            initargs=(list(metodologias), con_diff, en_flujo, temporales, validacion),
+        ) as pool:
+            # imap conserva el orden de entrada: el ZIP es determinista
+            for relpath, estado, message, salidas, tiempos, identidad in pool.imap(
+                _procesar_archivo, tareas, chunksize=chunksize
+            ):
+                contadores[estado] += 1
+                colisiones = []
+                if registro is not None and salidas and identidad:
+                    inicio = time.perf_counter()
+                    colisiones = registro.registrar(
+                        clave_cartera(relpath), identidad, metodologias
+                    )
+                    tiempos["registro"] = time.perf_counter() - inicio
+                if compresor is not None:
+                    # Incluye la espera cuando hay demasiadas entradas en vuelo
+                    inicio = time.perf_counter()
+                    for nombre, data in salidas:
+                        if temporales is None:
+                            compresor.escribir(nombre, data)
+                            continue
+                        # En modo flujo, `data` es el temporal: se copia por bloques
+                        compresor.vaciar()
+                        with open(data, "rb") as f:
+                            copiar_entrada(zip_file, nombre, f)
+                        os.remove(data)
+                    tiempos["zip"] = time.perf_counter() - inicio
+                del salidas
+                if perfil is not None:
+                    perfil.registrar(relpath, tiempos)
+                print(f"{ICONOS[estado]} {relpath}: {message}", flush=True)
+                if colisiones:
+                    contadores["colision"] += 1
+                    print(
+                        f"{ICONOS['colision']} {relpath}: "
+                        f"{describir_colisiones(colisiones)}",
+                        flush=True,
+                    )
+        if compresor is not None:
+            compresor.cerrar()
+    finally:
+        if zip_file is not None:
+            zip_file.close()
+        if temporales is not None:
+            shutil.rmtree(temporales, ignore_errors=True)
+    return contadores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Modificador de Estrategias MQL5 en modo por lotes"
+    )
+    parser.add_argument(
+        "entradas",
+        nargs="+",
+        help="Archivos .mq5, paquetes .zip, directorios (se recorren "
+        "recursivamente) o patrones glob",
+    )
+    parser.add_argument(
+        "-m",
+        "--metodologia",
+        choices=sorted(METODOLOGIAS_CLI),
+        action="append",
+        default=[],
+        help="Metodología de gestión de riesgo a aplicar (se puede repetir)",
+    )
+    parser.add_argument(
+        "--variantes",
+        help="Archivo JSON con variantes de metodología y parámetros a generar "
+        "en la misma pasada",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="Directorio de salida o archivo .zip",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Número de procesos (por defecto, uno por núcleo)",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Archivos enviados a cada proceso por tarea",
+    )
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="Escribe junto a cada estrategia modificada un .diff con los cambios",
+    )
+    parser.add_argument(
+        "--flujo",
+        action="store_true",
+        help="Lee y escribe cada archivo por trozos, sin cargarlo entero en "
+        "memoria (estrategias muy grandes); no admite --diff",
+    )
+    parser.add_argument(
+        "--validacion",
+        choices=VALIDACIONES,
+        default="bloquear",
+        help="Qué hacer con las salidas que no compilarían (llaves desequilibradas, "
+        "funciones o variables duplicadas, bloques sin insertar): no escribirlas "
+        "(por defecto), escribirlas avisando o no validarlas",
+    )
+    parser.add_argument(
+        "--nivel-zip",
+        type=int,
+        choices=range(10),
+        default=None,
+        metavar="0-9",
+        help="Nivel de compresión del .zip de salida; 0 guarda las entradas sin "
+        "comprimir (por defecto, MQL5_ZIP_NIVEL o 6)",
+    )
+    parser.add_argument(
+        "--hilos-zip",
+        type=int,
+        default=None,
+        help="Hilos que comprimen las entradas del .zip de salida",
+    )
+    parser.add_argument(
+        "--registro",
+        nargs="?",
+        const=REGISTRO_RUTA,
+        metavar="ARCHIVO.sqlite",
+        help="Registra cada estrategia en la cartera y avisa si su StrategyID o "
+        f"MagicNumber ya lo usa otra (por defecto, MQL5_REGISTRO o {REGISTRO_RUTA})",
+    )
+    parser.add_argument(
+        "--perfil",
+        metavar="ARCHIVO.json",
+        help="Guarda los tiempos por archivo y etapa en JSON",
+    )
+    parser.add_argument(
+        "--metricas",
+        metavar="ARCHIVO.prom",
+        help="Guarda los tiempos por etapa como métricas de texto de Prometheus "
+        "(p. ej. para el textfile collector de node_exporter)",
+    )
+    args = parser.parse_args(argv)
+
+    metodologias = [
+        METODOLOGIAS_CLI[clave] for clave in dict.fromkeys(args.metodologia)
+    ]
+    if args.variantes:
+        try:
+            metodologias += cargar_variantes(args.variantes)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if args.flujo and args.diff:
+        parser.error("--diff no está disponible con --flujo")
+    if not metodologias:
+        parser.error("Indica al menos una metodología (-m) o un archivo --variantes")
+    sufijos = [metodologia.suffix for metodologia in metodologias]
+    repetidos = sorted({sufijo for sufijo in sufijos if sufijos.count(sufijo) > 1})
+    if repetidos:
+        parser.error(f"Sufijos de salida repetidos: {', '.join(repetidos)}")
+
+    try:
+        archivos = recopilar_archivos(args.entradas)
+    except (FileNotFoundError, zipfile.BadZipFile) as e:
+        parser.error(str(e))
+    if not archivos:
+        parser.error("No se encontraron archivos .mq5 en las entradas indicadas")
+
+    perfil = PerfilLote() if args.perfil or args.metricas else None
+    registro = RegistroCartera(args.registro) if args.registro else None
+    inicio = time.perf_counter()
+    try:
+        contadores = procesar_lote(
+            archivos,
+            metodologias,
+            args.output,
+            args.workers,
+            args.chunksize,
+            perfil,
+            args.diff,
+            args.nivel_zip,
+            args.hilos_zip,
+            args.flujo,
+            args.validacion,
+            registro,
+        )
+    finally:
+        if registro is not None:
+            registro.cerrar()
+    duracion = time.perf_counter() - inicio
+
+    if perfil is not None:
+        perfil.terminar()
+        if args.perfil:
+            with open(args.perfil, "w", encoding="utf-8") as f:
+                f.write(perfil.a_json())
+        if args.metricas:
+            # Escritura atómica: el colector nunca lee un archivo a medias
+            temporal = f"{args.metricas}.{os.getpid()}.tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                f.write(perfil.a_prometheus())
+            os.replace(temporal, args.metricas)
+
+    total = len(archivos)
+    print(
+        f"\nProcesados: {contadores['ok']} | Omitidos: {contadores['omitido']} | "
+        f"Rechazados: {contadores['rechazado']} | "
+        f"Inválidos: {contadores['invalido']} | Errores: {contadores['error']} | "
+        f"Total: {total}"
+    )
+    if registro is not None:
+        print(f"Colisiones en la cartera: {contadores['colision']}")
+    print(
+        f"Tiempo: {duracion:.2f} s ({total / duracion if duracion else total:.1f} archivos/s)"
+    )
+    return 1 if any(contadores[estado] for estado in FALLOS) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Diff unificado construido a partir de las ediciones del motor.
+
+Las ediciones (inicio, fin, texto) ya dicen qué cambia y dónde, así que no
+hace falta comparar los dos archivos: basta con contar saltos de línea hasta
+cada edición y recortar las líneas que no cambian. El coste es lineal en el
+tamaño del archivo (str.count y str.find), frente al cuadrático de difflib.
+"""
+
+SIN_SALTO_FINAL = "\\ No newline at end of file\n"
+
+
+def _inicio_de_linea(content, pos):
+    return content.rfind("\n", 0, pos) + 1
+
+
+def _fin_de_linea(content, pos):
+    fin = content.find("\n", pos)
+    return len(content) if fin < 0 else fin + 1
+
+
+def _lineas_atras(content, pos, n):
+    """Inicio de las `n` líneas completas anteriores a `pos` (inicio de línea)"""
+    for _ in range(n):
+        if pos == 0:
+            break
+        pos = _inicio_de_linea(content, pos - 1)
+    return pos
+
+
+def _lineas_adelante(content, pos, n):
+    """Fin de las `n` líneas completas posteriores a `pos` (inicio de línea)"""
+    for _ in range(n):
+        if pos >= len(content):
+            break
+        pos = _fin_de_linea(content, pos)
+    return pos
+
+
+def _bloques(content, ediciones):
+    """
+    Agrupa las ediciones que comparten líneas y devuelve, para cada grupo,
+    (primera línea, desplazamiento de esa línea, líneas originales, líneas nuevas)
+    sin las líneas iniciales y finales que no cambian
+    """
+    linea = 0
+    cursor = 0
+    i = 0
+    while i < len(ediciones):
+        inicio, fin, texto = ediciones[i]
+        a = _inicio_de_linea(content, inicio)
+        b = _fin_de_linea(content, fin)
+        partes = [content[a:inicio], texto]
+        ultimo_fin = fin
+        i += 1
+        # Las ediciones siguientes que empiezan en una línea ya afectada
+        while i < len(ediciones) and ediciones[i][0] < b:
+            inicio, fin, texto = ediciones[i]
+            partes += [content[ultimo_fin:inicio], texto]
+            ultimo_fin = fin
+            b = _fin_de_linea(content, fin)
+            i += 1
+        partes.append(content[ultimo_fin:b])
+
+        viejas = content[a:b].splitlines(keepends=True)
+        nuevas = "".join(partes).splitlines(keepends=True)
+
+        comunes = 0
+        limite = min(len(viejas), len(nuevas))
+        while comunes < limite and viejas[comunes] == nuevas[comunes]:
+            comunes += 1
+        finales = 0
+        while (
+            finales < limite - comunes
+            and viejas[len(viejas) - 1 - finales] == nuevas[len(nuevas) - 1 - finales]
+        ):
+            finales += 1
+        if comunes == len(viejas) == len(nuevas):
+            continue
+
+        linea += content.count("\n", cursor, a)
+        cursor = a
+        desplazamiento = a + sum(len(viejas[j]) for j in range(comunes))
+        yield (
+            linea + comunes,
+            desplazamiento,
+            viejas[comunes : len(viejas) - finales],
+            nuevas[comunes : len(nuevas) - finales],
+        )
+
+
+def _rango(inicio, longitud):
+    # En un rango vacío, diff indica la línea anterior
+    if longitud == 0:
+        return f"{inicio},0"
+    return f"{inicio + 1}" if longitud == 1 else f"{inicio + 1},{longitud}"
+
+
+def _emitir(salida, prefijo, lineas):
+    for linea in lineas:
+        salida.append(prefijo + linea)
+        if not linea.endswith("\n"):
+            salida.append("\n" + SIN_SALTO_FINAL)
+
+
+def hunks_unificados(content, ediciones, contexto=3):
+    """
+    Hunks del diff unificado entre `content` y el resultado de aplicar
+    `ediciones` (ordenadas y sin solapes, como las devuelve preparar_ediciones),
+    sin la cabecera con los nombres: no dependen del nombre del archivo
+    """
+    bloques = list(_bloques(content, ediciones))
+    if not bloques:
+        return ""
+
+    # Bloques a menos de 2 * contexto líneas se muestran en el mismo hunk
+    hunks = [[bloques[0]]]
+    for bloque in bloques[1:]:
+        anterior = hunks[-1][-1]
+        if bloque[0] - (anterior[0] + len(anterior[2])) <= 2 * contexto:
+            hunks[-1].append(bloque)
+        else:
+            hunks.append([bloque])
+
+    salida = []
+    delta = 0
+    for hunk in hunks:
+        primera, desplazamiento, _, _ = hunk[0]
+        antes_inicio = _lineas_atras(content, desplazamiento, contexto)
+        contexto_antes = content[antes_inicio:desplazamiento].splitlines(True)
+
+        cuerpo = []
+        _emitir(cuerpo, " ", contexto_antes)
+        viejas_total = len(contexto_antes)
+        nuevas_total = len(contexto_antes)
+        for n, (linea, desplazamiento, viejas, nuevas) in enumerate(hunk):
+            _emitir(cuerpo, "-", viejas)
+            _emitir(cuerpo, "+", nuevas)
+            fin_viejas = desplazamiento + sum(len(vieja) for vieja in viejas)
+            if n + 1 < len(hunk):
+                siguiente = hunk[n + 1][1]
+            else:
+                siguiente = _lineas_adelante(content, fin_viejas, contexto)
+            intermedias = content[fin_viejas:siguiente].splitlines(True)
+            _emitir(cuerpo, " ", intermedias)
+            viejas_total += len(viejas) + len(intermedias)
+            nuevas_total += len(nuevas) + len(intermedias)
+
+        inicio_viejo = primera - len(contexto_antes)
+        salida.append(
+            f"@@ -{_rango(inicio_viejo, viejas_total)} "
+            f"+{_rango(inicio_viejo + delta, nuevas_total)} @@\n"
+        )
+        salida += cuerpo
+        delta += nuevas_total - viejas_total
+    return "".join(salida)
+
+
+def con_cabecera(hunks, nombre_original, nombre_modificado):
+    """Diff completo a partir de los hunks y los nombres de ambos archivos"""
+    if not hunks:
+        return ""
+    return f"--- {nombre_original}\n+++ {nombre_modificado}\n{hunks}"
+
+
+def diff_unificado(content, ediciones, nombre_original, nombre_modificado, contexto=3):
+    """Diff unificado entre `content` y el resultado de aplicar `ediciones`"""
+    return con_cabecera(
+        hunks_unificados(content, ediciones, contexto),
+        nombre_original,
+        nombre_modificado,
+    )
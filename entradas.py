@@ -0,0 +1,73 @@
+"""
+Fuentes de archivos .mq5: archivos sueltos o miembros de paquetes ZIP.
+
+Los paquetes no se extraen: solo se lee su directorio central y cada miembro
+se descomprime en el momento en que el procesamiento lo necesita.
+"""
+
+import ntpath
+import posixpath
+import zipfile
+from functools import partial
+
+
+def es_zip(nombre):
+    return nombre.lower().endswith(".zip")
+
+
+def _ruta_segura(nombre):
+    """
+    Descarta rutas absolutas, con unidad de Windows ('C:/x.mq5', 'C:x.mq5') o
+    que salgan del paquete con '..'
+    """
+    if ntpath.splitdrive(nombre)[0]:
+        return False
+    normalizada = posixpath.normpath(nombre.replace("\\", "/"))
+    return not (normalizada.startswith(("/", "../")) or normalizada == "..")
+
+
+def miembros_mq5(bundle):
+    """
+    Miembros .mq5 de un ZipFile abierto, en el orden del directorio central
+    """
+    return [
+        info
+        for info in bundle.infolist()
+        if not info.is_dir()
+        and info.filename.lower().endswith(".mq5")
+        and not info.filename.startswith("__MACOSX/")
+        and _ruta_segura(info.filename)
+    ]
+
+
+def listar_fuentes(archivos_subidos):
+    """
+    Convierte los archivos subidos en una lista de (ruta, identidad, cargar),
+    donde `cargar()` devuelve los bytes del archivo. Para los ZIP la ruta es la
+    del miembro dentro del paquete, así la estructura de carpetas se conserva.
+    La identidad distingue cada subida (y cada miembro dentro de ella); las
+    rutas repetidas entre subidas llevan delante el número de la subida.
+    """
+    fuentes = []
+    usados = set()
+    for n, subido in enumerate(archivos_subidos):
+        if es_zip(subido.name):
+            bundle = zipfile.ZipFile(subido)
+            candidatos = [
+                (
+                    info.filename,
+                    (subido.file_id, info.filename),
+                    partial(bundle.read, info),
+                )
+                for info in miembros_mq5(bundle)
+            ]
+        else:
+            candidatos = [(subido.name, subido.file_id, subido.getvalue)]
+        for ruta, identidad, cargar in candidatos:
+            # Las rutas repetidas entre subidas darían el mismo archivo de
+            # salida: se distinguen con el número de la subida delante
+            if ruta in usados:
+                ruta = f"{n}/{ruta}"
+            usados.add(ruta)
+            fuentes.append((ruta, identidad, cargar))
+    return fuentes
@@ -0,0 +1,108 @@
+"""
+Núcleo del parcheo de estrategias MQL5, sin dependencias de la interfaz.
+
+Importar `motor` no carga Streamlit ni ningún módulo de la raíz del
+repositorio: lo usan la app, la CLI, el simulador y los benchmarks.
+"""
+
+from motor.anclas import (
+    ANCLAS_REQUERIDAS,
+    BENJAMIN_MARKER,
+    GERARD_MARKER,
+    REGION_FIN,
+    REGION_INICIO,
+    AnclasNoEncontradas,
+    IndiceAnclas,
+    InformeAnclas,
+    Region,
+    escanear_anclas,
+    indice_regiones,
+    verificar_anclas,
+)
+from motor.identidad import (
+    Identidad,
+    extraer_identidad,
+    extraer_identidad_bytes,
+    extraer_identidad_trozos,
+)
+from motor.metodologias import (
+    BENJAMIN,
+    GERARD,
+    METODOLOGIAS,
+    METODOLOGIAS_CLI,
+    PATCH_ENGINE_VERSION,
+    Metodologia,
+    aplicar_parametros,
+    cargar_variantes,
+    interpretar_variantes,
+    leer_parametros,
+    nombre_modificado,
+)
+from motor.parcheo import (
+    REGIONES_ACTUALIZADAS,
+    REGIONES_AL_DIA,
+    aplicar_ediciones,
+    construir_ediciones,
+    construir_ediciones_regiones,
+    ediciones_efectivas,
+    modificar_estrategia,
+    modificar_estrategia_benjamin,
+    modificar_estrategia_escalado_gerard,
+    modificar_variantes,
+    preparar_ediciones,
+    preparar_variantes,
+)
+from motor.validacion import (
+    EstructuraInvalida,
+    Problema,
+    Validador,
+    describir_problemas,
+    validar_estructura,
+)
+
+__all__ = [
+    "ANCLAS_REQUERIDAS",
+    "BENJAMIN",
+    "BENJAMIN_MARKER",
+    "GERARD",
+    "GERARD_MARKER",
+    "METODOLOGIAS",
+    "METODOLOGIAS_CLI",
+    "PATCH_ENGINE_VERSION",
+    "REGIONES_ACTUALIZADAS",
+    "REGIONES_AL_DIA",
+    "REGION_FIN",
+    "REGION_INICIO",
+    "AnclasNoEncontradas",
+    "EstructuraInvalida",
+    "Identidad",
+    "IndiceAnclas",
+    "InformeAnclas",
+    "Metodologia",
+    "Problema",
+    "Region",
+    "Validador",
+    "aplicar_ediciones",
+    "aplicar_parametros",
+    "cargar_variantes",
+    "construir_ediciones",
+    "construir_ediciones_regiones",
+    "describir_problemas",
+    "ediciones_efectivas",
+    "escanear_anclas",
+    "extraer_identidad",
+    "extraer_identidad_bytes",
+    "extraer_identidad_trozos",
+    "indice_regiones",
+    "interpretar_variantes",
+    "leer_parametros",
+    "modificar_estrategia",
+    "modificar_estrategia_benjamin",
+    "modificar_estrategia_escalado_gerard",
+    "modificar_variantes",
+    "nombre_modificado",
+    "preparar_ediciones",
+    "preparar_variantes",
+    "validar_estructura",
+    "verificar_anclas",
+]
@@ -0,0 +1,286 @@
+"""
+Anclas del código fuente MQL5: escáner de una sola pasada, marcas de región y
+comprobación previa de las anclas que necesita cada metodología.
+"""
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass, field
+
+from motor.lexico import funcion_en, indice_funciones
+from motor.perfilado import etapa
+
+# Anclas comunes a las dos metodologías
+TARGET_FOR_INPUTS = (
+    'input string smm = "----------- Money Management - Fixed Amount -----------";'
+)
+ONINIT_RETURN = "return(INIT_SUCCEEDED);"
+FIRST_INCLUDE_MARKER = "//+----------------------------- Include from"
+SQMM_FUNCTION_START = "double sqMMFixedAmount(string symbol,"
+
+# Correcciones de warnings comunes (literal original -> literal corregido)
+WARNING_FIXES = {
+    'return("File not found in the MQL5\\Files directory to send on FTP server");': 'return("File not found in the MQL5\\\\Files directory to send on FTP server");',
+    "0.5f": "0.5",
+    "10.0f": "10.0",
+}
+
+# Llamadas al cálculo del lote que se reemplazan, por orden de preferencia
+LOT_SIZE_PATTERNS = [
+    'size = sqMMFixedAmount("Current",ORDER_TYPE_BUY,openPrice,sl,mmRiskedMoney,mmDecimals,mmLotsIfNoMM,mmMaxLots,mmMultiplier,mmStep);',
+    'size = sqMMFixedAmount("Current",ORDER_TYPE_BUY,openPrice,sl,mmRiskedMoney,mmDecimals,mmLotsIfNoMM,mmMaxLots,mmMultiplier);',
+    'size = sqMMFixedAmount("Current", ORDER_TYPE_BUY, openPrice, sl, mmRiskedMoney, mmDecimals, mmLotsIfNoMM, mmMaxLots, mmMultiplier, mmStep);',
+    'size = sqMMFixedAmount("Current", ORDER_TYPE_BUY, openPrice, sl, mmRiskedMoney, mmDecimals, mmLotsIfNoMM, mmMaxLots, mmMultiplier);',
+]
+
+# Patrón más flexible para capturar variaciones de la llamada al cálculo del lote
+FLEXIBLE_LOT_SIZE_PATTERN = re.compile(r"size\s*=\s*sqMMFixedAmount\s*\([^;]+\);")
+
+GERARD_MARKER = "Risk Management (Precise Level Scaling)"
+BENJAMIN_MARKER = "Risk Management for Funded Accounts"
+
+# Marcas de región: cada bloque inyectado queda entre un comentario de inicio
+# con su tipo, la metodología y la versión de sus plantillas, y uno de fin.
+# Son comentarios de bloque, válidos en cualquier punto de una línea.
+REGION_INICIO = "/*@riesgo "
+REGION_FIN = "/*@fin "
+_REGION_MARCA = re.compile(r"/\*@riesgo (\w+) ([^\s*]+) (\w+)\*/|/\*@fin (\w+)\*/")
+
+# Escáner único: localiza todas las anclas en una sola pasada sobre el código fuente.
+# Sin grupos con nombre, el motor de regex conserva sus optimizaciones de literales;
+# el tipo de ancla se deduce del primer carácter del texto encontrado.
+_ANCHOR_SCANNER = re.compile(
+    "|".join(
+        [re.escape(GERARD_MARKER), re.escape(BENJAMIN_MARKER)]
+        + [re.escape(literal) for literal in WARNING_FIXES]
+        + [
+            re.escape(TARGET_FOR_INPUTS),
+            re.escape(ONINIT_RETURN),
+            r"size\s*=\s*sqMMFixedAmount\s*\(",
+            re.escape(FIRST_INCLUDE_MARKER),
+            re.escape(SQMM_FUNCTION_START),
+            re.escape(REGION_INICIO),
+            re.escape(REGION_FIN),
+        ]
+    )
+)
+_ANCHOR_KINDS = {
+    "R": "marker",
+    "0": "fixes",
+    "1": "fixes",
+    "i": "inputs",
+    "s": "lot",
+    "d": "mmfunc",
+}
+
+
+@dataclass
+class IndiceAnclas:
+    """
+    Offsets de todas las anclas encontradas en una única pasada sobre el código fuente
+    """
+
+    markers: set = field(default_factory=set)
+    fixes: list = field(default_factory=list)
+    inputs: list = field(default_factory=list)
+    oninit: list = field(default_factory=list)
+    lot: list = field(default_factory=list)
+    include: list = field(default_factory=list)
+    mmfunc: list = field(default_factory=list)
+    # Marcas de inicio y fin de región
+    regiones: list = field(default_factory=list)
+    # Tramos de las funciones sqMMFixedAmount, calculados la primera vez que
+    # una metodología los necesita y compartidos por las demás
+    tramos_mmfunc: list = None
+
+
+def escanear_anclas(content):
+    """
+    Recorre el código fuente una sola vez y devuelve el índice de anclas
+    """
+    indice = IndiceAnclas()
+    with etapa("escaneo_anclas"):
+        for match in _ANCHOR_SCANNER.finditer(content):
+            text = match.group()
+            kind = _ANCHOR_KINDS.get(text[0])
+            if kind is None and text[0] == "/":
+                kind = "include" if text[1] == "/" else "regiones"
+            elif kind is None:
+                # Los dos literales que empiezan por "return("
+                kind = "oninit" if text == ONINIT_RETURN else "fixes"
+            if kind == "marker":
+                indice.markers.add(text)
+            else:
+                getattr(indice, kind).append(match.start())
+    return indice
+
+
+def _dentro_de(tramos, pos):
+    """Indica si `pos` cae dentro de alguno de los tramos (inicio, fin) ordenados"""
+    i = bisect_right(tramos, (pos, float("inf"))) - 1
+    return i >= 0 and tramos[i][0] <= pos < tramos[i][1]
+
+
+@dataclass(frozen=True)
+class Region:
+    """Bloque inyectado por una metodología, delimitado por sus marcas"""
+
+    tipo: str
+    clave: str
+    version: str
+    # Inicio de la marca de inicio y fin de la marca de fin
+    inicio: int
+    fin: int
+
+
+def indice_regiones(content, indice):
+    """
+    Empareja las marcas de región encontradas por el escáner de anclas.
+    Lanza ValueError si una región no está cerrada o se cierra con otro tipo
+    """
+    regiones = []
+    abierta = None
+    for pos in indice.regiones:
+        match = _REGION_MARCA.match(content, pos)
+        if match is None:
+            continue
+        tipo, clave, version, tipo_fin = match.groups()
+        if tipo is not None:
+            if abierta is not None:
+                raise ValueError(f"Región '{abierta[0]}' sin marca de fin")
+            abierta = (tipo, clave, version, pos)
+        elif abierta is None or abierta[0] != tipo_fin:
+            raise ValueError(f"Marca de fin de región '{tipo_fin}' sin inicio")
+        else:
+            regiones.append(Region(*abierta, match.end()))
+            abierta = None
+    if abierta is not None:
+        raise ValueError(f"Región '{abierta[0]}' sin marca de fin")
+    return regiones
+
+
+def _tramos_funcion_mm(content, indice):
+    """Tramos (inicio, fin) de las definiciones de sqMMFixedAmount"""
+    if indice.tramos_mmfunc is None:
+        tramos = []
+        fin_previo = 0
+        # El índice de funciones solo se construye si hay alguna definición
+        funciones = []
+        if indice.mmfunc:
+            with etapa("indice_funciones"):
+                funciones = indice_funciones(content, hasta=indice.mmfunc[-1])
+        for pos in indice.mmfunc:
+            if pos < fin_previo:
+                continue
+            funcion = funcion_en(funciones, pos)
+            # Solo cuenta el ancla de la propia declaración: se descartan las
+            # de comentarios, cadenas y prototipos sin cuerpo
+            if (
+                funcion is not None
+                and funcion.nombre == "sqMMFixedAmount"
+                and pos < funcion.apertura
+            ):
+                tramos.append((pos, funcion.fin))
+                fin_previo = funcion.fin
+        indice.tramos_mmfunc = tramos
+    return indice.tramos_mmfunc
+
+
+# Anclas que cada metodología necesita para producir un archivo completo. Sin
+# el marcador de includes, OnTradeTransaction se añade al final del archivo.
+ANCLAS_REQUERIDAS = {
+    "inputs": "Inputs de Money Management",
+    "oninit": "return(INIT_SUCCEEDED); en OnInit",
+    "lot": "Cálculo del lote con sqMMFixedAmount",
+    "mmfunc": "Función sqMMFixedAmount",
+}
+
+
+@dataclass
+class InformeAnclas:
+    """Resultado de la comprobación previa de un archivo para una metodología"""
+
+    metodologia: str
+    # Anclas requeridas -> número de apariciones utilizables
+    anclas: dict = field(default_factory=dict)
+    # Marcadores de metodologías ya aplicadas al archivo
+    marcadores: list = field(default_factory=list)
+
+    @property
+    def procesado(self):
+        return bool(self.marcadores)
+
+    @property
+    def faltan(self):
+        return [ancla for ancla, veces in self.anclas.items() if not veces]
+
+    @property
+    def parcheable(self):
+        return not self.procesado and not self.faltan
+
+    def mensaje(self, filename):
+        if self.marcadores:
+            return (
+                f"{filename} ya contiene otra gestión de riesgo "
+                f"({', '.join(self.marcadores)})"
+            )
+        faltan = ", ".join(ANCLAS_REQUERIDAS[ancla] for ancla in self.faltan)
+        return f"No se puede modificar {filename}: faltan anclas ({faltan})"
+
+
+class AnclasNoEncontradas(ValueError):
+    """El archivo no tiene las anclas que necesita la metodología"""
+
+    def __init__(self, informe, filename):
+        super().__init__(informe.mensaje(filename))
+        self.informe = informe
+        self.filename = filename
+
+    def __reduce__(self):
+        # Se envía entre procesos del pool con sus argumentos reales
+        return type(self), (self.informe, self.filename)
+
+
+def verificar_anclas(content, metodologia, indice=None):
+    """
+    Comprobación previa: cuenta las anclas requeridas a partir del escaneo
+    combinado, sin construir ninguna edición
+    """
+    if indice is None:
+        indice = escanear_anclas(content)
+
+    tramos = []
+    anclas = {}
+    if metodologia.precise_mm_function is not None:
+        tramos = _tramos_funcion_mm(content, indice)
+        anclas["mmfunc"] = len(tramos)
+
+    def libre(pos):
+        return not tramos or not _dentro_de(tramos, pos)
+
+    anclas["inputs"] = sum(1 for pos in indice.inputs if libre(pos))
+
+    sangria = metodologia.target_for_oninit[: -len(ONINIT_RETURN)]
+    anclas["oninit"] = sum(
+        1
+        for pos in indice.oninit
+        if pos >= len(sangria)
+        and content[pos - len(sangria) : pos] == sangria
+        and libre(pos)
+    )
+
+    candidatos = [pos for pos in indice.lot if libre(pos)]
+    anclas["lot"] = sum(
+        1
+        for pos in candidatos
+        if any(content.startswith(pattern, pos) for pattern in LOT_SIZE_PATTERNS)
+        or (
+            metodologia.flexible_lot_size
+            and FLEXIBLE_LOT_SIZE_PATTERN.match(content, pos)
+        )
+    )
+
+    # El marcador propio se trata aparte (archivo omitido); el de otra
+    # metodología impide aplicar esta encima
+    marcadores = sorted(indice.markers - {metodologia.processed_marker})
+    return InformeAnclas(metodologia.nombre, anclas, marcadores)
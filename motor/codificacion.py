@@ -0,0 +1,118 @@
+"""
+Detección de la codificación de los archivos .mq5.
+
+MetaEditor guarda los fuentes en UTF-16LE con BOM, StrategyQuant los exporta
+en UTF-8 y los editados a mano pueden estar en ANSI (cp1252). La codificación
+se deduce del BOM o de una muestra de bytes, el texto se decodifica
+directamente desde el búfer recibido (bytes, memoryview o mmap) y el resultado
+se vuelve a escribir en la misma codificación.
+"""
+
+import codecs
+from dataclasses import dataclass
+
+# Bytes inspeccionados para distinguir UTF-16 sin BOM de UTF-8
+MUESTRA = 4096
+
+
+@dataclass(frozen=True)
+class Codificacion:
+    nombre: str
+    bom: bytes = b""
+
+    def decodificar(self, data):
+        """Decodifica sin copiar antes el búfer a un objeto bytes"""
+        with memoryview(data) as vista, vista[len(self.bom) :] as cuerpo:
+            return str(cuerpo, self.nombre)
+
+    def codificar(self, texto):
+        return self.bom + texto.encode(self.nombre)
+
+    def decodificar_trozos(self, trozos):
+        """Decodifica un flujo de trozos de bytes que empieza por el BOM"""
+        decoder = codecs.getincrementaldecoder(self.nombre)()
+        bom = len(self.bom)
+        for trozo in trozos:
+            if bom:
+                # El BOM puede quedar repartido entre los primeros trozos
+                saltados = min(bom, len(trozo))
+                trozo = trozo[saltados:]
+                bom -= saltados
+            texto = decoder.decode(trozo)
+            if texto:
+                yield texto
+        resto = decoder.decode(b"", final=True)
+        if resto:
+            yield resto
+
+    def codificar_trozos(self, textos):
+        """Codifica un flujo de textos, precedido del BOM"""
+        if self.bom:
+            yield self.bom
+        encoder = codecs.getincrementalencoder(self.nombre)()
+        for texto in textos:
+            yield encoder.encode(texto)
+        resto = encoder.encode("", final=True)
+        if resto:
+            yield resto
+
+
+UTF8 = Codificacion("utf-8")
+# Las plantillas solo usan caracteres de cp1252; latin-1 decodifica (y
+# reproduce) cualquier byte si cp1252 no puede
+_ANSI = (Codificacion("cp1252"), Codificacion("latin-1"))
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+
+def detectar_codificacion(data, muestra=MUESTRA):
+    """Codificación indicada por el BOM o deducida de los primeros bytes"""
+    cabeza = bytes(data[:muestra])
+    for bom, nombre in _BOMS:
+        if cabeza.startswith(bom):
+            return Codificacion(nombre, bom)
+
+    # El código MQL5 es casi todo ASCII: en UTF-16 la mitad de los bytes son 0
+    pares = len(cabeza) // 2
+    if pares:
+        if cabeza[1::2].count(0) > pares * 0.4 and not cabeza[0::2].count(0):
+            return Codificacion("utf-16-le")
+        if cabeza[0::2].count(0) > pares * 0.4 and not cabeza[1::2].count(0):
+            return Codificacion("utf-16-be")
+
+    try:
+        cabeza.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Un carácter multibyte partido al final de la muestra no cuenta
+        if e.start < len(cabeza) - 3:
+            return _ANSI[0]
+    return UTF8
+
+
+def candidatas(data):
+    """
+    Codificaciones que se prueban por orden: la detectada y, si no hay BOM,
+    las ANSI por si los bytes posteriores a la muestra no son UTF-8
+    """
+    codificacion = detectar_codificacion(data)
+    if codificacion.bom:
+        return (codificacion,)
+    return tuple(dict.fromkeys((codificacion,) + _ANSI))
+
+
+def decodificar(data):
+    """
+    Devuelve (texto, codificación). Si un archivo sin BOM que parecía UTF-8
+    no lo es más adelante de la muestra, se trata como ANSI
+    """
+    opciones = candidatas(data)
+    for candidata in opciones:
+        try:
+            return candidata.decodificar(data), candidata
+        except UnicodeDecodeError:
+            if candidata is opciones[-1]:
+                raise
@@ -0,0 +1,286 @@
+"""
+Modo en flujo para estrategias muy grandes: el archivo se lee por trozos y
+nunca está entero en memoria.
+
+Primera pasada: el texto se corta en segmentos que terminan en un ';' o en la
+'}' que cierra un bloque global, fuera de comentarios y cadenas (el mismo
+criterio que lexico). Ninguna ancla cruza esos cortes, así que solo se
+conservan los segmentos que contienen alguna (o solo el texto de las anclas,
+si no necesitan contexto); concatenados forman un texto condensado sobre el
+que se ejecuta el motor de siempre. Segunda pasada: las
+ediciones, trasladadas a posiciones del original, se aplican al vuelo sobre
+una nueva lectura. El resultado es idéntico byte a byte al del modo en
+memoria, y la memoria máxima depende de los segmentos con anclas (OnInit,
+sqMMFixedAmount, la función que calcula el lote...), no del tamaño del archivo.
+"""
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from itertools import chain
+
+from motor.anclas import _ANCHOR_SCANNER, FIRST_INCLUDE_MARKER, WARNING_FIXES
+from motor.codificacion import MUESTRA, candidatas
+from motor.identidad import TROZO, extraer_identidad_trozos
+from motor.lexico import OPACOS
+from motor.parcheo import preparar_variantes
+from motor.perfilado import etapa
+
+# Bytes por lectura del archivo de entrada
+TAMANO_TROZO = 1024 * 1024
+
+# Caracteres mínimos de un segmento: los cortes intermedios se agrupan
+TAMANO_SEGMENTO = 256 * 1024
+
+# Anclas que no dependen de lo que las rodea: de los segmentos que solo
+# tienen estas basta con conservar el texto encontrado
+_ANCLAS_SUELTAS = frozenset(WARNING_FIXES) | {FIRST_INCLUDE_MARKER}
+
+# Separa cada ancla suelta de lo que sigue: cierra el comentario del marcador
+# de includes y deja delante del siguiente segmento un ';', como en el original
+_SEPARADOR = "\n;"
+
+
+def _cortes(buffer, inicio, fin, profundidad):
+    """
+    Recorre las llaves y los ';' de un tramo de código. Devuelve
+    (profundidad final, posición tras el último corte o 0)
+    """
+    corte = 0
+    cierres = buffer.count("}", inicio, fin)
+    if profundidad > cierres:
+        # Dentro de un cuerpo que el tramo no puede cerrar
+        return profundidad + buffer.count("{", inicio, fin) - cierres, corte
+    pos = inicio
+    while True:
+        if not profundidad:
+            # Hasta la siguiente llave se está en el ámbito global
+            apertura = buffer.find("{", pos, fin)
+            limite = fin if apertura < 0 else apertura
+            punto_y_coma = buffer.rfind(";", pos, limite)
+            if punto_y_coma >= 0:
+                corte = punto_y_coma + 1
+            if apertura < 0:
+                # Las llaves de cierre sin pareja no cuentan
+                return profundidad, corte
+            profundidad = 1
+            pos = apertura + 1
+            continue
+        apertura = buffer.find("{", pos, fin)
+        cierre = buffer.find("}", pos, fin)
+        if cierre < 0:
+            return profundidad + buffer.count("{", pos, fin), corte
+        if 0 <= apertura < cierre:
+            profundidad += 1
+            pos = apertura + 1
+            continue
+        profundidad -= 1
+        pos = cierre + 1
+        if not profundidad:
+            corte = pos
+
+
+def segmentar(textos, minimo=TAMANO_SEGMENTO):
+    """
+    Corta un flujo de textos en segmentos (inicio, texto) que terminan en un
+    ';' o en la '}' que cierra un bloque global, de al menos `minimo`
+    caracteres salvo el último, que siempre se devuelve aunque esté vacío
+    """
+    buffer = ""
+    base = 0
+    # Posición del buffer desde la que falta recorrer el código
+    pos = 0
+    profundidad = 0
+    # Último corte válido en el buffer
+    corte = 0
+    for texto in chain(textos, (None,)):
+        final = texto is None
+        if not final:
+            buffer += texto
+        # Una '/' final puede empezar un comentario
+        fin = len(buffer) - (not final and buffer.endswith("/"))
+        for match in OPACOS.finditer(buffer, pos):
+            if not final and match.end() >= len(buffer) - 1:
+                # Comentario, cadena o directiva que puede seguir en el próximo
+                # texto (una cadena que termina en '\\' también)
+                fin = match.start()
+                break
+            profundidad, ultimo = _cortes(buffer, pos, match.start(), profundidad)
+            corte = ultimo or corte
+            pos = match.end()
+        if pos < fin:
+            profundidad, ultimo = _cortes(buffer, pos, fin, profundidad)
+            corte = ultimo or corte
+            pos = fin
+
+        if final:
+            break
+        if not corte or corte < minimo:
+            continue
+        segmento = buffer[:corte]
+        # Sin ';' después de la última llamada a sqMMFixedAmount, el patrón
+        # flexible del cálculo del lote podría continuar en el siguiente
+        llamada = segmento.rfind("sqMMFixedAmount")
+        if llamada >= 0 and segmento.find(";", llamada) < 0:
+            continue
+        yield base, segmento
+        buffer = buffer[corte:]
+        base += corte
+        pos -= corte
+        corte = 0
+    yield base, buffer
+
+
+@dataclass
+class Condensado:
+    """Segmentos con anclas de un archivo, concatenados"""
+
+    content: str
+    # Inicio de cada segmento en el texto condensado y en el original
+    inicios: list = field(default_factory=list)
+    originales: list = field(default_factory=list)
+
+    def original(self, pos, final=False):
+        """
+        Posición en el original de `pos`. En la unión de dos segmentos, el
+        final de un tramo reemplazado pertenece al anterior y el resto de
+        posiciones al siguiente. Los separadores no tienen posición
+        """
+        if final:
+            i = bisect_left(self.inicios, pos) - 1
+        else:
+            i = bisect_right(self.inicios, pos) - 1
+        return self.originales[i] + pos - self.inicios[i]
+
+    def traducir(self, ediciones):
+        """Ediciones (inicio, fin, texto) sobre el original"""
+        traducidas = []
+        for inicio, fin, texto in ediciones:
+            original = self.original(inicio)
+            if fin > inicio:
+                traducidas.append((original, self.original(fin, final=True), texto))
+            else:
+                traducidas.append((original, original, texto))
+        return traducidas
+
+
+def condensar(textos, minimo=TAMANO_SEGMENTO):
+    """
+    Recorre un flujo de textos y conserva los segmentos con alguna ancla, o
+    solo el texto de las anclas sueltas, y el último segmento, al que se añade
+    OnTradeTransaction si no hay marcador de includes
+    """
+    condensado = Condensado("")
+    partes = []
+    longitud = 0
+
+    def conservar(inicio, texto, separador=""):
+        nonlocal longitud
+        condensado.inicios.append(longitud)
+        condensado.originales.append(inicio)
+        partes.append(texto + separador)
+        longitud += len(texto) + len(separador)
+
+    anterior = None
+    for base, segmento in segmentar(textos, minimo):
+        if anterior is not None:
+            matches = list(_ANCHOR_SCANNER.finditer(anterior[1]))
+            if any(match.group() not in _ANCLAS_SUELTAS for match in matches):
+                conservar(*anterior)
+            else:
+                for match in matches:
+                    conservar(anterior[0] + match.start(), match.group(), _SEPARADOR)
+        anterior = (base, segmento)
+    conservar(*anterior)
+    condensado.content = "".join(partes)
+    return condensado
+
+
+def aplicar_flujo(textos, ediciones):
+    """
+    Aplica las ediciones (inicio, fin, texto), ordenadas y sin solapes, sobre
+    un flujo de textos. Devuelve un texto por cada uno recibido
+    """
+    pendientes = iter(ediciones)
+    edicion = next(pendientes, None)
+    pos = 0
+    # Siguiente carácter del original que falta por copiar
+    cursor = 0
+    for texto in textos:
+        fin_texto = pos + len(texto)
+        partes = []
+        while edicion is not None and edicion[0] < fin_texto:
+            inicio, fin, nuevo = edicion
+            if cursor < inicio:
+                partes.append(texto[cursor - pos : inicio - pos])
+            partes.append(nuevo)
+            cursor = fin
+            edicion = next(pendientes, None)
+        if cursor < fin_texto:
+            partes.append(texto[cursor - pos :])
+            cursor = fin_texto
+        pos = fin_texto
+        yield "".join(partes)
+    # Inserciones al final del archivo
+    while edicion is not None:
+        yield edicion[2]
+        edicion = next(pendientes, None)
+
+
+def _leer(fuente, tamano):
+    while trozo := fuente.read(tamano):
+        yield trozo
+
+
+def preparar_flujo(abrir, filename, metodologias, tamano=TAMANO_TROZO, rechazos=None):
+    """
+    Primera pasada: como preparar_variantes, pero leyendo el archivo por
+    trozos. `abrir()` devuelve el archivo binario (open(ruta, "rb"),
+    ZipFile.open...) y se llama una vez por cada codificación probada.
+    Devuelve (codificación, [(ediciones sobre el original, message), ...])
+    """
+    with abrir() as fuente:
+        opciones = candidatas(fuente.read(MUESTRA))
+    for codificacion in opciones:
+        try:
+            with abrir() as fuente, etapa("condensacion"):
+                condensado = condensar(
+                    codificacion.decodificar_trozos(_leer(fuente, tamano))
+                )
+            break
+        except UnicodeDecodeError:
+            if codificacion is opciones[-1]:
+                raise
+
+    preparados = preparar_variantes(
+        condensado.content, filename, metodologias, rechazos
+    )
+    return codificacion, [
+        (None if ediciones is None else condensado.traducir(ediciones), message)
+        for ediciones, message in preparados
+    ]
+
+
+def generar_flujo(abrir, codificacion, ediciones, tamano=TAMANO_TROZO, validador=None):
+    """
+    Segunda pasada: trozos de bytes del archivo modificado, en la misma
+    codificación que el original. Con un Validador (motor.validacion), el
+    resultado se valida a medida que se genera
+    """
+    with abrir() as fuente:
+        textos = aplicar_flujo(
+            codificacion.decodificar_trozos(_leer(fuente, tamano)), ediciones
+        )
+        if validador is not None:
+            textos = validador.recorrer(textos)
+        yield from codificacion.codificar_trozos(textos)
+
+
+def identidad_flujo(abrir, codificacion, tamano=TROZO):
+    """
+    Identidad de la estrategia (motor.identidad), leyendo el archivo solo
+    hasta OnInit
+    """
+    with abrir() as fuente:
+        return extraer_identidad_trozos(
+            codificacion.decodificar_trozos(_leer(fuente, tamano))
+        )
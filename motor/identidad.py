@@ -0,0 +1,112 @@
+"""
+Identidad de una estrategia en el terminal: StrategyID, MagicNumber y símbolo.
+
+El código inyectado guarda su estado en variables globales del terminal con el
+StrategyID en el nombre ("SQ.TradeLevel." + StrategyID...) y filtra las
+operaciones por MagicNumber, así que dos estrategias de una cartera que
+compartan alguno de los dos se pisan. Los tres valores se declaran antes de
+OnInit: se leen con una sola expresión regular que se detiene allí.
+"""
+
+import re
+from dataclasses import dataclass
+
+from motor.codificacion import MUESTRA, candidatas
+
+# Una alternativa por dato; OnInit marca el final de las declaraciones
+_IDENTIDAD = re.compile(
+    r"^[ \t]*(?:s?input[ \t]+)?(?:u?int|u?long)[ \t]+MagicNumber[ \t]*=[ \t]*"
+    r"(?P<magic_number>\d+)"
+    r'|^[ \t]*(?:s?input[ \t]+)?string[ \t]+StrategyID[ \t]*=[ \t]*"'
+    r'(?P<strategy_id>[^"\n]*)"'
+    r'|^[ \t]*s?input[ \t]+string[ \t]+\w*Symbol\w*[ \t]*=[ \t]*"'
+    r'(?P<simbolo>[^"\n]+)"'
+    r"|^//[ \t|]*(?:Symbol|Instrument)[ \t]*:[ \t]*(?P<simbolo_cabecera>[^\s|]+)"
+    r"|^[ \t]*int[ \t]+(?P<oninit>OnInit)[ \t]*\(",
+    re.MULTILINE,
+)
+
+# Caracteres leídos como máximo en modo flujo si no aparece OnInit
+LIMITE_FLUJO = 4 * 1024 * 1024
+
+# Bytes por trozo al decodificar solo el principio de un archivo
+TROZO = 16 * MUESTRA
+
+# Valores de símbolo que significan "el del gráfico"
+_SIMBOLO_DEL_GRAFICO = frozenset({"", "current", "_symbol", "null"})
+
+
+@dataclass(frozen=True)
+class Identidad:
+    strategy_id: str = None
+    magic_number: int = None
+    simbolo: str = None
+
+    def __bool__(self):
+        return self.strategy_id is not None or self.magic_number is not None
+
+
+def _recorrer(content, valores):
+    """
+    Completa `valores` con las declaraciones de `content`. Devuelve True al
+    llegar a OnInit o al tener los tres datos
+    """
+    for match in _IDENTIDAD.finditer(content):
+        campo = match.lastgroup
+        if campo == "oninit":
+            return True
+        valor = match.group(campo)
+        if campo == "magic_number":
+            valor = int(valor)
+        elif campo.startswith("simbolo"):
+            campo = "simbolo"
+            if valor.lower() in _SIMBOLO_DEL_GRAFICO:
+                continue
+        # La primera declaración es la que cuenta
+        valores.setdefault(campo, valor)
+        if len(valores) == 3:
+            return True
+    return False
+
+
+def extraer_identidad(content):
+    """Identidad declarada en el código de una estrategia"""
+    valores = {}
+    _recorrer(content, valores)
+    return Identidad(**valores)
+
+
+def extraer_identidad_trozos(textos, limite=LIMITE_FLUJO):
+    """
+    Como extraer_identidad, sobre un flujo de textos: solo se lee hasta
+    OnInit (o hasta `limite` caracteres)
+    """
+    valores = {}
+    buffer = ""
+    leidos = 0
+    for texto in textos:
+        buffer += texto
+        leidos += len(texto)
+        # Solo líneas completas: ninguna declaración ocupa más de una
+        corte = buffer.rfind("\n") + 1
+        if _recorrer(buffer[:corte], valores) or leidos >= limite:
+            return Identidad(**valores)
+        buffer = buffer[corte:]
+    _recorrer(buffer, valores)
+    return Identidad(**valores)
+
+
+def extraer_identidad_bytes(data, tamano=TROZO):
+    """
+    Identidad de los bytes de una estrategia, decodificando solo hasta
+    OnInit (para quien no tiene ya el texto, como los aciertos de caché)
+    """
+    opciones = candidatas(data)
+    with memoryview(data) as vista:
+        for codificacion in opciones:
+            trozos = (vista[i : i + tamano] for i in range(0, len(vista), tamano))
+            try:
+                return extraer_identidad_trozos(codificacion.decodificar_trozos(trozos))
+            except UnicodeDecodeError:
+                if codificacion is opciones[-1]:
+                    raise
@@ -0,0 +1,160 @@
+"""
+Analizador léxico mínimo de MQL5 para localizar funciones.
+
+Una sola pasada lineal sobre el código fuente: salta comentarios, cadenas,
+caracteres literales y directivas del preprocesador, y lleva la cuenta de las
+llaves para construir un índice con los límites de cada función definida en el
+ámbito global. A diferencia de una expresión regular con `.*?^}`, no depende
+de que la llave de cierre esté en la columna 0 ni se confunde con llaves
+dentro de comentarios o cadenas.
+"""
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+
+# Comentarios, cadenas, caracteres literales y directivas: las llaves que
+# contienen no cuentan. Una alternativa por tipo, sin grupos: el tipo se deduce
+# del primer carácter. Los comentarios de línea consecutivos forman un solo token.
+OPACOS = re.compile(
+    r"//[^\n]*(?:\n[ \t]*//[^\n]*)*"
+    r"|/\*.*?(?:\*/|\Z)"
+    r'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"?'
+    r"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'?"
+    r"|#[^\n]*(?:\\\n[^\n]*)*",
+    re.DOTALL,
+)
+_NOMBRE_FUNCION = re.compile(r"(\w+)\s*\(")
+FIN_CABECERA = re.compile(r"\)\s*(?:const\s*)?$")
+_NO_ESPACIO = re.compile(r"\S")
+
+
+@dataclass(frozen=True)
+class Funcion:
+    nombre: str
+    # Primer carácter de la declaración (tipo de retorno)
+    inicio: int
+    # Posición de la llave de apertura del cuerpo
+    apertura: int
+    # Posición siguiente a la llave de cierre del cuerpo
+    fin: int
+
+
+def _ultimo_punto_y_coma(content, limite, pos, opacos):
+    """Último ';' global entre `limite` y `pos` que no está en un comentario o cadena"""
+    corte = content.rfind(";", limite, pos)
+    while corte >= 0 and any(inicio <= corte < fin for inicio, fin in opacos):
+        corte = content.rfind(";", limite, corte)
+    return corte
+
+
+def _inicio_declaracion(content, limite, opacos):
+    """Primer carácter de la declaración que no es espacio ni comentario"""
+    for inicio, fin in opacos:
+        if content[limite:inicio].strip():
+            break
+        limite = fin
+    match = _NO_ESPACIO.search(content, limite)
+    return match.start() if match else limite
+
+
+def _cabecera(content, inicio, apertura, opacos):
+    """Texto de la declaración sin los comentarios ni cadenas intercalados"""
+    partes = []
+    for opaco_inicio, opaco_fin in opacos:
+        if opaco_fin <= inicio:
+            continue
+        partes.append(content[inicio:opaco_inicio])
+        inicio = opaco_fin
+    partes.append(content[inicio:apertura])
+    return " ".join(partes)
+
+
+def indice_funciones(content, hasta=None):
+    """
+    Devuelve la lista de funciones globales, ordenada por posición. Con
+    `hasta`, el recorrido termina en el ámbito global una vez cerrado el
+    primer cuerpo que se abre después (el de la función declarada en `hasta`,
+    aunque su cabecera tenga comentarios o cadenas)
+    """
+    funciones = []
+    profundidad = 0
+    # Fin del último elemento global (';', '}' o directiva): la siguiente
+    # declaración empieza después
+    limite = 0
+    # Comentarios y cadenas globales desde `limite`
+    opacos = []
+    apertura = None
+    # Ya se cerró un cuerpo abierto después de `hasta`
+    completo = False
+
+    def tramos():
+        # Tramos de código entre comentarios y cadenas, seguidos del token opaco
+        anterior = 0
+        for match in OPACOS.finditer(content):
+            inicio, fin = match.span()
+            yield anterior, inicio, inicio, fin
+            anterior = fin
+        yield anterior, len(content), None, None
+
+    for inicio, fin, opaco_inicio, opaco_fin in tramos():
+        if completo and profundidad == 0:
+            break
+        cierres = content.count("}", inicio, fin)
+        if profundidad > cierres:
+            # Dentro de un cuerpo que el tramo no puede cerrar: basta con
+            # contar, sin recorrer las llaves una a una
+            profundidad += content.count("{", inicio, fin) - cierres
+            continue
+
+        siguiente_apertura = content.find("{", inicio, fin)
+        siguiente_cierre = content.find("}", inicio, fin)
+        while siguiente_apertura >= 0 or siguiente_cierre >= 0:
+            if siguiente_apertura >= 0 and (
+                siguiente_cierre < 0 or siguiente_apertura < siguiente_cierre
+            ):
+                pos = siguiente_apertura
+                siguiente_apertura = content.find("{", pos + 1, fin)
+                if profundidad == 0:
+                    apertura = pos
+                    corte = _ultimo_punto_y_coma(content, limite, pos, opacos)
+                    if corte >= 0:
+                        limite = corte + 1
+                        opacos = [opaco for opaco in opacos if opaco[0] >= limite]
+                profundidad += 1
+                continue
+
+            pos = siguiente_cierre
+            siguiente_cierre = content.find("}", pos + 1, fin)
+            if profundidad == 0:
+                # Llave de cierre sin pareja: se ignora
+                continue
+            profundidad -= 1
+            if profundidad == 0:
+                declaracion = _inicio_declaracion(content, limite, opacos)
+                cabecera = _cabecera(content, declaracion, apertura, opacos)
+                nombre = _NOMBRE_FUNCION.search(cabecera)
+                if nombre and FIN_CABECERA.search(cabecera):
+                    funciones.append(
+                        Funcion(nombre.group(1), declaracion, apertura, pos + 1)
+                    )
+                limite = pos + 1
+                opacos = []
+                completo = hasta is not None and apertura > hasta
+
+        if profundidad or opaco_inicio is None:
+            continue
+        if content[opaco_inicio] == "#":
+            limite = opaco_fin
+            opacos = []
+        else:
+            opacos.append((opaco_inicio, opaco_fin))
+    return funciones
+
+
+def funcion_en(funciones, pos):
+    """Función cuya declaración o cuerpo contiene `pos`, o None"""
+    i = bisect_right([funcion.inicio for funcion in funciones], pos) - 1
+    if i >= 0 and pos < funciones[i].fin:
+        return funciones[i]
+    return None
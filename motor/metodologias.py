@@ -0,0 +1,236 @@
+"""
+Metodologías de gestión de riesgo y sus parámetros.
+"""
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import astuple, dataclass, replace
+from functools import cached_property
+
+from motor.anclas import BENJAMIN_MARKER, GERARD_MARKER, ONINIT_RETURN
+from motor.plantillas import (
+    BENJAMIN_LOT_SIZE_CALCULATION_LOGIC,
+    BENJAMIN_ON_INIT_ADDITION,
+    BENJAMIN_ON_TRADE_TRANSACTION_FUNCTION,
+    BENJAMIN_RISK_MANAGEMENT_INPUTS,
+    GERARD_LOT_SIZE_CALCULATION_LOGIC,
+    GERARD_ON_INIT_ADDITION,
+    GERARD_ON_TRADE_TRANSACTION_FUNCTION,
+    GERARD_RISK_MANAGEMENT_INPUTS,
+    PRECISE_MM_FUNCTION,
+)
+
+# Versión del motor de parcheo: incrementar cuando cambie el resultado de
+# modificar_estrategia para invalidar las cachés de resultados
+PATCH_ENGINE_VERSION = 5
+
+# Sufijos admitidos: forman parte del nombre de archivo y de las marcas de región
+_SUFIJO = re.compile(r"_?[A-Za-z0-9][A-Za-z0-9_.-]*")
+
+# "SQ.TradeLevel." + StrategyID
+_VARIABLE_GLOBAL = re.compile(r'"([^"\n]*)"\s*\+\s*StrategyID')
+
+
+@dataclass(frozen=True)
+class Metodologia:
+    """
+    Describe los bloques que una metodología inyecta y dónde los inyecta
+    """
+
+    nombre: str
+    suffix: str
+    processed_marker: str
+    skip_message: str
+    success_message: str
+    risk_management_inputs: str
+    target_for_oninit: str
+    on_init_addition: str
+    on_trade_transaction_function: str
+    lot_size_calculation_logic: str
+    precise_mm_function: str = None
+    flexible_lot_size: bool = False
+
+    @property
+    def clave(self):
+        """Identificador de la metodología (o variante) en las marcas de región"""
+        return self.suffix.lstrip("_")
+
+    @cached_property
+    def version(self):
+        """Huella de las plantillas y del motor; cambia si cambia el resultado"""
+        huella = hashlib.sha256(str(PATCH_ENGINE_VERSION).encode())
+        for valor in astuple(self):
+            huella.update(repr(valor).encode("utf-8"))
+        return huella.hexdigest()[:16]
+
+    @cached_property
+    def variables_globales(self):
+        """
+        Prefijos de las variables globales del terminal que la metodología
+        nombra con el StrategyID
+        """
+        return tuple(_VARIABLE_GLOBAL.findall(self.on_init_addition))
+
+    def con_parametros(self, parametros, suffix=None):
+        """
+        Copia de la metodología con otros valores por defecto en sus inputs
+        (p. ej. g_riskLevels_string o g_riskStep) y, opcionalmente, otro sufijo
+        """
+        if suffix and (
+            not isinstance(suffix, str)
+            or not _SUFIJO.fullmatch(suffix)
+            or ".." in suffix
+        ):
+            raise ValueError(
+                f"Sufijo no válido {suffix!r}: solo letras, números, '_', '.' y '-'"
+            )
+        return replace(
+            self,
+            suffix=suffix or self.suffix,
+            risk_management_inputs=aplicar_parametros(
+                self.risk_management_inputs, parametros
+            ),
+        )
+
+
+_INPUT_DECLARATION = re.compile(
+    r"^(\s*input\s+(\w+)\s+(\w+)\s*=\s*)([^;]*?)(\s*;)", re.MULTILINE
+)
+
+
+def _literal_mql5(tipo, nombre, valor):
+    """Formatea un valor Python como literal MQL5 del tipo declarado"""
+    try:
+        if tipo == "string":
+            valor = str(valor).replace("\\", "\\\\").replace('"', '\\"')
+            return f'"{valor}"'
+        if tipo == "bool":
+            if isinstance(valor, str):
+                valor = valor.strip().lower() in ("1", "true", "si", "sí", "yes")
+            return "true" if valor else "false"
+        if tipo in ("int", "long"):
+            return str(int(valor))
+        return repr(float(valor))
+    except (TypeError, ValueError):
+        raise ValueError(f"Valor no válido para {nombre} ({tipo}): {valor!r}")
+
+
+def aplicar_parametros(bloque, parametros):
+    """
+    Sustituye el valor por defecto de los inputs indicados en un bloque MQL5
+    """
+    pendientes = dict(parametros)
+
+    def sustituir(match):
+        tipo, nombre = match.group(2), match.group(3)
+        if nombre not in pendientes:
+            return match.group(0)
+        literal = _literal_mql5(tipo, nombre, pendientes.pop(nombre))
+        return match.group(1) + literal + match.group(5)
+
+    bloque = _INPUT_DECLARATION.sub(sustituir, bloque)
+    if pendientes:
+        raise ValueError(
+            f"Parámetro(s) desconocido(s) para la metodología: {', '.join(pendientes)}"
+        )
+    return bloque
+
+
+def _valor_python(tipo, literal):
+    """Interpreta un literal MQL5 del tipo declarado"""
+    if tipo == "string":
+        return re.sub(r"\\(.)", r"\1", literal[1:-1])
+    if tipo == "bool":
+        return literal == "true"
+    if tipo in ("int", "long"):
+        return int(literal)
+    return float(literal)
+
+
+def leer_parametros(bloque):
+    """Valores por defecto de los inputs declarados en un bloque MQL5"""
+    return {
+        match.group(3): _valor_python(match.group(2), match.group(4))
+        for match in _INPUT_DECLARATION.finditer(bloque)
+    }
+
+
+GERARD = Metodologia(
+    nombre="Escalado Metodología Gerard",
+    suffix="_escalado_gerard",
+    processed_marker=GERARD_MARKER,
+    skip_message="El archivo '{filename}' ya parece tener la gestión de riesgo precisa.",
+    success_message="Estrategia modificada con éxito - Escalado Preciso CORREGIDO",
+    risk_management_inputs=GERARD_RISK_MANAGEMENT_INPUTS,
+    target_for_oninit="      " + ONINIT_RETURN,
+    on_init_addition=GERARD_ON_INIT_ADDITION,
+    on_trade_transaction_function=GERARD_ON_TRADE_TRANSACTION_FUNCTION,
+    lot_size_calculation_logic=GERARD_LOT_SIZE_CALCULATION_LOGIC,
+    precise_mm_function=PRECISE_MM_FUNCTION,
+    flexible_lot_size=True,
+)
+
+BENJAMIN = Metodologia(
+    nombre="Escalado Metodología Benjamin",
+    suffix="_escalado_benjamin",
+    processed_marker=BENJAMIN_MARKER,
+    skip_message="El archivo '{filename}' ya parece estar modificado.",
+    success_message="Estrategia modificada con éxito - Cuentas de Fondeo",
+    risk_management_inputs=BENJAMIN_RISK_MANAGEMENT_INPUTS,
+    target_for_oninit="   " + ONINIT_RETURN,
+    on_init_addition=BENJAMIN_ON_INIT_ADDITION,
+    on_trade_transaction_function=BENJAMIN_ON_TRADE_TRANSACTION_FUNCTION,
+    lot_size_calculation_logic=BENJAMIN_LOT_SIZE_CALCULATION_LOGIC,
+)
+
+METODOLOGIAS = {metodologia.nombre: metodologia for metodologia in (GERARD, BENJAMIN)}
+
+# Claves de las metodologías en la CLI, el servidor y los archivos de variantes
+METODOLOGIAS_CLI = {"gerard": GERARD, "benjamin": BENJAMIN}
+
+
+def nombre_modificado(ruta, metodologia):
+    """
+    Ruta del archivo modificado, con el sufijo de la metodología. Al actualizar
+    un archivo ya modificado, su sufijo se sustituye en lugar de acumularse
+    """
+    base_name = os.path.splitext(ruta)[0]
+    sufijos = {metodologia.suffix} | {m.suffix for m in METODOLOGIAS.values()}
+    for suffix in sorted(sufijos, key=len, reverse=True):
+        if base_name.endswith(suffix) and len(base_name) > len(suffix):
+            base_name = base_name[: -len(suffix)]
+            break
+    return f"{base_name}{metodologia.suffix}.mq5"
+
+
+def cargar_variantes(ruta):
+    """Lee un archivo JSON de variantes y devuelve la lista de metodologías"""
+    with open(ruta, encoding="utf-8") as f:
+        entradas = json.load(f)
+    return interpretar_variantes(entradas, f"'{ruta}'")
+
+
+def interpretar_variantes(entradas, origen="Las variantes"):
+    """Lista de metodologías a partir de la lista JSON ya decodificada"""
+    if not isinstance(entradas, list) or not entradas:
+        raise ValueError(f"{origen} debe contener una lista JSON de variantes")
+
+    variantes = []
+    for n, entrada in enumerate(entradas, 1):
+        clave = entrada.get("metodologia") if isinstance(entrada, dict) else None
+        if clave not in METODOLOGIAS_CLI:
+            raise ValueError(
+                f"Variante {n}: metodología desconocida {clave!r} "
+                f"(opciones: {', '.join(sorted(METODOLOGIAS_CLI))})"
+            )
+        try:
+            variantes.append(
+                METODOLOGIAS_CLI[clave].con_parametros(
+                    entrada.get("parametros", {}), entrada.get("sufijo")
+                )
+            )
+        except ValueError as e:
+            raise ValueError(f"Variante {n}: {e}")
+    return variantes
@@ -0,0 +1,379 @@
+"""
+Motor de parcheo: traduce el índice de anclas a ediciones (inicio, fin, texto)
+sobre el código fuente original y construye el resultado.
+"""
+
+from motor.anclas import (
+    ANCLAS_REQUERIDAS,
+    FLEXIBLE_LOT_SIZE_PATTERN,
+    LOT_SIZE_PATTERNS,
+    ONINIT_RETURN,
+    REGION_FIN,
+    REGION_INICIO,
+    WARNING_FIXES,
+    AnclasNoEncontradas,
+    InformeAnclas,
+    _dentro_de,
+    _tramos_funcion_mm,
+    escanear_anclas,
+    indice_regiones,
+    verificar_anclas,
+)
+from motor.metodologias import BENJAMIN, GERARD
+from motor.perfilado import etapa
+
+REGIONES_AL_DIA = "El archivo '{filename}' ya tiene la versión actual de {metodologia}."
+REGIONES_ACTUALIZADAS = "Regiones actualizadas a {metodologia}: {cambios} cambio(s)"
+
+
+def _indentacion_previa(content, pos):
+    """Devuelve el inicio del bloque de espacios en blanco que precede a `pos`"""
+    inicio = pos
+    while inicio > 0 and content[inicio - 1].isspace():
+        inicio -= 1
+    return inicio
+
+
+def _sangrar(indentation, logic):
+    """Antepone la indentación capturada a cada línea del bloque"""
+    return "\n".join([indentation + line for line in logic.split("\n")])
+
+
+def _region(tipo, metodologia, texto):
+    """Bloque inyectado entre sus marcas de región"""
+    return (
+        f"{REGION_INICIO}{tipo} {metodologia.clave} {metodologia.version}*/"
+        f"{texto}{REGION_FIN}{tipo}*/"
+    )
+
+
+def _region_lote(metodologia, indentation):
+    """
+    Cálculo del lote sangrado; la primera indentación queda fuera de la
+    región para poder recuperarla al actualizarla
+    """
+    logic = _sangrar(indentation, metodologia.lot_size_calculation_logic)
+    return indentation + _region("lot", metodologia, logic[len(indentation) :])
+
+
+def construir_ediciones(content, indice, metodologia):
+    """
+    Traduce el índice de anclas a una lista de ediciones (inicio, fin, texto)
+    sobre el código fuente original, sin copiarlo
+    """
+    ediciones = []
+
+    # 1. Reemplazar la función sqMMFixedAmount existente
+    with etapa("funcion_mm"):
+        tramos = []
+        if metodologia.precise_mm_function is not None:
+            tramos = _tramos_funcion_mm(content, indice)
+            for inicio, fin in tramos:
+                ediciones.append(
+                    (
+                        inicio,
+                        fin,
+                        _region("mmfunc", metodologia, metodologia.precise_mm_function),
+                    )
+                )
+
+    def libre(pos):
+        return not tramos or not _dentro_de(tramos, pos)
+
+    # Correcciones de warnings comunes
+    with etapa("correcciones_warnings"):
+        for pos in indice.fixes:
+            for literal, corregido in WARNING_FIXES.items():
+                if content.startswith(literal, pos):
+                    ediciones.append((pos, pos + len(literal), corregido))
+                    break
+
+    # 2. Agregar las variables de input para gestión de riesgo
+    with etapa("inputs_riesgo"):
+        for pos in indice.inputs:
+            if libre(pos):
+                ediciones.append(
+                    (
+                        pos,
+                        pos,
+                        _region(
+                            "inputs", metodologia, metodologia.risk_management_inputs
+                        )
+                        + "\n",
+                    )
+                )
+
+    # 3. Agregar inicialización en OnInit
+    with etapa("oninit"):
+        sangria = metodologia.target_for_oninit[: -len(ONINIT_RETURN)]
+        for pos in indice.oninit:
+            inicio = pos - len(sangria)
+            if inicio >= 0 and content[inicio:pos] == sangria and libre(inicio):
+                ediciones.append(
+                    (
+                        inicio,
+                        inicio,
+                        _region("oninit", metodologia, metodologia.on_init_addition)
+                        + "\n\n   ",
+                    )
+                )
+
+    # 4. Reemplazar el cálculo del tamaño del lote - MÚLTIPLES PATRONES POSIBLES
+    with etapa("calculo_lote"):
+        candidatos = [pos for pos in indice.lot if libre(pos)]
+        replaced = False
+        for pattern in LOT_SIZE_PATTERNS:
+            ocurrencias = [
+                pos for pos in candidatos if content.startswith(pattern, pos)
+            ]
+            if ocurrencias:
+                indentation = content[
+                    _indentacion_previa(content, ocurrencias[0]) : ocurrencias[0]
+                ]
+                indented_logic = _region_lote(metodologia, indentation)
+                for pos in ocurrencias:
+                    inicio = pos - len(indentation)
+                    if inicio >= 0 and content[inicio:pos] == indentation:
+                        ediciones.append((inicio, pos + len(pattern), indented_logic))
+                replaced = True
+                break
+
+        if not replaced and metodologia.flexible_lot_size:
+            indented_logic = None
+            fin_previo = 0
+            for pos in candidatos:
+                if pos < fin_previo:
+                    continue
+                match = FLEXIBLE_LOT_SIZE_PATTERN.match(content, pos)
+                if match:
+                    inicio = max(_indentacion_previa(content, pos), fin_previo)
+                    if indented_logic is None:
+                        indented_logic = _region_lote(metodologia, content[inicio:pos])
+                    ediciones.append((inicio, match.end(), indented_logic))
+                    fin_previo = match.end()
+
+    # 5. Agregar la función OnTradeTransaction
+    with etapa("on_trade_transaction"):
+        funcion = _region(
+            "ontrade", metodologia, metodologia.on_trade_transaction_function
+        )
+        include = next((pos for pos in indice.include if libre(pos)), None)
+        if include is not None:
+            ediciones.append((include, include, funcion + "\n\n"))
+        else:
+            ediciones.append((len(content), len(content), "\n\n" + funcion))
+
+    return ediciones
+
+
+def construir_ediciones_regiones(content, indice, regiones, metodologia):
+    """
+    Reescribe solo las regiones marcadas con las plantillas de la metodología:
+    actualiza un archivo ya modificado, o le cambia la metodología, sin
+    necesitar el original. Las regiones que ya tienen su versión no cambian.
+    Devuelve (ediciones, anclas requeridas encontradas)
+    """
+    ediciones = []
+    textos = {
+        "inputs": metodologia.risk_management_inputs,
+        "oninit": metodologia.on_init_addition,
+        "ontrade": metodologia.on_trade_transaction_function,
+        "mmfunc": metodologia.precise_mm_function,
+    }
+    anclas = {
+        ancla: 0
+        for ancla in ANCLAS_REQUERIDAS
+        if ancla != "mmfunc" or metodologia.precise_mm_function is not None
+    }
+
+    with etapa("regiones"):
+        for region in regiones:
+            if region.tipo in anclas:
+                anclas[region.tipo] += 1
+            if (region.clave, region.version) == (
+                metodologia.clave,
+                metodologia.version,
+            ):
+                continue
+            if region.tipo == "lot":
+                # La indentación de la primera línea está fuera de la región
+                indentation = content[
+                    _indentacion_previa(content, region.inicio) : region.inicio
+                ]
+                texto = _region_lote(metodologia, indentation)[len(indentation) :]
+            elif textos.get(region.tipo) is not None:
+                texto = _region(region.tipo, metodologia, textos[region.tipo])
+            else:
+                # La sqMMFixedAmount precisa tiene la misma firma que usa el
+                # cálculo del lote de las demás metodologías: se conserva
+                continue
+            ediciones.append((region.inicio, region.fin, texto))
+
+    tramos = [(region.inicio, region.fin) for region in regiones]
+
+    # Un archivo modificado por una metodología que no reemplaza sqMMFixedAmount
+    # conserva la original
+    with etapa("funcion_mm"):
+        if "mmfunc" in anclas and not anclas["mmfunc"]:
+            for inicio, fin in _tramos_funcion_mm(content, indice):
+                if not _dentro_de(tramos, inicio):
+                    ediciones.append(
+                        (
+                            inicio,
+                            fin,
+                            _region(
+                                "mmfunc", metodologia, metodologia.precise_mm_function
+                            ),
+                        )
+                    )
+                    anclas["mmfunc"] += 1
+
+    # Correcciones de warnings añadidas desde la última modificación
+    with etapa("correcciones_warnings"):
+        for pos in indice.fixes:
+            if _dentro_de(tramos, pos):
+                continue
+            for literal, corregido in WARNING_FIXES.items():
+                if content.startswith(literal, pos):
+                    ediciones.append((pos, pos + len(literal), corregido))
+                    break
+
+    return ediciones, anclas
+
+
+def ediciones_efectivas(ediciones):
+    """
+    Ordena las ediciones y descarta las que caen dentro de un tramo que otra
+    ya reemplaza: son exactamente las que se aplican, con su desplazamiento
+    y longitud en el original
+    """
+    efectivas = []
+    cursor = 0
+    for edicion in sorted(ediciones, key=lambda edicion: edicion[0]):
+        if edicion[0] < cursor:
+            # La edición cae dentro de un tramo ya reemplazado
+            continue
+        efectivas.append(edicion)
+        cursor = edicion[1]
+    return efectivas
+
+
+def aplicar_ediciones(content, ediciones):
+    """
+    Construye el resultado con un único join sobre tramos del original
+    """
+    partes = []
+    cursor = 0
+    for inicio, fin, texto in ediciones_efectivas(ediciones):
+        partes.append(content[cursor:inicio])
+        partes.append(texto)
+        cursor = fin
+    partes.append(content[cursor:])
+    return "".join(partes)
+
+
+def _ediciones_con_indice(content, filename, indice, metodologia):
+    # Un archivo con marcas de región se actualiza reescribiendo solo sus regiones
+    regiones = indice_regiones(content, indice) if indice.regiones else []
+    if regiones:
+        ediciones, anclas = construir_ediciones_regiones(
+            content, indice, regiones, metodologia
+        )
+        informe = InformeAnclas(metodologia.nombre, anclas)
+        if not informe.parcheable:
+            raise AnclasNoEncontradas(informe, filename)
+        if not ediciones:
+            return None, REGIONES_AL_DIA.format(
+                filename=filename, metodologia=metodologia.nombre
+            )
+        return ediciones_efectivas(ediciones), REGIONES_ACTUALIZADAS.format(
+            metodologia=metodologia.nombre, cambios=len(ediciones)
+        )
+
+    # Evita modificar un archivo que ya ha sido procesado
+    if metodologia.processed_marker in indice.markers:
+        return None, metodologia.skip_message.format(filename=filename)
+
+    # Rechazo temprano: sin las anclas requeridas el resultado quedaría a medias
+    with etapa("verificacion_anclas"):
+        informe = verificar_anclas(content, metodologia, indice)
+    if not informe.parcheable:
+        raise AnclasNoEncontradas(informe, filename)
+
+    ediciones = construir_ediciones(content, indice, metodologia)
+    return ediciones_efectivas(ediciones), metodologia.success_message
+
+
+def _aplicar(content, preparado):
+    ediciones, message = preparado
+    if ediciones is None:
+        return None, message
+    with etapa("aplicar_ediciones"):
+        return aplicar_ediciones(content, ediciones), message
+
+
+def preparar_ediciones(content, filename, metodologia):
+    """
+    Como modificar_estrategia, pero devuelve (ediciones, message) sin
+    aplicarlas: la lista (inicio, fin, texto) ordenada de cada inserción y
+    reemplazo sobre el original, o None si el archivo ya estaba procesado
+    """
+    indice = escanear_anclas(content)
+    return _ediciones_con_indice(content, filename, indice, metodologia)
+
+
+def preparar_variantes(content, filename, metodologias, rechazos=None):
+    """
+    Ediciones de varias variantes (metodologías o escalas de parámetros
+    distintas) a partir de un único escaneo del código fuente.
+    Devuelve [(ediciones, message), ...] en el orden recibido; las variantes
+    rechazadas por falta de anclas devuelven (None, motivo) y, si se pasa la
+    lista `rechazos`, su AnclasNoEncontradas se añade a ella
+    """
+    indice = escanear_anclas(content)
+    preparados = []
+    for metodologia in metodologias:
+        try:
+            preparados.append(
+                _ediciones_con_indice(content, filename, indice, metodologia)
+            )
+        except AnclasNoEncontradas as e:
+            preparados.append((None, str(e)))
+            if rechazos is not None:
+                rechazos.append(e)
+    return preparados
+
+
+def modificar_estrategia(content, filename, metodologia):
+    """
+    Aplica una metodología de gestión de riesgo sobre el código fuente MQL5.
+    Lanza AnclasNoEncontradas si el archivo no se puede modificar por completo
+    """
+    return _aplicar(content, preparar_ediciones(content, filename, metodologia))
+
+
+def modificar_variantes(content, filename, metodologias):
+    """
+    Genera varias variantes a partir de un único escaneo del código fuente.
+    Cada variante solo cambia los bloques que inyecta; los tramos del original
+    se comparten. Devuelve [(modified_content, message), ...] en el orden
+    recibido; las variantes rechazadas devuelven (None, motivo)
+    """
+    return [
+        _aplicar(content, preparado)
+        for preparado in preparar_variantes(content, filename, metodologias)
+    ]
+
+
+def modificar_estrategia_escalado_gerard(content, filename):
+    """
+    Modifica contenido de estrategia MQL5 para añadir gestión de riesgo por niveles - VERSIÓN CORREGIDA
+    """
+    return modificar_estrategia(content, filename, GERARD)
+
+
+def modificar_estrategia_benjamin(content, filename):
+    """
+    Modifica contenido de estrategia MQL5 para añadir gestión de riesgo para cuentas de fondeo
+    """
+    return modificar_estrategia(content, filename, BENJAMIN)
@@ -0,0 +1,145 @@
+"""
+Medición del tiempo de cada etapa del procesamiento.
+
+El motor marca sus etapas con `with etapa("nombre"):`. Solo se mide cuando hay
+un Cronometro activo en el contexto, así que fuera de un lote perfilado el
+coste es una consulta a una ContextVar. Las etapas anidadas descuentan el
+tiempo de sus hijas: la suma de todas las etapas es el tiempo medido.
+"""
+
+import json
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+
+_cronometro_activo = ContextVar("cronometro_activo", default=None)
+_SIN_MEDIR = nullcontext()
+
+
+def percentil(valores, p):
+    """Percentil con interpolación lineal sobre una lista ordenada"""
+    if not valores:
+        return 0.0
+    k = (len(valores) - 1) * p / 100
+    inferior = int(k)
+    superior = min(inferior + 1, len(valores) - 1)
+    return valores[inferior] + (valores[superior] - valores[inferior]) * (k - inferior)
+
+
+class Cronometro:
+    """Acumula segundos por etapa para un archivo"""
+
+    def __init__(self):
+        self.tiempos = {}
+        # Tiempo de las etapas hijas de cada etapa abierta
+        self._pila = []
+
+    @contextmanager
+    def activo(self):
+        token = _cronometro_activo.set(self)
+        try:
+            yield self
+        finally:
+            _cronometro_activo.reset(token)
+
+    @contextmanager
+    def etapa(self, nombre):
+        self._pila.append(0.0)
+        inicio = perf_counter()
+        try:
+            yield
+        finally:
+            total = perf_counter() - inicio
+            hijas = self._pila.pop()
+            self.tiempos[nombre] = self.tiempos.get(nombre, 0.0) + total - hijas
+            if self._pila:
+                self._pila[-1] += total
+
+
+def etapa(nombre):
+    """Mide la etapa en el Cronometro activo, si lo hay"""
+    cronometro = _cronometro_activo.get()
+    if cronometro is None:
+        return _SIN_MEDIR
+    return cronometro.etapa(nombre)
+
+
+class PerfilLote:
+    """Tiempos por archivo y por etapa de un lote, y su agregado"""
+
+    def __init__(self):
+        self.archivos = {}
+        self._inicio = perf_counter()
+        self.duracion = None
+
+    def registrar(self, nombre, tiempos):
+        acumulados = self.archivos.setdefault(nombre, {})
+        for etapa_nombre, segundos in tiempos.items():
+            acumulados[etapa_nombre] = acumulados.get(etapa_nombre, 0.0) + segundos
+
+    def terminar(self):
+        self.duracion = perf_counter() - self._inicio
+
+    def etapas(self):
+        """Total, media, percentiles y máximo de cada etapa entre archivos"""
+        por_etapa = {}
+        for tiempos in self.archivos.values():
+            for etapa_nombre, segundos in tiempos.items():
+                por_etapa.setdefault(etapa_nombre, []).append(segundos)
+
+        agregado = {}
+        for etapa_nombre, valores in sorted(
+            por_etapa.items(), key=lambda item: -sum(item[1])
+        ):
+            valores.sort()
+            agregado[etapa_nombre] = {
+                "archivos": len(valores),
+                "total_s": sum(valores),
+                "media_s": sum(valores) / len(valores),
+                "p50_s": percentil(valores, 50),
+                "p95_s": percentil(valores, 95),
+                "max_s": valores[-1],
+            }
+        return agregado
+
+    def a_dict(self):
+        return {
+            "duracion_s": self.duracion,
+            "archivos": self.archivos,
+            "etapas": self.etapas(),
+        }
+
+    def a_json(self):
+        return json.dumps(self.a_dict(), indent=2, ensure_ascii=False)
+
+    def a_prometheus(self, prefijo="mql5"):
+        """Métricas en el formato de texto de Prometheus"""
+        lineas = [
+            f"# HELP {prefijo}_etapa_segundos Tiempo por archivo de cada etapa",
+            f"# TYPE {prefijo}_etapa_segundos summary",
+        ]
+        for etapa_nombre, metricas in self.etapas().items():
+            etiqueta = f'etapa="{etapa_nombre}"'
+            for cuantil, clave in (("0.5", "p50_s"), ("0.95", "p95_s")):
+                lineas.append(
+                    f'{prefijo}_etapa_segundos{{{etiqueta},quantile="{cuantil}"}} '
+                    f"{metricas[clave]:.9f}"
+                )
+            lineas.append(
+                f"{prefijo}_etapa_segundos_sum{{{etiqueta}}} {metricas['total_s']:.9f}"
+            )
+            lineas.append(
+                f"{prefijo}_etapa_segundos_count{{{etiqueta}}} {metricas['archivos']}"
+            )
+        lineas += [
+            f"# HELP {prefijo}_lote_archivos Archivos del último lote",
+            f"# TYPE {prefijo}_lote_archivos gauge",
+            f"{prefijo}_lote_archivos {len(self.archivos)}",
+        ]
+        if self.duracion is not None:
+            lineas += [
+                f"# HELP {prefijo}_lote_duracion_segundos Duración del último lote",
+                f"# TYPE {prefijo}_lote_duracion_segundos gauge",
+                f"{prefijo}_lote_duracion_segundos {self.duracion:.9f}",
+            ]
+        return "\n".join(lineas) + "\n"
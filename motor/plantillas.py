@@ -0,0 +1,287 @@
+"""
+Bloques de código MQL5 que inyecta cada metodología.
+"""
+
+# Bloques de código MQL5 CORREGIDOS - Escalado Gerard
+
+GERARD_RISK_MANAGEMENT_INPUTS = """
+    //+------------------------------------------------------------------+
+    //| Risk Management (Precise Level Scaling) by Python Script
+    //+------------------------------------------------------------------+
+    input string g_riskScalingTitle = "----------- Risk Management (Level Scaling) -----------";
+    input string g_riskLevels_string = "1.0,1.2,1.6,2.4,3.6,4.5"; // Risk % por nivel, separado por comas
+
+    // --- Internal State Variables ---
+    double g_riskLevels[];          // Array para guardar los niveles de riesgo parseados
+    int    g_currentTradeLevel;     // Nivel actual del Trade (1-based, ej: 1, 2, 3...)
+    string g_gv_tradeLevel_key;     // Clave para la Variable Global
+
+    """
+
+GERARD_ON_INIT_ADDITION = """
+    // --- Inicialización de Gestión de Riesgo por Niveles ---
+    g_gv_tradeLevel_key = "SQ.TradeLevel." + StrategyID;
+
+    string risk_levels_parts[];
+    StringSplit(g_riskLevels_string, ',', risk_levels_parts);
+    ArrayResize(g_riskLevels, ArraySize(risk_levels_parts));
+    for(int i = 0; i < ArraySize(risk_levels_parts); i++)
+    {
+        g_riskLevels[i] = StringToDouble(risk_levels_parts[i]);
+    }
+
+    if(ArraySize(g_riskLevels) == 0)
+    {
+        Alert("Error en Gestión de Riesgo: La cadena de niveles de riesgo está vacía o mal formada.");
+        return(INIT_FAILED);
+    }
+
+    if(GlobalVariableCheck(g_gv_tradeLevel_key)) {
+        g_currentTradeLevel = (int)GlobalVariableGet(g_gv_tradeLevel_key);
+    } else {
+        g_currentTradeLevel = 1; 
+        GlobalVariableSet(g_gv_tradeLevel_key, g_currentTradeLevel);
+    }
+    
+    VerboseLog("Gestión de Riesgo por Niveles Inicializada. Nivel Actual: ", IntegerToString(g_currentTradeLevel));
+    // --- Fin de la Inicialización ---
+    """
+
+GERARD_ON_TRADE_TRANSACTION_FUNCTION = """
+    //+------------------------------------------------------------------+
+    //| Gestor de Eventos de Transacción para Gestión de Riesgo por Niveles |
+    //+------------------------------------------------------------------+
+    void OnTradeTransaction(const MqlTradeTransaction &trans,
+                            const MqlTradeRequest &request,
+                            const MqlTradeResult &result)
+    {
+    if(trans.type == TRADE_TRANSACTION_DEAL_ADD)
+    {
+        if(HistoryDealSelect(trans.deal))
+        {
+            if(HistoryDealGetInteger(trans.deal, DEAL_MAGIC) == MagicNumber)
+            {
+                if(HistoryDealGetInteger(trans.deal, DEAL_ENTRY) == DEAL_ENTRY_OUT)
+                {
+                double dealProfit = HistoryDealGetDouble(trans.deal, DEAL_PROFIT);
+                
+                if(dealProfit < 0) 
+                {
+                    g_currentTradeLevel++; 
+                    if(g_currentTradeLevel > ArraySize(g_riskLevels))
+                    {
+                        g_currentTradeLevel = ArraySize(g_riskLevels);
+                    }
+                    VerboseLog("GESTION POR NIVELES: Trade PERDEDOR. Avanzando al Nivel ", IntegerToString(g_currentTradeLevel));
+                }
+                else
+                {
+                    g_currentTradeLevel = 1;
+                    VerboseLog("GESTION POR NIVELES: Trade GANADOR. Reseteando al Nivel 1.");
+                }
+                GlobalVariableSet(g_gv_tradeLevel_key, g_currentTradeLevel);
+                }
+            }
+        }
+    }
+    }
+    """
+
+# LÓGICA CORREGIDA para el cálculo del tamaño del lote
+GERARD_LOT_SIZE_CALCULATION_LOGIC = """      // --- Cálculo de Gestión de Riesgo por Niveles ---
+      if(g_currentTradeLevel < 1 || g_currentTradeLevel > ArraySize(g_riskLevels))
+      {
+         g_currentTradeLevel = 1; 
+         GlobalVariableSet(g_gv_tradeLevel_key, g_currentTradeLevel);
+      }
+      
+      double riskPercentForTrade = g_riskLevels[g_currentTradeLevel - 1];
+      
+      double moneyToRisk = (initialBalance * riskPercentForTrade) / 100.0;
+      VerboseLog("GESTION POR NIVELES: Nivel actual: ", IntegerToString(g_currentTradeLevel), ". Arriesgando: ", DoubleToString(riskPercentForTrade, 2), "%. Dinero máximo a arriesgar: ", DoubleToString(moneyToRisk, 2));
+      
+      size = sqMMFixedAmount("Current",ORDER_TYPE_BUY,openPrice,sl,moneyToRisk,mmDecimals,mmLotsIfNoMM,mmMaxLots,mmMultiplier);"""
+
+# FUNCIÓN CORREGIDA sqMMFixedAmount sin el parámetro problemático mmStep
+PRECISE_MM_FUNCTION = """
+    double sqMMFixedAmount(string symbol, ENUM_ORDER_TYPE orderType, double price, double sl, double RiskedMoney, int decimals, double LotsIfNoMM, double MaximumLots, double multiplier) {
+    Verbose("Computing Money Management for order - Precise amount");
+    
+    if(UseMoneyManagement == false) {
+        Verbose("Use Money Management = false, MM not used");
+        return (mmLotsIfNoMM);
+    }
+        
+    string correctedSymbol = correctSymbol(symbol);
+    sl = NormalizeDouble(sl, (int) SymbolInfoInteger(correctedSymbol, SYMBOL_DIGITS));
+    
+    double openPrice = price > 0 ? price : SymbolInfoDouble(correctedSymbol, isLongOrder(orderType) ? SYMBOL_ASK : SYMBOL_BID);
+    double LotSize=0;
+
+    if(RiskedMoney <= 0 ) {
+        Verbose("Computing Money Management - Incorrect RiskedMoney value, it must be above 0");
+        return(0);
+    }
+    
+    double PointValue = SymbolInfoDouble(correctedSymbol, SYMBOL_TRADE_TICK_VALUE) / SymbolInfoDouble(correctedSymbol, SYMBOL_TRADE_TICK_SIZE); 
+    double Smallest_Lot = SymbolInfoDouble(correctedSymbol, SYMBOL_VOLUME_MIN);
+    double Largest_Lot = SymbolInfoDouble(correctedSymbol, SYMBOL_VOLUME_MAX);    
+    double LotStep = SymbolInfoDouble(correctedSymbol, SYMBOL_VOLUME_STEP);
+    
+    if (PointValue <= 0 || MathAbs(openPrice - sl) <= 0) {
+        Verbose("Cannot calculate lot size: Point value or SL distance is zero. Using default lot size.");
+        return LotsIfNoMM;
+    }
+    
+    double oneLotSLDrawdown = PointValue * MathAbs(openPrice - sl);
+            
+    if(oneLotSLDrawdown > 0) {
+        LotSize = RiskedMoney / oneLotSLDrawdown;
+    }
+    else {
+        LotSize = 0;
+    }
+
+    LotSize = LotSize * multiplier;
+    
+    // Redondear al step correcto
+    if(LotStep > 0) {
+        LotSize = MathFloor(LotSize / LotStep) * LotStep;
+    }
+
+    Verbose("Computing Money Management - Smallest_Lot: ", DoubleToString(Smallest_Lot), ", Largest_Lot: ", DoubleToString(Largest_Lot), ", Computed LotSize: ", DoubleToString(LotSize, 8));
+    Verbose("Money to risk: ", DoubleToString(RiskedMoney), ", Max 1 lot trade drawdown: ", DoubleToString(oneLotSLDrawdown), ", Point value: ", DoubleToString(PointValue));
+
+    if(LotSize <= 0) {
+        Verbose("Calculated LotSize is <= 0. Using LotsIfNoMM value: ", DoubleToString(LotsIfNoMM), ")");
+        LotSize = LotsIfNoMM;
+    }                              
+
+    if (LotSize < Smallest_Lot) {
+        Verbose("Calculated LotSize is too small (", DoubleToString(LotSize,8), "). Minimal allowed is ", DoubleToString(Smallest_Lot), ". Trade will be skipped.");
+        return 0;
+    }
+    else if (LotSize > Largest_Lot) {
+        Verbose("LotSize is too big. LotSize set to maximal allowed market value: ", DoubleToString(Largest_Lot));
+        LotSize = Largest_Lot;
+    }
+
+    if(LotSize > MaximumLots) {
+        Verbose("LotSize is too big. LotSize set to maximal allowed value (MaximumLots): ", DoubleToString(MaximumLots));
+        LotSize = MaximumLots;
+    }
+
+    return (LotSize);
+    }"""
+
+
+# Bloques de código MQL5 - Escalado Benjamin
+BENJAMIN_RISK_MANAGEMENT_INPUTS = """
+    //+------------------------------------------------------------------+
+    //| Risk Management for Funded Accounts by Python Script (V2 - Corrected)
+    //+------------------------------------------------------------------+
+    input string g_riskManagementTitle = "----------- Risk Management (Funded Accounts) -----------";
+    input double g_initialRiskPercent = 1.0;       // Riesgo Inicial %
+    input double g_riskStep = 0.25;                // Paso de Riesgo % por Ganancia/Pérdida
+    input double g_maxLossThreshold = -4.0;        // Umbral de Pérdida Máxima %
+    input double g_maxLossRisk = 1.0;              // Riesgo % tras alcanzar Umbral de Pérdida
+    input double g_profitProtectThreshold = 4.0;   // Umbral de Protección de Ganancias %
+    input double g_profitProtectRisk = 0.75;       // Riesgo % tras alcanzar Protección de Ganancias
+    input double g_minRiskPercent = 0.25;          // Riesgo mínimo permitido %
+
+    // --- Variables de estado internas (no modificar)
+    double g_currentRiskPercent;
+    double g_totalAccountProfitPercent;
+    string g_gv_riskPercent_key;
+    string g_gv_profitPercent_key;
+
+    """
+
+BENJAMIN_ON_INIT_ADDITION = """
+    // --- Inicialización de Variables de Gestión de Riesgo ---
+    g_gv_riskPercent_key = "SQ.Risk." + StrategyID;
+    g_gv_profitPercent_key = "SQ.Profit." + StrategyID;
+
+    if(GlobalVariableCheck(g_gv_riskPercent_key)) {
+        g_currentRiskPercent = GlobalVariableGet(g_gv_riskPercent_key);
+    } else {
+        g_currentRiskPercent = g_initialRiskPercent;
+        GlobalVariableSet(g_gv_riskPercent_key, g_currentRiskPercent);
+    }
+
+    if(GlobalVariableCheck(g_gv_profitPercent_key)) {
+        g_totalAccountProfitPercent = GlobalVariableGet(g_gv_profitPercent_key);
+    } else {
+        g_totalAccountProfitPercent = 0.0;
+        GlobalVariableSet(g_gv_profitPercent_key, g_totalAccountProfitPercent);
+    }
+    
+    VerboseLog("Gestión de Riesgo Inicializada. Riesgo Actual: ", DoubleToString(g_currentRiskPercent, 2), "%, P/L Total: ", DoubleToString(g_totalAccountProfitPercent, 2), "%");
+    // --- Fin de la Inicialización de Gestión de Riesgo ---
+    """
+
+BENJAMIN_ON_TRADE_TRANSACTION_FUNCTION = """
+    //+------------------------------------------------------------------+
+    //| Gestor de Eventos de Transacción para Gestión de Riesgo          |
+    //+------------------------------------------------------------------+
+    void OnTradeTransaction(const MqlTradeTransaction &trans,
+                            const MqlTradeRequest &request,
+                            const MqlTradeResult &result)
+    {
+    if(trans.type == TRADE_TRANSACTION_DEAL_ADD)
+    {
+        if(HistoryDealSelect(trans.deal))
+        {
+            if(HistoryDealGetInteger(trans.deal, DEAL_MAGIC) == MagicNumber)
+            {
+                if(HistoryDealGetInteger(trans.deal, DEAL_ENTRY) == DEAL_ENTRY_OUT)
+                {
+                double dealProfit = HistoryDealGetDouble(trans.deal, DEAL_PROFIT);
+                
+                if(initialBalance <= 0)
+                {
+                    VerboseLog("Error en Gestión de Riesgo: InitialCapital debe ser > 0 para el cálculo de porcentaje.");
+                    return; 
+                }
+
+                double profitPercent = (dealProfit / initialBalance) * 100.0;
+                g_totalAccountProfitPercent += profitPercent;
+                
+                if(dealProfit >= 0)
+                {
+                    g_currentRiskPercent -= g_riskStep;
+                    if(g_currentRiskPercent < g_minRiskPercent) 
+                    {
+                        g_currentRiskPercent = g_minRiskPercent;
+                    }
+                }
+                else
+                {
+                    g_currentRiskPercent += g_riskStep;
+                }
+
+                GlobalVariableSet(g_gv_riskPercent_key, g_currentRiskPercent);
+                GlobalVariableSet(g_gv_profitPercent_key, g_totalAccountProfitPercent);
+                
+                VerboseLog("GESTION DE RIESGO: Trade Cerrado. P/L: ", DoubleToString(dealProfit, 2), " (", DoubleToString(profitPercent, 2), "%). Nuevo P/L Total: ", DoubleToString(g_totalAccountProfitPercent, 2), "%. Próximo Riesgo: ", DoubleToString(g_currentRiskPercent, 2), "%");
+                }
+            }
+        }
+    }
+    }
+    """
+
+BENJAMIN_LOT_SIZE_CALCULATION_LOGIC = """    // --- Cálculo de Gestión de Riesgo Dinámico ---
+    double riskPercentForTrade = g_currentRiskPercent;
+    if(g_totalAccountProfitPercent <= g_maxLossThreshold) {
+        riskPercentForTrade = g_maxLossRisk;
+        VerboseLog("GESTION DE RIESGO: Protección de Drawdown activada. Riesgo fijado a: ", DoubleToString(riskPercentForTrade, 2), "%");
+    } else if (g_totalAccountProfitPercent >= g_profitProtectThreshold) {
+        riskPercentForTrade = g_profitProtectRisk;
+        VerboseLog("GESTION DE RIESGO: Protección de Ganancias activada. Riesgo fijado a: ", DoubleToString(riskPercentForTrade, 2), "%");
+    }
+    
+    double moneyToRisk = (initialBalance * riskPercentForTrade) / 100.0;
+    VerboseLog("GESTION DE RIESGO: Calculando tamaño de lote. Usando riesgo de: ", DoubleToString(riskPercentForTrade, 2), "%. Dinero a arriesgar: ", DoubleToString(moneyToRisk, 2));
+    
+    size = sqMMFixedAmount("Current",ORDER_TYPE_BUY,openPrice,sl,moneyToRisk,mmDecimals,mmLotsIfNoMM,mmMaxLots,mmMultiplier);"""
@@ -0,0 +1,411 @@
+"""
+Validación estructural de las estrategias modificadas, antes de compilarlas en
+MetaEditor.
+
+Una sola pasada lineal con el mismo criterio que lexico (comentarios, cadenas,
+caracteres y directivas no cuentan) detecta los fallos que solo aparecerían al
+compilar: llaves o paréntesis desequilibrados, comentarios o cadenas sin
+cerrar, funciones globales definidas dos veces (p. ej. OnTradeTransaction si la
+estrategia ya tenía la suya), variables globales declaradas dos veces (p. ej.
+g_riskLevels) y bloques de la metodología que no llegaron a insertarse.
+"""
+
+import re
+from dataclasses import dataclass
+
+from motor.anclas import _REGION_MARCA, REGION_FIN, REGION_INICIO
+from motor.flujo import segmentar
+from motor.lexico import FIN_CABECERA, OPACOS
+
+# Manejadores de eventos: no admiten sobrecargas, basta con el nombre
+MANEJADORES = frozenset(
+    {
+        "OnStart",
+        "OnInit",
+        "OnDeinit",
+        "OnTick",
+        "OnTimer",
+        "OnTrade",
+        "OnTradeTransaction",
+        "OnBookEvent",
+        "OnChartEvent",
+        "OnCalculate",
+        "OnTester",
+        "OnTesterInit",
+        "OnTesterPass",
+        "OnTesterDeinit",
+    }
+)
+
+# Bloques que inyecta cada metodología (el de sqMMFixedAmount, solo si la
+# reemplaza)
+BLOQUES = {
+    "inputs": "inputs de gestión de riesgo",
+    "oninit": "inicialización en OnInit",
+    "lot": "cálculo del lote",
+    "mmfunc": "función sqMMFixedAmount",
+    "ontrade": "función OnTradeTransaction",
+}
+
+_GLOBAL = re.compile(r"[{};]")
+_NOMBRE_FUNCION = re.compile(r"((?:\w+\s*::\s*)*~?\w+)\s*\(")
+_ESPACIOS = re.compile(r"\s+")
+_DIMENSIONES = re.compile(r"\[[^\]]*\]")
+_DECLARADO = re.compile(r"(\w+)\s*$")
+# Sentencias globales que no declaran variables
+_NO_VARIABLES = frozenset(
+    {"class", "struct", "enum", "union", "typedef", "template", "extern", "namespace"}
+)
+_CONDICIONALES = re.compile(r"#\s*(if|ifdef|ifndef|else|elif|endif)\b")
+
+
+@dataclass(frozen=True)
+class Problema:
+    """Fallo estructural encontrado en un archivo"""
+
+    # "llaves", "parentesis", "sin_cerrar", "duplicado" o "bloque"
+    tipo: str
+    mensaje: str
+    linea: int = None
+
+    def __str__(self):
+        if self.linea is None:
+            return self.mensaje
+        return f"{self.mensaje} (línea {self.linea})"
+
+
+class EstructuraInvalida(ValueError):
+    """El archivo modificado no compilaría"""
+
+    def __init__(self, problemas, filename):
+        super().__init__(describir_problemas(problemas, filename))
+        self.problemas = problemas
+        self.filename = filename
+
+    def __reduce__(self):
+        # Se envía entre procesos del pool con sus argumentos reales
+        return type(self), (self.problemas, self.filename)
+
+
+def describir_problemas(problemas, filename):
+    return f"Estructura inválida en {filename}: {'; '.join(map(str, problemas))}"
+
+
+def _separar_declaradores(texto):
+    """Trozos de una declaración separados por comas fuera de paréntesis"""
+    partes = []
+    nivel = 0
+    inicio = 0
+    for pos, caracter in enumerate(texto):
+        if caracter == "(":
+            nivel += 1
+        elif caracter == ")":
+            nivel -= 1
+        elif caracter == "," and not nivel:
+            partes.append(texto[inicio:pos])
+            inicio = pos + 1
+    partes.append(texto[inicio:])
+    return partes
+
+
+def _variables_declaradas(sentencia):
+    """Nombres de las variables que declara una sentencia global"""
+    palabras = sentencia.split(None, 1)
+    if not palabras or palabras[0] in _NO_VARIABLES:
+        return []
+    nombres = []
+    for n, declarador in enumerate(_separar_declaradores(sentencia)):
+        declarador = declarador.split("=", 1)[0]
+        if "(" in declarador:
+            # Prototipo de función (o una declaración que no se entiende)
+            return []
+        declarador = _DIMENSIONES.sub("", declarador)
+        match = _DECLARADO.search(declarador)
+        # La primera parte lleva delante el tipo
+        if match is None or (n == 0 and not declarador[: match.start()].strip()):
+            continue
+        nombres.append(match.group(1))
+    return nombres
+
+
+class Validador:
+    """
+    Validación incremental: recibe el texto en segmentos que no parten
+    comentarios, cadenas ni directivas (un texto completo, o los de
+    motor.flujo.segmentar) y acumula los problemas.
+
+        validador = Validador(metodologia)
+        validador.alimentar(content)
+        problemas = validador.terminar()
+    """
+
+    def __init__(self, metodologia=None):
+        self.metodologia = metodologia
+        self.problemas = []
+        self._profundidad = 0
+        self._parentesis = 0
+        # Texto de código de la sentencia global en curso, sin comentarios
+        self._partes = []
+        # Cabecera (nombre, clave, línea) de la función cuyo cuerpo está abierto
+        self._funcion = None
+        # Línea de la llave global abierta
+        self._linea_apertura = None
+        self._funciones = {}
+        self._variables = {}
+        # Por cada #if abierto: [profundidad al entrar, profundidad tras la
+        # primera rama o None]
+        self._condicionales = []
+        self._region = None
+        self._bloques = dict.fromkeys(BLOQUES, 0)
+        # Contador de líneas incremental dentro del segmento en curso
+        self._segmento = ""
+        self._linea = 1
+        self._linea_pos = 0
+
+    def _linea_de(self, pos):
+        """Línea de `pos` en el segmento en curso; las posiciones solo avanzan"""
+        self._linea += self._segmento.count("\n", self._linea_pos, pos)
+        self._linea_pos = pos
+        return self._linea
+
+    def _problema(self, tipo, mensaje, pos=None):
+        linea = None if pos is None else self._linea_de(pos)
+        self.problemas.append(Problema(tipo, mensaje, linea))
+
+    def alimentar(self, segmento):
+        self._segmento = segmento
+        self._linea_pos = 0
+        anterior = 0
+        for match in OPACOS.finditer(segmento):
+            inicio, fin = match.span()
+            self._codigo(anterior, inicio)
+            self._opaco(match.group(), inicio)
+            anterior = fin
+        self._codigo(anterior, len(segmento))
+        self._linea += segmento.count("\n", self._linea_pos)
+        self._segmento = ""
+        self._linea_pos = 0
+
+    def _opaco(self, texto, pos):
+        primero = texto[0]
+        if primero == "#":
+            self._directiva(texto, pos)
+        elif primero == "/":
+            if texto[1] == "*":
+                if len(texto) < 4 or not texto.endswith("*/"):
+                    self._problema("sin_cerrar", "Comentario /* sin cerrar", pos)
+                elif texto.startswith((REGION_INICIO, REGION_FIN)):
+                    self._marca(texto, pos)
+        elif len(texto) < 2 or texto[-1] != primero:
+            self._problema(
+                "sin_cerrar",
+                "Cadena sin cerrar" if primero == '"' else "Carácter sin cerrar",
+                pos,
+            )
+        elif not self._profundidad:
+            # Las cadenas globales solo importan como parte de la sentencia
+            self._partes.append('""')
+
+    def _directiva(self, texto, pos):
+        if not self._profundidad:
+            self._partes = []
+        match = _CONDICIONALES.match(texto)
+        if match is None:
+            return
+        # Las ramas de una compilación condicional pueden abrir y cerrar
+        # llaves por separado: cuenta la primera
+        directiva = match.group(1)
+        if directiva.startswith("if"):
+            self._condicionales.append([self._profundidad, None])
+        elif not self._condicionales:
+            self._problema("llaves", f"#{directiva} sin #if", pos)
+        elif directiva == "endif":
+            _, primera = self._condicionales.pop()
+            if primera is not None:
+                self._profundidad = primera
+        else:
+            condicional = self._condicionales[-1]
+            if condicional[1] is None:
+                condicional[1] = self._profundidad
+            self._profundidad = condicional[0]
+
+    def _marca(self, texto, pos):
+        match = _REGION_MARCA.fullmatch(texto)
+        if match is None:
+            return
+        tipo, clave, _, tipo_fin = match.groups()
+        if tipo is not None:
+            if self._region is not None:
+                self._problema(
+                    "bloque", f"Bloque '{self._region[0]}' sin marca de fin", pos
+                )
+            self._region = (tipo, clave)
+            return
+        if self._region is None or self._region[0] != tipo_fin:
+            self._problema("bloque", f"Marca de fin de '{tipo_fin}' sin inicio", pos)
+            self._region = None
+            return
+        tipo, clave = self._region
+        self._region = None
+        if tipo in self._bloques and (
+            self.metodologia is None or clave == self.metodologia.clave
+        ):
+            self._bloques[tipo] += 1
+
+    def _codigo(self, inicio, fin):
+        segmento = self._segmento
+        self._parentesis += segmento.count("(", inicio, fin) - segmento.count(
+            ")", inicio, fin
+        )
+        pos = inicio
+        while pos < fin:
+            if self._profundidad:
+                cierres = segmento.count("}", pos, fin)
+                if self._profundidad > cierres:
+                    # Dentro de un cuerpo que el tramo no puede cerrar
+                    self._profundidad += segmento.count("{", pos, fin) - cierres
+                    return
+                apertura = segmento.find("{", pos, fin)
+                cierre = segmento.find("}", pos, fin)
+                if 0 <= apertura < cierre:
+                    self._profundidad += 1
+                    pos = apertura + 1
+                    continue
+                self._profundidad -= 1
+                pos = cierre + 1
+                if not self._profundidad:
+                    self._cerrar_bloque()
+                continue
+
+            match = _GLOBAL.search(segmento, pos, fin)
+            if match is None:
+                self._partes.append(segmento[pos:fin])
+                return
+            corte = match.start()
+            self._partes.append(segmento[pos:corte])
+            pos = corte + 1
+            caracter = segmento[corte]
+            if caracter == ";":
+                self._cerrar_sentencia(corte)
+            elif caracter == "{":
+                self._abrir_bloque(corte)
+            else:
+                self._problema("llaves", "Llave '}' sin apertura", corte)
+
+    def _sentencia(self):
+        return _ESPACIOS.sub(" ", "".join(self._partes)).strip()
+
+    def _abrir_bloque(self, pos):
+        self._profundidad = 1
+        self._linea_apertura = self._linea_de(pos)
+        cabecera = self._sentencia()
+        nombre = _NOMBRE_FUNCION.search(cabecera)
+        if nombre and FIN_CABECERA.search(cabecera):
+            # Las sobrecargas se distinguen por la cabecera completa
+            clave = nombre.group(1).replace(" ", "")
+            if clave not in MANEJADORES:
+                clave = cabecera
+            self._funcion = (nombre.group(1), clave, self._linea_apertura)
+        else:
+            # Clase, estructura, enumeración o inicializador: la sentencia
+            # termina en el siguiente ';'
+            self._funcion = None
+
+    def _cerrar_bloque(self):
+        if self._funcion is None:
+            self._partes.append("{}")
+            return
+        nombre, clave, linea = self._funcion
+        self._funcion = None
+        self._partes = []
+        if self._condicionales:
+            return
+        previa = self._funciones.get(clave)
+        if previa is None:
+            self._funciones[clave] = linea
+        else:
+            self.problemas.append(
+                Problema(
+                    "duplicado",
+                    f"Función '{nombre}' definida dos veces (ya en la línea {previa})",
+                    linea,
+                )
+            )
+
+    def _cerrar_sentencia(self, pos):
+        sentencia = self._sentencia()
+        self._partes = []
+        if not sentencia or self._condicionales:
+            return
+        for nombre in _variables_declaradas(sentencia):
+            linea = self._linea_de(pos)
+            previa = self._variables.get(nombre)
+            if previa is None:
+                self._variables[nombre] = linea
+            else:
+                self.problemas.append(
+                    Problema(
+                        "duplicado",
+                        f"Variable global '{nombre}' declarada dos veces "
+                        f"(ya en la línea {previa})",
+                        linea,
+                    )
+                )
+
+    def terminar(self):
+        """Comprobaciones del final del archivo. Devuelve la lista de problemas"""
+        if self._profundidad:
+            self.problemas.append(
+                Problema(
+                    "llaves",
+                    f"{self._profundidad} llave(s) '{{' sin cerrar; la primera "
+                    f"global en la línea {self._linea_apertura}",
+                )
+            )
+        if self._parentesis:
+            sobran = "(" if self._parentesis > 0 else ")"
+            self.problemas.append(
+                Problema(
+                    "parentesis",
+                    f"Paréntesis desequilibrados: sobran {abs(self._parentesis)} '{sobran}'",
+                )
+            )
+        if self._condicionales:
+            self.problemas.append(Problema("llaves", "#if sin #endif"))
+        if self._region is not None:
+            self.problemas.append(
+                Problema("bloque", f"Bloque '{self._region[0]}' sin marca de fin")
+            )
+        if self.metodologia is not None:
+            for tipo, descripcion in BLOQUES.items():
+                if tipo == "mmfunc" and self.metodologia.precise_mm_function is None:
+                    continue
+                if not self._bloques[tipo]:
+                    self.problemas.append(
+                        Problema(
+                            "bloque",
+                            f"Falta el bloque de {descripcion} de "
+                            f"{self.metodologia.nombre}",
+                        )
+                    )
+        return self.problemas
+
+    def recorrer(self, textos):
+        """
+        Valida un flujo de textos a medida que pasa: devuelve los mismos
+        textos reagrupados en los segmentos de motor.flujo.segmentar
+        """
+        for _, segmento in segmentar(textos):
+            self.alimentar(segmento)
+            yield segmento
+
+
+def validar_estructura(content, metodologia=None):
+    """
+    Valida un archivo completo en una sola pasada. Con una metodología,
+    comprueba además que estén todos sus bloques. Devuelve la lista de
+    problemas (vacía si es válido)
+    """
+    validador = Validador(metodologia)
+    validador.alimentar(content)
+    return validador.terminar()
@@ -0,0 +1,362 @@
+"""
+Optimización Monte Carlo de los parámetros de gestión de riesgo.
+
+Cada combinación de una rejilla de parámetros se simula (con simulacion.py)
+sobre miles de secuencias barajadas de las operaciones de una estrategia. Todas
+las combinaciones ven las mismas secuencias, así que se comparan en igualdad de
+condiciones. Las combinaciones se reparten en un pool de procesos y cada una se
+simula por bloques: en cuanto las secuencias que superan el límite de drawdown
+o de ruina hacen imposible cumplir la probabilidad máxima, se descarta sin
+simular el resto.
+
+El resultado es una lista JSON ordenada en el formato de --variantes de
+cli.py, lista para generar los .mq5 con esos valores por defecto:
+
+    python optimizacion.py operaciones.csv --rejilla rejilla.json -o mejores.json
+    python cli.py exports/ --variantes mejores.json -o salida.zip
+
+La rejilla es una lista de objetos con "metodologia" y los valores a probar de
+cada parámetro:
+
+    [{"metodologia": "benjamin",
+      "parametros": {"g_riskStep": [0.1, 0.25, 0.5],
+                     "g_maxLossThreshold": [-3.0, -4.0, -6.0]}},
+     {"metodologia": "gerard",
+      "parametros": {"g_riskLevels_string": ["1.0,1.2,1.6", "0.5,1.0,2.0,3.0"]}}]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass
+from itertools import product
+from multiprocessing import Pool
+
+import numpy as np
+
+from motor import METODOLOGIAS_CLI
+from simulacion import BALANCE_INICIAL, leer_operaciones, recopilar_csv, simular_lote
+
+OBJETIVOS = ("mediana", "p5", "ratio")
+
+
+@dataclass(frozen=True)
+class Configuracion:
+    simulaciones: int = 2000
+    # Secuencias simuladas a la vez; tras cada bloque se comprueba la parada
+    bloque: int = 250
+    semilla: int = 0
+    # "permutacion" baraja las operaciones; "remuestreo" las elige con reemplazo
+    muestreo: str = "permutacion"
+    balance: float = BALANCE_INICIAL
+    # Una secuencia incumple si su drawdown máximo (% desde el máximo) llega a
+    # este valor o si el balance cae por debajo del nivel de ruina
+    max_drawdown_pct: float = 10.0
+    ruina_pct: float = None
+    # Fracción máxima de secuencias que pueden incumplir
+    prob_max: float = 0.05
+
+
+def expandir_rejilla(especificacion):
+    """
+    Convierte la rejilla JSON en una lista de (metodología, parámetros),
+    validando cada combinación con la plantilla
+    """
+    if not isinstance(especificacion, list) or not especificacion:
+        raise ValueError("La rejilla debe ser una lista JSON no vacía")
+    candidatos = []
+    for n, entrada in enumerate(especificacion, 1):
+        clave = entrada.get("metodologia") if isinstance(entrada, dict) else None
+        if clave not in METODOLOGIAS_CLI:
+            raise ValueError(
+                f"Rejilla {n}: metodología desconocida {clave!r} "
+                f"(opciones: {', '.join(sorted(METODOLOGIAS_CLI))})"
+            )
+        valores = entrada.get("parametros", {})
+        nombres = list(valores)
+        listas = [v if isinstance(v, list) else [v] for v in valores.values()]
+        for combinacion in product(*listas):
+            parametros = dict(zip(nombres, combinacion))
+            try:
+                METODOLOGIAS_CLI[clave].con_parametros(parametros)
+            except ValueError as e:
+                raise ValueError(f"Rejilla {n}: {e}")
+            candidatos.append((clave, parametros))
+    return candidatos
+
+
+def muestras(r, n, semilla, bloque, muestreo="permutacion"):
+    """
+    Secuencias del bloque `bloque`: dependen solo de la semilla y del número
+    de bloque, así que todas las combinaciones simulan las mismas
+    """
+    rng = np.random.default_rng([semilla, bloque])
+    if muestreo == "remuestreo":
+        return r[rng.integers(0, len(r), size=(n, len(r)))]
+    return rng.permuted(np.broadcast_to(r, (n, len(r))), axis=1)
+
+
+def evaluar(r, clave, parametros, config):
+    """
+    Simula una combinación de parámetros y devuelve sus métricas. Se detiene
+    en cuanto el número de secuencias que incumplen supera el máximo permitido
+    """
+    metodologia = METODOLOGIAS_CLI[clave].con_parametros(parametros)
+    permitidas = int(config.prob_max * config.simulaciones)
+    suelo = None
+    if config.ruina_pct is not None:
+        suelo = config.balance * (1 - config.ruina_pct / 100.0)
+
+    beneficios = []
+    drawdowns = []
+    incumplen = 0
+    simuladas = 0
+    bloque = 0
+    while simuladas < config.simulaciones:
+        n = min(config.bloque, config.simulaciones - simuladas)
+        sims = muestras(r, n, config.semilla, bloque, config.muestreo)
+        resultado = simular_lote(
+            None,
+            sims,
+            np.full(n, len(r)),
+            metodologia,
+            config.balance,
+        )
+        incumple = resultado.max_drawdown_pct >= config.max_drawdown_pct
+        if suelo is not None:
+            incumple |= resultado.equity.min(axis=1, initial=config.balance) <= suelo
+        incumplen += int(incumple.sum())
+        beneficios.append(resultado.equity[:, -1] - config.balance)
+        drawdowns.append(resultado.max_drawdown_pct)
+        simuladas += n
+        bloque += 1
+        if incumplen > permitidas:
+            break
+
+    beneficios = np.concatenate(beneficios)
+    drawdowns = np.concatenate(drawdowns)
+    mediana = float(np.median(beneficios))
+    dd_p95 = float(np.percentile(drawdowns, 95))
+    return {
+        "metodologia": clave,
+        "parametros": parametros,
+        "valida": incumplen <= permitidas,
+        "simulaciones": simuladas,
+        "prob_incumplir": incumplen / simuladas,
+        "beneficio_mediana": mediana,
+        "beneficio_p5": float(np.percentile(beneficios, 5)),
+        "drawdown_mediana_pct": float(np.median(drawdowns)),
+        "drawdown_p95_pct": dd_p95,
+        "ratio": mediana / dd_p95 if dd_p95 > 0 else float("inf"),
+    }
+
+
+def puntuacion(metricas, objetivo):
+    return {
+        "mediana": metricas["beneficio_mediana"],
+        "p5": metricas["beneficio_p5"],
+        "ratio": metricas["ratio"],
+    }[objetivo]
+
+
+# Operaciones y configuración, enviadas una sola vez a cada proceso del pool
+_r = None
+_config = None
+
+
+def _iniciar_proceso(r, config):
+    global _r, _config
+    _r = r
+    _config = config
+
+
+def _evaluar_candidato(candidato):
+    return evaluar(_r, *candidato, _config)
+
+
+def optimizar(r, candidatos, config, workers=None, progreso=None):
+    """
+    Evalúa las combinaciones en un pool de procesos y las devuelve ordenadas
+    como llegan; `progreso` recibe las métricas de cada una al terminar
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(candidatos)))
+    resultados = []
+    with Pool(
+        processes=workers, initializer=_iniciar_proceso, initargs=(r, config)
+    ) as pool:
+        for metricas in pool.imap_unordered(_evaluar_candidato, candidatos):
+            resultados.append(metricas)
+            if progreso is not None:
+                progreso(metricas)
+    return resultados
+
+
+def clasificar(resultados, objetivo="mediana"):
+    """Combinaciones válidas, de mejor a peor según el objetivo"""
+    validas = [metricas for metricas in resultados if metricas["valida"]]
+    return sorted(
+        validas,
+        key=lambda metricas: (
+            -puntuacion(metricas, objetivo),
+            metricas["drawdown_p95_pct"],
+        ),
+    )
+
+
+def como_variantes(clasificados, prefijo="opt"):
+    """Lista en el formato de --variantes de cli.py, con las métricas aparte"""
+    variantes = []
+    for n, metricas in enumerate(clasificados, 1):
+        variantes.append(
+            {
+                "metodologia": metricas["metodologia"],
+                "sufijo": f"_{metricas['metodologia']}_{prefijo}{n}",
+                "parametros": metricas["parametros"],
+                "metricas": {
+                    clave: _valor_json(valor)
+                    for clave, valor in metricas.items()
+                    if clave not in ("metodologia", "parametros", "valida")
+                },
+            }
+        )
+    return variantes
+
+
+def _valor_json(valor):
+    # Sin drawdown el ratio es infinito: JSON no lo admite, se escribe null
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+
+def _leer_r(rutas, args):
+    estrategias = {}
+    for ruta in rutas:
+        for nombre, valores in leer_operaciones(
+            ruta, args.columna, args.columna_estrategia, args.tipo, args.riesgo
+        ):
+            estrategias[nombre] = valores
+    if args.estrategia:
+        if args.estrategia not in estrategias:
+            raise ValueError(f"No hay operaciones de la estrategia '{args.estrategia}'")
+        return estrategias[args.estrategia]
+    # Varias estrategias sin --estrategia: se optimiza sobre todas sus operaciones
+    return np.concatenate(list(estrategias.values()) or [np.zeros(0)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Optimiza por Monte Carlo los parámetros de gestión de riesgo"
+    )
+    parser.add_argument("entradas", nargs="+", help="Archivos CSV de operaciones")
+    parser.add_argument("--rejilla", required=True, help="Archivo JSON con la rejilla")
+    parser.add_argument("-o", "--output", help="JSON con las mejores combinaciones")
+    parser.add_argument(
+        "--top", type=int, default=10, help="Combinaciones guardadas (por defecto, 10)"
+    )
+    parser.add_argument(
+        "--objetivo",
+        choices=OBJETIVOS,
+        default="mediana",
+        help="Beneficio mediano, percentil 5 del beneficio o beneficio mediano "
+        "por punto de drawdown p95",
+    )
+    parser.add_argument("--simulaciones", type=int, default=Configuracion.simulaciones)
+    parser.add_argument("--bloque", type=int, default=Configuracion.bloque)
+    parser.add_argument("--semilla", type=int, default=Configuracion.semilla)
+    parser.add_argument(
+        "--muestreo",
+        choices=("permutacion", "remuestreo"),
+        default=Configuracion.muestreo,
+    )
+    parser.add_argument(
+        "--max-drawdown",
+        type=float,
+        default=Configuracion.max_drawdown_pct,
+        help="Drawdown máximo %% desde el máximo de cada secuencia",
+    )
+    parser.add_argument(
+        "--ruina",
+        type=float,
+        help="Pérdida %% del balance inicial que se considera ruina",
+    )
+    parser.add_argument(
+        "--prob-max",
+        type=float,
+        default=Configuracion.prob_max,
+        help="Fracción máxima de secuencias que pueden incumplir los límites",
+    )
+    parser.add_argument("--balance", type=float, default=BALANCE_INICIAL)
+    parser.add_argument("--tipo", choices=("r", "pl"), default="r")
+    parser.add_argument("--columna")
+    parser.add_argument("--columna-estrategia")
+    parser.add_argument(
+        "--estrategia", help="Estrategia a optimizar si el CSV contiene varias"
+    )
+    parser.add_argument("--riesgo", type=float)
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    if args.tipo == "pl" and not (args.riesgo and args.riesgo > 0):
+        parser.error("Con --tipo pl hay que indicar el --riesgo por operación")
+    try:
+        with open(args.rejilla, encoding="utf-8") as f:
+            candidatos = expandir_rejilla(json.load(f))
+        r = _leer_r(recopilar_csv(args.entradas), args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if not len(r):
+        parser.error("No hay operaciones en las entradas indicadas")
+
+    config = Configuracion(
+        simulaciones=args.simulaciones,
+        bloque=args.bloque,
+        semilla=args.semilla,
+        muestreo=args.muestreo,
+        balance=args.balance,
+        max_drawdown_pct=args.max_drawdown,
+        ruina_pct=args.ruina,
+        prob_max=args.prob_max,
+    )
+    print(
+        f"{len(candidatos)} combinación(es) × {config.simulaciones} secuencias "
+        f"de {len(r)} operaciones",
+        flush=True,
+    )
+
+    def progreso(metricas):
+        icono = "✅" if metricas["valida"] else "⛔"
+        print(
+            f"{icono} {metricas['metodologia']} {json.dumps(metricas['parametros'])}: "
+            f"mediana {metricas['beneficio_mediana']:.2f}, "
+            f"DD p95 {metricas['drawdown_p95_pct']:.2f} %, "
+            f"incumple {metricas['prob_incumplir']:.1%} "
+            f"({metricas['simulaciones']} secuencias)",
+            flush=True,
+        )
+
+    inicio = time.perf_counter()
+    resultados = optimizar(r, candidatos, config, args.workers, progreso)
+    duracion = time.perf_counter() - inicio
+    clasificados = clasificar(resultados, args.objetivo)
+
+    simuladas = sum(metricas["simulaciones"] for metricas in resultados)
+    print(
+        f"\nVálidas: {len(clasificados)} de {len(resultados)} | "
+        f"Secuencias simuladas: {simuladas} de "
+        f"{len(resultados) * config.simulaciones} | Tiempo: {duracion:.2f} s"
+    )
+    variantes = como_variantes(clasificados[: args.top])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(variantes, f, indent=2, ensure_ascii=False, allow_nan=False)
+    for variante in variantes[:3]:
+        print(f"🏆 {variante['sufijo']}: {json.dumps(variante['parametros'])}")
+    return 0 if clasificados else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Tareas de modificación ejecutables en un pool de procesos.
+
+Las funciones viven en un módulo importable (no en el script que ejecuta
+Streamlit como __main__) para que los procesos del pool puedan recibirlas.
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from diferencias import hunks_unificados
+from motor import (
+    METODOLOGIAS,
+    EstructuraInvalida,
+    aplicar_ediciones,
+    preparar_ediciones,
+    validar_estructura,
+)
+from motor.codificacion import decodificar
+from motor.perfilado import Cronometro, etapa
+
+
+def procesar_contenido(data, filename, nombre_metodologia):
+    """
+    Decodifica y modifica un archivo. Devuelve ((modified_content, message,
+    diff), tiempos) con el contenido ya codificado en bytes, en la misma
+    codificación de entrada, los hunks del diff unificado de los cambios
+    (texto, sin nombres: el resultado se cachea por contenido) y los segundos
+    de cada etapa. Lanza EstructuraInvalida si el resultado no compilaría
+    """
+    metodologia = METODOLOGIAS[nombre_metodologia]
+    cronometro = Cronometro()
+    with cronometro.activo():
+        with etapa("decodificacion"):
+            content, codificacion = decodificar(data)
+        ediciones, message = preparar_ediciones(content, filename, metodologia)
+        if ediciones is None:
+            return (None, message, None), cronometro.tiempos
+        with etapa("aplicar_ediciones"):
+            modified_content = aplicar_ediciones(content, ediciones)
+        with etapa("validacion"):
+            problemas = validar_estructura(modified_content, metodologia)
+        if problemas:
+            raise EstructuraInvalida(problemas, filename)
+        with etapa("diff"):
+            diff = hunks_unificados(content, ediciones)
+        with etapa("codificacion"):
+            modified_content = codificacion.codificar(modified_content)
+    return (modified_content, message, diff), cronometro.tiempos
+
+
+def procesar_en_paralelo(archivos, nombre_metodologia, max_workers=None, en_vuelo=None):
+    """
+    Reparte los archivos (índice, filename, data) en un pool de procesos y
+    devuelve (índice, salida de procesar_contenido, excepción) a medida que
+    cada uno termina.
+
+    `archivos` puede ser un generador: solo se leen `en_vuelo` archivos por
+    delante de los resultados ya entregados, así la memoria no crece con el lote.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if hasattr(archivos, "__len__"):
+        max_workers = max(1, min(max_workers, len(archivos)))
+    en_vuelo = en_vuelo or 2 * max_workers
+
+    # spawn: se llama desde hilos de trabajo de un servidor con más hilos, y
+    # los procesos no deben heredar sus cerrojos
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        pendientes = {}
+        siguientes = iter(archivos)
+
+        def rellenar():
+            for i, filename, data in islice(siguientes, en_vuelo - len(pendientes)):
+                futuro = executor.submit(
+                    procesar_contenido, data, filename, nombre_metodologia
+                )
+                pendientes[futuro] = i
+
+        rellenar()
+        while pendientes:
+            hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                i = pendientes.pop(futuro)
+                try:
+                    yield i, futuro.result(), None
+                except Exception as e:
+                    yield i, None, e
+            rellenar()
+
+
+def procesar_con_cache(
+    archivos, nombre_metodologia, cache, max_workers=None, contadores=None
+):
+    """
+    Igual que procesar_en_paralelo, pero consulta la caché en el proceso
+    principal antes de enviar cada archivo al pool y guarda los resultados nuevos.
+    Devuelve (índice, resultado, excepción, tiempos por etapa). Si se pasa el
+    diccionario `contadores`, suma en él los aciertos ("aciertos_memoria",
+    "aciertos_disco") y los fallos de esta llamada
+    """
+    metodologia = METODOLOGIAS[nombre_metodologia]
+    aciertos = deque()
+    claves = {}
+    tiempos = {}
+
+    def sin_cachear():
+        for i, filename, data in archivos:
+            cronometro = Cronometro()
+            with cronometro.etapa("cache"):
+                clave = cache.clave(data, metodologia)
+                resultado, nivel = cache.buscar(clave)
+            if contadores is not None:
+                contador = "fallos" if nivel is None else f"aciertos_{nivel}"
+                contadores[contador] = contadores.get(contador, 0) + 1
+            tiempos[i] = cronometro.tiempos
+            if resultado is not None:
+                aciertos.append((i, resultado, None, tiempos.pop(i)))
+            else:
+                claves[i] = clave
+                yield i, filename, data
+
+    for i, salida, error in procesar_en_paralelo(
+        sin_cachear(), nombre_metodologia, max_workers
+    ):
+        while aciertos:
+            yield aciertos.popleft()
+        clave = claves.pop(i)
+        tiempos_archivo = tiempos.pop(i)
+        resultado = None
+        if error is None:
+            resultado, tiempos_pool = salida
+            tiempos_archivo.update(tiempos_pool)
+            cache.put(clave, resultado)
+        yield i, resultado, error, tiempos_archivo
+    while aciertos:
+        yield aciertos.popleft()
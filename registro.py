@@ -0,0 +1,265 @@
+"""
+Registro persistente de la cartera: StrategyID, MagicNumber, símbolo y
+metodología de cada estrategia modificada.
+
+Las metodologías guardan su estado en variables globales del terminal
+("SQ.TradeLevel." + StrategyID, "SQ.Risk." + StrategyID...) y filtran las
+operaciones por MagicNumber: dos estrategias de la cartera que compartan
+alguno de los dos se corrompen el estado de riesgo. Cada estrategia se
+comprueba al registrarla con dos consultas por índice (SQLite), así que el
+coste no depende del tamaño de la cartera.
+
+Un StrategyID solo choca entre metodologías que usan las mismas variables
+globales (todas las variantes de Gerard comparten "SQ.TradeLevel."); un
+MagicNumber choca siempre. Cada estrategia se identifica por la ruta relativa
+de su archivo original (clave_cartera), la misma desde la CLI, el modo
+vigilancia y la interfaz, así que sus variantes no chocan entre sí.
+
+    python cli.py exports/ -m gerard -o salida.zip --registro
+    python registro.py
+    python registro.py --olvidar "EURUSD/Strategy 1.2.3.mq5"
+
+Sin argumentos, registro.py lista las colisiones que ya hay en la cartera.
+"""
+
+import argparse
+import os
+import posixpath
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+REGISTRO_RUTA = os.environ.get(
+    "MQL5_REGISTRO", os.path.join(os.path.expanduser("~"), ".mql5_cartera.sqlite")
+)
+
+# Estrategias de la cartera que se informan por cada dato repetido
+MAX_COLISIONES = 20
+
+# Colisiones que se describen en un mensaje; del resto solo se da el número
+MOSTRADAS = 3
+
+
+@dataclass(frozen=True)
+class Colision:
+    """Estrategia ya registrada que comparte `campo` con la nueva"""
+
+    campo: str
+    valor: str
+    archivo: str
+    metodologia: str
+    simbolo: str = None
+
+    def __str__(self):
+        detalle = (
+            f"{self.metodologia}, {self.simbolo}" if self.simbolo else self.metodologia
+        )
+        return f"{self.campo} {self.valor} ya lo usa {self.archivo} ({detalle})"
+
+
+def clave_cartera(relpath):
+    """
+    Clave de una estrategia en el registro: su ruta relativa (en el
+    directorio de entrada o dentro del paquete subido), normalizada con '/'
+    """
+    return posixpath.normpath(relpath.replace("\\", "/")).lstrip("/")
+
+
+def describir_colisiones(colisiones, mostradas=MOSTRADAS):
+    texto = "; ".join(str(colision) for colision in colisiones[:mostradas])
+    if len(colisiones) > mostradas:
+        texto += f" y {len(colisiones) - mostradas} más"
+    return f"Colisión en la cartera: {texto}"
+
+
+class RegistroCartera:
+    """
+    Estrategias registradas, por (archivo, metodología). Cada conexión se usa
+    desde un solo hilo; varios procesos pueden compartir la base de datos
+    """
+
+    def __init__(self, ruta=REGISTRO_RUTA):
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(directorio, exist_ok=True)
+        # Transacciones explícitas: la comprobación y el alta son atómicas
+        self._conexion = sqlite3.connect(ruta, timeout=30, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        with self._transaccion():
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS estrategias ("
+                " archivo TEXT NOT NULL,"
+                " metodologia TEXT NOT NULL,"
+                " variables TEXT NOT NULL,"
+                " strategy_id TEXT,"
+                " magic_number INTEGER,"
+                " simbolo TEXT,"
+                " registrado REAL NOT NULL,"
+                " PRIMARY KEY (archivo, metodologia))"
+            )
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS estrategias_strategy_id"
+                " ON estrategias (strategy_id, variables)"
+            )
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS estrategias_magic_number"
+                " ON estrategias (magic_number)"
+            )
+
+    @contextmanager
+    def _transaccion(self):
+        # BEGIN IMMEDIATE: ningún otro proceso escribe entre consulta y alta
+        self._conexion.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conexion.execute("ROLLBACK")
+            raise
+        self._conexion.execute("COMMIT")
+
+    def __len__(self):
+        return self._conexion.execute("SELECT COUNT(*) FROM estrategias").fetchone()[0]
+
+    def colisiones(self, archivo, identidad, metodologias):
+        """Estrategias de otros archivos que chocan con `identidad`"""
+        colisiones = []
+        if identidad.strategy_id:
+            vistos = set()
+            for metodologia in metodologias:
+                variables = _variables(metodologia)
+                if not variables or variables in vistos:
+                    continue
+                vistos.add(variables)
+                colisiones += self._buscar(
+                    "StrategyID",
+                    identidad.strategy_id,
+                    "strategy_id = ? AND variables = ?",
+                    (identidad.strategy_id, variables),
+                    archivo,
+                )
+        if identidad.magic_number is not None:
+            colisiones += self._buscar(
+                "MagicNumber",
+                identidad.magic_number,
+                "magic_number = ?",
+                (identidad.magic_number,),
+                archivo,
+            )
+        return colisiones
+
+    def _buscar(self, campo, valor, condicion, parametros, archivo):
+        # Una fila por archivo aunque tenga varias metodologías registradas
+        filas = self._conexion.execute(
+            "SELECT archivo, group_concat(metodologia, ', '), max(simbolo)"
+            f" FROM estrategias WHERE {condicion} AND archivo != ?"
+            " GROUP BY archivo ORDER BY min(registrado) LIMIT ?",
+            (*parametros, archivo, MAX_COLISIONES),
+        )
+        return [Colision(campo, str(valor), *fila) for fila in filas]
+
+    def registrar(self, archivo, identidad, metodologias):
+        """
+        Da de alta (o actualiza) el archivo con cada metodología y devuelve
+        las colisiones con el resto de la cartera
+        """
+        with self._transaccion():
+            colisiones = self.colisiones(archivo, identidad, metodologias)
+            ahora = time.time()
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO estrategias VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        archivo,
+                        metodologia.clave,
+                        _variables(metodologia),
+                        identidad.strategy_id,
+                        identidad.magic_number,
+                        identidad.simbolo,
+                        ahora,
+                    )
+                    for metodologia in metodologias
+                ),
+            )
+        return colisiones
+
+    def colisiones_cartera(self):
+        """
+        (campo, valor, archivos) de cada StrategyID o MagicNumber que ya
+        comparten varios archivos de la cartera
+        """
+        consultas = (
+            # Solo las metodologías que nombran variables con el StrategyID
+            ("StrategyID", "strategy_id", "strategy_id, variables", "variables != ''"),
+            ("MagicNumber", "magic_number", "magic_number", "1"),
+        )
+        grupos = []
+        for campo, columna, grupo, condicion in consultas:
+            filas = self._conexion.execute(
+                f"SELECT {grupo}, group_concat(archivo, char(0)) FROM ("
+                f" SELECT DISTINCT {grupo}, archivo FROM estrategias"
+                f" WHERE {columna} IS NOT NULL AND {condicion})"
+                f" GROUP BY {grupo} HAVING count(*) > 1 ORDER BY {columna}"
+            )
+            for valor, *variables, archivos in filas:
+                if variables:
+                    # Las variables globales en las que chocan
+                    valor = f"{valor} ({variables[0]})"
+                grupos.append((campo, str(valor), sorted(archivos.split("\0"))))
+        return grupos
+
+    def olvidar(self, archivos):
+        with self._transaccion():
+            self._conexion.executemany(
+                "DELETE FROM estrategias WHERE archivo = ?",
+                ((archivo,) for archivo in archivos),
+            )
+
+    def cerrar(self):
+        self._conexion.close()
+
+
+def _variables(metodologia):
+    return ",".join(sorted(metodologia.variables_globales))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Colisiones de StrategyID y MagicNumber en la cartera registrada"
+    )
+    parser.add_argument(
+        "--registro",
+        default=REGISTRO_RUTA,
+        metavar="ARCHIVO.sqlite",
+        help=f"Base de datos de la cartera (por defecto, {REGISTRO_RUTA})",
+    )
+    parser.add_argument(
+        "--olvidar",
+        nargs="+",
+        default=[],
+        metavar="ARCHIVO",
+        help="Da de baja estrategias retiradas de la cartera (ruta relativa del "
+        ".mq5 original)",
+    )
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.registro):
+        parser.error(f"No existe el registro '{args.registro}'")
+
+    registro = RegistroCartera(args.registro)
+    try:
+        if args.olvidar:
+            registro.olvidar([clave_cartera(archivo) for archivo in args.olvidar])
+        grupos = registro.colisiones_cartera()
+        total = len(registro)
+    finally:
+        registro.cerrar()
+
+    for campo, valor, archivos in grupos:
+        print(f"💥 {campo} {valor}: {', '.join(archivos)}")
+    print(f"\nRegistros: {total} | Colisiones: {len(grupos)}")
+    return 1 if grupos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
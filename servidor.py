@@ -0,0 +1,575 @@
+"""
+API HTTP local por lotes (FastAPI), para llamar a las metodologías desde
+otras herramientas sin la interfaz de Streamlit.
+
+Uso:
+    python servidor.py --puerto 8000 -j 4
+    uvicorn --factory servidor:crear_app --port 8000
+
+    curl -F metodologia=gerard -F archivos=@estrategia.mq5 -F archivos=@lote.zip \\
+        http://127.0.0.1:8000/procesar -o resultado.zip
+    curl --data-binary @export_sqx.zip -H "Content-Type: application/zip" \\
+        "http://127.0.0.1:8000/procesar?metodologia=benjamin&parametros=%7B%22g_riskStep%22%3A0.5%7D" \\
+        -o resultado.zip
+    curl http://127.0.0.1:8000/salud
+
+POST /procesar recibe archivos .mq5 o .zip (multipart/form-data, o un .zip
+como cuerpo) y, en la consulta o como campos del formulario, "metodologia"
+(se puede repetir), "parametros" (objeto JSON con los valores por defecto de
+los inputs, para todas las metodologías indicadas), "variantes" (lista JSON
+en el formato de --variantes de cli.py), "validacion" y "nivel_zip".
+
+La respuesta es un .zip que se envía por trozos a medida que termina cada
+archivo, y que acaba con manifiesto.json: el estado y el mensaje de cada
+archivo de entrada, las entradas generadas y su identidad (StrategyID,
+MagicNumber y símbolo, ver registro.py).
+
+La memoria está acotada: las subidas se guardan en disco, los archivos se
+procesan y comprimen en un pool de procesos común con un límite de archivos
+en vuelo para todo el servidor y otro por petición, y cada petición solo
+envía archivos nuevos al pool a medida que el cliente lee la respuesta. Como
+mucho --max-lotes peticiones se atienden a la vez; el resto esperan turno
+unos segundos y, si no llega, reciben un 503.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import posixpath
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from functools import partial
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.datastructures import UploadFile
+
+import cli
+from cli import VALIDACIONES
+from entradas import es_zip, miembros_mq5
+from motor import METODOLOGIAS_CLI, Identidad, interpretar_variantes
+from zip_salida import (
+    abrir_zip,
+    anexar_entrada,
+    escribir_entrada,
+    preparar_entrada,
+)
+
+# Tamaño máximo del cuerpo de una petición
+MAX_SUBIDA = int(os.environ.get("MQL5_API_MAX_SUBIDA_MB", "512")) * 1024 * 1024
+
+# Tamaño máximo de los campos de texto de un formulario
+MAX_CAMPO = 1024 * 1024
+
+# Archivos por formulario
+MAX_ARCHIVOS = 1000
+
+# Peticiones de /procesar atendidas a la vez
+MAX_LOTES = 4
+
+# Segundos que una petición espera turno antes de recibir un 503
+ESPERA_LOTE = 30
+
+# Cuerpo máximo que se descarta al rechazar una petición; con uno mayor se
+# cierra la conexión sin leerlo
+MAX_DESCARTE = 16 * 1024 * 1024
+
+# Segundos que puede tardar el cliente en aceptar cada trozo de la respuesta
+TIMEOUT = 120
+
+MANIFIESTO = "manifiesto.json"
+
+
+class PeticionInvalida(ValueError):
+    """Error del cliente: se responde con el código indicado"""
+
+    def __init__(self, mensaje, codigo=400):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+def _iniciar_trabajador():
+    # Ctrl+C y SIGTERM los atiende el servidor, que cierra el pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _procesar_tarea(metodologias, validacion, compresion, nivel, tarea):
+    """
+    Trabajo de cada proceso del pool: el de cli.py, con las metodologías de
+    la petición. Las salidas vuelven ya comprimidas para el ZIP
+    (preparar_entrada), así que el servidor solo tiene que anexarlas
+    """
+    if (metodologias, validacion) != (cli._metodologias, cli._validacion):
+        cli._iniciar_proceso(metodologias, validacion=validacion)
+    # Los paquetes de peticiones anteriores ya no existen
+    for ruta in [ruta for ruta in cli._bundles_abiertos if ruta != tarea[0]]:
+        if not os.path.exists(ruta):
+            cli._bundles_abiertos.pop(ruta).close()
+    relpath, estado, message, salidas, tiempos, identidad = cli._procesar_archivo(tarea)
+    comprimidas = [
+        (nombre, preparar_entrada(data, compresion, nivel)) for nombre, data in salidas
+    ]
+    return relpath, estado, message, comprimidas, tiempos, identidad
+
+
+def _nombre_subido(nombre):
+    """Nombre base de un archivo subido, sin carpetas"""
+    return posixpath.basename(nombre.replace("\\", "/")).strip()
+
+
+def _guardar(origen, ruta):
+    with open(ruta, "wb") as f:
+        shutil.copyfileobj(origen, f, 1024 * 1024)
+
+
+def listar_tareas(archivos):
+    """
+    (ruta, miembro, relpath) de cada .mq5 subido, suelto o dentro de un
+    paquete. Los relpath repetidos entre subidas se distinguen con el número
+    de la subida delante
+    """
+    tareas = []
+    usados = set()
+    for n, (nombre, ruta) in enumerate(archivos):
+        if es_zip(nombre):
+            try:
+                with zipfile.ZipFile(ruta) as bundle:
+                    candidatos = [
+                        (ruta, info.filename, info.filename)
+                        for info in miembros_mq5(bundle)
+                    ]
+            except zipfile.BadZipFile:
+                raise PeticionInvalida(f"'{nombre}' no es un .zip válido")
+        else:
+            candidatos = [(ruta, None, nombre)]
+        for ruta_tarea, miembro, relpath in candidatos:
+            if relpath in usados:
+                relpath = f"{n}/{relpath}"
+            usados.add(relpath)
+            tareas.append((ruta_tarea, miembro, relpath))
+    return tareas
+
+
+def interpretar_opciones(opciones):
+    """
+    Metodologías, validación y nivel de compresión a partir de los valores
+    (listas de textos) de la consulta y del formulario
+    """
+
+    def unico(nombre, defecto=None):
+        valores = opciones.get(nombre)
+        return valores[-1] if valores else defecto
+
+    metodologias = []
+    for clave in dict.fromkeys(opciones.get("metodologia", [])):
+        if clave not in METODOLOGIAS_CLI:
+            raise PeticionInvalida(
+                f"Metodología desconocida {clave!r} "
+                f"(opciones: {', '.join(sorted(METODOLOGIAS_CLI))})"
+            )
+        metodologias.append(METODOLOGIAS_CLI[clave])
+    try:
+        parametros = unico("parametros")
+        if parametros is not None:
+            parametros = json.loads(parametros)
+            if not isinstance(parametros, dict):
+                raise PeticionInvalida("'parametros' debe ser un objeto JSON")
+            metodologias = [
+                metodologia.con_parametros(parametros) for metodologia in metodologias
+            ]
+        variantes = unico("variantes")
+        if variantes is not None:
+            metodologias += interpretar_variantes(json.loads(variantes), "'variantes'")
+    except PeticionInvalida:
+        raise
+    except ValueError as e:
+        raise PeticionInvalida(str(e))
+    if not metodologias:
+        raise PeticionInvalida(
+            "Indica al menos una metodología ('metodologia') o 'variantes'"
+        )
+    sufijos = [metodologia.suffix for metodologia in metodologias]
+    repetidos = sorted({sufijo for sufijo in sufijos if sufijos.count(sufijo) > 1})
+    if repetidos:
+        raise PeticionInvalida(f"Sufijos de salida repetidos: {', '.join(repetidos)}")
+
+    validacion = unico("validacion", "bloquear")
+    if validacion not in VALIDACIONES:
+        raise PeticionInvalida(
+            f"'validacion' debe ser uno de: {', '.join(VALIDACIONES)}"
+        )
+    nivel = unico("nivel_zip")
+    if nivel is not None:
+        if not nivel.isdigit() or int(nivel) > 9:
+            raise PeticionInvalida("'nivel_zip' debe estar entre 0 y 9")
+        nivel = int(nivel)
+    return metodologias, validacion, nivel
+
+
+async def leer_peticion(request, directorio):
+    """
+    Guarda los archivos subidos en `directorio`, cada uno en su carpeta.
+    Devuelve (opciones, tareas)
+    """
+    opciones = {}
+    for campo, valor in request.query_params.multi_items():
+        opciones.setdefault(campo, []).append(valor)
+    try:
+        longitud = int(request.headers.get("content-length", ""))
+    except ValueError:
+        raise PeticionInvalida("Indica Content-Length en la petición", 411)
+    if longitud > MAX_SUBIDA:
+        raise PeticionInvalida(
+            f"La subida supera el máximo de {MAX_SUBIDA // 1024 // 1024} MB", 413
+        )
+
+    archivos = []
+    tipo = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if tipo == "multipart/form-data":
+        # Starlette vuelca a disco los archivos de más de 1 MB
+        async with request.form(
+            max_files=MAX_ARCHIVOS, max_part_size=MAX_CAMPO
+        ) as formulario:
+            for campo, valor in formulario.multi_items():
+                if not isinstance(valor, UploadFile):
+                    opciones.setdefault(campo, []).append(valor)
+                    continue
+                nombre = _nombre_subido(valor.filename or "")
+                if not nombre.lower().endswith((".mq5", ".zip")):
+                    # Otros archivos se ignoran
+                    continue
+                carpeta = os.path.join(directorio, str(len(archivos)))
+                os.mkdir(carpeta)
+                ruta = os.path.join(carpeta, nombre)
+                await asyncio.to_thread(_guardar, valor.file, ruta)
+                archivos.append((nombre, ruta))
+    elif tipo in ("application/zip", "application/x-zip-compressed"):
+        carpeta = os.path.join(directorio, "0")
+        os.mkdir(carpeta)
+        ruta = os.path.join(carpeta, "subida.zip")
+        with open(ruta, "wb") as f:
+            async for data in request.stream():
+                f.write(data)
+        archivos.append(("subida.zip", ruta))
+    else:
+        raise PeticionInvalida(
+            "Envía multipart/form-data o un .zip (application/zip)", 415
+        )
+    # Leer el directorio central de los paquetes no bloquea el bucle
+    return opciones, await asyncio.to_thread(listar_tareas, archivos)
+
+
+class _Salida:
+    """
+    Destino del ZIP de la respuesta: acumula lo escrito hasta que se envía.
+    Sin tell() ni seek(): zipfile lo trata como un flujo y no vuelve atrás
+    """
+
+    def __init__(self):
+        self._pendiente = bytearray()
+
+    def write(self, data):
+        self._pendiente += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        data = bytes(self._pendiente)
+        self._pendiente.clear()
+        return data
+
+
+def _liberar_al_terminar(loop, huecos, futuro):
+    """Libera el hueco de una tarea abandonada cuando el pool termine con ella"""
+
+    def liberar(_):
+        try:
+            loop.call_soon_threadsafe(huecos.release)
+        except RuntimeError:
+            # El bucle ya se cerró con el servidor
+            pass
+
+    futuro.add_done_callback(liberar)
+
+
+async def generar_zip(estado, tareas, metodologias, validacion, nivel):
+    """
+    Trozos del ZIP de resultados, en el orden en que terminan los archivos.
+    Solo se envían archivos nuevos al pool tras entregar los resultados
+    anteriores, así que un cliente lento frena su propia petición
+    """
+    loop = asyncio.get_running_loop()
+    inicio = time.perf_counter()
+    manifiesto = []
+    contadores = dict.fromkeys(cli.ICONOS, 0)
+    pendientes = {}
+    siguientes = iter(tareas)
+    salida = _Salida()
+    try:
+        with abrir_zip(salida, nivel) as zip_file:
+            procesar = partial(
+                _procesar_tarea,
+                metodologias,
+                validacion,
+                zip_file.compression,
+                zip_file.compresslevel,
+            )
+
+            async def rellenar():
+                while len(pendientes) < estado.en_vuelo_lote:
+                    # Sin hueco en el pool común, espera a que otra petición
+                    # (o esta misma) entregue algún resultado
+                    if pendientes and estado.huecos.locked():
+                        return
+                    await estado.huecos.acquire()
+                    tarea = next(siguientes, None)
+                    if tarea is None:
+                        estado.huecos.release()
+                        return
+                    try:
+                        original = estado.pool.submit(procesar, (*tarea, None))
+                    except BaseException:
+                        estado.huecos.release()
+                        raise
+                    pendientes[asyncio.wrap_future(original)] = (original, tarea[2])
+
+            await rellenar()
+            while pendientes:
+                hechos, _ = await asyncio.wait(
+                    pendientes, return_when=asyncio.FIRST_COMPLETED
+                )
+                for futuro in hechos:
+                    _, relpath = pendientes.pop(futuro)
+                    try:
+                        try:
+                            _, resultado, message, salidas, _, identidad = (
+                                futuro.result()
+                            )
+                        except Exception as e:
+                            resultado, message, salidas = "error", str(e), []
+                            identidad = Identidad()
+                        for nombre, comprimida in salidas:
+                            anexar_entrada(zip_file, nombre, comprimida)
+                    finally:
+                        # El hueco se libera cuando el resultado ya está en el
+                        # ZIP (o se descartó)
+                        estado.huecos.release()
+                    contadores[resultado] += 1
+                    manifiesto.append(
+                        {
+                            "archivo": relpath,
+                            "estado": resultado,
+                            "mensaje": message,
+                            "salidas": [nombre for nombre, _ in salidas],
+                            "identidad": asdict(identidad),
+                        }
+                    )
+                await rellenar()
+                yield salida.vaciar()
+
+            escribir_entrada(
+                zip_file,
+                MANIFIESTO,
+                json.dumps(
+                    {
+                        "metodologias": [m.nombre for m in metodologias],
+                        "sufijos": [m.suffix for m in metodologias],
+                        "contadores": contadores,
+                        "duracion_s": round(time.perf_counter() - inicio, 3),
+                        "archivos": manifiesto,
+                    },
+                    ensure_ascii=False,
+                    indent=2,
+                ),
+            )
+        yield salida.vaciar()
+    finally:
+        # El cliente cerró la conexión o dejó de leer. Una tarea que ya está en
+        # un proceso del pool no se detiene: ocupa su hueco hasta que termine
+        for original, _ in pendientes.values():
+            if original.cancel():
+                estado.huecos.release()
+            else:
+                _liberar_al_terminar(loop, estado.huecos, original)
+
+
+class _RespuestaZip(StreamingResponse):
+    """
+    StreamingResponse que siempre ejecuta `liberar` al terminar, también si
+    el cliente se desconecta antes de empezar a leer, y que abandona la
+    respuesta si el cliente tarda más de TIMEOUT en aceptar un trozo
+    """
+
+    def __init__(self, contenido, liberar):
+        super().__init__(
+            contenido,
+            media_type="application/zip",
+            headers={
+                "Content-Disposition": (
+                    'attachment; filename="estrategias_modificadas.zip"'
+                )
+            },
+        )
+        self.liberar = liberar
+
+    async def __call__(self, scope, receive, send):
+        async def enviar(mensaje):
+            async with asyncio.timeout(TIMEOUT):
+                await send(mensaje)
+
+        try:
+            await super().__call__(scope, receive, enviar)
+        except TimeoutError:
+            pass
+        finally:
+            await self.body_iterator.aclose()
+            self.liberar()
+
+
+@asynccontextmanager
+async def _ciclo_de_vida(app):
+    estado = app.state
+    # spawn: los procesos no heredan los hilos ni el bucle del servidor
+    estado.pool = ProcessPoolExecutor(
+        max_workers=estado.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_iniciar_trabajador,
+    )
+    estado.huecos = asyncio.Semaphore(estado.en_vuelo)
+    estado.lotes = asyncio.Semaphore(estado.max_lotes)
+    estado.lotes_activos = 0
+    try:
+        yield
+    finally:
+        estado.pool.shutdown(cancel_futures=True)
+
+
+def crear_app(workers=None, max_lotes=MAX_LOTES, en_vuelo=None):
+    """
+    Aplicación FastAPI con un pool de procesos común. `en_vuelo` limita los
+    archivos enviados al pool y aún no añadidos a su respuesta, entre todas
+    las peticiones; cada una, como mucho `en_vuelo_lote`
+    """
+    app = FastAPI(
+        title="Modificador de Estrategias MQL5",
+        lifespan=_ciclo_de_vida,
+    )
+    app.state.workers = workers or os.cpu_count() or 1
+    app.state.max_lotes = max_lotes
+    app.state.en_vuelo = en_vuelo or 4 * app.state.workers
+    app.state.en_vuelo_lote = max(1, min(app.state.en_vuelo, 2 * app.state.workers))
+
+    @app.exception_handler(PeticionInvalida)
+    async def peticion_invalida(request, error):
+        return JSONResponse({"detail": str(error)}, error.codigo)
+
+    @app.get("/salud")
+    async def salud():
+        return {
+            "estado": "ok",
+            "metodologias": sorted(METODOLOGIAS_CLI),
+            "workers": app.state.workers,
+            "lotes_activos": app.state.lotes_activos,
+        }
+
+    @app.post("/procesar")
+    async def procesar(request: Request):
+        """
+        Procesa los .mq5 subidos (sueltos o en .zip) y devuelve un .zip por
+        trozos que termina con manifiesto.json
+        """
+        estado = app.state
+        try:
+            await asyncio.wait_for(estado.lotes.acquire(), ESPERA_LOTE)
+        except TimeoutError:
+            # Se lee el cuerpo (si no es muy grande) para que el cliente
+            # termine de enviarlo y reciba la respuesta
+            cabeceras = {"Retry-After": "5"}
+            longitud = request.headers.get("content-length", "")
+            if longitud.isdigit() and int(longitud) <= MAX_DESCARTE:
+                async for _ in request.stream():
+                    pass
+            else:
+                cabeceras["Connection"] = "close"
+            return JSONResponse(
+                {"detail": "Servidor ocupado, reintenta más tarde"}, 503, cabeceras
+            )
+
+        estado.lotes_activos += 1
+        directorio = tempfile.TemporaryDirectory(prefix="mql5_api_")
+
+        def liberar():
+            directorio.cleanup()
+            estado.lotes_activos -= 1
+            estado.lotes.release()
+
+        try:
+            opciones, tareas = await leer_peticion(request, directorio.name)
+            metodologias, validacion, nivel = interpretar_opciones(opciones)
+            if not tareas:
+                raise PeticionInvalida("No se recibió ningún archivo .mq5")
+        except BaseException:
+            liberar()
+            raise
+        return _RespuestaZip(
+            generar_zip(estado, tareas, metodologias, validacion, nivel), liberar
+        )
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="API HTTP local del Modificador de Estrategias MQL5"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8000)
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Número de procesos (por defecto, uno por núcleo)",
+    )
+    parser.add_argument(
+        "--max-lotes",
+        type=int,
+        default=MAX_LOTES,
+        help=f"Peticiones atendidas a la vez; el resto esperan hasta "
+        f"{ESPERA_LOTE} s y después reciben un 503",
+    )
+    parser.add_argument(
+        "--en-vuelo",
+        type=int,
+        default=None,
+        help="Archivos en el pool o pendientes de añadir a su respuesta, entre "
+        "todas las peticiones (por defecto, cuatro por proceso)",
+    )
+    args = parser.parse_args(argv)
+
+    app = crear_app(args.workers, args.max_lotes, args.en_vuelo)
+    uvicorn.run(
+        app,
+        host=args.host,
+        port=args.puerto,
+        # Las respuestas en curso tienen este margen para terminar al cerrar
+        timeout_graceful_shutdown=ESPERA_LOTE,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
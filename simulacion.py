@@ -0,0 +1,477 @@
+"""
+Simulación de la gestión de riesgo inyectada sobre listas de operaciones.
+
+Reproduce con NumPy las máquinas de estado de las plantillas MQL5 (la escalera
+de niveles de Gerard y los pasos y umbrales de Benjamin) sobre el resultado de
+cada operación en múltiplos de R, así que se pueden comparar metodologías y
+parámetros sin compilar ni hacer un backtest en MetaTrader 5. Los parámetros
+se leen de los inputs de la propia plantilla, también en las variantes.
+
+Como en el EA, el dinero arriesgado en cada operación es un porcentaje del
+balance inicial y la operación gana o pierde R veces ese importe. No se
+modela el redondeo del lote a SYMBOL_VOLUME_STEP.
+
+Uso:
+    python simulacion.py operaciones.csv
+    python simulacion.py "exports/*.csv" --tipo pl --riesgo 100 -m gerard
+    python simulacion.py cartera.csv --columna-estrategia Strategy \\
+        --variantes escalas.json -o resumen.csv --curvas curvas.csv
+
+El CSV se lee en streaming y las estrategias se simulan por lotes: con
+--columna-estrategia, las filas de cada estrategia deben ser consecutivas;
+sin ella, cada archivo es una estrategia.
+"""
+
+import argparse
+import csv
+import glob
+import os
+import sys
+from array import array
+from dataclasses import dataclass
+
+import numpy as np
+
+from motor import (
+    BENJAMIN_MARKER,
+    GERARD_MARKER,
+    METODOLOGIAS_CLI,
+    cargar_variantes,
+    leer_parametros,
+)
+from motor.codificacion import detectar_codificacion
+
+BALANCE_INICIAL = 100_000.0
+
+# Estrategias simuladas a la vez
+TAMANO_LOTE = 1024
+
+# Nombres de columna reconocidos (sin distinguir mayúsculas) para cada tipo
+COLUMNAS_VALOR = {
+    "r": ("r", "r-multiple", "r_multiple", "rmultiple", "r multiple"),
+    "pl": ("profit/loss", "p/l", "pl", "profit", "beneficio"),
+}
+
+
+@dataclass
+class ResultadoLote:
+    """
+    Resultado de simular un lote de estrategias con una metodología. Las
+    matrices tienen una fila por estrategia y una columna por operación; más
+    allá de la última operación de cada estrategia, la curva no cambia
+    """
+
+    nombres: list
+    longitudes: np.ndarray
+    beneficio_operacion: np.ndarray
+    equity: np.ndarray
+    max_drawdown: np.ndarray
+    max_drawdown_pct: np.ndarray
+    # Riesgo % de la siguiente operación y, en Gerard, nivel de la escalera
+    riesgo_siguiente: np.ndarray
+    nivel_final: np.ndarray = None
+
+    def curva(self, i):
+        """Curva de equity de la estrategia `i`, una entrada por operación"""
+        return self.equity[i, : self.longitudes[i]]
+
+
+def niveles_gerard(parametros):
+    """Niveles de riesgo de g_riskLevels_string, como StringSplit en OnInit"""
+    try:
+        niveles = np.array(
+            [float(parte) for parte in parametros["g_riskLevels_string"].split(",")]
+        )
+    except ValueError:
+        raise ValueError(
+            f"g_riskLevels_string no válido: {parametros['g_riskLevels_string']!r}"
+        )
+    if not len(niveles) or (niveles <= 0).any():
+        raise ValueError("Los niveles de riesgo deben ser porcentajes positivos")
+    return niveles
+
+
+def simular_gerard(r, longitudes, parametros, balance=BALANCE_INICIAL):
+    """
+    Escalera de Gerard: cada pérdida sube un nivel (hasta el último) y cada
+    operación no perdedora vuelve al nivel 1. Con riesgos positivos, el signo
+    del beneficio es el de R, así que el nivel de cada operación solo depende
+    de la racha de pérdidas previa y se calcula sin recorrer las operaciones
+    """
+    niveles = niveles_gerard(parametros)
+    perdida = r < 0
+    perdidas = np.cumsum(perdida, axis=1)
+    # Pérdidas consecutivas hasta cada operación, incluida
+    racha = perdidas - np.maximum.accumulate(np.where(perdida, 0, perdidas), axis=1)
+    previa = np.zeros_like(racha)
+    previa[:, 1:] = racha[:, :-1]
+    nivel = np.minimum(previa + 1, len(niveles))
+
+    riesgo = niveles[nivel - 1]
+    beneficio = r * ((balance * riesgo) / 100.0)
+    filas = np.arange(len(r))
+    ultima = np.maximum(longitudes - 1, 0)
+    nivel_final = np.where(
+        longitudes > 0, np.minimum(racha[filas, ultima] + 1, len(niveles)), 1
+    )
+    return beneficio, niveles[nivel_final - 1], nivel_final
+
+
+def simular_benjamin(r, longitudes, parametros, balance=BALANCE_INICIAL):
+    """
+    Gestión de Benjamin: el riesgo baja un paso tras cada operación no
+    perdedora (hasta el mínimo) y sube un paso tras cada pérdida; con el P/L
+    acumulado por debajo o por encima de los umbrales se arriesga una cantidad
+    fija. El P/L acumulado hace el estado secuencial: se recorren las
+    operaciones una vez, con todas las estrategias del lote en paralelo y la
+    misma aritmética de doble precisión que el EA
+    """
+    if balance <= 0:
+        raise ValueError("El balance inicial debe ser mayor que 0")
+    paso = parametros["g_riskStep"]
+    minimo = parametros["g_minRiskPercent"]
+    umbral_perdida = parametros["g_maxLossThreshold"]
+    riesgo_perdida = parametros["g_maxLossRisk"]
+    umbral_ganancia = parametros["g_profitProtectThreshold"]
+    riesgo_ganancia = parametros["g_profitProtectRisk"]
+
+    riesgo = np.full(len(r), float(parametros["g_initialRiskPercent"]))
+    total = np.zeros(len(r))
+    beneficio = np.zeros_like(r)
+    for t in range(r.shape[1]):
+        activas = t < longitudes
+        riesgo_operacion = np.where(
+            total <= umbral_perdida,
+            riesgo_perdida,
+            np.where(total >= umbral_ganancia, riesgo_ganancia, riesgo),
+        )
+        beneficio_t = r[:, t] * ((balance * riesgo_operacion) / 100.0)
+        beneficio[:, t] = np.where(activas, beneficio_t, 0.0)
+        total = np.where(activas, total + (beneficio_t / balance) * 100.0, total)
+
+        gana = beneficio_t >= 0
+        nuevo = np.where(gana, riesgo - paso, riesgo + paso)
+        nuevo = np.where(gana & (nuevo < minimo), minimo, nuevo)
+        riesgo = np.where(activas, nuevo, riesgo)
+
+    # Riesgo con el que se abriría la siguiente operación
+    siguiente = np.where(
+        total <= umbral_perdida,
+        riesgo_perdida,
+        np.where(total >= umbral_ganancia, riesgo_ganancia, riesgo),
+    )
+    return beneficio, siguiente, None
+
+
+# Máquina de estado de cada metodología, identificada por su marcador (las
+# variantes con otros parámetros lo conservan)
+SIMULADORES = {GERARD_MARKER: simular_gerard, BENJAMIN_MARKER: simular_benjamin}
+
+
+def simular_lote(nombres, r, longitudes, metodologia, balance=BALANCE_INICIAL):
+    """Simula un lote (matriz de R con relleno) con una metodología"""
+    parametros = leer_parametros(metodologia.risk_management_inputs)
+    simulador = SIMULADORES[metodologia.processed_marker]
+    beneficio, riesgo_siguiente, nivel_final = simulador(
+        r, longitudes, parametros, balance
+    )
+
+    equity = balance + np.cumsum(beneficio, axis=1)
+    maximo = np.maximum(np.maximum.accumulate(equity, axis=1), balance)
+    caida = maximo - equity
+    # La mayor caída en dinero y en % desde el máximo pueden no coincidir
+    max_drawdown = caida.max(axis=1, initial=0.0)
+    max_drawdown_pct = (caida / maximo).max(axis=1, initial=0.0) * 100.0
+
+    return ResultadoLote(
+        nombres,
+        longitudes,
+        beneficio,
+        equity,
+        max_drawdown,
+        max_drawdown_pct,
+        riesgo_siguiente,
+        nivel_final,
+    )
+
+
+# --- Lectura de operaciones ---
+
+
+def _numero(texto, decimal_coma):
+    texto = texto.strip().replace(" ", "")
+    if decimal_coma and "," in texto:
+        # 1.234,5 -> 1234.5
+        texto = texto.replace(".", "").replace(",", ".")
+    return float(texto)
+
+
+def _columna(cabecera, nombre, candidatos, ruta):
+    normalizada = [celda.strip().lower() for celda in cabecera]
+    for candidato in (nombre,) if nombre else candidatos:
+        if candidato.lower() in normalizada:
+            return normalizada.index(candidato.lower())
+    buscada = nombre or " / ".join(candidatos)
+    raise ValueError(
+        f"{ruta}: no se encuentra la columna {buscada!r} "
+        f"(columnas: {', '.join(cabecera)})"
+    )
+
+
+def leer_operaciones(
+    ruta, columna=None, columna_estrategia=None, tipo="r", riesgo=None
+):
+    """
+    Lee un CSV fila a fila y devuelve (estrategia, R de cada operación) por
+    cada estrategia. Con tipo "pl", los beneficios se convierten a R con el
+    dinero arriesgado por operación en el backtest original (`riesgo`)
+    """
+    if tipo == "pl" and not (riesgo and riesgo > 0):
+        raise ValueError("Con --tipo pl hay que indicar el --riesgo por operación")
+
+    with open(ruta, "rb") as f:
+        codificacion = detectar_codificacion(f.read(4096))
+    # Los códecs con BOM lo descartan al leer
+    encoding = codificacion.nombre
+    if encoding == "utf-8":
+        encoding = "utf-8-sig"
+    elif codificacion.bom:
+        encoding = "utf-16"
+    with open(ruta, encoding=encoding, newline="") as f:
+        try:
+            dialecto = csv.Sniffer().sniff(f.read(4096), delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        f.seek(0)
+        lector = csv.reader(f, dialecto)
+        cabecera = next(lector, None)
+        if cabecera is None:
+            return
+        valor = _columna(cabecera, columna, COLUMNAS_VALOR[tipo], ruta)
+        agrupada = None
+        if columna_estrategia:
+            agrupada = _columna(cabecera, columna_estrategia, (), ruta)
+        # Con ';' o tabuladores como separador, la coma puede ser decimal
+        decimal_coma = dialecto.delimiter != ","
+        escala = riesgo if tipo == "pl" else 1.0
+
+        nombre_archivo = os.path.splitext(os.path.basename(ruta))[0]
+        actual = None
+        valores = array("d")
+        vistas = set()
+        for n, fila in enumerate(lector, 2):
+            if not fila or not any(celda.strip() for celda in fila):
+                continue
+            estrategia = fila[agrupada] if agrupada is not None else nombre_archivo
+            if estrategia != actual:
+                if actual is not None:
+                    yield actual, np.frombuffer(valores) / escala
+                if estrategia in vistas:
+                    raise ValueError(
+                        f"{ruta}:{n}: las filas de '{estrategia}' no son consecutivas"
+                    )
+                vistas.add(estrategia)
+                actual, valores = estrategia, array("d")
+            celda = fila[valor] if valor < len(fila) else ""
+            try:
+                valores.append(_numero(celda, decimal_coma))
+            except ValueError:
+                raise ValueError(f"{ruta}:{n}: valor no numérico {celda!r}")
+        if actual is not None:
+            yield actual, np.frombuffer(valores) / escala
+
+
+def por_lotes(operaciones, tamano=TAMANO_LOTE):
+    """
+    Agrupa (estrategia, R) en lotes (nombres, matriz de R, longitudes); las
+    filas más cortas se rellenan con ceros
+    """
+    lote = []
+    for elemento in operaciones:
+        lote.append(elemento)
+        if len(lote) == tamano:
+            yield _matriz(lote)
+            lote = []
+    if lote:
+        yield _matriz(lote)
+
+
+def _matriz(lote):
+    longitudes = np.array([len(valores) for _, valores in lote], dtype=np.int64)
+    r = np.zeros((len(lote), longitudes.max(initial=0)))
+    for i, (_, valores) in enumerate(lote):
+        r[i, : len(valores)] = valores
+    return [nombre for nombre, _ in lote], r, longitudes
+
+
+# --- Línea de comandos ---
+
+
+def recopilar_csv(entradas):
+    """Archivos CSV de las entradas (archivos, directorios o patrones glob)"""
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            rutas += sorted(
+                glob.glob(os.path.join(entrada, "**", "*.csv"), recursive=True)
+            )
+        elif glob.has_magic(entrada):
+            rutas += sorted(glob.glob(entrada, recursive=True))
+        elif os.path.isfile(entrada):
+            rutas.append(entrada)
+        else:
+            raise FileNotFoundError(f"No existe el archivo o directorio '{entrada}'")
+    return list(dict.fromkeys(rutas))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simula la gestión de riesgo de cada metodología sobre "
+        "listas de operaciones"
+    )
+    parser.add_argument(
+        "entradas", nargs="+", help="Archivos CSV, directorios o patrones glob"
+    )
+    parser.add_argument(
+        "-m",
+        "--metodologia",
+        choices=sorted(METODOLOGIAS_CLI),
+        action="append",
+        default=[],
+        help="Metodología a simular (se puede repetir; por defecto, todas)",
+    )
+    parser.add_argument(
+        "--variantes",
+        help="Archivo JSON con variantes de metodología y parámetros (como en cli.py)",
+    )
+    parser.add_argument(
+        "--tipo",
+        choices=("r", "pl"),
+        default="r",
+        help="Valores en múltiplos de R o en beneficio/pérdida (por defecto, r)",
+    )
+    parser.add_argument("--columna", help="Columna con el resultado de cada operación")
+    parser.add_argument(
+        "--columna-estrategia",
+        help="Columna con el nombre de la estrategia (por defecto, una por archivo)",
+    )
+    parser.add_argument(
+        "--riesgo",
+        type=float,
+        help="Dinero arriesgado por operación en el backtest original (--tipo pl)",
+    )
+    parser.add_argument(
+        "--balance",
+        type=float,
+        default=BALANCE_INICIAL,
+        help=f"Balance inicial (por defecto, {BALANCE_INICIAL:.0f})",
+    )
+    parser.add_argument(
+        "--lote", type=int, default=TAMANO_LOTE, help="Estrategias simuladas a la vez"
+    )
+    parser.add_argument(
+        "-o", "--output", help="CSV de resumen (por defecto, salida estándar)"
+    )
+    parser.add_argument(
+        "--curvas",
+        metavar="ARCHIVO.csv",
+        help="Guarda la curva de equity de cada simulación",
+    )
+    args = parser.parse_args(argv)
+
+    metodologias = [
+        METODOLOGIAS_CLI[clave]
+        for clave in dict.fromkeys(args.metodologia)
+        or (() if args.variantes else sorted(METODOLOGIAS_CLI))
+    ]
+    if args.variantes:
+        try:
+            metodologias += cargar_variantes(args.variantes)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if args.balance <= 0:
+        parser.error("El balance inicial debe ser mayor que 0")
+    if args.tipo == "pl" and not (args.riesgo and args.riesgo > 0):
+        parser.error("Con --tipo pl hay que indicar el --riesgo por operación")
+    try:
+        rutas = recopilar_csv(args.entradas)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    if not rutas:
+        parser.error("No se encontraron archivos CSV en las entradas indicadas")
+
+    def operaciones():
+        for ruta in rutas:
+            yield from leer_operaciones(
+                ruta, args.columna, args.columna_estrategia, args.tipo, args.riesgo
+            )
+
+    salida = (
+        open(args.output, "w", newline="", encoding="utf-8")
+        if args.output
+        else sys.stdout
+    )
+    curvas = (
+        open(args.curvas, "w", newline="", encoding="utf-8") if args.curvas else None
+    )
+    try:
+        resumen = csv.writer(salida)
+        resumen.writerow(
+            [
+                "estrategia",
+                "metodologia",
+                "operaciones",
+                "beneficio",
+                "balance_final",
+                "max_drawdown",
+                "max_drawdown_pct",
+                "riesgo_siguiente_pct",
+                "nivel_final",
+            ]
+        )
+        if curvas is not None:
+            escritor_curvas = csv.writer(curvas)
+            escritor_curvas.writerow(
+                ["estrategia", "metodologia", "operacion", "equity"]
+            )
+
+        for nombres, r, longitudes in por_lotes(operaciones(), args.lote):
+            for metodologia in metodologias:
+                resultado = simular_lote(
+                    nombres, r, longitudes, metodologia, args.balance
+                )
+                for i, nombre in enumerate(nombres):
+                    final = resultado.curva(i)[-1] if longitudes[i] else args.balance
+                    resumen.writerow(
+                        [
+                            nombre,
+                            metodologia.clave,
+                            longitudes[i],
+                            f"{final - args.balance:.2f}",
+                            f"{final:.2f}",
+                            f"{resultado.max_drawdown[i]:.2f}",
+                            f"{resultado.max_drawdown_pct[i]:.2f}",
+                            f"{resultado.riesgo_siguiente[i]:g}",
+                            ""
+                            if resultado.nivel_final is None
+                            else resultado.nivel_final[i],
+                        ]
+                    )
+                    if curvas is not None:
+                        escritor_curvas.writerows(
+                            (nombre, metodologia.clave, n, f"{valor:.2f}")
+                            for n, valor in enumerate(resultado.curva(i), 1)
+                        )
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        if args.output:
+            salida.close()
+        if curvas is not None:
+            curvas.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
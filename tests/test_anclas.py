@@ -0,0 +1,61 @@
+import pickle
+
+from benchmarks.corpus import generar_estrategia
+from motor import (
+    ANCLAS_REQUERIDAS,
+    BENJAMIN,
+    BENJAMIN_MARKER,
+    GERARD,
+    AnclasNoEncontradas,
+    escanear_anclas,
+    verificar_anclas,
+)
+from motor.anclas import ONINIT_RETURN
+from trabajos import clasificar
+
+
+def test_informe_de_un_archivo_parcheable():
+    content = generar_estrategia(16 * 1024, seed=1)
+    informe = verificar_anclas(content, GERARD)
+    assert informe.parcheable
+    assert informe.anclas == {"mmfunc": 1, "inputs": 1, "oninit": 1, "lot": 1}
+    # El índice del escaneo se reutiliza
+    assert verificar_anclas(content, GERARD, escanear_anclas(content)) == informe
+
+
+def test_informe_de_anclas_que_faltan():
+    content = generar_estrategia(16 * 1024, seed=1, sin_anclas=("inputs", "lot"))
+    informe = verificar_anclas(content, BENJAMIN)
+    assert not informe.parcheable
+    assert informe.faltan == ["inputs", "lot"]
+    mensaje = informe.mensaje("s.mq5")
+    assert ANCLAS_REQUERIDAS["inputs"] in mensaje
+    assert ANCLAS_REQUERIDAS["lot"] in mensaje
+
+
+def test_anclas_dentro_de_sqmmfixedamount_no_cuentan():
+    content = generar_estrategia(16 * 1024, seed=1, sin_anclas=("oninit",))
+    # Un return(INIT_SUCCEEDED) dentro de la función de MM no es el de OnInit
+    linea = '   Verbose("Computing Money Management for order - Fixed amount");'
+    assert linea in content
+    content = content.replace(linea, f"      {ONINIT_RETURN}")
+    informe = verificar_anclas(content, GERARD)
+    assert informe.faltan == ["oninit"]
+
+
+def test_marcador_de_otra_metodologia():
+    content = generar_estrategia(16 * 1024, seed=1, ya_procesado="benjamin")
+    informe = verificar_anclas(content, GERARD)
+    assert informe.procesado and not informe.parcheable
+    assert informe.marcadores == [BENJAMIN_MARKER]
+    assert "ya contiene otra gestión de riesgo" in informe.mensaje("s.mq5")
+
+
+def test_rechazo_viaja_entre_procesos_y_se_clasifica():
+    content = generar_estrategia(16 * 1024, seed=1, sin_anclas=("mmfunc",))
+    informe = verificar_anclas(content, GERARD)
+    error = pickle.loads(pickle.dumps(AnclasNoEncontradas(informe, "s.mq5")))
+    assert error.informe == informe and str(error) == informe.mensaje("s.mq5")
+
+    estado, mensaje, contenido, _, informe_trabajo = clasificar("s.mq5", None, error)
+    assert (estado, contenido, informe_trabajo) == ("rechazado", None, informe)
@@ -0,0 +1,107 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def _restaurar_main():
+    # AppTest deja su script como __main__, y los pools con spawn de otros
+    # tests lo ejecutarían en cada proceso
+    main = sys.modules["__main__"]
+    yield
+    sys.modules["__main__"] = main
+
+
+def _resultados(raiz):
+    """Script de la app con un archivo ya procesado en la sesión"""
+    import sys
+
+    sys.path.insert(0, raiz)
+    import streamlit as st
+
+    import app
+    from benchmarks.corpus import generar_estrategia
+    from motor import GERARD, modificar_estrategia_escalado_gerard
+
+    content = generar_estrategia(10 * 1024)
+    modificado, message = modificar_estrategia_escalado_gerard(content, "s.mq5")[:2]
+    clave = ("s.mq5", "h", GERARD.nombre)
+    st.session_state.setdefault(
+        "resultados", {clave: ("ok", message, modificado.encode(), "")}
+    )
+    st.session_state.setdefault("informes_anclas", {})
+    app._mostrar_resultados([clave], GERARD.nombre)
+
+
+def test_zip_de_resultados_en_disco():
+    at = AppTest.from_function(_resultados, args=(RAIZ,), default_timeout=30).run()
+    assert not at.exception
+    _, ruta = at.session_state["zip_resultados"]
+    # La sesión guarda la ruta, no los bytes
+    assert isinstance(ruta, str)
+    with zipfile.ZipFile(ruta) as bundle:
+        assert bundle.namelist() == ["s_escalado_gerard.mq5"]
+
+    # Un rerun reutiliza el mismo archivo
+    at.run()
+    assert at.session_state["zip_resultados"][1] == ruta
+
+    # Con otras opciones se construye otro y el anterior se borra
+    at.checkbox(key="incluir_diffs").check().run()
+    nueva = at.session_state["zip_resultados"][1]
+    assert nueva != ruta and not os.path.exists(ruta)
+    with zipfile.ZipFile(nueva) as bundle:
+        assert "s_escalado_gerard.diff" in bundle.namelist()
+
+
+def _rerun_incremental(raiz):
+    """Script que reproduce dos reruns: se retira un archivo del cargador"""
+    import sys
+
+    sys.path.insert(0, raiz)
+    import streamlit as st
+
+    import app
+
+    lecturas = st.session_state.setdefault("lecturas", [])
+
+    def cargar(nombre):
+        def leer():
+            lecturas.append(nombre)
+            return nombre.encode()
+
+        return leer
+
+    fuentes = [("a.mq5", "id-a", cargar("a.mq5")), ("b.mq5", "id-b", cargar("b.mq5"))]
+    if st.session_state.get("retirar_b"):
+        fuentes = fuentes[:1]
+    claves = [
+        (ruta, app._huella_contenido(identidad, leer), "Gerard")
+        for ruta, identidad, leer in fuentes
+    ]
+    resultados = st.session_state.setdefault("resultados", {})
+    for clave in claves:
+        resultados.setdefault(clave, ("ok", "", b"", ""))
+    app._olvidar_archivos_retirados(fuentes, claves)
+
+
+def test_reruns_incrementales():
+    at = AppTest.from_function(_rerun_incremental, args=(RAIZ,), default_timeout=30)
+    at.run()
+    assert not at.exception
+    assert len(at.session_state["resultados"]) == 2
+    # Los archivos ya vistos no se vuelven a leer para calcular su huella
+    at.run()
+    assert at.session_state["lecturas"] == ["a.mq5", "b.mq5"]
+
+    at.session_state["retirar_b"] = True
+    at.run()
+    assert [clave[0] for clave in at.session_state["resultados"]] == ["a.mq5"]
+    assert list(at.session_state["huellas"]) == ["id-a"]
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from benchmarks import run
+from benchmarks.corpus import TAMANOS, generar_corpus, generar_estrategia, variantes
+
+
+def test_generador_determinista_y_del_tamano_pedido():
+    for size in (TAMANOS["10k"], TAMANOS["100k"]):
+        content = generar_estrategia(size, seed=5)
+        assert content == generar_estrategia(size, seed=5)
+        assert size <= len(content) < size + 2048
+    assert generar_estrategia(seed=5) != generar_estrategia(seed=6)
+
+
+def test_corpus_con_manifest(tmp_path):
+    manifest = generar_corpus(str(tmp_path), tamanos=("10k",))
+    assert len(manifest) == len(list(variantes()))
+    assert json.loads((tmp_path / "manifest.json").read_text()) == manifest
+    for entrada in manifest:
+        ruta = tmp_path / entrada["archivo"]
+        assert ruta.stat().st_size == entrada["bytes"]
+
+
+def test_runner(tmp_path, capsys):
+    anterior = tmp_path / "anterior.json"
+    argumentos = ["--tamanos", "10k", "--repeticiones", "1", "--output"]
+    assert run.main(argumentos + [str(anterior)]) == 0
+    informe = json.loads(anterior.read_text())
+    for clave in ("gerard", "benjamin"):
+        metricas = informe["resultados"][clave]["10k"]
+        assert metricas["archivos"] == len(list(variantes()))
+        assert metricas["p50_ms"] <= metricas["p99_ms"] <= metricas["max_ms"]
+
+    assert (
+        run.main(
+            argumentos + [str(tmp_path / "actual.json"), "--compare", str(anterior)]
+        )
+        == 0
+    )
+    assert "Comparación con" in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        run.main(["--tamanos", "5k"])
@@ -0,0 +1,84 @@
+import os
+
+from benchmarks.corpus import generar_estrategia
+from cache import CacheResultados
+from motor import BENJAMIN, GERARD
+from procesamiento import procesar_con_cache
+
+
+def _resultado(n, size=1000):
+    return bytes([n % 256]) * size, f"mensaje {n}", f"@@ -1 +1 @@\n-a\n+b{n}\n"
+
+
+def test_clave():
+    data = b"input int MagicNumber = 1;"
+    clave = CacheResultados.clave(data, GERARD)
+    assert clave == CacheResultados.clave(bytes(data), GERARD)
+    assert clave != CacheResultados.clave(data + b" ", GERARD)
+    assert clave != CacheResultados.clave(data, BENJAMIN)
+    # Otros parámetros cambian la versión de las plantillas
+    variante = GERARD.con_parametros({"g_riskLevels_string": "0.5,1.0"})
+    assert clave != CacheResultados.clave(data, variante)
+
+
+def test_lru_en_memoria():
+    cache = CacheResultados(memoria_max_size=3500, directorio=None)
+    for n in range(3):
+        cache.put(f"k{n}", _resultado(n))
+    assert cache.buscar("k0") == (_resultado(0), "memoria")
+    # k1 es ahora la menos usada y sale al entrar k3
+    cache.put("k3", _resultado(3))
+    assert cache.get("k1") is None
+    assert cache.get("k0") == _resultado(0)
+    assert cache.estadisticas()["memoria_bytes"] <= 3500
+
+
+def test_disco_persiste_entre_instancias(tmp_path):
+    cache = CacheResultados(directorio=str(tmp_path))
+    cache.put("ab12", _resultado(1))
+    # Los omitidos no se guardan
+    cache.put("cd34", (None, "Strategy.mq5 ya estaba procesado", None))
+
+    otra = CacheResultados(directorio=str(tmp_path))
+    assert otra.estadisticas()["disco_bytes"] > 0
+    assert otra.buscar("ab12") == (_resultado(1), "disco")
+    assert otra.buscar("ab12")[1] == "memoria"
+    assert otra.buscar("cd34") == (None, None)
+    assert otra.estadisticas()["fallos"] == 1
+
+
+def test_expulsion_en_disco(tmp_path):
+    cache = CacheResultados(directorio=str(tmp_path), disco_max_size=10_000)
+    for n in range(20):
+        clave = f"{n:02d}clave"
+        cache.put(clave, _resultado(n))
+        ruta = cache._ruta(clave)
+        os.utime(ruta, (n, n))
+    assert cache.estadisticas()["disco_bytes"] <= 10_000
+    en_disco = CacheResultados(directorio=str(tmp_path), memoria_max_size=0)
+    # Se conservan las más recientes
+    assert en_disco.get("19clave") == _resultado(19)
+    assert en_disco.get("00clave") is None
+
+
+def test_procesar_con_cache(tmp_path):
+    archivos = [
+        (i, f"Strategy {i}.mq5", generar_estrategia(8 * 1024, seed=i).encode())
+        for i in range(4)
+    ]
+    cache = CacheResultados(directorio=str(tmp_path))
+    primera = {
+        i: resultado
+        for i, resultado, _, _ in procesar_con_cache(
+            archivos, GERARD.nombre, cache, max_workers=1
+        )
+    }
+    contadores = {}
+    segunda = {
+        i: resultado
+        for i, resultado, _, _ in procesar_con_cache(
+            archivos, GERARD.nombre, cache, max_workers=1, contadores=contadores
+        )
+    }
+    assert segunda == primera
+    assert contadores == {"aciertos_memoria": 4}
@@ -0,0 +1,83 @@
+import zipfile
+
+import pytest
+
+import cli
+from benchmarks.corpus import generar_estrategia
+from motor import GERARD, modificar_estrategia
+
+
+@pytest.fixture
+def exports(tmp_path):
+    directorio = tmp_path / "exports"
+    (directorio / "EURUSD").mkdir(parents=True)
+    content = generar_estrategia(20 * 1024, seed=1)
+    (directorio / "EURUSD" / "Strategy 1.mq5").write_text(content, encoding="utf-8")
+    # Ya modificada: se omite sin contar como fallo
+    modificado, _ = modificar_estrategia(content, "Strategy 2.mq5", GERARD)
+    (directorio / "Strategy 2.mq5").write_text(modificado, encoding="utf-8")
+    return directorio
+
+
+def _sin_anclas(exports):
+    (exports / "Sin anclas.mq5").write_text(
+        "int OnInit()\n{\n   return(INIT_SUCCEEDED);\n}\n", encoding="utf-8"
+    )
+
+
+@pytest.mark.parametrize("flujo", [False, True])
+def test_codigo_de_salida_con_omitidos(exports, tmp_path, capsys, flujo):
+    salida = tmp_path / "salida.zip"
+    argumentos = [str(exports), "-m", "gerard", "-o", str(salida), "-j", "1"]
+    assert cli.main(argumentos + (["--flujo"] if flujo else [])) == 0
+    consola = capsys.readouterr().out
+    assert "Procesados: 1 | Omitidos: 1 | Rechazados: 0" in consola
+    with zipfile.ZipFile(salida) as zip_file:
+        assert zip_file.namelist() == ["EURUSD/Strategy 1_escalado_gerard.mq5"]
+
+
+@pytest.mark.parametrize("flujo", [False, True])
+def test_codigo_de_salida_con_rechazados(exports, tmp_path, capsys, flujo):
+    _sin_anclas(exports)
+    salida = tmp_path / "salida"
+    argumentos = [str(exports), "-m", "gerard", "-o", str(salida), "-j", "1"]
+    assert cli.main(argumentos + (["--flujo"] if flujo else [])) == 1
+    consola = capsys.readouterr().out
+    assert f"{cli.ICONOS['rechazado']} Sin anclas.mq5:" in consola
+    assert "Rechazados: 1" in consola
+    # El resto del lote se procesa igualmente
+    assert (salida / "EURUSD" / "Strategy 1_escalado_gerard.mq5").exists()
+
+
+def test_codigo_de_salida_con_errores(exports, tmp_path, capsys):
+    (exports / "Binario.mq5").write_bytes(b"\xff\xfe\x00no es utf-8\xff")
+    salida = tmp_path / "salida"
+    argumentos = [str(exports), "-m", "gerard", "-o", str(salida), "-j", "1"]
+    assert cli.main(argumentos) == 1
+    consola = capsys.readouterr().out
+    assert "❌ Binario.mq5:" in consola
+    assert "Errores: 1" in consola
+    # El resto del lote se procesa igualmente
+    assert (salida / "EURUSD" / "Strategy 1_escalado_gerard.mq5").exists()
+
+
+def test_zip_determinista_con_varios_procesos(exports, tmp_path):
+    for n in range(3, 9):
+        content = generar_estrategia(8 * 1024, seed=n)
+        (exports / "EURUSD" / f"Strategy {n}.mq5").write_text(content, encoding="utf-8")
+    uno, dos = tmp_path / "uno.zip", tmp_path / "dos.zip"
+    assert cli.main([str(exports), "-m", "gerard", "-o", str(uno), "-j", "1"]) == 0
+    assert cli.main([str(exports), "-m", "gerard", "-o", str(dos), "-j", "2"]) == 0
+    assert uno.read_bytes() == dos.read_bytes()
+
+
+def test_recopilar_archivos(exports, tmp_path):
+    directorio = [relpath for _, _, relpath in cli.recopilar_archivos([str(exports)])]
+    assert directorio == ["EURUSD/Strategy 1.mq5", "Strategy 2.mq5"]
+    # El patrón conserva las rutas relativas desde su parte fija
+    patron = [
+        relpath for _, _, relpath in cli.recopilar_archivos([f"{exports}/**/*.mq5"])
+    ]
+    assert patron == directorio
+    with pytest.raises(FileNotFoundError):
+        cli.recopilar_archivos([str(tmp_path / "no_existe")])
@@ -0,0 +1,61 @@
+import codecs
+import mmap
+
+import pytest
+
+from benchmarks.corpus import generar_estrategia
+from motor import GERARD
+from motor.codificacion import decodificar, detectar_codificacion
+from procesamiento import procesar_contenido
+
+TEXTO = generar_estrategia(16 * 1024, seed=3).replace("Verbose(", "Verbose(/* ñ € */")
+
+CODIFICADOS = {
+    "utf-8": TEXTO.encode("utf-8"),
+    "utf-8-bom": codecs.BOM_UTF8 + TEXTO.encode("utf-8"),
+    "utf-16-le-bom": codecs.BOM_UTF16_LE + TEXTO.encode("utf-16-le"),
+    "utf-16-be-bom": codecs.BOM_UTF16_BE + TEXTO.encode("utf-16-be"),
+    "utf-16-le": TEXTO.encode("utf-16-le"),
+    "cp1252": TEXTO.encode("cp1252"),
+}
+
+
+@pytest.mark.parametrize("nombre", CODIFICADOS)
+def test_ida_y_vuelta(nombre):
+    data = CODIFICADOS[nombre]
+    texto, codificacion = decodificar(data)
+    assert texto == TEXTO
+    assert codificacion.codificar(texto) == data
+
+
+@pytest.mark.parametrize("nombre", CODIFICADOS)
+def test_resultado_en_la_codificacion_original(nombre):
+    data = CODIFICADOS[nombre]
+    (modificado, _, _), _ = procesar_contenido(data, "s.mq5", GERARD.nombre)
+    texto, codificacion = decodificar(modificado)
+    assert codificacion == decodificar(data)[1]
+    assert GERARD.processed_marker in texto and "ñ €" in texto
+
+
+def test_utf8_con_ansi_tras_la_muestra():
+    # Parece UTF-8 en los primeros bytes pero no lo es más adelante
+    data = TEXTO.encode("utf-8")[:8192] + "// ñ".encode("cp1252")
+    assert detectar_codificacion(data).nombre == "utf-8"
+    texto, codificacion = decodificar(data)
+    assert codificacion.nombre == "cp1252" and texto.endswith("// ñ")
+
+
+def test_decodifica_desde_mmap(tmp_path):
+    ruta = tmp_path / "s.mq5"
+    ruta.write_bytes(CODIFICADOS["utf-16-le-bom"])
+    with open(ruta, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        texto, codificacion = decodificar(m)
+    assert texto == TEXTO and codificacion.nombre == "utf-16-le"
+
+
+def test_trozos_con_el_bom_partido():
+    data = CODIFICADOS["utf-16-le-bom"]
+    codificacion = detectar_codificacion(data)
+    trozos = [data[i : i + 1] for i in range(3)] + [data[3:]]
+    assert "".join(codificacion.decodificar_trozos(trozos)) == TEXTO
+    assert b"".join(codificacion.codificar_trozos([TEXTO[:5], TEXTO[5:]])) == data
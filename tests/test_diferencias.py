@@ -0,0 +1,71 @@
+import re
+
+import pytest
+
+from benchmarks.corpus import generar_estrategia
+from diferencias import con_cabecera, diff_unificado, hunks_unificados
+from motor import BENJAMIN, GERARD, aplicar_ediciones, preparar_ediciones
+
+_HUNK = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@\n")
+
+
+def _aplicar_diff(original, diff):
+    """Aplica un diff unificado comprobando el contexto y los recuentos"""
+    lineas = original.splitlines(True)
+    resultado = []
+    cursor = 0
+    for match in _HUNK.finditer(diff):
+        inicio_viejo = int(match.group(1))
+        viejas, nuevas = int(match.group(2) or 1), int(match.group(4) or 1)
+        inicio = inicio_viejo - 1 if viejas else inicio_viejo
+        assert inicio >= cursor
+        resultado += lineas[cursor:inicio]
+        assert int(match.group(3)) == (len(resultado) + 1 if nuevas else len(resultado))
+        cursor = inicio
+        pos = match.end()
+        vistas_viejas = vistas_nuevas = 0
+        while vistas_viejas < viejas or vistas_nuevas < nuevas:
+            fin = diff.index("\n", pos) + 1
+            linea = diff[pos:fin]
+            pos = fin
+            sin_salto = diff.startswith("\\ No newline at end of file\n", pos)
+            if sin_salto:
+                linea = linea[:-1]
+                pos += len("\\ No newline at end of file\n")
+            tipo, texto = linea[0], linea[1:]
+            if tipo in " -":
+                assert lineas[cursor] == texto
+                cursor += 1
+                vistas_viejas += 1
+            if tipo in " +":
+                resultado.append(texto)
+                vistas_nuevas += 1
+        assert (vistas_viejas, vistas_nuevas) == (viejas, nuevas)
+    return "".join(resultado + lineas[cursor:])
+
+
+@pytest.mark.parametrize("metodologia", [GERARD, BENJAMIN], ids=lambda m: m.clave)
+@pytest.mark.parametrize("contexto", [0, 3])
+def test_el_diff_reproduce_el_resultado(metodologia, contexto):
+    for seed in range(4):
+        content = generar_estrategia(24 * 1024, seed=seed)
+        ediciones, _ = preparar_ediciones(content, "s.mq5", metodologia)
+        diff = diff_unificado(content, ediciones, "a/s.mq5", "b/s_x.mq5", contexto)
+        assert diff.startswith("--- a/s.mq5\n+++ b/s_x.mq5\n@@ ")
+        cuerpo = diff.split("\n", 2)[2]
+        assert _aplicar_diff(content, cuerpo) == aplicar_ediciones(content, ediciones)
+
+
+def test_sin_salto_de_linea_final():
+    content = "a\nb\nc"
+    ediciones = [(4, 5, "C")]
+    hunks = hunks_unificados(content, ediciones, contexto=1)
+    assert hunks == (
+        "@@ -2,2 +2,2 @@\n b\n-c\n\\ No newline at end of file\n"
+        "+C\n\\ No newline at end of file\n"
+    )
+    assert _aplicar_diff(content, hunks) == "a\nb\nC"
+
+
+def test_sin_cambios():
+    assert con_cabecera(hunks_unificados("a\n", []), "a", "b") == ""
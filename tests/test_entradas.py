@@ -0,0 +1,124 @@
+import io
+import warnings
+import zipfile
+
+import cli
+from benchmarks.corpus import generar_estrategia
+from entradas import listar_fuentes, miembros_mq5
+
+
+class Subido(io.BytesIO):
+    """Como el UploadedFile de Streamlit: BytesIO con nombre e identificador"""
+
+    def __init__(self, name, data, file_id):
+        super().__init__(data)
+        self.name = name
+        self.file_id = file_id
+
+
+def _paquete(miembros):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as bundle:
+        for nombre, data in miembros.items():
+            bundle.writestr(nombre, data)
+    return buffer.getvalue()
+
+
+MIEMBROS = {
+    "EURUSD/Strategy 1.mq5": generar_estrategia(8 * 1024, seed=1),
+    "EURUSD/": "",
+    "GBPUSD/Strategy 2.MQ5": generar_estrategia(8 * 1024, seed=2),
+    "__MACOSX/EURUSD/._Strategy 1.mq5": "basura",
+    "../fuera.mq5": "x",
+    "/absoluta.mq5": "x",
+    "C:/unidad.mq5": "x",
+    "C:relativa_a_la_unidad.mq5": "x",
+    "C:\\barra_invertida.mq5": "x",
+    "notas.txt": "x",
+}
+
+
+def test_miembros_mq5():
+    with zipfile.ZipFile(io.BytesIO(_paquete(MIEMBROS))) as bundle:
+        nombres = [info.filename for info in miembros_mq5(bundle)]
+    assert nombres == ["EURUSD/Strategy 1.mq5", "GBPUSD/Strategy 2.MQ5"]
+
+
+def test_listar_fuentes():
+    suelto = generar_estrategia(8 * 1024, seed=3).encode("utf-8")
+    fuentes = listar_fuentes(
+        [
+            Subido("export.zip", _paquete(MIEMBROS), "id-zip"),
+            Subido("Strategy 3.mq5", suelto, "id-mq5"),
+        ]
+    )
+    assert [(ruta, identidad) for ruta, identidad, _ in fuentes] == [
+        ("EURUSD/Strategy 1.mq5", ("id-zip", "EURUSD/Strategy 1.mq5")),
+        ("GBPUSD/Strategy 2.MQ5", ("id-zip", "GBPUSD/Strategy 2.MQ5")),
+        ("Strategy 3.mq5", "id-mq5"),
+    ]
+    # Cada miembro se descomprime al pedirlo
+    assert fuentes[0][2]() == MIEMBROS["EURUSD/Strategy 1.mq5"].encode("utf-8")
+    assert fuentes[2][2]() == suelto
+
+
+def test_cli_procesa_paquetes_zip(tmp_path):
+    paquete = tmp_path / "export.zip"
+    paquete.write_bytes(_paquete(MIEMBROS))
+    salida = tmp_path / "salida.zip"
+    assert cli.main([str(paquete), "-m", "gerard", "-o", str(salida), "-j", "1"]) == 0
+    with zipfile.ZipFile(salida) as zip_file:
+        assert zip_file.namelist() == [
+            "EURUSD/Strategy 1_escalado_gerard.mq5",
+            "GBPUSD/Strategy 2_escalado_gerard.mq5",
+        ]
+
+
+def test_listar_fuentes_con_rutas_repetidas():
+    fuentes = listar_fuentes(
+        [
+            Subido("a.zip", _paquete({"estrategia.mq5": "a"}), "id-a"),
+            Subido("b.zip", _paquete({"estrategia.mq5": "b"}), "id-b"),
+            Subido("estrategia.mq5", b"c", "id-c"),
+        ]
+    )
+    assert [ruta for ruta, _, _ in fuentes] == [
+        "estrategia.mq5",
+        "1/estrategia.mq5",
+        "2/estrategia.mq5",
+    ]
+    assert [cargar() for _, _, cargar in fuentes] == [b"a", b"b", b"c"]
+
+
+def test_cli_paquetes_con_el_mismo_miembro(tmp_path):
+    entrada = tmp_path / "exports"
+    entrada.mkdir()
+    for n, nombre in enumerate(["a.zip", "b.zip"]):
+        content = generar_estrategia(8 * 1024, seed=n)
+        (entrada / nombre).write_bytes(_paquete({"estrategia.mq5": content}))
+    esperados = ["1/estrategia_escalado_gerard.mq5", "estrategia_escalado_gerard.mq5"]
+
+    # Los .zip dentro de un directorio también se procesan
+    salida = tmp_path / "salida.zip"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert (
+            cli.main([str(entrada), "-m", "gerard", "-o", str(salida), "-j", "1"]) == 0
+        )
+    with zipfile.ZipFile(salida) as zip_file:
+        assert sorted(zip_file.namelist()) == esperados
+        contenidos = {zip_file.read(nombre) for nombre in esperados}
+    assert len(contenidos) == 2
+
+    # En un directorio de salida, ninguno pisa al otro
+    directorio = tmp_path / "salida"
+    assert (
+        cli.main([str(entrada), "-m", "gerard", "-o", str(directorio), "-j", "1"]) == 0
+    )
+    assert (
+        sorted(
+            ruta.relative_to(directorio).as_posix()
+            for ruta in directorio.rglob("*.mq5")
+        )
+        == esperados
+    )
@@ -0,0 +1,115 @@
+import codecs
+import io
+import zipfile
+
+import pytest
+
+import cli
+from benchmarks.corpus import generar_estrategia, variantes
+from motor import BENJAMIN, GERARD, AnclasNoEncontradas, modificar_estrategia
+from motor.codificacion import decodificar
+from motor.flujo import (
+    aplicar_flujo,
+    condensar,
+    generar_flujo,
+    preparar_flujo,
+    segmentar,
+)
+from motor.parcheo import preparar_variantes
+
+VARIANTES = list(variantes())
+
+TEXTO = generar_estrategia(16 * 1024, seed=3).replace("Verbose(", "Verbose(/* ñ € */")
+
+CODIFICADOS = {
+    "utf-8": TEXTO.encode("utf-8"),
+    "utf-8-bom": codecs.BOM_UTF8 + TEXTO.encode("utf-8"),
+    "utf-16-le-bom": codecs.BOM_UTF16_LE + TEXTO.encode("utf-16-le"),
+    "utf-16-le": TEXTO.encode("utf-16-le"),
+    "cp1252": TEXTO.encode("cp1252"),
+}
+
+
+def _en_flujo(data, metodologia, tamano=4096):
+    """(bytes modificados o None, mensaje, rechazos) del modo en flujo"""
+
+    def abrir():
+        return io.BytesIO(data)
+
+    rechazos = []
+    codificacion, [(ediciones, message)] = preparar_flujo(
+        abrir, "x.mq5", [metodologia], tamano, rechazos
+    )
+    if ediciones is None:
+        return None, message, rechazos
+    return b"".join(generar_flujo(abrir, codificacion, ediciones, tamano)), message, []
+
+
+def _en_memoria(data, metodologia):
+    content, codificacion = decodificar(data)
+    try:
+        modificado, message = modificar_estrategia(content, "x.mq5", metodologia)
+    except AnclasNoEncontradas as error:
+        return None, None, [error]
+    if modificado is None:
+        return None, message, []
+    return codificacion.codificar(modificado), message, []
+
+
+@pytest.mark.parametrize("metodologia", [GERARD, BENJAMIN], ids=lambda m: m.clave)
+@pytest.mark.parametrize("nombre, parametros", VARIANTES, ids=[v[0] for v in VARIANTES])
+def test_corpus_igual_que_en_memoria(nombre, parametros, metodologia):
+    data = generar_estrategia(16 * 1024, seed=7, **parametros).encode("utf-8")
+    flujo, message, rechazos = _en_flujo(data, metodologia)
+    memoria, message_memoria, rechazos_memoria = _en_memoria(data, metodologia)
+    assert flujo == memoria
+    if rechazos_memoria:
+        assert [rechazo.informe.faltan for rechazo in rechazos] == [
+            rechazo.informe.faltan for rechazo in rechazos_memoria
+        ]
+    else:
+        assert not rechazos and message == message_memoria
+
+
+@pytest.mark.parametrize("nombre", CODIFICADOS)
+def test_codificaciones_igual_que_en_memoria(nombre):
+    data = CODIFICADOS[nombre]
+    # Trozos impares: cortan caracteres de varios bytes y el BOM
+    assert _en_flujo(data, GERARD, tamano=1001) == _en_memoria(data, GERARD)
+
+
+def test_segmentos_pequenos():
+    content = generar_estrategia(64 * 1024, seed=5)
+    textos = [content[i : i + 333] for i in range(0, len(content), 333)]
+    segmentos = list(segmentar(textos, minimo=64))
+    assert len(segmentos) > 10
+    assert "".join(texto for _, texto in segmentos) == content
+    for inicio, texto in segmentos:
+        assert content[inicio : inicio + len(texto)] == texto
+
+    # Con cortes tan pequeños, las anclas quedan en segmentos distintos
+    condensado = condensar(textos, minimo=64)
+    assert len(condensado.content) < len(content)
+    [(ediciones, _)] = preparar_variantes(condensado.content, "x.mq5", [GERARD])
+    resultado = "".join(aplicar_flujo(textos, condensado.traducir(ediciones)))
+    assert resultado == modificar_estrategia(content, "x.mq5", GERARD)[0]
+
+
+def test_cli_flujo_igual_que_en_memoria(tmp_path):
+    directorio = tmp_path / "exports"
+    directorio.mkdir()
+    for nombre, data in CODIFICADOS.items():
+        (directorio / f"{nombre}.mq5").write_bytes(data)
+    (directorio / "grande.mq5").write_text(
+        generar_estrategia(256 * 1024, seed=9), encoding="utf-8"
+    )
+    memoria, flujo = tmp_path / "memoria.zip", tmp_path / "flujo.zip"
+    argumentos = [str(directorio), "-m", "gerard", "-m", "benjamin", "-j", "1"]
+    assert cli.main(argumentos + ["-o", str(memoria)]) == 0
+    assert cli.main(argumentos + ["-o", str(flujo), "--flujo"]) == 0
+    with zipfile.ZipFile(memoria) as uno, zipfile.ZipFile(flujo) as dos:
+        nombres = uno.namelist()
+        assert len(nombres) == 2 * (len(CODIFICADOS) + 1)
+        assert dos.namelist() == nombres
+        for nombre in nombres:
+            assert uno.read(nombre) == dos.read(nombre)
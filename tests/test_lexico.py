@@ -0,0 +1,88 @@
+import pytest
+
+from benchmarks.corpus import generar_estrategia, variantes
+from motor import GERARD, modificar_estrategia_escalado_gerard
+from motor.lexico import funcion_en, indice_funciones
+
+FIRMAS = [
+    "double sqMMFixedAmount(string symbol, /* step */ double price) {\n"
+    "   return(price);\n}\n",
+    "double sqMMFixedAmount(string symbol, // orden\n"
+    "   double price) {\n   return(price);\n}\n",
+]
+
+VARIANTES = list(variantes())
+
+
+def test_indice_funciones_limites():
+    content = 'int a() { if(x) { y(); } }\n// }\nstring s = "}";\nvoid b()\n{\n}\n'
+    funciones = indice_funciones(content)
+    assert [f.nombre for f in funciones] == ["a", "b"]
+    assert content[funciones[0].fin - 1] == "}"
+    assert funcion_en(funciones, content.index("y()")).nombre == "a"
+    assert funcion_en(funciones, content.index("string s")) is None
+
+
+def test_indice_funciones_ignora_prototipos():
+    content = "double f(int x);\ndouble f(int x) { return x; }\n"
+    funciones = indice_funciones(content)
+    assert len(funciones) == 1 and funciones[0].inicio == content.index(
+        "double f(int x) {"
+    )
+
+
+@pytest.mark.parametrize("firma", FIRMAS)
+def test_hasta_con_comentario_en_la_cabecera(firma):
+    content = "int a() { return 0; }\n" + firma + "void b() { }\n"
+    hasta = content.index("sqMMFixedAmount")
+    funciones = indice_funciones(content, hasta=hasta)
+    funcion = funcion_en(funciones, hasta)
+    assert funcion is not None and funcion.nombre == "sqMMFixedAmount"
+    assert funciones == indice_funciones(content)[: len(funciones)]
+
+
+@pytest.mark.parametrize("firma_mm", ["comentario_bloque", "comentario_linea"])
+def test_gerard_parchea_firmas_con_comentarios(firma_mm):
+    content = generar_estrategia(20 * 1024, firma_mm=firma_mm)
+    modified, message = modificar_estrategia_escalado_gerard(content, "x.mq5")[:2]
+    assert modified is not None, message
+    assert GERARD.processed_marker in modified
+
+
+def test_llaves_opacas_y_cierres_sangrados():
+    content = (
+        "#define ABRE { \\\n   }\n"
+        "char c = '}';\n"
+        'string s = "a\\"}{";\n'
+        "int a[] = {1, 2};\n"
+        "class C\n{\n   void m() { }\n};\n"
+        "/* } */ double f(int x) // {\n"
+        "   {\n   if(x) { return '{'; }\n   return 0;\n   }\n"
+        "void g() {}"
+    )
+    funciones = indice_funciones(content)
+    assert [f.nombre for f in funciones] == ["f", "g"]
+    f, g = funciones
+    assert content[f.inicio :].startswith("double f(int x)")
+    assert content[f.apertura] == "{" and content[f.fin - 1] == "}"
+    assert content[f.fin :].startswith("\nvoid g()") and g.fin == len(content)
+
+
+@pytest.mark.parametrize("nombre, parametros", VARIANTES, ids=[v[0] for v in VARIANTES])
+def test_indice_sobre_el_corpus(nombre, parametros):
+    content = generar_estrategia(16 * 1024, seed=2, **parametros)
+    funciones = indice_funciones(content)
+    nombres = [funcion.nombre for funcion in funciones]
+    assert "OnInit" in nombres
+    assert ("sqMMFixedAmount" in nombres) == (
+        "mmfunc" not in parametros.get("sin_anclas", ())
+    )
+    for anterior, funcion in zip(funciones, funciones[1:]):
+        assert anterior.fin <= funcion.inicio
+    for funcion in funciones:
+        assert content[funcion.apertura] == "{" and content[funcion.fin - 1] == "}"
+    # Con `hasta`, un prefijo del índice completo que incluye la función
+    for funcion in funciones:
+        parcial = indice_funciones(content, hasta=funcion.inicio)
+        assert parcial == funciones[: len(parcial)]
+        assert funcion_en(parcial, funcion.inicio) == funcion
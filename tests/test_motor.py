@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from motor import METODOLOGIAS_CLI, interpretar_variantes
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS_RAIZ = sorted(
+    nombre[:-3] for nombre in os.listdir(RAIZ) if nombre.endswith(".py")
+)
+
+
+def _modulos_raiz_cargados(importacion):
+    codigo = (
+        f"import sys\n{importacion}\n"
+        f"print(','.join(m for m in {MODULOS_RAIZ!r} if m in sys.modules))"
+    )
+    salida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        cwd=RAIZ,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(filter(None, salida.stdout.strip().split(",")))
+
+
+def test_motor_no_importa_modulos_de_la_raiz():
+    assert _modulos_raiz_cargados("import motor, motor.flujo") == set()
+
+
+def test_analisis_no_importa_la_cli():
+    cargados = _modulos_raiz_cargados("import simulacion, optimizacion")
+    assert cargados == {"simulacion", "optimizacion"}
+
+
+def test_interpretar_variantes():
+    variantes = interpretar_variantes(
+        [
+            {"metodologia": "gerard"},
+            {"metodologia": "benjamin", "sufijo": "_B2"},
+        ]
+    )
+    assert variantes[0] == METODOLOGIAS_CLI["gerard"].con_parametros({})
+    assert variantes[1].suffix == "_B2"
+    with pytest.raises(ValueError, match="Variante 1: metodología desconocida"):
+        interpretar_variantes([{"metodologia": "martingala"}])
+    with pytest.raises(ValueError, match="lista JSON"):
+        interpretar_variantes({})
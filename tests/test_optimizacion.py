@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+import pytest
+
+import optimizacion
+from motor import interpretar_variantes
+
+
+def test_ratio_sin_drawdown_se_escribe_null(tmp_path):
+    # Solo ganancias: ninguna secuencia tiene drawdown y el ratio es infinito
+    csv = tmp_path / "operaciones.csv"
+    csv.write_text("R\n" + "\n".join(["0.5"] * 20) + "\n", encoding="utf-8")
+    rejilla = tmp_path / "rejilla.json"
+    rejilla.write_text(json.dumps([{"metodologia": "gerard"}]), encoding="utf-8")
+    salida = tmp_path / "mejores.json"
+
+    codigo = optimizacion.main(
+        [
+            str(csv),
+            "--rejilla",
+            str(rejilla),
+            "-o",
+            str(salida),
+            "--objetivo",
+            "ratio",
+            "--simulaciones",
+            "50",
+            "--workers",
+            "1",
+        ]
+    )
+
+    assert codigo == 0
+    texto = salida.read_text(encoding="utf-8")
+    assert "Infinity" not in texto
+    variantes = json.loads(texto)
+    assert variantes[0]["metricas"]["ratio"] is None
+    # Sigue siendo un archivo de --variantes válido
+    assert len(interpretar_variantes(variantes)) == 1
+
+
+def test_clasificar_por_ratio_con_drawdown_cero():
+    config = optimizacion.Configuracion(simulaciones=50, bloque=25)
+    sin_perdidas = optimizacion.evaluar(np.full(20, 0.5), "gerard", {}, config)
+    con_perdidas = optimizacion.evaluar(
+        np.array([1.0, -0.5] * 10), "gerard", {}, config
+    )
+    assert sin_perdidas["ratio"] == float("inf")
+    clasificados = optimizacion.clasificar([con_perdidas, sin_perdidas], "ratio")
+    assert clasificados[0] is sin_perdidas
+
+
+def test_expandir_rejilla():
+    candidatos = optimizacion.expandir_rejilla(
+        [
+            {
+                "metodologia": "benjamin",
+                "parametros": {"g_riskStep": [0.1, 0.25], "g_maxLossRisk": [0.5, 1]},
+            },
+            {"metodologia": "gerard", "parametros": {"g_riskLevels_string": "1,2"}},
+        ]
+    )
+    assert len(candidatos) == 5
+    assert candidatos[0] == ("benjamin", {"g_riskStep": 0.1, "g_maxLossRisk": 0.5})
+    assert candidatos[-1] == ("gerard", {"g_riskLevels_string": "1,2"})
+    with pytest.raises(ValueError, match="Rejilla 1: metodología desconocida"):
+        optimizacion.expandir_rejilla([{"metodologia": "kelly"}])
+    with pytest.raises(ValueError, match="Rejilla 1: Parámetro"):
+        optimizacion.expandir_rejilla(
+            [{"metodologia": "gerard", "parametros": {"g_otro": [1]}}]
+        )
+
+
+def test_descarta_en_cuanto_no_puede_cumplir():
+    r = np.array([1.0, -1.0] * 10 + [-1.0] * 10)
+    config = optimizacion.Configuracion(
+        simulaciones=1000, bloque=50, max_drawdown_pct=0.5, prob_max=0.01
+    )
+    metricas = optimizacion.evaluar(r, "gerard", {}, config)
+    assert not metricas["valida"]
+    assert metricas["simulaciones"] == 50
+
+
+def test_mismas_secuencias_con_cualquier_numero_de_procesos():
+    r = np.random.default_rng(0).normal(0.2, 1.0, size=60)
+    candidatos = optimizacion.expandir_rejilla(
+        [{"metodologia": "benjamin", "parametros": {"g_riskStep": [0.1, 0.25, 0.5]}}]
+    )
+    config = optimizacion.Configuracion(simulaciones=200, bloque=100)
+    uno = optimizacion.optimizar(r, candidatos, config, workers=1)
+    dos = optimizacion.optimizar(r, candidatos, config, workers=2)
+
+    def clave(metricas):
+        return metricas["parametros"]["g_riskStep"]
+
+    assert sorted(uno, key=clave) == sorted(dos, key=clave)
+    clasificados = optimizacion.clasificar(uno, "mediana")
+    medianas = [metricas["beneficio_mediana"] for metricas in clasificados]
+    assert medianas == sorted(medianas, reverse=True)
@@ -0,0 +1,90 @@
+import pytest
+
+from benchmarks.corpus import LOT_SIZE_CALLS, generar_estrategia, variantes
+from motor import (
+    BENJAMIN,
+    GERARD,
+    REGIONES_AL_DIA,
+    AnclasNoEncontradas,
+    aplicar_ediciones,
+    modificar_estrategia,
+    preparar_ediciones,
+    validar_estructura,
+)
+from motor.anclas import ONINIT_RETURN, WARNING_FIXES
+
+VARIANTES = list(variantes())
+
+
+def _faltan(metodologia, parametros):
+    """Anclas requeridas que no tendrá el archivo generado con `parametros`"""
+    requeridas = {"inputs", "oninit", "lot"}
+    if metodologia.precise_mm_function is not None:
+        requeridas.add("mmfunc")
+    faltan = set(parametros.get("sin_anclas", ())) & requeridas
+    # Cada metodología busca el return de OnInit con (al menos) su sangría
+    sangria = metodologia.target_for_oninit[: -len(ONINIT_RETURN)]
+    if not parametros.get("oninit_indent", "      ").endswith(sangria):
+        faltan.add("oninit")
+    # La llamada con formato libre solo la reconoce el patrón flexible
+    if parametros.get("llamada", 0) >= 4 and not metodologia.flexible_lot_size:
+        faltan.add("lot")
+    return faltan
+
+
+@pytest.mark.parametrize("metodologia", [GERARD, BENJAMIN], ids=lambda m: m.clave)
+@pytest.mark.parametrize("nombre, parametros", VARIANTES, ids=[v[0] for v in VARIANTES])
+def test_corpus(nombre, parametros, metodologia):
+    content = generar_estrategia(16 * 1024, seed=7, **parametros)
+    faltan = _faltan(metodologia, parametros)
+    otra = parametros.get("ya_procesado") not in (
+        None,
+        metodologia.clave.split("_")[-1],
+    )
+
+    if faltan or otra:
+        with pytest.raises(AnclasNoEncontradas) as error:
+            modificar_estrategia(content, "x.mq5", metodologia)
+        assert set(error.value.informe.faltan) == faltan
+        assert error.value.informe.procesado == otra
+        return
+    if parametros.get("ya_procesado"):
+        assert modificar_estrategia(content, "x.mq5", metodologia) == (
+            None,
+            metodologia.skip_message.format(filename="x.mq5"),
+        )
+        return
+
+    modificado, message = modificar_estrategia(content, "x.mq5", metodologia)
+    assert message == metodologia.success_message
+    assert modificado.count(metodologia.processed_marker) == 1
+    assert modificado.count(metodologia.on_trade_transaction_function.strip()) == 1
+    assert all(literal not in modificado for literal in WARNING_FIXES)
+    assert LOT_SIZE_CALLS[parametros.get("llamada", 0)] not in modificado
+    assert validar_estructura(modificado, metodologia) == []
+
+    # Las ediciones son tramos ordenados y disjuntos del original
+    ediciones, _ = preparar_ediciones(content, "x.mq5", metodologia)
+    for (_, fin, _), (inicio, _, _) in zip(ediciones, ediciones[1:]):
+        assert fin <= inicio
+    assert aplicar_ediciones(content, ediciones) == modificado
+
+    # Una segunda pasada no cambia nada
+    assert modificar_estrategia(modificado, "x.mq5", metodologia) == (
+        None,
+        REGIONES_AL_DIA.format(filename="x.mq5", metodologia=metodologia.nombre),
+    )
+
+
+def test_fuera_de_las_ediciones_el_original_no_cambia():
+    content = generar_estrategia(64 * 1024, seed=11)
+    ediciones, _ = preparar_ediciones(content, "x.mq5", GERARD)
+    modificado = aplicar_ediciones(content, ediciones)
+    cursor = 0
+    desplazamiento = 0
+    for inicio, fin, texto in ediciones:
+        tramo = content[cursor:inicio]
+        assert modificado[cursor + desplazamiento : inicio + desplazamiento] == tramo
+        desplazamiento += len(texto) - (fin - inicio)
+        cursor = fin
+    assert modificado[cursor + desplazamiento :] == content[cursor:]
@@ -0,0 +1,60 @@
+import json
+import time
+
+import cli
+from benchmarks.corpus import generar_estrategia
+from motor.perfilado import Cronometro, PerfilLote, etapa, percentil
+
+
+def test_percentil():
+    assert percentil([], 50) == 0.0
+    assert percentil([1.0], 95) == 1.0
+    assert percentil([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert percentil([0.0, 10.0], 95) == 9.5
+
+
+def test_etapas_anidadas_descuentan_a_sus_hijas():
+    cronometro = Cronometro()
+    with cronometro.activo():
+        with etapa("exterior"):
+            time.sleep(0.01)
+            with etapa("interior"):
+                time.sleep(0.02)
+    tiempos = cronometro.tiempos
+    assert 0.01 <= tiempos["exterior"] < 0.02
+    assert tiempos["interior"] >= 0.02
+    # Fuera de un cronómetro activo no se mide nada
+    with etapa("suelta"):
+        pass
+    assert "suelta" not in cronometro.tiempos
+
+
+def test_perfil_lote():
+    perfil = PerfilLote()
+    perfil.registrar("a.mq5", {"escaneo": 0.1, "diff": 0.3})
+    perfil.registrar("a.mq5", {"escaneo": 0.1})
+    perfil.registrar("b.mq5", {"escaneo": 0.4})
+    perfil.terminar()
+    etapas = perfil.etapas()
+    assert list(etapas) == ["escaneo", "diff"]
+    assert etapas["escaneo"]["archivos"] == 2
+    assert abs(etapas["escaneo"]["total_s"] - 0.6) < 1e-9
+    assert etapas["escaneo"]["max_s"] == 0.4
+
+    metricas = perfil.a_prometheus()
+    assert 'mql5_etapa_segundos_count{etapa="escaneo"} 2' in metricas
+    assert "mql5_lote_archivos 2" in metricas
+    assert json.loads(perfil.a_json())["archivos"]["a.mq5"]["escaneo"] == 0.2
+
+
+def test_cli_perfil_y_metricas(tmp_path):
+    entrada = tmp_path / "Strategy.mq5"
+    entrada.write_text(generar_estrategia(8 * 1024, seed=1), encoding="utf-8")
+    perfil, metricas = tmp_path / "perfil.json", tmp_path / "mql5.prom"
+    argumentos = [str(entrada), "-m", "gerard", "-o", str(tmp_path / "salida.zip")]
+    argumentos += ["-j", "1", "--perfil", str(perfil), "--metricas", str(metricas)]
+    assert cli.main(argumentos) == 0
+    etapas = json.loads(perfil.read_text(encoding="utf-8"))["etapas"]
+    for nombre in ("decodificacion", "escaneo_anclas", "validacion", "zip"):
+        assert nombre in etapas
+    assert "mql5_lote_duracion_segundos" in metricas.read_text(encoding="utf-8")
@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+import procesamiento
+
+from benchmarks.corpus import generar_estrategia
+from motor import GERARD, AnclasNoEncontradas
+from procesamiento import procesar_contenido, procesar_en_paralelo
+
+NOMBRE = GERARD.nombre
+
+
+def _archivos(n):
+    archivos = []
+    for i in range(n):
+        sin_anclas = ("lot",) if i % 4 == 3 else ()
+        content = generar_estrategia(8 * 1024, seed=i, sin_anclas=sin_anclas)
+        archivos.append((i, f"Strategy {i}.mq5", content.encode("utf-8")))
+    return archivos
+
+
+def test_resultados_del_pool_iguales_que_en_serie():
+    archivos = _archivos(8)
+    resultados = {}
+    for i, salida, error in procesar_en_paralelo(archivos, NOMBRE, max_workers=2):
+        assert i not in resultados
+        resultados[i] = (salida, error)
+    assert sorted(resultados) == list(range(8))
+
+    for i, filename, data in archivos:
+        salida, error = resultados[i]
+        if i % 4 == 3:
+            # Las excepciones del motor llegan intactas desde el pool
+            assert isinstance(error, AnclasNoEncontradas)
+            assert error.informe.faltan == ["lot"]
+            with pytest.raises(AnclasNoEncontradas):
+                procesar_contenido(data, filename, NOMBRE)
+            continue
+        assert error is None
+        assert salida[0] == procesar_contenido(data, filename, NOMBRE)[0]
+
+
+def test_lee_el_lote_a_medida_que_avanza():
+    leidos = []
+
+    def generador():
+        for archivo in _archivos(12):
+            leidos.append(archivo[0])
+            yield archivo
+
+    entregados = 0
+    for _ in procesar_en_paralelo(generador(), NOMBRE, max_workers=1, en_vuelo=2):
+        entregados += 1
+        assert len(leidos) <= entregados + 2
+    assert entregados == 12
+
+
+def test_pool_sin_fork(monkeypatch):
+    # Desde los hilos de ColaTrabajos: los procesos no deben heredar cerrojos
+    metodos = []
+
+    class Pool(procesamiento.ProcessPoolExecutor):
+        def __init__(self, *args, mp_context=None, **kwargs):
+            metodos.append(mp_context and mp_context.get_start_method())
+            super().__init__(*args, mp_context=mp_context, **kwargs)
+
+    monkeypatch.setattr(procesamiento, "ProcessPoolExecutor", Pool)
+    resultados = []
+    hilo = threading.Thread(
+        target=lambda: resultados.extend(
+            procesar_en_paralelo(_archivos(2), NOMBRE, max_workers=1)
+        )
+    )
+    hilo.start()
+    hilo.join(60)
+    assert metodos == ["spawn"]
+    assert sorted(i for i, _, error in resultados if error is None) == [0, 1]
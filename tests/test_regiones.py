@@ -0,0 +1,59 @@
+import pytest
+
+from benchmarks.corpus import generar_estrategia
+from motor import (
+    BENJAMIN,
+    GERARD,
+    REGIONES_ACTUALIZADAS,
+    escanear_anclas,
+    indice_regiones,
+    modificar_estrategia,
+    validar_estructura,
+)
+
+
+def _version_antigua(content, metodologia):
+    """Como si el archivo se hubiera modificado con plantillas anteriores"""
+    return content.replace(f" {metodologia.version}*/", " 0123456789abcdef*/")
+
+
+@pytest.mark.parametrize("metodologia", [GERARD, BENJAMIN], ids=lambda m: m.clave)
+def test_actualiza_las_regiones_de_una_version_anterior(metodologia):
+    original = generar_estrategia(32 * 1024, seed=2)
+    actual, _ = modificar_estrategia(original, "s.mq5", metodologia)
+    regiones = indice_regiones(actual, escanear_anclas(actual))
+    assert {region.version for region in regiones} == {metodologia.version}
+
+    # Los cambios a mano fuera de las regiones se conservan
+    antiguo = _version_antigua(actual, metodologia).replace(
+        "bool VerboseMode = false;", "bool VerboseMode = true; // editado"
+    )
+    actualizado, message = modificar_estrategia(antiguo, "s.mq5", metodologia)
+    assert message == REGIONES_ACTUALIZADAS.format(
+        metodologia=metodologia.nombre, cambios=len(regiones)
+    )
+    assert actualizado == actual.replace(
+        "bool VerboseMode = false;", "bool VerboseMode = true; // editado"
+    )
+
+
+def test_cambia_de_metodologia_sin_el_original():
+    original = generar_estrategia(32 * 1024, seed=2)
+    gerard, _ = modificar_estrategia(original, "s.mq5", GERARD)
+    benjamin, _ = modificar_estrategia(gerard, "s.mq5", BENJAMIN)
+    assert GERARD.processed_marker not in benjamin
+    assert BENJAMIN.processed_marker in benjamin
+    assert validar_estructura(benjamin, BENJAMIN) == []
+    regiones = indice_regiones(benjamin, escanear_anclas(benjamin))
+    # La sqMMFixedAmount precisa de Gerard tiene la firma original: se conserva
+    assert {(r.tipo, r.clave) for r in regiones if r.clave != BENJAMIN.clave} == {
+        ("mmfunc", GERARD.clave)
+    }
+
+
+def test_region_sin_cerrar():
+    original = generar_estrategia(16 * 1024, seed=2)
+    modificado, _ = modificar_estrategia(original, "s.mq5", GERARD)
+    roto = modificado.replace("/*@fin oninit*/", "", 1)
+    with pytest.raises(ValueError, match="sin marca de fin"):
+        modificar_estrategia(roto, "s.mq5", GERARD)
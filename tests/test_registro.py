@@ -0,0 +1,189 @@
+import re
+
+import pytest
+
+import cli
+from benchmarks.corpus import generar_estrategia
+from motor import (
+    BENJAMIN,
+    GERARD,
+    Identidad,
+    extraer_identidad,
+    extraer_identidad_bytes,
+    extraer_identidad_trozos,
+)
+from registro import (
+    MAX_COLISIONES,
+    MOSTRADAS,
+    RegistroCartera,
+    clave_cartera,
+    describir_colisiones,
+)
+from registro import main as registro_main
+
+
+@pytest.fixture
+def registro(tmp_path):
+    registro = RegistroCartera(str(tmp_path / "cartera.sqlite"))
+    yield registro
+    registro.cerrar()
+
+
+def _estrategia(strategy_id="111111111", magic=4242, seed=0):
+    content = generar_estrategia(10 * 1024, seed=seed)
+    content = re.sub(r"MagicNumber = \d+", f"MagicNumber = {magic}", content)
+    return re.sub(r'StrategyID = "\d+"', f'StrategyID = "{strategy_id}"', content)
+
+
+def test_extraer_identidad():
+    content = _estrategia()
+    identidad = Identidad("111111111", 4242, None)
+    assert extraer_identidad(content) == identidad
+    trozos = (content[i : i + 100] for i in range(0, len(content), 100))
+    assert extraer_identidad_trozos(trozos) == identidad
+    assert extraer_identidad_bytes(content.encode("utf-16")) == identidad
+
+
+def test_identidad_se_detiene_en_oninit_y_lee_el_simbolo():
+    content = (
+        "//|  Symbol: EURUSD\n"
+        'input string TradeSymbol = "Current";\n'
+        "input int MagicNumber = 7;\n"
+        "int OnInit() {\n"
+        'string StrategyID = "tarde";\n'
+    )
+    assert extraer_identidad(content) == Identidad(None, 7, "EURUSD")
+    assert not Identidad()
+
+
+def test_clave_cartera():
+    assert clave_cartera("EURUSD\\a/../Strategy 1.mq5") == "EURUSD/Strategy 1.mq5"
+    assert clave_cartera("./x.mq5") == "x.mq5"
+
+
+def test_colisiones(registro):
+    a = Identidad("1", 10, "EURUSD")
+    assert registro.registrar("a.mq5", a, [GERARD]) == []
+    # Variantes del mismo archivo: no chocan
+    assert registro.registrar("a.mq5", a, [GERARD, BENJAMIN]) == []
+
+    colisiones = registro.registrar("b.mq5", Identidad("1", 11), [GERARD])
+    assert [(c.campo, c.archivo) for c in colisiones] == [("StrategyID", "a.mq5")]
+    assert "StrategyID 1 ya lo usa a.mq5" in describir_colisiones(colisiones)
+
+    # El StrategyID de Benjamin va en otras variables globales que Gerard...
+    assert registro.registrar("c.mq5", Identidad("2", 12), [BENJAMIN]) == []
+    assert registro.registrar("d.mq5", Identidad("2", 13), [GERARD]) == []
+    # ...pero el MagicNumber choca siempre
+    colisiones = registro.registrar("e.mq5", Identidad("3", 12), [GERARD])
+    assert [(c.campo, c.archivo) for c in colisiones] == [("MagicNumber", "c.mq5")]
+
+    grupos = registro.colisiones_cartera()
+    assert ("MagicNumber", "12", ["c.mq5", "e.mq5"]) in grupos
+    assert ("StrategyID", "1 (SQ.TradeLevel.)", ["a.mq5", "b.mq5"]) in grupos
+    registro.olvidar(["b.mq5", "e.mq5"])
+    assert registro.colisiones_cartera() == []
+
+
+def test_mismo_nombre_en_carpetas_distintas(registro):
+    registro.registrar(clave_cartera("EURUSD/s.mq5"), Identidad("1", 1), [GERARD])
+    colisiones = registro.registrar(
+        clave_cartera("GBPUSD/s.mq5"), Identidad("2", 1), [GERARD]
+    )
+    assert [c.archivo for c in colisiones] == ["EURUSD/s.mq5"]
+    assert len(registro) == 2
+
+
+def test_cli_y_trabajos_comparten_la_clave(tmp_path):
+    from cache import CacheResultados
+    from trabajos import ColaTrabajos
+
+    entrada = tmp_path / "exports" / "EURUSD"
+    entrada.mkdir(parents=True)
+    data = _estrategia().encode("utf-8")
+    (entrada / "s.mq5").write_bytes(data)
+    otra = tmp_path / "exports" / "otra.mq5"
+    otra.write_bytes(_estrategia(strategy_id="222222222", seed=1).encode("utf-8"))
+    ruta = str(tmp_path / "cartera.sqlite")
+
+    assert (
+        cli.main(
+            [
+                str(tmp_path / "exports"),
+                "-m",
+                "gerard",
+                "-o",
+                str(tmp_path / "salida"),
+                "-j",
+                "1",
+                "--registro",
+                ruta,
+            ]
+        )
+        == 0
+    )
+    registro = RegistroCartera(ruta)
+    try:
+        # otra.mq5 comparte el MagicNumber
+        assert registro.colisiones_cartera() == [
+            ("MagicNumber", "4242", ["EURUSD/s.mq5", "otra.mq5"])
+        ]
+    finally:
+        registro.cerrar()
+
+    # El mismo archivo desde la interfaz, dentro de un paquete
+    cola = ColaTrabajos(
+        CacheResultados(directorio=str(tmp_path / "cache")),
+        directorio=str(tmp_path / "trabajos"),
+        registro=ruta,
+    )
+    trabajo = cola.obtener(
+        cola.enviar(
+            GERARD.nombre, [(("EURUSD/s.mq5", "h"), "EURUSD/s.mq5", lambda: data)]
+        )
+    )
+    cola._pool.shutdown(wait=True)
+    assert trabajo.estado == "terminado", trabajo.error
+    # Solo choca con otra.mq5, no consigo mismo
+    [descripcion] = trabajo.colisiones.values()
+    assert "otra.mq5" in descripcion and "EURUSD/s.mq5" not in descripcion
+
+
+def test_trabajos_sin_registro_por_defecto(tmp_path):
+    from trabajos import ColaTrabajos
+
+    assert ColaTrabajos(None, directorio=str(tmp_path)).registro is None
+
+
+def test_limite_de_colisiones(registro):
+    for n in range(MAX_COLISIONES + 5):
+        registro.registrar(f"{n:02d}.mq5", Identidad(str(n), 99), [BENJAMIN])
+    colisiones = registro.registrar("nueva.mq5", Identidad("x", 99), [GERARD])
+    # Como mucho MAX_COLISIONES, de las registradas antes
+    assert len(colisiones) == MAX_COLISIONES
+    assert {c.archivo for c in colisiones} <= {
+        f"{n:02d}.mq5" for n in range(MAX_COLISIONES + 5)
+    }
+    assert describir_colisiones(colisiones).endswith(
+        f" y {MAX_COLISIONES - MOSTRADAS} más"
+    )
+
+
+def test_main_lista_y_olvida(tmp_path, capsys):
+    ruta = str(tmp_path / "cartera.sqlite")
+    with pytest.raises(SystemExit):
+        registro_main(["--registro", ruta])
+
+    registro = RegistroCartera(ruta)
+    registro.registrar("EURUSD/a.mq5", Identidad("1", 10), [GERARD])
+    registro.registrar("b.mq5", Identidad("2", 10), [GERARD])
+    registro.cerrar()
+
+    assert registro_main(["--registro", ruta]) == 1
+    salida = capsys.readouterr().out
+    assert "MagicNumber 10: EURUSD/a.mq5, b.mq5" in salida
+    assert "Registros: 2 | Colisiones: 1" in salida
+
+    # Con la ruta tal y como la escribe el usuario
+    assert registro_main(["--registro", ruta, "--olvidar", "EURUSD\\a.mq5"]) == 0
+    assert "Registros: 1 | Colisiones: 0" in capsys.readouterr().out
@@ -0,0 +1,279 @@
+import asyncio
+import http.client
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from urllib.parse import urlencode, urlsplit
+
+import pytest
+
+import servidor
+from benchmarks.carga import _esperar_servidor, _puerto_libre, cuerpo_multipart
+from benchmarks.corpus import generar_estrategia
+from motor import BENJAMIN, GERARD, extraer_identidad, modificar_estrategia
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIN_ANCLAS = b"int OnInit()\n{\n   return(INIT_SUCCEEDED);\n}\n"
+
+
+@pytest.fixture(scope="module")
+def url():
+    puerto = _puerto_libre()
+    proceso = subprocess.Popen(
+        [sys.executable, "servidor.py", "--puerto", str(puerto), "-j", "1"],
+        cwd=RAIZ,
+    )
+    url = f"http://127.0.0.1:{puerto}"
+    try:
+        _esperar_servidor(url)
+        yield url
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=60)
+
+
+def _peticion(url, metodo, ruta, cuerpo=None, tipo=None):
+    """(código, cabeceras, cuerpo) de una petición al servidor"""
+    partes = urlsplit(url)
+    conexion = http.client.HTTPConnection(partes.hostname, partes.port, timeout=60)
+    try:
+        cabeceras = {"Content-Type": tipo} if tipo else {}
+        conexion.request(metodo, ruta, cuerpo, cabeceras)
+        respuesta = conexion.getresponse()
+        return (
+            respuesta.status,
+            {campo.lower(): valor for campo, valor in respuesta.getheaders()},
+            respuesta.read(),
+        )
+    finally:
+        conexion.close()
+
+
+def _paquete(miembros):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as bundle:
+        for nombre, data in miembros:
+            bundle.writestr(nombre, data)
+    return buffer.getvalue()
+
+
+def _estrategia(seed):
+    return generar_estrategia(8 * 1024, seed=seed)
+
+
+def test_salud(url):
+    codigo, _, cuerpo = _peticion(url, "GET", "/salud")
+    assert codigo == 200
+    assert json.loads(cuerpo)["metodologias"] == ["benjamin", "gerard"]
+
+
+def test_formulario_con_sueltos_y_paquetes(url):
+    archivos = [
+        ("Strategy 1.mq5", _estrategia(1).encode("utf-8")),
+        (
+            "lote.zip",
+            _paquete(
+                [
+                    ("EURUSD/Strategy 2.mq5", _estrategia(2).encode("utf-8")),
+                    ("EURUSD/Sin anclas.mq5", SIN_ANCLAS),
+                    ("notas.txt", b"no es una estrategia"),
+                ]
+            ),
+        ),
+        ("notas.txt", b"se ignora"),
+    ]
+    cuerpo, tipo = cuerpo_multipart(
+        archivos, [("metodologia", "gerard"), ("metodologia", "benjamin")]
+    )
+    codigo, cabeceras, respuesta = _peticion(url, "POST", "/procesar", cuerpo, tipo)
+    assert codigo == 200
+    assert cabeceras["content-type"] == "application/zip"
+    # Se envía por trozos, sin conocer antes el tamaño
+    assert cabeceras.get("transfer-encoding") == "chunked"
+
+    with zipfile.ZipFile(io.BytesIO(respuesta)) as resultado:
+        assert resultado.testzip() is None
+        nombres = resultado.namelist()
+        assert nombres[-1] == servidor.MANIFIESTO
+        manifiesto = json.loads(resultado.read(servidor.MANIFIESTO))
+        archivos_salida = {nombre: resultado.read(nombre) for nombre in nombres[:-1]}
+
+    assert manifiesto["contadores"]["ok"] == 2
+    assert manifiesto["contadores"]["rechazado"] == 1
+    por_archivo = {entrada["archivo"]: entrada for entrada in manifiesto["archivos"]}
+    assert sorted(por_archivo) == [
+        "EURUSD/Sin anclas.mq5",
+        "EURUSD/Strategy 2.mq5",
+        "Strategy 1.mq5",
+    ]
+    assert por_archivo["EURUSD/Sin anclas.mq5"]["salidas"] == []
+
+    for relpath, seed in (("Strategy 1.mq5", 1), ("EURUSD/Strategy 2.mq5", 2)):
+        entrada = por_archivo[relpath]
+        assert entrada["estado"] == "ok"
+        identidad = extraer_identidad(_estrategia(seed))
+        assert entrada["identidad"]["strategy_id"] == identidad.strategy_id
+        assert entrada["identidad"]["magic_number"] == identidad.magic_number
+        assert len(entrada["salidas"]) == 2
+        for nombre, metodologia in zip(sorted(entrada["salidas"]), (BENJAMIN, GERARD)):
+            assert nombre.endswith(f"{metodologia.suffix}.mq5")
+            esperado, _ = modificar_estrategia(_estrategia(seed), relpath, metodologia)
+            assert archivos_salida[nombre].decode("utf-8") == esperado
+    assert len(archivos_salida) == 4
+
+
+def test_zip_como_cuerpo_con_parametros(url):
+    cuerpo = _paquete([("Strategy 3.mq5", _estrategia(3).encode("utf-8"))])
+    consulta = urlencode(
+        {"metodologia": "benjamin", "parametros": '{"g_riskStep": 0.75}'}
+    )
+    codigo, _, respuesta = _peticion(
+        url, "POST", f"/procesar?{consulta}", cuerpo, "application/zip"
+    )
+    assert codigo == 200
+    with zipfile.ZipFile(io.BytesIO(respuesta)) as resultado:
+        [nombre, _] = resultado.namelist()
+        modificado = resultado.read(nombre).decode("utf-8")
+    esperado, _ = modificar_estrategia(
+        _estrategia(3), "Strategy 3.mq5", BENJAMIN.con_parametros({"g_riskStep": 0.75})
+    )
+    assert modificado == esperado and "0.75" in modificado
+
+
+@pytest.mark.parametrize(
+    "campos, archivos, tipo, codigo, detalle",
+    [
+        ([("metodologia", "kelly")], True, None, 400, "Metodología desconocida"),
+        ([], True, None, 400, "al menos una metodología"),
+        ([("metodologia", "gerard")], False, None, 400, "ningún archivo"),
+        (
+            [("metodologia", "gerard"), ("nivel_zip", "10")],
+            True,
+            None,
+            400,
+            "nivel_zip",
+        ),
+        (
+            [
+                ("metodologia", "gerard"),
+                ("variantes", '[{"metodologia": "gerard"}]'),
+            ],
+            True,
+            None,
+            400,
+            "Sufijos de salida repetidos",
+        ),
+        ([("metodologia", "gerard")], True, "text/plain", 415, "multipart"),
+    ],
+)
+def test_peticiones_invalidas(url, campos, archivos, tipo, codigo, detalle):
+    subidos = [("s.mq5", _estrategia(1).encode("utf-8"))] if archivos else []
+    cuerpo, tipo_formulario = cuerpo_multipart(subidos, campos)
+    respuesta = _peticion(url, "POST", "/procesar", cuerpo, tipo or tipo_formulario)
+    assert respuesta[0] == codigo
+    assert detalle in json.loads(respuesta[2])["detail"]
+
+
+def test_listar_tareas_con_nombres_repetidos(tmp_path):
+    suelto = tmp_path / "Strategy 1.mq5"
+    suelto.write_bytes(b"")
+    paquete = tmp_path / "lote.zip"
+    paquete.write_bytes(_paquete([("Strategy 1.mq5", b""), ("otro.txt", b"")]))
+    tareas = servidor.listar_tareas(
+        [("Strategy 1.mq5", str(suelto)), ("lote.zip", str(paquete))]
+    )
+    assert tareas == [
+        (str(suelto), None, "Strategy 1.mq5"),
+        (str(paquete), "Strategy 1.mq5", "1/Strategy 1.mq5"),
+    ]
+    roto = tmp_path / "roto.zip"
+    roto.write_bytes(b"no es un zip")
+    with pytest.raises(servidor.PeticionInvalida, match="no es un .zip válido"):
+        servidor.listar_tareas([("roto.zip", str(roto))])
+
+
+def _estado_pool(en_vuelo=4, en_vuelo_lote=2):
+    return SimpleNamespace(
+        pool=ThreadPoolExecutor(max_workers=1),
+        huecos=asyncio.Semaphore(en_vuelo),
+        en_vuelo=en_vuelo,
+        en_vuelo_lote=en_vuelo_lote,
+    )
+
+
+def _tareas(tmp_path, n):
+    tareas = []
+    for i in range(n):
+        ruta = tmp_path / f"s{i}.mq5"
+        ruta.write_text(_estrategia(i), encoding="utf-8")
+        tareas.append((str(ruta), None, ruta.name))
+    return tareas
+
+
+def test_huecos_liberados_si_falla_el_zip(tmp_path, monkeypatch):
+    def anexar_roto(*args):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(servidor, "anexar_entrada", anexar_roto)
+
+    async def consumir():
+        estado = _estado_pool()
+        try:
+            generador = servidor.generar_zip(
+                estado, _tareas(tmp_path, 3), [GERARD], "bloquear", None
+            )
+            with pytest.raises(OSError, match="disco lleno"):
+                async for _ in generador:
+                    pass
+            # La otra tarea en curso libera su hueco al terminar
+            await asyncio.to_thread(estado.pool.shutdown, True)
+            await asyncio.sleep(0)
+            return estado.huecos._value
+        finally:
+            estado.pool.shutdown(wait=True)
+
+    assert asyncio.run(consumir()) == 4
+
+
+def test_huecos_de_tareas_en_curso_al_desconectar(tmp_path, monkeypatch):
+    seguir = threading.Event()
+    empezada = threading.Event()
+
+    def procesar_lento(*args):
+        empezada.set()
+        seguir.wait(30)
+        return args[-1][2], "ok", "", [], {}, None
+
+    monkeypatch.setattr(servidor, "_procesar_tarea", procesar_lento)
+
+    async def desconectar():
+        estado = _estado_pool()
+        try:
+            generador = servidor.generar_zip(
+                estado, _tareas(tmp_path, 3), [GERARD], "bloquear", None
+            )
+            siguiente = asyncio.ensure_future(generador.__anext__())
+            await asyncio.to_thread(empezada.wait, 30)
+            # El cliente se va: la primera tarea sigue en el pool y la segunda
+            # aún no ha empezado
+            siguiente.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await siguiente
+            await generador.aclose()
+            durante = estado.huecos._value
+            seguir.set()
+            await asyncio.to_thread(estado.pool.shutdown, True)
+            await asyncio.sleep(0)
+            return durante, estado.huecos._value
+        finally:
+            seguir.set()
+            estado.pool.shutdown(wait=True)
+
+    assert asyncio.run(desconectar()) == (3, 4)
@@ -0,0 +1,119 @@
+import csv
+
+import numpy as np
+import pytest
+
+import simulacion
+from motor import BENJAMIN, GERARD, leer_parametros
+from simulacion import leer_operaciones, por_lotes, simular_lote
+
+BALANCE = 10_000.0
+
+
+def _gerard(r, parametros):
+    """La escalera de la plantilla MQL5, operación a operación"""
+    niveles = [float(v) for v in parametros["g_riskLevels_string"].split(",")]
+    nivel = 1
+    beneficios = []
+    for valor in r:
+        beneficio = valor * BALANCE * niveles[nivel - 1] / 100.0
+        beneficios.append(beneficio)
+        nivel = min(nivel + 1, len(niveles)) if beneficio < 0 else 1
+    return beneficios, niveles[nivel - 1]
+
+
+def _benjamin(r, p):
+    riesgo = p["g_initialRiskPercent"]
+    total = 0.0
+    beneficios = []
+
+    def del_trade():
+        if total <= p["g_maxLossThreshold"]:
+            return p["g_maxLossRisk"]
+        if total >= p["g_profitProtectThreshold"]:
+            return p["g_profitProtectRisk"]
+        return riesgo
+
+    for valor in r:
+        beneficio = valor * BALANCE * del_trade() / 100.0
+        beneficios.append(beneficio)
+        total += beneficio / BALANCE * 100.0
+        if beneficio >= 0:
+            riesgo = max(riesgo - p["g_riskStep"], p["g_minRiskPercent"])
+        else:
+            riesgo += p["g_riskStep"]
+    return beneficios, del_trade()
+
+
+# Las variantes conservan el marcador de su metodología
+REFERENCIAS = {GERARD.processed_marker: _gerard, BENJAMIN.processed_marker: _benjamin}
+
+
+@pytest.mark.parametrize(
+    "metodologia",
+    [
+        GERARD,
+        GERARD.con_parametros({"g_riskLevels_string": "0.5,1,3"}, "_g3"),
+        BENJAMIN,
+        BENJAMIN.con_parametros({"g_riskStep": 0.5, "g_maxLossThreshold": -2}, "_b"),
+    ],
+    ids=lambda m: m.clave,
+)
+def test_igual_que_la_maquina_de_estado(metodologia):
+    rng = np.random.default_rng(3)
+    estrategias = [
+        (f"s{n}", np.round(rng.normal(0.1, 1.2, size=rng.integers(0, 300)), 2))
+        for n in range(12)
+    ]
+    referencia = REFERENCIAS[metodologia.processed_marker]
+    parametros = leer_parametros(metodologia.risk_management_inputs)
+    for nombres, r, longitudes in por_lotes(iter(estrategias), tamano=5):
+        resultado = simular_lote(nombres, r, longitudes, metodologia, BALANCE)
+        for i, nombre in enumerate(nombres):
+            valores = dict(estrategias)[nombre]
+            beneficios, siguiente = referencia(valores, parametros)
+            np.testing.assert_allclose(
+                resultado.beneficio_operacion[i, : len(valores)], beneficios
+            )
+            equity = BALANCE + np.cumsum(beneficios)
+            np.testing.assert_allclose(resultado.curva(i), equity)
+            maximo = np.maximum.accumulate(np.concatenate([[BALANCE], equity]))
+            caida = maximo - np.concatenate([[BALANCE], equity])
+            assert resultado.max_drawdown[i] == pytest.approx(caida.max())
+            assert resultado.riesgo_siguiente[i] == pytest.approx(siguiente)
+
+
+def test_leer_operaciones(tmp_path):
+    ruta = tmp_path / "cartera.csv"
+    ruta.write_text(
+        "Strategy;Profit/Loss\nA;1.250,5\nA;-500\n\nB;250\n", encoding="utf-8"
+    )
+    operaciones = list(
+        leer_operaciones(
+            str(ruta), columna_estrategia="Strategy", tipo="pl", riesgo=500
+        )
+    )
+    assert [nombre for nombre, _ in operaciones] == ["A", "B"]
+    np.testing.assert_allclose(operaciones[0][1], [2.501, -1.0])
+
+    ruta.write_text("Strategy,R\nA,1\nB,2\nA,3\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="no son consecutivas"):
+        list(leer_operaciones(str(ruta), columna_estrategia="Strategy"))
+    with pytest.raises(ValueError, match="no se encuentra la columna"):
+        list(leer_operaciones(str(ruta), columna="Beneficio"))
+
+
+def test_main(tmp_path):
+    entrada = tmp_path / "EURUSD.csv"
+    entrada.write_text("R\n1\n-1\n-1\n2\n", encoding="utf-8")
+    salida = tmp_path / "resumen.csv"
+    argumentos = [str(entrada), "-m", "gerard", "-o", str(salida), "--balance", "10000"]
+    assert simulacion.main(argumentos) == 0
+    with open(salida, encoding="utf-8") as f:
+        (fila,) = list(csv.DictReader(f))
+    beneficios, _ = _gerard(
+        [1, -1, -1, 2], leer_parametros(GERARD.risk_management_inputs)
+    )
+    assert fila["estrategia"] == "EURUSD" and fila["operaciones"] == "4"
+    assert float(fila["beneficio"]) == pytest.approx(sum(beneficios), abs=0.01)
+    assert fila["nivel_final"] == "1"
@@ -0,0 +1,162 @@
+import hashlib
+import threading
+import time
+import zipfile
+
+import pytest
+
+from benchmarks.corpus import generar_estrategia
+from cache import CacheResultados
+from trabajos import ColaLlena, ColaTrabajos, firma_lote
+
+GERARD = "Escalado Metodología Gerard"
+
+
+def _entradas(n, seed=0):
+    entradas = []
+    for i in range(n):
+        data = generar_estrategia(10 * 1024, seed=(seed + i) % 4).encode("utf-8")
+        if i >= 4:
+            # Contenido distinto aunque se repita la semilla
+            data += f"\n// {i}\n".encode("ascii")
+        # Como en la app, la clave incluye una huella del contenido
+        clave = (f"s{i}.mq5", hashlib.sha256(data).hexdigest())
+        entradas.append((clave, f"s{i}.mq5", lambda d=data: d))
+    return entradas
+
+
+def _esperar(trabajo, limite=60):
+    fin = time.monotonic() + limite
+    while trabajo.activo:
+        assert time.monotonic() < fin, "el trabajo no termina"
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def cola(tmp_path):
+    cola = ColaTrabajos(
+        CacheResultados(directorio=str(tmp_path / "cache")),
+        max_trabajos=2,
+        max_en_cola=2,
+        directorio=str(tmp_path / "trabajos"),
+        registro=None,
+    )
+    yield cola
+    cola._pool.shutdown(wait=True)
+
+
+def test_trabajo_completo(cola):
+    trabajo = cola.obtener(cola.enviar(GERARD, _entradas(3)))
+    _esperar(trabajo)
+    assert trabajo.estado == "terminado", trabajo.error
+    assert trabajo.completados == trabajo.total == 3
+    assert trabajo.contadores()["ok"] == 3
+    with zipfile.ZipFile(trabajo.archivo_zip) as bundle:
+        assert sorted(bundle.namelist()) == [
+            f"s{i}_escalado_gerard.mq5" for i in range(3)
+        ]
+
+
+def test_mismo_lote_reutiliza_el_trabajo(cola):
+    entradas = _entradas(2)
+    assert cola.enviar(GERARD, entradas) == cola.enviar(GERARD, entradas)
+    assert firma_lote(GERARD, [1, 2]) == firma_lote(GERARD, [2, 1])
+
+
+def test_cola_llena(cola):
+    # Con los dos hilos ocupados, los trabajos se quedan en cola
+    liberar = threading.Event()
+    for _ in range(2):
+        cola._pool.submit(liberar.wait)
+    try:
+        primero = cola.obtener(cola.enviar(GERARD, _entradas(2)))
+        segundo = cola.obtener(cola.enviar(GERARD, _entradas(2, seed=1)))
+        assert primero.estado == segundo.estado == "en_cola"
+        assert (cola.posicion(primero), cola.posicion(segundo)) == (0, 1)
+        with pytest.raises(ColaLlena):
+            cola.enviar(GERARD, _entradas(2, seed=2))
+    finally:
+        liberar.set()
+    _esperar(segundo)
+    assert segundo.estado == "terminado"
+
+
+def test_limpiar_caducados(cola):
+    trabajo = cola.obtener(cola.enviar(GERARD, _entradas(1)))
+    _esperar(trabajo)
+    cola.limpiar(ahora=time.time() + cola.ttl + 1)
+    assert cola.obtener(trabajo.id) is None
+
+
+def test_resumen_de_cache_por_trabajo(cola):
+    # Dos trabajos a la vez sobre los mismos archivos: cada resumen cuenta
+    # solo sus propias consultas
+    entradas = _entradas(6)
+    liberar = threading.Event()
+    for _ in range(2):
+        cola._pool.submit(liberar.wait)
+    primero = cola.obtener(cola.enviar(GERARD, entradas[:3]))
+    segundo = cola.obtener(cola.enviar(GERARD, entradas[3:]))
+    liberar.set()
+    _esperar(primero)
+    _esperar(segundo)
+    for trabajo in (primero, segundo):
+        assert "0 acierto(s)" in trabajo.resumen_cache
+        assert "3 fallo(s)" in trabajo.resumen_cache
+    repetido = cola.obtener(cola.enviar(GERARD, entradas[:2] + entradas[4:]))
+    _esperar(repetido)
+    assert "4 acierto(s) (4 en memoria, 0 en disco)" in repetido.resumen_cache
+
+
+def test_cache_desde_varios_hilos(tmp_path):
+    cache = CacheResultados(
+        memoria_max_size=50_000, directorio=str(tmp_path), disco_max_size=10**9
+    )
+    errores = []
+
+    def trabajar(n):
+        try:
+            for i in range(300):
+                clave = f"{n:02d}{i:04d}"
+                cache.put(clave, (b"x" * 1000, "ok", ""))
+                assert cache.get(clave) is not None
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=trabajar, args=(n,)) for n in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert not errores
+    stats = cache.estadisticas()
+    assert stats["aciertos_memoria"] + stats["aciertos_disco"] == 8 * 300
+    assert stats["memoria_bytes"] == sum(
+        len(resultado[0]) for resultado in cache._memoria.values()
+    )
+    assert stats["memoria_bytes"] <= 50_000
+
+
+def test_lote_con_rechazados_e_invalidos(cola):
+    entradas = _entradas(1)
+    rechazado = b"int OnInit()\n{\n   return(INIT_SUCCEEDED);\n}\n"
+    # Ya tiene su OnTradeTransaction: el resultado la definiría dos veces
+    invalido = generar_estrategia(10 * 1024, seed=1).encode("utf-8") + (
+        b"\nvoid OnTradeTransaction(const MqlTradeTransaction &t,"
+        b" const MqlTradeRequest &r, const MqlTradeResult &s)\n{\n}\n"
+    )
+    for nombre, data in (("rechazado.mq5", rechazado), ("invalido.mq5", invalido)):
+        clave = (nombre, hashlib.sha256(data).hexdigest())
+        entradas.append((clave, nombre, lambda d=data: d))
+
+    trabajo = cola.obtener(cola.enviar(GERARD, entradas))
+    _esperar(trabajo)
+    assert trabajo.estado == "terminado", trabajo.error
+    contadores = trabajo.contadores()
+    assert contadores["ok"] == contadores["rechazado"] == contadores["invalido"] == 1
+    # El informe de anclas se guarda para mostrarlo en la interfaz
+    [(clave, informe)] = trabajo.informes.items()
+    assert clave[0] == "rechazado.mq5" and informe.faltan
+    with zipfile.ZipFile(trabajo.archivo_zip) as bundle:
+        assert bundle.namelist() == ["s0_escalado_gerard.mq5"]
+    assert any("OnTradeTransaction" in linea for linea in trabajo.recientes)
@@ -0,0 +1,107 @@
+import pickle
+import re
+
+import pytest
+
+from benchmarks.corpus import generar_estrategia
+from motor import GERARD, EstructuraInvalida, modificar_estrategia, validar_estructura
+from motor.flujo import segmentar
+from motor.validacion import Validador
+from procesamiento import procesar_contenido
+
+ON_TRADE_TRANSACTION = (
+    "\nvoid OnTradeTransaction(const MqlTradeTransaction &trans,\n"
+    "                        const MqlTradeRequest &request,\n"
+    "                        const MqlTradeResult &result)\n{\n}\n"
+)
+
+
+def _tipos(content, metodologia=None):
+    return [problema.tipo for problema in validar_estructura(content, metodologia)]
+
+
+@pytest.mark.parametrize(
+    "content, tipo",
+    [
+        ("void f()\n{\n   if(x) {\n}\n", "llaves"),
+        ("void f()\n{\n}\n}\n", "llaves"),
+        ("void f()\n{\n   g((1);\n}\n", "parentesis"),
+        ('string s = "abc;\n', "sin_cerrar"),
+        ("int x;\n/* sin cerrar\n", "sin_cerrar"),
+        ("void f()\n{\n}\nvoid f()\n{\n}\n", "duplicado"),
+        ("int OnInit()\n{\n   return(0);\n}\nint OnInit()\n{\n}\n", "duplicado"),
+        ("double g_riskLevels[];\nint a, g_riskLevels[3];\n", "duplicado"),
+        ("#ifdef X\nint a;\n", "llaves"),
+    ],
+)
+def test_problemas(content, tipo):
+    assert _tipos(content) == [tipo]
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        # Sobrecargas, prototipos, declaraciones dentro de funciones
+        "void f(int a)\n{\n}\nvoid f(double a)\n{\n}\nvoid f(int a);\n",
+        "void f()\n{\n   int x;\n}\nvoid g()\n{\n   int x;\n}\n",
+        # Llaves y paréntesis en comentarios, cadenas y caracteres
+        "// {(\nstring s = \"}{)\";\nchar c = '{';\n/* ) */\n",
+        # Cada rama de la compilación condicional abre su llave
+        "#ifdef X\nvoid f() {\n#else\nvoid f(int a) {\n#endif\n}\n",
+        "struct S\n{\n   int a;\n};\nclass C\n{\n   int a;\n};\nint a;\n",
+    ],
+)
+def test_validos(content):
+    assert validar_estructura(content) == []
+
+
+def test_linea_del_problema():
+    [problema] = validar_estructura("int a;\n\n// a;\nint b, a;\n")
+    assert problema.linea == 4 and "ya en la línea 1" in problema.mensaje
+
+
+def test_falta_un_bloque_de_la_metodologia():
+    content = generar_estrategia(16 * 1024, seed=1)
+    modificado, _ = modificar_estrategia(content, "s.mq5", GERARD)
+    assert validar_estructura(modificado, GERARD) == []
+    sin_bloque = re.sub(
+        r"/\*@riesgo ontrade .*?/\*@fin ontrade\*/", "", modificado, flags=re.DOTALL
+    )
+    [problema] = validar_estructura(sin_bloque, GERARD)
+    assert problema.tipo == "bloque" and "OnTradeTransaction" in problema.mensaje
+    # Sin metodología no se buscan sus bloques
+    assert validar_estructura(sin_bloque) == []
+
+
+@pytest.mark.parametrize("minimo", [1, 64, 4096])
+def test_en_segmentos_igual_que_entero(minimo):
+    content = generar_estrategia(32 * 1024, seed=4) + ON_TRADE_TRANSACTION
+    modificado, _ = modificar_estrategia(content, "s.mq5", GERARD)
+    modificado = modificado.replace("double g_", "double g_x, g_", 1) + "\n}\n"
+    entero = validar_estructura(modificado, GERARD)
+    assert {problema.tipo for problema in entero} == {"duplicado", "llaves"}
+
+    validador = Validador(GERARD)
+    textos = [modificado[i : i + 500] for i in range(0, len(modificado), 500)]
+    for _, segmento in segmentar(textos, minimo):
+        validador.alimentar(segmento)
+    assert validador.terminar() == entero
+
+    # recorrer() devuelve el mismo texto mientras valida
+    validador = Validador(GERARD)
+    assert "".join(validador.recorrer(textos)) == modificado
+    assert validador.terminar() == entero
+
+
+def test_estructura_invalida_al_procesar():
+    content = generar_estrategia(16 * 1024, seed=1) + ON_TRADE_TRANSACTION
+    with pytest.raises(EstructuraInvalida) as error:
+        procesar_contenido(content.encode("utf-8"), "s.mq5", GERARD.nombre)
+    [problema] = error.value.problemas
+    assert problema.tipo == "duplicado" and "OnTradeTransaction" in str(error.value)
+    assert isinstance(error.value, ValueError)
+
+    # Cruza el pool de procesos con sus problemas
+    copia = pickle.loads(pickle.dumps(error.value))
+    assert copia.problemas == error.value.problemas
+    assert copia.filename == "s.mq5" and str(copia) == str(error.value)
@@ -0,0 +1,110 @@
+import json
+import zipfile
+
+import pytest
+
+import cli
+from benchmarks.corpus import generar_estrategia
+from motor import (
+    BENJAMIN,
+    GERARD,
+    REGIONES_AL_DIA,
+    interpretar_variantes,
+    leer_parametros,
+    modificar_estrategia,
+    modificar_variantes,
+    nombre_modificado,
+    validar_estructura,
+)
+
+VARIANTES = [
+    GERARD,
+    GERARD.con_parametros({"g_riskLevels_string": "0.5,1.0,2.0"}, "_g_conservador"),
+    BENJAMIN,
+    BENJAMIN.con_parametros({"g_riskStep": 0.1, "g_maxLossThreshold": -3}, "_b_suave"),
+]
+
+
+def test_variantes_iguales_que_por_separado():
+    content = generar_estrategia(32 * 1024, seed=4)
+    resultados = modificar_variantes(content, "s.mq5", VARIANTES)
+    assert resultados == [
+        modificar_estrategia(content, "s.mq5", metodologia) for metodologia in VARIANTES
+    ]
+    # Cada variante lleva sus propios valores por defecto
+    assert 'g_riskLevels_string = "0.5,1.0,2.0"' in resultados[1][0]
+    assert "g_riskStep = 0.1;" in resultados[3][0]
+
+
+def test_con_parametros():
+    variante = VARIANTES[3]
+    parametros = leer_parametros(variante.risk_management_inputs)
+    assert parametros["g_riskStep"] == 0.1
+    assert parametros["g_maxLossThreshold"] == -3.0
+    # El resto de inputs conserva su valor
+    original = leer_parametros(BENJAMIN.risk_management_inputs)
+    assert parametros["g_minRiskPercent"] == original["g_minRiskPercent"]
+    assert variante.suffix == "_b_suave" and variante.version != BENJAMIN.version
+
+    with pytest.raises(ValueError, match="desconocido"):
+        GERARD.con_parametros({"g_noExiste": 1})
+    with pytest.raises(ValueError, match="Valor no válido"):
+        BENJAMIN.con_parametros({"g_riskStep": "mucho"})
+
+
+def test_cli_variantes(tmp_path):
+    entrada = tmp_path / "Strategy.mq5"
+    entrada.write_text(generar_estrategia(8 * 1024, seed=2), encoding="utf-8")
+    variantes = tmp_path / "variantes.json"
+    variantes.write_text(
+        json.dumps(
+            [
+                {"metodologia": "gerard", "sufijo": "_g1"},
+                {
+                    "metodologia": "gerard",
+                    "sufijo": "_g2",
+                    "parametros": {"g_riskLevels_string": "1,2"},
+                },
+            ]
+        ),
+        encoding="utf-8",
+    )
+    salida = tmp_path / "variantes.zip"
+    argumentos = [str(entrada), "--variantes", str(variantes), "-o", str(salida)]
+    assert cli.main(argumentos + ["-m", "benjamin", "-j", "1"]) == 0
+    with zipfile.ZipFile(salida) as zip_file:
+        assert zip_file.namelist() == [
+            "Strategy_escalado_benjamin.mq5",
+            "Strategy_g1.mq5",
+            "Strategy_g2.mq5",
+        ]
+
+    # Dos variantes con el mismo sufijo se pisarían
+    variantes.write_text(
+        json.dumps([{"metodologia": "gerard", "sufijo": "_escalado_gerard"}]),
+        encoding="utf-8",
+    )
+    with pytest.raises(SystemExit):
+        cli.main(argumentos + ["-m", "gerard"])
+
+
+@pytest.mark.parametrize(
+    "sufijo",
+    ["_mi variante", "_x*/ int y; /*", "/../../evil", "_a\\b", "_..", "_", 5],
+)
+def test_sufijo_no_valido(sufijo):
+    with pytest.raises(ValueError, match="Variante 1: Sufijo no válido"):
+        interpretar_variantes([{"metodologia": "gerard", "sufijo": sufijo}])
+
+
+def test_sufijo_valido_en_marcas_y_nombres():
+    [variante] = interpretar_variantes([{"metodologia": "gerard", "sufijo": "_g-1.5"}])
+    assert nombre_modificado("a/b.mq5", variante) == "a/b_g-1.5.mq5"
+    content = generar_estrategia(16 * 1024, seed=1)
+    modificado, _ = modificar_estrategia(content, "b.mq5", variante)
+    assert validar_estructura(modificado, variante) == []
+    # Las marcas de región se reconocen en una segunda pasada
+    assert modificar_estrategia(modificado, "b.mq5", variante) == (
+        None,
+        REGIONES_AL_DIA.format(filename="b.mq5", metodologia=variante.nombre),
+    )
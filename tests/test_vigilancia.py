@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+import vigilancia
+from benchmarks.corpus import generar_estrategia
+from motor import GERARD
+
+
+@pytest.fixture
+def exports(tmp_path):
+    directorio = tmp_path / "exports"
+    (directorio / "EURUSD").mkdir(parents=True)
+    for n, relpath in enumerate(["EURUSD/Strategy 1.mq5", "Strategy 2.mq5"]):
+        content = generar_estrategia(8 * 1024, seed=n)
+        (directorio / relpath).write_text(content, encoding="utf-8")
+    return directorio
+
+
+def _vigilar(exports, salida, capsys, *metodologias):
+    argumentos = [str(exports), "-o", str(salida), "-j", "1", "--una-vez"]
+    for clave in metodologias or ("gerard",):
+        argumentos += ["-m", clave]
+    codigo = vigilancia.main(argumentos)
+    lineas = capsys.readouterr().out.splitlines()
+    procesados = sorted(linea.split(" ", 1)[1].split(":")[0] for linea in lineas[:-2])
+    return codigo, procesados
+
+
+def _estado(salida):
+    with sqlite3.connect(salida / vigilancia.ESTADO_ARCHIVO) as conexion:
+        return dict(conexion.execute("SELECT relpath, estado FROM archivos"))
+
+
+def test_solo_se_procesan_los_cambios(exports, tmp_path, capsys):
+    salida = tmp_path / "salida"
+    relpath = os.path.join("EURUSD", "Strategy 1.mq5")
+    assert _vigilar(exports, salida, capsys) == (0, [relpath, "Strategy 2.mq5"])
+    assert _estado(salida) == {relpath: "ok", "Strategy 2.mq5": "ok"}
+    assert sorted(p.name for p in salida.rglob("*.mq5")) == [
+        "Strategy 1_escalado_gerard.mq5",
+        "Strategy 2_escalado_gerard.mq5",
+    ]
+
+    # Sin cambios, ni siquiera se leen
+    assert _vigilar(exports, salida, capsys) == (0, [])
+
+    # Otra fecha con el mismo contenido: solo se actualiza la fecha guardada
+    ruta = exports / relpath
+    os.utime(ruta, ns=(0, 10**18))
+    assert _vigilar(exports, salida, capsys) == (0, [])
+    with sqlite3.connect(salida / vigilancia.ESTADO_ARCHIVO) as conexion:
+        [(mtime_ns,)] = conexion.execute(
+            "SELECT mtime_ns FROM archivos WHERE relpath = ?", (relpath,)
+        )
+    assert mtime_ns == 10**18
+
+    # Contenido nuevo: solo ese archivo
+    (exports / "Strategy 2.mq5").write_text(
+        generar_estrategia(8 * 1024, seed=9), encoding="utf-8"
+    )
+    assert _vigilar(exports, salida, capsys) == (0, ["Strategy 2.mq5"])
+
+    # Un archivo borrado sale del estado
+    ruta.unlink()
+    assert _vigilar(exports, salida, capsys) == (0, [])
+    assert _estado(salida) == {"Strategy 2.mq5": "ok"}
+
+
+def test_otras_metodologias_reprocesan_todo(exports, tmp_path, capsys):
+    salida = tmp_path / "salida"
+    assert len(_vigilar(exports, salida, capsys)[1]) == 2
+    assert len(_vigilar(exports, salida, capsys, "gerard", "benjamin")[1]) == 2
+    assert len(list(salida.rglob("*.mq5"))) == 4
+
+
+def test_codigo_de_salida_con_rechazados(exports, tmp_path, capsys):
+    salida = tmp_path / "salida"
+    (exports / "Sin anclas.mq5").write_text(
+        "int OnInit()\n{\n   return(INIT_SUCCEEDED);\n}\n", encoding="utf-8"
+    )
+    assert _vigilar(exports, salida, capsys)[0] == 1
+    assert _estado(salida)["Sin anclas.mq5"] == "rechazado"
+    # El rechazo queda registrado: no se reintenta hasta que cambie
+    assert _vigilar(exports, salida, capsys) == (0, [])
+
+
+def test_espera_a_que_el_archivo_este_estable(exports, tmp_path):
+    salida = tmp_path / "salida"
+    salida.mkdir()
+    estado = vigilancia.EstadoVigilancia(str(salida / vigilancia.ESTADO_ARCHIVO))
+    try:
+        vigilante = vigilancia.Vigilante(
+            str(exports), str(salida), [GERARD], estado, workers=1, espera=60
+        )
+        vigilante.revisar()
+        # Aún no han pasado los 60 s: no se envía nada al pool
+        proximo = vigilante._despachar(None, time.monotonic())
+        assert proximo is not None and proximo > 0
+        assert not vigilante._en_curso and len(vigilante._cambiados) == 2
+    finally:
+        estado.cerrar()
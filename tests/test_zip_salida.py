@@ -0,0 +1,127 @@
+import io
+import zipfile
+
+import pytest
+
+import zip_salida
+from benchmarks.corpus import generar_estrategia
+from zip_salida import (
+    CompresorParalelo,
+    abrir_zip,
+    anexar_entrada,
+    crear_zip_temporal,
+    escribir_entrada,
+    preparar_entrada,
+)
+
+
+def _entradas():
+    entradas = [
+        (f"EURUSD/Strategy {n}.mq5", generar_estrategia(20 * 1024, seed=n))
+        for n in range(12)
+    ]
+    # Texto de varios bloques, bytes en UTF-16 y una entrada vacía
+    entradas.append(("grande.mq5", generar_estrategia(3 * 1024 * 1024, seed=99)))
+    entradas.append(("utf16.mq5", "﻿input int x = 1;\r\n".encode("utf-16-le")))
+    entradas.append(("vacia.mq5", ""))
+    return entradas
+
+
+def _serie(nivel):
+    buffer = io.BytesIO()
+    with abrir_zip(buffer, nivel) as zip_file:
+        for arcname, content in _entradas():
+            escribir_entrada(zip_file, arcname, content)
+    return buffer.getvalue()
+
+
+def _paralelo(nivel):
+    buffer = io.BytesIO()
+    with abrir_zip(buffer, nivel) as zip_file:
+        with CompresorParalelo(zip_file, hilos=4, en_vuelo=3) as compresor:
+            for arcname, content in _entradas():
+                compresor.escribir(arcname, content)
+    return buffer.getvalue()
+
+
+@pytest.mark.skipif(
+    not zip_salida.ANEXAR_COMPRIMIDAS, reason="versión de Python sin comprobar"
+)
+@pytest.mark.parametrize("nivel", [0, 1, 6, 9])
+def test_paralelo_igual_byte_a_byte_que_serie(nivel):
+    paralelo = _paralelo(nivel)
+    assert paralelo == _serie(nivel)
+    with zipfile.ZipFile(io.BytesIO(paralelo)) as zip_file:
+        assert zip_file.testzip() is None
+
+
+@pytest.mark.parametrize("nivel", [0, 6])
+def test_sin_anexar_comprimidas_escribe_en_serie(monkeypatch, nivel):
+    esperado = _serie(nivel)
+    monkeypatch.setattr(zip_salida, "ANEXAR_COMPRIMIDAS", False)
+    assert _paralelo(nivel) == esperado
+
+
+@pytest.mark.parametrize("anexar", [True, False])
+def test_preparar_y_anexar(monkeypatch, anexar):
+    if anexar and not zip_salida.ANEXAR_COMPRIMIDAS:
+        pytest.skip("versión de Python sin comprobar")
+    monkeypatch.setattr(zip_salida, "ANEXAR_COMPRIMIDAS", anexar)
+    esperado = _serie(6)
+
+    # Lo que usa el servidor: preparar en el pool, anexar en el proceso principal
+    buffer = io.BytesIO()
+    with abrir_zip(buffer, 6) as zip_file:
+        for arcname, content in _entradas():
+            preparada = preparar_entrada(
+                content, zip_file.compression, zip_file.compresslevel
+            )
+            anexar_entrada(zip_file, arcname, preparada)
+    assert buffer.getvalue() == esperado
+
+
+def test_zip_temporal_pasa_a_disco():
+    with crear_zip_temporal(max_size=64 * 1024) as temporal:
+        with abrir_zip(temporal, 0) as zip_file:
+            escribir_entrada(zip_file, "a.mq5", "x" * 1024)
+            assert not temporal._rolled
+            escribir_entrada(zip_file, "b.mq5", "x" * 128 * 1024)
+            assert temporal._rolled
+        temporal.seek(0)
+        with zipfile.ZipFile(temporal) as zip_file:
+            assert zip_file.namelist() == ["a.mq5", "b.mq5"]
+
+
+def test_escribir_entrada_por_bloques():
+    content = "áé€ñ;\n" * 1000
+    buffer = io.BytesIO()
+    with abrir_zip(buffer) as zip_file:
+        escribir_entrada(zip_file, "a.mq5", content, chunk_size=7)
+    with zipfile.ZipFile(buffer) as zip_file:
+        assert zip_file.read("a.mq5") == content.encode("utf-8")
+
+
+def test_abrir_zip_nivel():
+    with abrir_zip(io.BytesIO(), 0) as zip_file:
+        assert zip_file.compression == zipfile.ZIP_STORED
+    with abrir_zip(io.BytesIO(), 9) as zip_file:
+        assert zip_file.compression == zipfile.ZIP_DEFLATED
+        assert zip_file.compresslevel == 9
+    with pytest.raises(ValueError, match="fuera de rango"):
+        abrir_zip(io.BytesIO(), 10)
+
+
+def test_compresor_paralelo_acotado():
+    buffer = io.BytesIO()
+    with abrir_zip(buffer, 6) as zip_file:
+        with CompresorParalelo(zip_file, hilos=2, en_vuelo=3) as compresor:
+            for arcname, content in _entradas():
+                compresor.escribir(arcname, content)
+                # Nunca más de `en_vuelo` entradas comprimidas esperando
+                assert len(compresor._pendientes) <= 3
+    with zipfile.ZipFile(buffer) as zip_file:
+        assert zip_file.namelist() == [arcname for arcname, _ in _entradas()]
+
+    with zipfile.ZipFile(io.BytesIO(), "w", zipfile.ZIP_LZMA) as zip_file:
+        with pytest.raises(ValueError, match="ZIP_STORED y ZIP_DEFLATED"):
+            CompresorParalelo(zip_file)
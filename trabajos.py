@@ -0,0 +1,354 @@
+"""
+Cola de trabajos en segundo plano para la interfaz de Streamlit.
+
+Un lote enviado se convierte en un trabajo con su identificador: las entradas
+se copian a disco y se procesan en un hilo propio, fuera de la ejecución del
+script, así que un rerun, una recarga de la página o varios usuarios a la vez
+no cancelan ni repiten el trabajo. El progreso, los resultados parciales y el
+ZIP final se guardan en el trabajo; la interfaz solo consulta su estado.
+
+Con MQL5_TRABAJOS_REGISTRO=1 (como --registro en la CLI), cada estrategia
+modificada se registra en la cartera (registro.py, en MQL5_REGISTRO) y el
+trabajo guarda las colisiones de StrategyID o MagicNumber que se detecten.
+
+Como mucho MAX_TRABAJOS trabajos se procesan a la vez y MAX_EN_COLA esperan
+turno. Los terminados se borran (de memoria y de disco) TTL_TRABAJOS segundos
+después de acabar.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from time import perf_counter
+
+from motor import (
+    METODOLOGIAS,
+    AnclasNoEncontradas,
+    EstructuraInvalida,
+    extraer_identidad_bytes,
+    nombre_modificado,
+)
+from motor.perfilado import PerfilLote
+from procesamiento import procesar_con_cache
+from registro import (
+    REGISTRO_RUTA,
+    RegistroCartera,
+    clave_cartera,
+    describir_colisiones,
+)
+from zip_salida import CompresorParalelo, abrir_zip
+
+MAX_TRABAJOS = int(os.environ.get("MQL5_TRABAJOS_MAX", "2"))
+MAX_EN_COLA = int(os.environ.get("MQL5_TRABAJOS_EN_COLA", "8"))
+TTL_TRABAJOS = int(os.environ.get("MQL5_TRABAJOS_TTL_MIN", "60")) * 60
+TRABAJOS_DIR = os.environ.get(
+    "MQL5_TRABAJOS_DIR", os.path.join(tempfile.gettempdir(), "mql5_trabajos")
+)
+
+# Registro de la cartera de los trabajos de la interfaz: solo si se activa
+REGISTRO_TRABAJOS = (
+    REGISTRO_RUTA if os.environ.get("MQL5_TRABAJOS_REGISTRO") == "1" else None
+)
+
+# Líneas de resultados recientes que guarda cada trabajo para la interfaz
+RECIENTES = 10
+
+ICONOS = {
+    "ok": "✅",
+    "omitido": "⚠️",
+    "rechazado": "🚫",
+    "invalido": "🧱",
+    "error": "❌",
+    "colision": "💥",
+}
+
+
+class ColaLlena(RuntimeError):
+    """Ya hay MAX_EN_COLA trabajos sin terminar"""
+
+
+def clasificar(nombre, resultado, error):
+    """
+    (estado, mensaje, contenido, diff, informe de anclas) de la salida de
+    procesar_con_cache para un archivo
+    """
+    if isinstance(error, AnclasNoEncontradas):
+        # Rechazado en la comprobación previa, antes de transformarlo
+        return "rechazado", error.informe.mensaje(nombre), None, None, error.informe
+    if isinstance(error, EstructuraInvalida):
+        # El resultado no compilaría: no se incluye en el ZIP
+        return "invalido", str(error), None, None, None
+    if error is not None:
+        return "error", f"Error procesando {nombre}: {str(error)}", None, None, None
+    modified_content, message, diff = resultado
+    if modified_content:
+        return "ok", message, modified_content, diff, None
+    return "omitido", message, None, None, None
+
+
+def firma_lote(metodologia, claves):
+    """Identifica un lote por su metodología y el contenido de sus archivos"""
+    huella = hashlib.sha256(metodologia.encode("utf-8"))
+    for clave in sorted(claves):
+        huella.update(repr(clave).encode("utf-8"))
+    return huella.hexdigest()
+
+
+@dataclass
+class Trabajo:
+    """Estado de un lote en segundo plano"""
+
+    id: str
+    metodologia: str
+    firma: str
+    directorio: str
+    # (clave, ruta, archivo con los bytes originales), en el orden de carga
+    entradas: list
+    estado: str = "en_cola"
+    completados: int = 0
+    # clave -> (estado, mensaje, contenido, diff), e informes de anclas
+    resultados: dict = field(default_factory=dict)
+    informes: dict = field(default_factory=dict)
+    # clave -> descripción de las colisiones con la cartera
+    colisiones: dict = field(default_factory=dict)
+    recientes: deque = field(default_factory=lambda: deque(maxlen=RECIENTES))
+    perfil: PerfilLote = None
+    resumen_cache: str = None
+    archivo_zip: str = None
+    error: str = None
+    creado: float = field(default_factory=time.time)
+    terminado: float = None
+
+    @property
+    def total(self):
+        return len(self.entradas)
+
+    @property
+    def activo(self):
+        return self.estado in ("en_cola", "procesando")
+
+    def contadores(self):
+        contadores = dict.fromkeys(ICONOS, 0)
+        for estado, *_ in list(self.resultados.values()):
+            contadores[estado] += 1
+        contadores["colision"] = len(self.colisiones)
+        return contadores
+
+
+class ColaTrabajos:
+    """
+    Trabajos de todas las sesiones del servidor. Los métodos se pueden llamar
+    desde cualquier hilo
+    """
+
+    def __init__(
+        self,
+        cache,
+        max_trabajos=MAX_TRABAJOS,
+        max_en_cola=MAX_EN_COLA,
+        ttl=TTL_TRABAJOS,
+        directorio=TRABAJOS_DIR,
+        registro=None,
+    ):
+        self.cache = cache
+        # Ruta del registro de la cartera, o None para no registrar
+        self.registro = registro or None
+        self.max_en_cola = max_en_cola
+        self.ttl = ttl
+        self.directorio = directorio
+        self._trabajos = {}
+        self._cerrojo = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_trabajos, thread_name_prefix="trabajo"
+        )
+        os.makedirs(self.directorio, exist_ok=True)
+        # Restos de ejecuciones anteriores del servidor
+        limite = time.time() - self.ttl
+        for entrada in os.scandir(self.directorio):
+            if entrada.is_dir() and entrada.stat().st_mtime < limite:
+                shutil.rmtree(entrada.path, ignore_errors=True)
+
+    def enviar(self, metodologia, entradas):
+        """
+        Crea un trabajo con las entradas (clave, ruta, cargar), donde
+        `cargar()` devuelve los bytes del archivo, y devuelve su
+        identificador. Si ya hay un trabajo vigente con los mismos archivos y
+        metodología, devuelve el suyo
+        """
+        self.limpiar()
+        firma = firma_lote(metodologia, [clave for clave, _, _ in entradas])
+        with self._cerrojo:
+            for trabajo in self._trabajos.values():
+                if trabajo.firma == firma and trabajo.estado != "error":
+                    return trabajo.id
+            if sum(t.activo for t in self._trabajos.values()) >= self.max_en_cola:
+                raise ColaLlena(
+                    f"Hay {self.max_en_cola} trabajos en curso o en cola; "
+                    "espera a que termine alguno"
+                )
+            id_trabajo = uuid.uuid4().hex
+            directorio = os.path.join(self.directorio, id_trabajo)
+            trabajo = Trabajo(id_trabajo, metodologia, firma, directorio, [])
+            self._trabajos[id_trabajo] = trabajo
+
+        try:
+            # Las subidas pueden desaparecer con la sesión: se copian a disco
+            os.makedirs(os.path.join(directorio, "entradas"))
+            for n, (clave, ruta, cargar) in enumerate(entradas):
+                archivo = os.path.join(directorio, "entradas", str(n))
+                with open(archivo, "wb") as f:
+                    f.write(cargar())
+                trabajo.entradas.append((clave, ruta, archivo))
+        except BaseException:
+            with self._cerrojo:
+                del self._trabajos[id_trabajo]
+            shutil.rmtree(directorio, ignore_errors=True)
+            raise
+        self._pool.submit(self._ejecutar, trabajo)
+        return id_trabajo
+
+    def obtener(self, id_trabajo):
+        """El trabajo, o None si no existe o ya caducó"""
+        self.limpiar()
+        with self._cerrojo:
+            return self._trabajos.get(id_trabajo)
+
+    def posicion(self, trabajo):
+        """Trabajos en cola por delante de `trabajo`"""
+        with self._cerrojo:
+            return sum(
+                t.estado == "en_cola" and t.creado < trabajo.creado
+                for t in self._trabajos.values()
+            )
+
+    def limpiar(self, ahora=None):
+        """Borra los trabajos terminados hace más de `ttl` segundos"""
+        limite = (ahora or time.time()) - self.ttl
+        with self._cerrojo:
+            caducados = [
+                trabajo
+                for trabajo in self._trabajos.values()
+                if not trabajo.activo and trabajo.terminado < limite
+            ]
+            for trabajo in caducados:
+                del self._trabajos[trabajo.id]
+        for trabajo in caducados:
+            shutil.rmtree(trabajo.directorio, ignore_errors=True)
+
+    def _ejecutar(self, trabajo):
+        trabajo.estado = "procesando"
+        estado = "error"
+        try:
+            self._procesar(trabajo)
+            trabajo.archivo_zip = self._construir_zip(trabajo)
+            estado = "terminado"
+        except Exception as e:
+            trabajo.error = str(e)
+        finally:
+            shutil.rmtree(
+                os.path.join(trabajo.directorio, "entradas"), ignore_errors=True
+            )
+            # La fecha antes que el estado: limpiar() la usa en cuanto deja de
+            # estar activo
+            trabajo.terminado = time.time()
+            trabajo.estado = estado
+
+    def _procesar(self, trabajo):
+        perfil = PerfilLote()
+        lecturas = {}
+        identidades = {}
+        # Una conexión por hilo de trabajo
+        registro = None if self.registro is None else RegistroCartera(self.registro)
+        metodologias = [METODOLOGIAS[trabajo.metodologia]]
+
+        def leer_entradas():
+            for i, (_, ruta, archivo) in enumerate(trabajo.entradas):
+                inicio = perf_counter()
+                with open(archivo, "rb") as f:
+                    data = f.read()
+                lecturas[i] = perf_counter() - inicio
+                if registro is not None:
+                    # Los aciertos de caché no decodifican el archivo
+                    try:
+                        identidades[i] = extraer_identidad_bytes(data)
+                    except UnicodeDecodeError:
+                        pass
+                yield i, ruta, data
+
+        # Aciertos y fallos de este trabajo: la caché es común a todos
+        contadores = dict.fromkeys(("aciertos_memoria", "aciertos_disco", "fallos"), 0)
+        try:
+            for i, resultado, error, tiempos in procesar_con_cache(
+                leer_entradas(), trabajo.metodologia, self.cache, contadores=contadores
+            ):
+                clave, nombre, _ = trabajo.entradas[i]
+                tiempos = {"lectura": lecturas.pop(i), **tiempos}
+                estado, message, content, diff, informe = clasificar(
+                    nombre, resultado, error
+                )
+                if informe is not None:
+                    trabajo.informes[clave] = informe
+                trabajo.resultados[clave] = (estado, message, content, diff)
+                if estado in ("error", "invalido", "rechazado"):
+                    trabajo.recientes.append(f"{ICONOS[estado]} {message}")
+                else:
+                    trabajo.recientes.append(f"{ICONOS[estado]} {nombre}: {message}")
+                identidad = identidades.pop(i, None)
+                if estado == "ok" and identidad:
+                    inicio = perf_counter()
+                    colisiones = registro.registrar(
+                        clave_cartera(nombre), identidad, metodologias
+                    )
+                    tiempos["registro"] = perf_counter() - inicio
+                    if colisiones:
+                        descripcion = describir_colisiones(colisiones)
+                        trabajo.colisiones[clave] = descripcion
+                        trabajo.recientes.append(
+                            f"{ICONOS['colision']} {nombre}: {descripcion}"
+                        )
+                perfil.registrar(nombre, tiempos)
+                trabajo.completados += 1
+        finally:
+            if registro is not None:
+                registro.cerrar()
+
+        perfil.terminar()
+        trabajo.perfil = perfil
+
+        stats = self.cache.estadisticas()
+        aciertos_memoria = contadores["aciertos_memoria"]
+        aciertos_disco = contadores["aciertos_disco"]
+        fallos = contadores["fallos"]
+        trabajo.resumen_cache = (
+            f"🗄️ Caché: {aciertos_memoria + aciertos_disco} acierto(s) "
+            f"({aciertos_memoria} en memoria, {aciertos_disco} en disco) · "
+            f"{fallos} fallo(s) · "
+            f"{stats['memoria_bytes'] / 1024 / 1024:.1f} MB en memoria, "
+            f"{stats['disco_bytes'] / 1024 / 1024:.1f} MB en disco"
+        )
+
+    def _construir_zip(self, trabajo):
+        """ZIP con las estrategias modificadas del trabajo, en su directorio"""
+        metodologia = METODOLOGIAS[trabajo.metodologia]
+        ruta_zip = os.path.join(trabajo.directorio, "estrategias_modificadas.zip")
+        temporal = f"{ruta_zip}.tmp"
+        with open(temporal, "wb") as destino:
+            with (
+                abrir_zip(destino) as zip_file,
+                CompresorParalelo(zip_file) as compresor,
+            ):
+                for clave, ruta, _ in trabajo.entradas:
+                    estado, _, modified_content, _ = trabajo.resultados[clave]
+                    if estado == "ok":
+                        compresor.escribir(
+                            nombre_modificado(ruta, metodologia), modified_content
+                        )
+        os.replace(temporal, ruta_zip)
+        return ruta_zip
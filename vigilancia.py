@@ -0,0 +1,549 @@
+"""
+Modo vigilancia: mantiene un directorio de salida al día con las
+exportaciones que StrategyQuant va dejando en un directorio de entrada.
+
+Uso:
+    python vigilancia.py exports/ -m gerard -o salida/
+    python vigilancia.py exports/ -m gerard -m benjamin -o salida/ -j 2
+    python vigilancia.py exports/ --variantes escalas.json -o salida/ --sondeo
+    python vigilancia.py exports/ -m gerard -o salida/ --una-vez
+
+Los cambios llegan por inotify (watchdog) o, con --sondeo, recorriendo el
+árbol cada --intervalo segundos. Un archivo solo se procesa cuando su fecha y
+tamaño llevan --espera segundos sin cambiar (StrategyQuant puede estar
+escribiéndolo) y su contenido es distinto del ya procesado. La base de datos
+de estado (SQLite, por defecto en el directorio de salida) guarda la ruta,
+fecha, tamaño y hash de cada archivo y la versión de las metodologías:
+al reiniciar basta con un stat por archivo, sin leer los que no cambiaron.
+"""
+
+import argparse
+import hashlib
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from cli import (
+    FALLOS,
+    ICONOS,
+    VALIDACIONES,
+    _iniciar_proceso,
+    _procesar_archivo,
+)
+from motor import METODOLOGIAS_CLI, cargar_variantes
+from registro import (
+    REGISTRO_RUTA,
+    RegistroCartera,
+    clave_cartera,
+    describir_colisiones,
+)
+
+# Nombre de la base de datos de estado dentro del directorio de salida
+ESTADO_ARCHIVO = ".vigilancia.sqlite"
+
+# Segundos que un archivo debe seguir igual antes de procesarlo
+ESPERA = 2.0
+
+# Segundos entre recorridos completos del árbol con --sondeo
+INTERVALO = 2.0
+
+# Con inotify también se recorre el árbol de vez en cuando, por si se perdió
+# algún evento (p. ej. al desbordarse la cola del kernel)
+REESCANEO = 300.0
+
+# Bytes por lectura al calcular el hash de un archivo
+CHUNK_SIZE = 1024 * 1024
+
+
+def huella_archivo(ruta, chunk_size=CHUNK_SIZE):
+    huella = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        while trozo := f.read(chunk_size):
+            huella.update(trozo)
+    return huella.hexdigest()
+
+
+def version_metodologias(metodologias):
+    """Cambia si cambian las variantes a generar o sus plantillas"""
+    huella = hashlib.sha256()
+    for metodologia in metodologias:
+        huella.update(f"{metodologia.suffix}\0{metodologia.version}\0".encode())
+    return huella.hexdigest()[:16]
+
+
+class EstadoVigilancia:
+    """
+    Estado persistente de los archivos procesados. Las filas se cargan en
+    memoria al abrir la base de datos; cada cambio se guarda al momento
+    """
+
+    def __init__(self, ruta):
+        self._conexion = sqlite3.connect(ruta)
+        with self._conexion:
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS archivos ("
+                " relpath TEXT PRIMARY KEY,"
+                " mtime_ns INTEGER NOT NULL,"
+                " tamano INTEGER NOT NULL,"
+                " huella TEXT NOT NULL,"
+                " version TEXT NOT NULL,"
+                " estado TEXT NOT NULL,"
+                " mensaje TEXT NOT NULL,"
+                " procesado REAL NOT NULL)"
+            )
+        # relpath -> (mtime_ns, tamaño, hash, versión)
+        self._filas = {
+            relpath: tuple(fila)
+            for relpath, *fila in self._conexion.execute(
+                "SELECT relpath, mtime_ns, tamano, huella, version FROM archivos"
+            )
+        }
+
+    def __contains__(self, relpath):
+        return relpath in self._filas
+
+    def __iter__(self):
+        return iter(list(self._filas))
+
+    def al_dia(self, relpath, mtime_ns, tamano, version):
+        """Fecha, tamaño y versión coinciden con los de la última vez"""
+        fila = self._filas.get(relpath)
+        return fila is not None and (fila[0], fila[1], fila[3]) == (
+            mtime_ns,
+            tamano,
+            version,
+        )
+
+    def mismo_contenido(self, relpath, huella, version):
+        fila = self._filas.get(relpath)
+        return fila is not None and (fila[2], fila[3]) == (huella, version)
+
+    def registrar(self, relpath, mtime_ns, tamano, huella, version, estado, mensaje):
+        with self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO archivos VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    relpath,
+                    mtime_ns,
+                    tamano,
+                    huella,
+                    version,
+                    estado,
+                    mensaje,
+                    time.time(),
+                ),
+            )
+        self._filas[relpath] = (mtime_ns, tamano, huella, version)
+
+    def actualizar_fecha(self, relpath, mtime_ns, tamano):
+        """El archivo se reescribió con el mismo contenido"""
+        with self._conexion:
+            self._conexion.execute(
+                "UPDATE archivos SET mtime_ns = ?, tamano = ? WHERE relpath = ?",
+                (mtime_ns, tamano, relpath),
+            )
+        _, _, huella, version = self._filas[relpath]
+        self._filas[relpath] = (mtime_ns, tamano, huella, version)
+
+    def olvidar(self, relpaths):
+        with self._conexion:
+            self._conexion.executemany(
+                "DELETE FROM archivos WHERE relpath = ?",
+                ((relpath,) for relpath in relpaths),
+            )
+        for relpath in relpaths:
+            self._filas.pop(relpath, None)
+
+    def cerrar(self):
+        self._conexion.close()
+
+
+def _iniciar_trabajador(*args):
+    # Ctrl+C y SIGTERM los atiende el proceso principal, que cierra el pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _iniciar_proceso(*args)
+
+
+class _Eventos(FileSystemEventHandler):
+    """Anota las rutas .mq5 que cambian; un cambio de directorio pide un recorrido"""
+
+    def __init__(self, vigilante):
+        self.vigilante = vigilante
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        if event.is_directory:
+            if event.event_type != "modified":
+                self.vigilante.avisar(None)
+            return
+        for ruta in (event.src_path, getattr(event, "dest_path", "")):
+            if ruta and os.fsdecode(ruta).lower().endswith(".mq5"):
+                self.vigilante.avisar(os.fsdecode(ruta))
+
+
+class Vigilante:
+    """
+    Detecta los archivos nuevos o modificados del directorio de entrada y los
+    procesa en un pool de procesos acotado: como mucho `en_vuelo` archivos
+    enviados a la vez, y cada ruta una sola vez aunque cambie mientras espera
+    """
+
+    def __init__(
+        self,
+        entrada,
+        output_dir,
+        metodologias,
+        estado,
+        workers=None,
+        espera=ESPERA,
+        validacion="bloquear",
+        registro=None,
+    ):
+        self.entrada = entrada
+        self.output_dir = output_dir
+        self.metodologias = list(metodologias)
+        self.estado = estado
+        self.workers = workers or os.cpu_count() or 1
+        self.en_vuelo = 2 * self.workers
+        self.espera = espera
+        self.validacion = validacion
+        self.registro = registro
+        self.version = version_metodologias(self.metodologias)
+        self.contadores = dict.fromkeys(ICONOS, 0)
+
+        # relpath -> (mtime_ns, tamaño, momento en que se vio así por primera vez)
+        self._cambiados = {}
+        # futuro -> (relpath, mtime_ns, tamaño, hash)
+        self._en_curso = {}
+        # Rutas avisadas por inotify desde la última revisión; None pide un
+        # recorrido completo
+        self._avisos = set()
+        self._cerrojo = threading.Lock()
+        self._despertar = threading.Event()
+        self._excluido = os.path.realpath(output_dir)
+
+    def avisar(self, ruta):
+        """Llamado desde el hilo de watchdog (o para forzar un recorrido, con None)"""
+        with self._cerrojo:
+            self._avisos.add(ruta)
+        self._despertar.set()
+
+    def _relpath(self, ruta):
+        return os.path.relpath(ruta, self.entrada)
+
+    def _recorrer(self):
+        """Rutas relativas de todos los .mq5 de la entrada, sin la salida"""
+        for raiz, directorios, nombres in os.walk(self.entrada):
+            directorios[:] = [
+                nombre
+                for nombre in directorios
+                if os.path.realpath(os.path.join(raiz, nombre)) != self._excluido
+            ]
+            for nombre in nombres:
+                if nombre.lower().endswith(".mq5"):
+                    yield self._relpath(os.path.join(raiz, nombre))
+
+    def revisar(self, relpaths=None):
+        """
+        Compara la fecha y el tamaño de los archivos (todos, sin `relpaths`)
+        con el estado guardado y anota los que cambiaron. Solo un stat por
+        archivo: el contenido se lee cuando el archivo ya está estable
+        """
+        completo = relpaths is None
+        if completo:
+            relpaths = list(self._recorrer())
+        ahora = time.monotonic()
+        existentes = set()
+        for relpath in relpaths:
+            try:
+                stat = os.stat(os.path.join(self.entrada, relpath))
+            except FileNotFoundError:
+                self._cambiados.pop(relpath, None)
+                if relpath in self.estado:
+                    self.estado.olvidar([relpath])
+                continue
+            existentes.add(relpath)
+            firma = (stat.st_mtime_ns, stat.st_size)
+            if self.estado.al_dia(relpath, *firma, self.version):
+                self._cambiados.pop(relpath, None)
+                continue
+            anterior = self._cambiados.get(relpath)
+            if anterior is None or anterior[:2] != firma:
+                self._cambiados[relpath] = (*firma, ahora)
+        if completo:
+            borrados = [relpath for relpath in self.estado if relpath not in existentes]
+            if borrados:
+                self.estado.olvidar(borrados)
+
+    def _despachar(self, pool, ahora):
+        """
+        Envía al pool los archivos cuya fecha y tamaño llevan `espera`
+        segundos sin cambiar. Devuelve los segundos hasta el próximo que lo
+        estará, o None
+        """
+        en_curso = {relpath for relpath, *_ in self._en_curso.values()}
+        proximo = None
+        for relpath, (mtime_ns, tamano, desde) in list(self._cambiados.items()):
+            if len(self._en_curso) >= self.en_vuelo:
+                break
+            if relpath in en_curso:
+                # Se vuelve a revisar cuando termine
+                continue
+            restante = desde + self.espera - ahora
+            if restante > 0:
+                proximo = restante if proximo is None else min(proximo, restante)
+                continue
+
+            ruta = os.path.join(self.entrada, relpath)
+            try:
+                stat = os.stat(ruta)
+                if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, tamano):
+                    # Sigue cambiando
+                    self._cambiados[relpath] = (stat.st_mtime_ns, stat.st_size, ahora)
+                    proximo = self.espera if proximo is None else proximo
+                    continue
+                huella = huella_archivo(ruta)
+            except FileNotFoundError:
+                del self._cambiados[relpath]
+                continue
+            del self._cambiados[relpath]
+
+            if self.estado.mismo_contenido(relpath, huella, self.version):
+                # Solo cambió la fecha: no se vuelve a procesar
+                self.estado.actualizar_fecha(relpath, mtime_ns, tamano)
+                continue
+            futuro = pool.submit(
+                _procesar_archivo, (ruta, None, relpath, self.output_dir)
+            )
+            futuro.add_done_callback(lambda _: self._despertar.set())
+            self._en_curso[futuro] = (relpath, mtime_ns, tamano, huella)
+        return proximo
+
+    def _recoger(self):
+        for futuro in [futuro for futuro in self._en_curso if futuro.done()]:
+            relpath, mtime_ns, tamano, huella = self._en_curso.pop(futuro)
+            try:
+                _, estado, message, salidas, _, identidad = futuro.result()
+            except Exception as e:
+                estado, message, salidas, identidad = "error", str(e), [], None
+            self.contadores[estado] += 1
+            # Los errores también se registran: no se reintentan hasta que el
+            # archivo (o la versión de las metodologías) cambie
+            self.estado.registrar(
+                relpath, mtime_ns, tamano, huella, self.version, estado, message
+            )
+            print(f"{ICONOS[estado]} {relpath}: {message}", flush=True)
+            if self.registro is not None and salidas and identidad:
+                colisiones = self.registro.registrar(
+                    clave_cartera(relpath), identidad, self.metodologias
+                )
+                if colisiones:
+                    self.contadores["colision"] += 1
+                    print(
+                        f"{ICONOS['colision']} {relpath}: "
+                        f"{describir_colisiones(colisiones)}",
+                        flush=True,
+                    )
+            # Puede haber cambiado mientras se procesaba
+            self.revisar([relpath])
+
+    def _tomar_avisos(self):
+        # Primero se baja la señal: un aviso posterior la vuelve a subir
+        self._despertar.clear()
+        with self._cerrojo:
+            avisos = self._avisos
+            self._avisos = set()
+        return avisos
+
+    def ejecutar(self, sondeo=False, intervalo=INTERVALO, una_vez=False):
+        """
+        Bucle principal. Con `una_vez`, revisa el árbol, procesa los cambios
+        sin esperar a que se estabilicen y termina
+        """
+        if una_vez:
+            self.espera = 0
+        observador = None
+        if not sondeo and not una_vez:
+            observador = Observer()
+            observador.schedule(_Eventos(self), self.entrada, recursive=True)
+            observador.start()
+        periodo = intervalo if sondeo else REESCANEO
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_iniciar_trabajador,
+            initargs=(self.metodologias, False, False, None, self.validacion),
+        ) as pool:
+            try:
+                # El primer recorrido compara todo el árbol con el estado guardado
+                self.revisar()
+                siguiente_recorrido = time.monotonic() + periodo
+                while True:
+                    self._recoger()
+                    ahora = time.monotonic()
+                    proximo = self._despachar(pool, ahora)
+                    if una_vez and not self._cambiados and not self._en_curso:
+                        return
+                    espera = siguiente_recorrido - ahora
+                    if proximo is not None:
+                        espera = min(espera, proximo)
+                    self._despertar.wait(max(0, espera))
+
+                    avisos = self._tomar_avisos()
+                    if time.monotonic() >= siguiente_recorrido or None in avisos:
+                        self.revisar()
+                        siguiente_recorrido = time.monotonic() + periodo
+                    elif avisos:
+                        self.revisar(
+                            sorted(
+                                self._relpath(ruta)
+                                for ruta in avisos
+                                if not os.path.realpath(ruta).startswith(
+                                    self._excluido + os.sep
+                                )
+                            )
+                        )
+            finally:
+                if observador is not None:
+                    observador.stop()
+                    observador.join()
+                pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Modificador de Estrategias MQL5 en modo vigilancia"
+    )
+    parser.add_argument("entrada", help="Directorio que se vigila (recursivamente)")
+    parser.add_argument(
+        "-m",
+        "--metodologia",
+        choices=sorted(METODOLOGIAS_CLI),
+        action="append",
+        default=[],
+        help="Metodología de gestión de riesgo a aplicar (se puede repetir)",
+    )
+    parser.add_argument(
+        "--variantes",
+        help="Archivo JSON con variantes de metodología y parámetros a generar",
+    )
+    parser.add_argument("-o", "--output", required=True, help="Directorio de salida")
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Número de procesos (por defecto, uno por núcleo)",
+    )
+    parser.add_argument(
+        "--estado",
+        metavar="ARCHIVO.sqlite",
+        help=f"Base de datos de estado (por defecto, {ESTADO_ARCHIVO} en el "
+        "directorio de salida)",
+    )
+    parser.add_argument(
+        "--espera",
+        type=float,
+        default=ESPERA,
+        help="Segundos sin cambios antes de procesar un archivo",
+    )
+    parser.add_argument(
+        "--sondeo",
+        action="store_true",
+        help="Recorre el árbol periódicamente en lugar de usar inotify (p. ej. "
+        "en carpetas de red)",
+    )
+    parser.add_argument(
+        "--intervalo",
+        type=float,
+        default=INTERVALO,
+        help="Segundos entre recorridos con --sondeo",
+    )
+    parser.add_argument(
+        "--una-vez",
+        action="store_true",
+        help="Procesa los cambios pendientes y termina",
+    )
+    parser.add_argument(
+        "--validacion",
+        choices=VALIDACIONES,
+        default="bloquear",
+        help="Qué hacer con las salidas que no compilarían (ver cli.py)",
+    )
+    parser.add_argument(
+        "--registro",
+        nargs="?",
+        const=REGISTRO_RUTA,
+        metavar="ARCHIVO.sqlite",
+        help="Registra cada estrategia en la cartera y avisa de las colisiones "
+        "de StrategyID o MagicNumber (ver cli.py)",
+    )
+    args = parser.parse_args(argv)
+
+    metodologias = [
+        METODOLOGIAS_CLI[clave] for clave in dict.fromkeys(args.metodologia)
+    ]
+    if args.variantes:
+        try:
+            metodologias += cargar_variantes(args.variantes)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if not metodologias:
+        parser.error("Indica al menos una metodología (-m) o un archivo --variantes")
+    if not os.path.isdir(args.entrada):
+        parser.error(f"No existe el directorio '{args.entrada}'")
+    if args.output.lower().endswith(".zip"):
+        parser.error("El modo vigilancia escribe en un directorio, no en un .zip")
+
+    os.makedirs(args.output, exist_ok=True)
+    estado = EstadoVigilancia(args.estado or os.path.join(args.output, ESTADO_ARCHIVO))
+    registro = RegistroCartera(args.registro) if args.registro else None
+    vigilante = Vigilante(
+        args.entrada,
+        args.output,
+        metodologias,
+        estado,
+        args.workers,
+        args.espera,
+        args.validacion,
+        registro,
+    )
+    if not args.una_vez:
+        print(
+            f"Vigilando {args.entrada} "
+            f"({'sondeo' if args.sondeo else 'inotify'}); Ctrl+C para terminar",
+            flush=True,
+        )
+    # Como servicio (systemd, docker stop) termina igual que con Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        vigilante.ejecutar(args.sondeo, args.intervalo, args.una_vez)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        estado.cerrar()
+        if registro is not None:
+            registro.cerrar()
+
+    contadores = vigilante.contadores
+    print(
+        f"\nProcesados: {contadores['ok']} | Omitidos: {contadores['omitido']} | "
+        f"Rechazados: {contadores['rechazado']} | "
+        f"Inválidos: {contadores['invalido']} | Errores: {contadores['error']}"
+    )
+    if registro is not None:
+        print(f"Colisiones en la cartera: {contadores['colision']}")
+    return 1 if any(contadores[estado] for estado in FALLOS) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Escritura del archivo ZIP de resultados con memoria acotada.
+
+La compresión DEFLATE de cada entrada se puede repartir entre hilos (zlib
+libera el GIL mientras comprime) con CompresorParalelo; las entradas se
+añaden al ZIP en el orden de llegada, así que el archivo es el mismo que con
+escribir_entrada. Anexar una entrada ya comprimida requiere el interior de
+zipfile: fuera de las versiones de CPython comprobadas (ANEXAR_COMPRIMIDAS)
+las entradas se escriben en serie con escribir_entrada.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Tamaño a partir del cual el ZIP en construcción pasa de memoria a disco
+ZIP_SPOOL_MAX_SIZE = int(os.environ.get("MQL5_ZIP_SPOOL_MAX_MB", "32")) * 1024 * 1024
+
+# Caracteres codificados por escritura al volcar una entrada
+CHUNK_SIZE = 1024 * 1024
+
+# Nivel de compresión de los ZIP de salida: 0 guarda las entradas sin comprimir
+ZIP_NIVEL = int(os.environ.get("MQL5_ZIP_NIVEL", "6"))
+
+# Hilos de compresión por defecto
+ZIP_HILOS = min(8, os.cpu_count() or 1)
+
+# _anexar_comprimida replica ZipFile.open(arcname, "w") de estas versiones
+ANEXAR_COMPRIMIDAS = (
+    sys.implementation.name == "cpython"
+    and (3, 8) <= sys.version_info[:2] <= (3, 13)
+    and hasattr(zipfile.ZipFile, "_writecheck")
+)
+
+
+def crear_zip_temporal(max_size=None):
+    """
+    Devuelve un SpooledTemporaryFile que se mantiene en memoria hasta
+    `max_size` bytes y después se vuelca a un archivo temporal en disco
+    """
+    return tempfile.SpooledTemporaryFile(
+        max_size=ZIP_SPOOL_MAX_SIZE if max_size is None else max_size
+    )
+
+
+def escribir_entrada(zip_file, arcname, content, chunk_size=CHUNK_SIZE):
+    """
+    Comprime `content` directamente en la entrada del ZIP. Los bytes (ya en
+    la codificación del archivo original) se escriben tal cual; el texto se
+    codifica en UTF-8 por bloques, sin construir una copia completa en bytes.
+
+    Las entradas usan la fecha fija de ZipInfo, así que el mismo lote produce
+    siempre el mismo archivo.
+    """
+    with zip_file.open(arcname, "w") as destino:
+        if not isinstance(content, str):
+            destino.write(content)
+            return
+        for inicio in range(0, len(content), chunk_size):
+            destino.write(content[inicio : inicio + chunk_size].encode("utf-8"))
+
+
+def copiar_entrada(zip_file, arcname, origen, chunk_size=CHUNK_SIZE):
+    """Comprime por bloques el contenido de un archivo binario abierto"""
+    with zip_file.open(arcname, "w") as destino:
+        shutil.copyfileobj(origen, destino, chunk_size)
+
+
+def abrir_zip(destino, nivel=None):
+    """
+    ZipFile en modo escritura con el `nivel` de compresión indicado (0-9).
+    El nivel 0 usa ZIP_STORED: las entradas se guardan sin comprimir
+    """
+    nivel = ZIP_NIVEL if nivel is None else nivel
+    if not 0 <= nivel <= 9:
+        raise ValueError(f"Nivel de compresión fuera de rango (0-9): {nivel}")
+    if nivel == 0:
+        return zipfile.ZipFile(destino, "w", zipfile.ZIP_STORED)
+    return zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED, compresslevel=nivel)
+
+
+def comprimir_entrada(content, compress_type, nivel, chunk_size=CHUNK_SIZE):
+    """
+    Comprime `content` como lo haría escribir_entrada, fuera del ZIP.
+    Devuelve (datos comprimidos, CRC-32, tamaño sin comprimir)
+    """
+    if isinstance(content, str):
+        bloques = (
+            content[inicio : inicio + chunk_size].encode("utf-8")
+            for inicio in range(0, len(content), chunk_size)
+        )
+    else:
+        bloques = (content,)
+
+    compresor = None
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compresor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION if nivel is None else nivel,
+            zlib.DEFLATED,
+            -15,
+        )
+    partes = []
+    crc = 0
+    tamano = 0
+    for bloque in bloques:
+        crc = zlib.crc32(bloque, crc)
+        tamano += len(bloque)
+        partes.append(bloque if compresor is None else compresor.compress(bloque))
+    if compresor is not None:
+        partes.append(compresor.flush())
+    return b"".join(partes), crc, tamano
+
+
+def _anexar_comprimida(zip_file, arcname, datos, crc, tamano):
+    """
+    Añade al ZIP una entrada ya comprimida. zipfile no lo permite con su API
+    pública; se replica lo que hacen ZipFile.open(arcname, "w") y el cierre de
+    la entrada, con la cabecera local ya completa porque se conocen el CRC y
+    los tamaños
+    """
+    zinfo = zipfile.ZipInfo(arcname)
+    zinfo.compress_type = zip_file.compression
+    zinfo._compresslevel = zip_file.compresslevel
+    zinfo.external_attr = 0o600 << 16
+    zinfo.file_size = tamano
+    zinfo.compress_size = len(datos)
+    zinfo.CRC = crc
+    zip64 = max(tamano, len(datos)) > zipfile.ZIP64_LIMIT
+    if zip64 and not zip_file._allowZip64:
+        raise zipfile.LargeZipFile("Filesize would require ZIP64 extensions")
+
+    with zip_file._lock:
+        if zip_file._writing:
+            raise ValueError("Hay otra entrada del ZIP abierta para escritura")
+        if zip_file._seekable:
+            zip_file.fp.seek(zip_file.start_dir)
+        zinfo.header_offset = zip_file.fp.tell()
+        zip_file._writecheck(zinfo)
+        zip_file._didModify = True
+        zip_file.fp.write(zinfo.FileHeader(zip64))
+        zip_file.fp.write(datos)
+        zip_file.start_dir = zip_file.fp.tell()
+        zip_file.filelist.append(zinfo)
+        zip_file.NameToInfo[zinfo.filename] = zinfo
+
+
+def preparar_entrada(content, compress_type, nivel):
+    """
+    Lo que anexar_entrada necesita para añadir `content` a un ZIP: la entrada
+    ya comprimida (comprimir_entrada) o, sin ANEXAR_COMPRIMIDAS, el contenido
+    """
+    if ANEXAR_COMPRIMIDAS:
+        return comprimir_entrada(content, compress_type, nivel)
+    return content
+
+
+def anexar_entrada(zip_file, arcname, preparada):
+    """Añade al ZIP una entrada devuelta por preparar_entrada"""
+    if ANEXAR_COMPRIMIDAS:
+        _anexar_comprimida(zip_file, arcname, *preparada)
+    else:
+        escribir_entrada(zip_file, arcname, preparada)
+
+
+class CompresorParalelo:
+    """
+    Comprime las entradas de un ZIP en un pool de hilos y las añade en el
+    orden en que se piden. Como mucho `en_vuelo` entradas (por defecto, cuatro
+    por hilo) esperan comprimidas en memoria a ser escritas. Sin
+    ANEXAR_COMPRIMIDAS cada entrada se escribe al pedirla, sin hilos.
+
+        with abrir_zip(destino, nivel) as zip_file:
+            with CompresorParalelo(zip_file) as compresor:
+                compresor.escribir("a.mq5", content)
+    """
+
+    def __init__(self, zip_file, hilos=None, en_vuelo=None):
+        if zip_file.compression not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise ValueError("Solo se admiten ZIP_STORED y ZIP_DEFLATED")
+        self.zip_file = zip_file
+        self.hilos = hilos or ZIP_HILOS
+        self.en_vuelo = en_vuelo or self.hilos * 4
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.hilos, thread_name_prefix="zip"
+        )
+        self._pendientes = deque()
+
+    def escribir(self, arcname, content):
+        """Encola `content` para comprimirlo y escribirlo como `arcname`"""
+        if not ANEXAR_COMPRIMIDAS:
+            escribir_entrada(self.zip_file, arcname, content)
+            return
+        futuro = self._pool.submit(
+            comprimir_entrada,
+            content,
+            self.zip_file.compression,
+            self.zip_file.compresslevel,
+        )
+        self._pendientes.append((arcname, futuro))
+        # Las entradas ya comprimidas al principio de la cola no tienen que esperar
+        while self._pendientes and (
+            len(self._pendientes) > self.en_vuelo or self._pendientes[0][1].done()
+        ):
+            self._escribir_siguiente()
+
+    def _escribir_siguiente(self):
+        arcname, futuro = self._pendientes.popleft()
+        _anexar_comprimida(self.zip_file, arcname, *futuro.result())
+
+    def vaciar(self):
+        """Escribe todas las entradas pendientes"""
+        while self._pendientes:
+            self._escribir_siguiente()
+
+    def cerrar(self):
+        """Escribe las entradas pendientes y libera los hilos"""
+        try:
+            self.vaciar()
+        finally:
+            self._descartar()
+
+    def _descartar(self):
+        for _, futuro in self._pendientes:
+            futuro.cancel()
+        self._pendientes.clear()
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        # Tras un error a medias no se escriben más entradas
+        if tipo is None:
+            self.cerrar()
+        else:
+            self._descartar()